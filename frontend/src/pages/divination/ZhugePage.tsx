@@ -55,16 +55,12 @@ export default function ZhugePage() {
         try {
             setCalcLoading(true)
 
-            const bihua = await getBihuaFromAI(chars)
-
+            // 笔画由后端本地笔画表计算
             const response = await fetch(`${API_BASE}/api/zhuge/divine`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
                     text: chars.join(''),
-                    bihua1: bihua[0],
-                    bihua2: bihua[1],
-                    bihua3: bihua[2],
                 }),
             })
 
@@ -91,41 +87,17 @@ export default function ZhugePage() {
     // 步骤2：AI解签
     const handleAIAnalysis = async () => {
         const chars = getThreeChars(inputText)
-        const bihua = await getBihuaFromAI(chars)
 
         onSubmit({
             prompt: `诸葛神算解签`,
             input_text: inputText,
             chars: chars,
-            bihua: bihua,
+            bihua: zhugeData?.bihua_list,
             qian_number: zhugeData?.qian_number,
             qian_title: zhugeData?.title,
         })
     }
 
-    // 简化的笔画获取（实际应通过AI）
-    const getBihuaFromAI = async (chars: string[]): Promise<number[]> => {
-        // 常用汉字笔画表（简化版）
-        const bihuaMap: Record<string, number> = {
-            '一': 1, '二': 2, '三': 3, '四': 5, '五': 4, '六': 4, '七': 2, '八': 2, '九': 2, '十': 2,
-            '天': 4, '地': 6, '人': 2, '和': 8, '平': 5, '安': 6, '福': 13, '禄': 12, '寿': 7, '喜': 12,
-            '大': 3, '小': 3, '中': 4, '上': 3, '下': 3, '左': 5, '右': 5, '前': 9, '后': 6, '内': 4,
-            '日': 4, '月': 4, '年': 6, '时': 7, '分': 4, '秒': 9, '春': 9, '夏': 10, '秋': 9, '冬': 5,
-            '山': 3, '水': 4, '火': 4, '木': 4, '金': 8, '土': 3, '风': 4, '云': 4, '雨': 8, '雪': 11,
-            '龙': 5, '虎': 8, '凤': 4, '龟': 7, '马': 3, '牛': 4, '羊': 6, '猪': 11, '狗': 8, '鸡': 7,
-            '爱': 10, '情': 11, '心': 4, '意': 13, '志': 7, '思': 9, '想': 13, '念': 8, '感': 13, '觉': 9,
-            '我': 7, '你': 7, '他': 5, '她': 6, '它': 5, '们': 5, '的': 8, '是': 9, '在': 6, '有': 6,
-        }
-
-        return chars.map(char => {
-            if (bihuaMap[char]) {
-                return bihuaMap[char]
-            }
-            // 默认返回随机笔画数（5-15）
-            return Math.floor(Math.random() * 11) + 5
-        })
-    }
-
     const displayChars = getThreeChars(inputText)
 
     return (
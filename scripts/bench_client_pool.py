@@ -0,0 +1,233 @@
+"""
+自定义 API 客户端池基准
+
+在子进程中启动一个模拟 OpenAI /chat/completions 流式接口（asyncio 原始 HTTP/1.1 服务，支持 keep-alive），
+每个新连接的首个请求额外等待 30ms 模拟 TCP + TLS 握手，响应以 chunked SSE 每 5ms 推送一个片段。
+客户端以 10 并发发起 500 次流式请求，对比：
+- per_request：每个请求新建 AsyncOpenAI，用完关闭（改动前的写法并补上关闭）
+- unclosed：每个请求新建 AsyncOpenAI 且从不关闭（改动前的实际行为）
+- pooled：get_openai_client_pool().get(...) 复用客户端与连接池
+统计服务端看到的新建连接数（即握手次数）、请求延迟 p50/p95 与失败数。
+
+--root 可指向旧版本检出目录（没有 src/ai/client_pool.py 时跳过 pooled）。
+
+用法：
+    python scripts/bench_client_pool.py --requests 500 --concurrency 10
+"""
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HANDSHAKE_DELAY = 0.030
+CHUNK_INTERVAL = 0.005
+CHUNKS = ["卦", "象", "大", "吉", "。"]
+API_KEY = "sk-bench"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="自定义 API 客户端池基准")
+    parser.add_argument("--requests", type=int, default=500, help="每种方式的请求数")
+    parser.add_argument("--concurrency", type=int, default=10, help="并发数")
+    parser.add_argument("--modes", default="per_request,pooled", help="逗号分隔的方式（可加 unclosed）")
+    parser.add_argument("--timeout", type=float, default=10.0, help="单个请求超时（秒）")
+    parser.add_argument("--root", default=str(ROOT), help="被测代码所在目录")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+# ==================== 模拟接口 ====================
+
+STATS = {"connections": 0, "requests": 0}
+
+
+def sse_chunk(content: str) -> bytes:
+    chunk = {
+        "id": "bench",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "bench",
+        "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+    }
+    return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def write_chunked(writer: asyncio.StreamWriter, data: bytes) -> None:
+    writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+    await writer.drain()
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """keep-alive 连接：新连接的首个请求先等待模拟握手"""
+    STATS["connections"] += 1
+    handshake = True
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            request_line, *header_lines = head.decode("latin-1").split("\r\n")
+            headers = dict(line.split(": ", 1) for line in header_lines if ": " in line)
+            length = int(headers.get("Content-Length", headers.get("content-length", "0")))
+            if length:
+                await reader.readexactly(length)
+            if handshake:
+                await asyncio.sleep(HANDSHAKE_DELAY)
+                handshake = False
+
+            if request_line.startswith("GET /stats"):
+                body = json.dumps(STATS).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+                continue
+
+            STATS["requests"] += 1
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+            for content in CHUNKS:
+                await asyncio.sleep(CHUNK_INTERVAL)
+                await write_chunked(writer, sse_chunk(content))
+            await write_chunked(writer, b"data: [DONE]\n\n")
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+def serve(port: int):
+    async def run():
+        server = await asyncio.start_server(handle, "127.0.0.1", port, backlog=1024)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
+
+
+# ==================== 压测 ====================
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def server_stats(base_url: str) -> dict:
+    import httpx
+
+    async with httpx.AsyncClient() as client:
+        return (await client.get(f"{base_url}/stats")).json()
+
+
+async def wait_ready(base_url: str, deadline: float = 10.0):
+    import httpx
+
+    start = time.monotonic()
+    while True:
+        try:
+            return await server_stats(base_url)
+        except httpx.TransportError:
+            if time.monotonic() - start > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def run_mode(mode: str, base_url: str, args) -> dict:
+    from openai import AsyncOpenAI
+
+    pool = None
+    if mode == "pooled":
+        from src.ai.client_pool import get_openai_client_pool
+        pool = get_openai_client_pool()
+
+    api_url = f"{base_url}/v1"
+    latencies = []
+    failures = 0
+    remaining = iter(range(args.requests))
+
+    async def one_request():
+        if pool is not None:
+            client = pool.get(api_url, API_KEY, timeout=args.timeout)
+        else:
+            client = AsyncOpenAI(api_key=API_KEY, base_url=api_url, timeout=args.timeout, max_retries=0)
+        try:
+            stream = await client.chat.completions.create(
+                model="bench", messages=[{"role": "user", "content": "问事业"}], stream=True,
+            )
+            text = "".join([chunk.choices[0].delta.content or "" async for chunk in stream])
+            if text != "".join(CHUNKS):
+                raise ValueError(f"内容不一致: {text!r}")
+        finally:
+            if mode == "per_request":
+                await client.close()
+
+    async def worker():
+        nonlocal failures
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                await one_request()
+            except Exception:
+                failures += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    before = await server_stats(base_url)
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+    after = await server_stats(base_url)
+
+    latencies.sort()
+    result = {
+        "mode": mode,
+        "requests": args.requests,
+        "failures": failures,
+        # 统计请求本身也占用一个连接
+        "connections": after["connections"] - before["connections"] - 1,
+        "elapsed_s": round(elapsed, 2),
+    }
+    if latencies:
+        result["p50_ms"] = round(latencies[len(latencies) // 2] * 1000, 1)
+        result["p95_ms"] = round(latencies[int(len(latencies) * 0.95)] * 1000, 1)
+    if pool is not None:
+        result["pool"] = pool.get_stats()
+    return result
+
+
+async def run_all(base_url: str, args):
+    await wait_ready(base_url)
+    for mode in args.modes.split(","):
+        if mode == "pooled" and not (Path(args.root) / "src" / "ai" / "client_pool.py").exists():
+            print(json.dumps({"mode": mode, "skipped": "被测代码没有 src/ai/client_pool.py"}, ensure_ascii=False))
+            continue
+        print(json.dumps(await run_mode(mode, base_url, args), ensure_ascii=False))
+
+
+def main():
+    args = parse_args()
+    if args.serve:
+        serve(args.serve)
+        return
+
+    sys.path.insert(0, args.root)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([sys.executable, __file__, "--serve", str(port)])
+    try:
+        asyncio.run(run_all(base_url, args))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+BM25 关键词索引与混合检索基准
+
+语料：仓库 src/ 下 .py/.json/.md 文件中的中文片段拼接成长文本，随机截取 rows 个 200 字分块，
+向量为随机 384 维；查询为从语料中随机截取的 6~16 字短语。
+统计入库耗时（含 BM25）及其中 BM25 建索引的部分、save_indexes 与重新打开耗时、
+BM25 / 向量检索延迟、模拟嵌入延迟下非混合与混合检索的 retrieve 延迟，
+以及查询原文所在分块进入 BM25 前 10 的比例。
+
+用法：
+    python scripts/bench_rag_bm25.py --rows 100000
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.rag.bm25 import BM25Index  # noqa: E402
+from src.rag.models import DocumentChunk  # noqa: E402
+from src.rag.retriever import RetrievalConfig, SemanticRetriever  # noqa: E402
+from src.rag.vector_store import VectorStore  # noqa: E402
+
+CHUNK_CHARS = 200
+DIM = 384
+BATCH = 5000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="BM25 关键词索引与混合检索基准")
+    parser.add_argument("--rows", type=int, default=100000, help="分块数")
+    parser.add_argument("--queries", type=int, default=200, help="查询次数")
+    parser.add_argument("--embed-ms", default="0,30", help="逗号分隔的模拟嵌入延迟（毫秒）")
+    return parser.parse_args()
+
+
+def load_corpus() -> str:
+    texts = []
+    for path in sorted((ROOT / "src").rglob("*")):
+        if path.suffix in (".py", ".json", ".md"):
+            texts.append(path.read_text(encoding="utf-8", errors="ignore"))
+    return "".join(re.findall(r"[一-鿿，。]+", "".join(texts)))
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return round(statistics.median(latencies), 2), round(latencies[int(len(latencies) * 0.95)], 2)
+
+
+def timed(queries, fn):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return percentiles(latencies)
+
+
+class SleepyEmbedding:
+    """模拟远程嵌入：固定延迟后返回同一查询向量"""
+
+    def __init__(self, delay: float, vector):
+        self.delay = delay
+        self.vector = vector
+
+    async def embed(self, text: str):
+        await asyncio.sleep(self.delay)
+        return self.vector
+
+
+async def retrieve_latency(store, queries, delay: float, vector, hybrid: bool):
+    retriever = SemanticRetriever(store, SleepyEmbedding(delay, vector))
+    config = RetrievalConfig(hybrid=hybrid, score_threshold=0.0)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        await retriever.retrieve(query, config)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return percentiles(latencies)
+
+
+def main():
+    args = parse_args()
+    corpus = load_corpus()
+    rng = random.Random(0)
+    docs = [corpus[s:s + CHUNK_CHARS] for s in (rng.randrange(len(corpus) - 300) for _ in range(args.rows))]
+    vectors = np.random.default_rng(0).standard_normal((args.rows, DIM)).astype(np.float32)
+    queries = []
+    for _ in range(args.queries):
+        start = rng.randrange(len(corpus) - 20)
+        queries.append(corpus[start:start + rng.randint(6, 16)])
+
+    path = tempfile.mkdtemp(prefix="bench_bm25_")
+    try:
+        store = VectorStore(path)
+        start = time.perf_counter()
+        for lo in range(0, args.rows, BATCH):
+            hi = min(args.rows, lo + BATCH)
+            chunks = [DocumentChunk(id=f"c{i}", document_id="x", content=docs[i], chunk_index=i) for i in range(lo, hi)]
+            store.add_batch(chunks, vectors[lo:hi], "general")
+        ingest_s = time.perf_counter() - start
+
+        # 单独重建一遍 BM25，得到入库耗时中关键词索引所占部分
+        keywords = BM25Index()
+        start = time.perf_counter()
+        for lo in range(0, args.rows, BATCH):
+            hi = min(args.rows, lo + BATCH)
+            keywords.add([f"c{i}" for i in range(lo, hi)], docs[lo:hi], ["general"] * (hi - lo))
+        bm25_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store.save_indexes()
+        save_s = time.perf_counter() - start
+        start = time.perf_counter()
+        store = VectorStore(path)
+        open_s = time.perf_counter() - start
+
+        print(json.dumps({
+            "rows": args.rows,
+            "corpus_chars": len(corpus),
+            "ingest_s": round(ingest_s, 1),
+            "bm25_build_s": round(bm25_s, 1),
+            "save_indexes_s": round(save_s, 2),
+            "open_s": round(open_s, 2),
+            "bm25_docs": len(store._keywords),
+        }))
+
+        query_vector = vectors[0]
+        print(json.dumps({"bm25_search_ms_p50_p95": timed(queries, lambda q: store.keyword_search(q, 20))}))
+        print(json.dumps({"vector_search_ms_p50_p95": timed(queries, lambda q: store.search(query_vector, 20))}))
+
+        for delay_ms in (float(ms) for ms in args.embed_ms.split(",")):
+            plain = asyncio.run(retrieve_latency(store, queries[:100], delay_ms / 1000, query_vector, False))
+            hybrid = asyncio.run(retrieve_latency(store, queries[:100], delay_ms / 1000, query_vector, True))
+            print(json.dumps({"embed_ms": delay_ms, "retrieve_ms_p50_p95": plain, "hybrid_ms_p50_p95": hybrid}))
+
+        hits = sum(any(q in entry.content for entry, _ in store.keyword_search(q, 10)) for q in queries)
+        print(json.dumps({"exact_phrase_in_bm25_top10": round(hits / len(queries), 3)}))
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
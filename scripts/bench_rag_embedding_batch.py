@@ -0,0 +1,190 @@
+"""
+远程嵌入微批处理基准
+
+在子进程中启动一个模拟 OpenAI /embeddings 接口（uvicorn，每个请求耗时 20ms + 每条输入 0.1ms，
+向量首维为 len(text) % 7，用于校验返回顺序）；EmbeddingService 不启用缓存，
+以不同并发度发起 2000 次 embed()（1500 个不同文本，可重复），
+统计每秒嵌入数、单次延迟 p50/p95、实际 HTTP 请求数与发送的文本数。
+
+--root 可指向旧版本检出目录对比改动前后。
+
+用法：
+    python scripts/bench_rag_embedding_batch.py --concurrency 1,16,64,256
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+REQUEST_DELAY = 0.020
+PER_INPUT_DELAY = 0.0001
+VECTOR_DIM = 64
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="远程嵌入微批处理基准")
+    parser.add_argument("--concurrency", default="1,16,64,256", help="逗号分隔的并发度")
+    parser.add_argument("--total", type=int, default=2000, help="每轮 embed() 调用次数")
+    parser.add_argument("--distinct", type=int, default=1500, help="不同文本数")
+    parser.add_argument("--timeout", type=float, default=120.0, help="每轮超时（秒）")
+    parser.add_argument("--root", default=str(ROOT), help="被测代码所在目录")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+# ==================== 模拟接口 ====================
+
+STATS = {"requests": 0, "texts": 0}
+
+
+async def fake_embeddings_app(scope, receive, send):
+    """最小 ASGI 应用：POST /embeddings 返回假向量，GET /stats 返回累计请求数"""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            else:
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["path"] == "/stats":
+        body = json.dumps(STATS).encode()
+    else:
+        chunks = b""
+        while True:
+            message = await receive()
+            chunks += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        inputs = json.loads(chunks)["input"]
+        STATS["requests"] += 1
+        STATS["texts"] += len(inputs)
+        await asyncio.sleep(REQUEST_DELAY + PER_INPUT_DELAY * len(inputs))
+        body = json.dumps({
+            "data": [
+                {"index": i, "embedding": [float(len(text) % 7)] * VECTOR_DIM}
+                for i, text in enumerate(inputs)
+            ]
+        }).encode()
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": body})
+
+
+def serve(port: int):
+    import uvicorn
+
+    uvicorn.run(fake_embeddings_app, host="127.0.0.1", port=port, log_level="error")
+
+
+# ==================== 压测 ====================
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(base_url: str, deadline: float = 10.0):
+    async with httpx.AsyncClient() as client:
+        start = time.monotonic()
+        while True:
+            try:
+                await client.get(f"{base_url}/stats")
+                return
+            except httpx.TransportError:
+                if time.monotonic() - start > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+
+async def server_stats(base_url: str) -> dict:
+    async with httpx.AsyncClient() as client:
+        return (await client.get(f"{base_url}/stats")).json()
+
+
+async def run_round(base_url: str, concurrency: int, args) -> dict:
+    from src.rag.embeddings import EmbeddingService
+
+    service = EmbeddingService("openai", api_key="bench", base_url=base_url, use_cache=False)
+    await service.embed("warmup")
+
+    rng = random.Random(1)
+    texts = iter([f"query {rng.randrange(args.distinct)} 紫微斗数" for _ in range(args.total)])
+    latencies = []
+    wrong = 0
+
+    async def worker():
+        nonlocal wrong
+        for text in texts:
+            start = time.perf_counter()
+            vector = await service.embed(text)
+            latencies.append(time.perf_counter() - start)
+            # 请求失败时服务会退回模拟向量，首维不再等于 len(text) % 7
+            if not vector or vector[0] != float(len(text) % 7):
+                wrong += 1
+
+    before = await server_stats(base_url)
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(asyncio.gather(*[worker() for _ in range(concurrency)]), args.timeout)
+        timed_out = False
+    except asyncio.TimeoutError:
+        timed_out = True
+    elapsed = time.perf_counter() - start
+    after = await server_stats(base_url)
+
+    latencies.sort()
+    result = {
+        "concurrency": concurrency,
+        "embeds_s": round(len(latencies) / elapsed),
+        "completed": len(latencies),
+        "timed_out": timed_out,
+        "wrong_vectors": wrong,
+        "http_requests": after["requests"] - before["requests"],
+        "texts_sent": after["texts"] - before["texts"],
+    }
+    if latencies:
+        result["p50_ms"] = round(latencies[len(latencies) // 2] * 1000, 1)
+        result["p95_ms"] = round(latencies[int(len(latencies) * 0.95)] * 1000, 1)
+    batcher = getattr(service, "batcher", None)
+    if batcher is not None:
+        result["batcher"] = batcher.stats()
+    return result
+
+
+async def run_all(base_url: str, args):
+    # 共享 HTTP 客户端绑定在事件循环上，各轮在同一循环中执行，每轮使用新的服务实例
+    await wait_ready(base_url)
+    for concurrency in (int(n) for n in args.concurrency.split(",")):
+        print(json.dumps(await run_round(base_url, concurrency, args), ensure_ascii=False))
+
+
+def main():
+    args = parse_args()
+    if args.serve:
+        serve(args.serve)
+        return
+
+    sys.path.insert(0, args.root)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([sys.executable, __file__, "--serve", str(port)])
+    try:
+        asyncio.run(run_all(base_url, args))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+向量集合精确检索基准（FlatIndex）
+
+数据：标准正态随机向量，按行号轮流分到 5 个分类，每批 1000 条入库；
+查询：另一随机种子生成的随机向量，top_k=5，统计每次查询的中位延迟（全量 / 单分类过滤）。
+
+--root 可指向旧版本的检出目录（如 git worktree），用同一份数据对比改动前后。
+
+用法：
+    python scripts/bench_rag_flat.py --rows 10000 --dim 384
+    python scripts/bench_rag_flat.py --rows 100000 --dim 1536 --queries 50
+"""
+import argparse
+import json
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+CATEGORIES = ["classic", "liuyao", "tarot", "bazi", "general"]
+BATCH = 1000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="FlatIndex 精确检索基准")
+    parser.add_argument("--rows", type=int, default=10000, help="集合条目数")
+    parser.add_argument("--dim", type=int, default=384, help="向量维度")
+    parser.add_argument("--queries", type=int, default=100, help="查询次数")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--root", default=str(Path(__file__).resolve().parent.parent), help="被测代码所在目录")
+    return parser.parse_args()
+
+
+def build(store, rows: int, dim: int) -> float:
+    """分批入库，返回 add_batch 累计耗时（秒）"""
+    from src.rag.models import DocumentChunk
+
+    rng = np.random.default_rng(0)
+    elapsed = 0.0
+    for lo in range(0, rows, BATCH):
+        hi = min(rows, lo + BATCH)
+        vectors = rng.standard_normal((hi - lo, dim)).astype(np.float32).tolist()
+        chunks = [
+            DocumentChunk(id=f"c{k}", document_id=f"d{k // 10}", content="文本", chunk_index=k % 10)
+            for k in range(lo, hi)
+        ]
+        for c, category in enumerate(CATEGORIES):
+            picked = [i for i in range(hi - lo) if (lo + i) % len(CATEGORIES) == c]
+            start = time.perf_counter()
+            store.add_batch([chunks[i] for i in picked], [vectors[i] for i in picked], category)
+            elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def median_ms(store, queries, top_k: int, **kwargs):
+    """返回 (中位延迟 ms, 第一条查询的结果)"""
+    latencies = []
+    first = None
+    for query in queries:
+        start = time.perf_counter()
+        results = store.search(query, top_k=top_k, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if first is None:
+            first = results
+    return round(statistics.median(latencies), 2), first
+
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, args.root)
+    from src.rag.vector_store import VectorStore
+
+    store = VectorStore(store_path=tempfile.mkdtemp(prefix="bench_flat_"), auto_save=False)
+    add_s = build(store, args.rows, args.dim)
+
+    queries = np.random.default_rng(1).standard_normal((args.queries, args.dim)).astype(np.float32).tolist()
+    all_ms, top = median_ms(store, queries, args.top_k)
+    category_ms, top_category = median_ms(store, queries, args.top_k, categories=["liuyao"])
+
+    print(json.dumps({
+        "rows": args.rows,
+        "dim": args.dim,
+        "add_batch_s": round(add_s, 2),
+        "search_ms_p50": all_ms,
+        "search_category_ms_p50": category_ms,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024,
+        # 新旧实现的 top-k 应一致
+        "top": [(entry.id, round(score, 4)) for entry, score in top],
+        "top_category": [entry.id for entry, _ in top_category],
+    }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+IVF / IVF-PQ 近似检索基准
+
+数据：带聚类结构的合成向量（rows/100 个中心，每行 = 随机中心 + 0.6 倍高斯噪声，归一化）；
+查询：从数据中随机抽取 200 行并加小幅噪声。
+以 FlatIndex 精确检索的 top-10 为基准，统计各 nprobe 下的 recall@10 与单线程 QPS，以及训练耗时。
+--reopen 时另将同样数据写入 ivf 集合，训练并保存后统计重新打开耗时（无需重新训练）。
+
+用法：
+    python scripts/bench_rag_ivf.py --rows 300000 --dim 384 --pq 0,48
+    python scripts/bench_rag_ivf.py --rows 300000 --pq 48 --reopen
+"""
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.rag.index import FlatIndex, normalize_rows  # noqa: E402
+from src.rag.ivf import IVFIndex  # noqa: E402
+
+TOP_K = 10
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="IVF / IVF-PQ 近似检索基准")
+    parser.add_argument("--rows", type=int, default=300000, help="集合条目数")
+    parser.add_argument("--dim", type=int, default=384, help="向量维度")
+    parser.add_argument("--queries", type=int, default=200, help="查询次数")
+    parser.add_argument("--pq", default="0,48", help="逗号分隔的 pq_m 取值，0 表示不量化")
+    parser.add_argument("--nprobe", default="4,8,16,32,64", help="逗号分隔的 nprobe 取值")
+    parser.add_argument("--rerank", type=int, default=10, help="PQ 精确重排倍数")
+    parser.add_argument("--reopen", action="store_true", help="测量保存后重新打开集合的耗时")
+    return parser.parse_args()
+
+
+def make_data(rows: int, dim: int, queries: int):
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(1, rows // 100), dim)).astype(np.float32)
+    data = centers[rng.integers(0, len(centers), rows)] + 0.6 * rng.standard_normal((rows, dim)).astype(np.float32)
+    data = normalize_rows(data)
+    picked = data[rng.choice(rows, queries, replace=False)]
+    return data, picked + 1.2 * rng.standard_normal((queries, dim)).astype(np.float32) / np.sqrt(dim)
+
+
+def run(index, queries, **kwargs):
+    """返回 (每条查询的 id 集合, QPS)"""
+    start = time.perf_counter()
+    results = [index.search(query, TOP_K, score_threshold=-1.0, **kwargs) for query in queries]
+    qps = len(queries) / (time.perf_counter() - start)
+    return [{entry_id for entry_id, _ in result} for result in results], qps
+
+
+def bench_index(args, data, queries):
+    ids = [f"e{i}" for i in range(len(data))]
+    categories = ["general"] * len(data)
+
+    flat = FlatIndex()
+    flat.add(ids, data, categories, normalized=True)
+    truth, qps = run(flat, queries)
+    print(json.dumps({"rows": len(data), "dim": data.shape[1], "index": "flat", "qps": round(qps), "recall@10": 1.0}))
+
+    for pq_m in (int(m) for m in args.pq.split(",")):
+        ivf = IVFIndex(pq_m=pq_m, rerank=args.rerank, min_train_rows=10**12)
+        ivf.add(ids, data, categories, normalized=True)
+        start = time.perf_counter()
+        ivf.train()
+        train_s = time.perf_counter() - start
+        for nprobe in (int(n) for n in args.nprobe.split(",")):
+            found, qps = run(ivf, queries, nprobe=nprobe)
+            recall = np.mean([len(f & t) / TOP_K for f, t in zip(found, truth)])
+            print(json.dumps({
+                "index": f"ivf-pq{pq_m}" if pq_m else "ivf",
+                "nlist": len(ivf._centroids),
+                "nprobe": nprobe,
+                "qps": round(qps),
+                "recall@10": round(float(recall), 3),
+                "train_s": round(train_s, 1),
+            }))
+
+
+def bench_reopen(args, data):
+    from src.rag.models import DocumentChunk
+    from src.rag.vector_store import VectorStore
+
+    pq_m = max(int(m) for m in args.pq.split(","))
+    path = tempfile.mkdtemp(prefix="bench_ivf_")
+    try:
+        store = VectorStore(path, index_type="ivf", index_params={"pq_m": pq_m, "min_train_rows": 10**12})
+        for lo in range(0, len(data), 20000):
+            hi = min(len(data), lo + 20000)
+            chunks = [DocumentChunk(id=f"e{i}", document_id="d", content="x", chunk_index=i) for i in range(lo, hi)]
+            store.add_batch(chunks, data[lo:hi], "general")
+        start = time.perf_counter()
+        store._index.train()
+        train_s = time.perf_counter() - start
+        store.save_all()
+
+        start = time.perf_counter()
+        reopened = VectorStore(path)
+        open_s = time.perf_counter() - start
+        print(json.dumps({
+            "index": f"ivf-pq{pq_m}" if pq_m else "ivf",
+            "train_s": round(train_s, 1),
+            "reopen_s": round(open_s, 2),
+            "trained_after_reopen": reopened._index.trained,
+        }))
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    args = parse_args()
+    data, queries = make_data(args.rows, args.dim, args.queries)
+    bench_index(args, data, queries)
+    if args.reopen:
+        bench_reopen(args, data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+本地嵌入模型吞吐与检索质量基准
+
+语料：仓库 src/ 下 .py/.md 文件中的中英文片段拼接成长文本。
+- 吞吐：随机截取 20000 个 200/500/2000 字分块，统计 encode() 按不同批大小与 embed_texts()（列表输出）的文档/秒
+- 质量：3000 个 300 字分块；300 个查询取自分块内 30 字片段并随机删去 6 个字，
+  统计来源分块进入余弦相似度前 5 的比例（recall@5），并对比拟合 IDF 后的结果
+
+--root 可指向旧版本检出目录（无 encode()/fit_idf() 时只测 embed_texts 与不带 IDF 的质量）。
+
+用法：
+    python scripts/bench_rag_local_embedding.py
+    python scripts/bench_rag_local_embedding.py --root /path/to/old/checkout --docs 5000
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="本地嵌入模型吞吐与检索质量基准")
+    parser.add_argument("--docs", type=int, default=20000, help="吞吐测试的分块数")
+    parser.add_argument("--lengths", default="200,500,2000", help="逗号分隔的分块字数")
+    parser.add_argument("--batch-sizes", default="1,32,256", help="逗号分隔的 encode() 批大小")
+    parser.add_argument("--root", default=str(ROOT), help="被测代码所在目录")
+    return parser.parse_args()
+
+
+def load_corpus() -> str:
+    texts = []
+    for path in sorted((ROOT / "src").rglob("*")):
+        if path.suffix in (".py", ".md"):
+            texts.append(path.read_text(encoding="utf-8", errors="ignore"))
+    return "".join(re.findall(r"[一-鿿，。a-zA-Z0-9 ]+", "".join(texts)))
+
+
+def sample(corpus: str, count: int, length: int, rng: random.Random):
+    return [corpus[s:s + length] for s in (rng.randrange(len(corpus) - length) for _ in range(count))]
+
+
+def throughput(model, corpus: str, args):
+    rng = random.Random(0)
+    for length in (int(n) for n in args.lengths.split(",")):
+        docs = sample(corpus, args.docs, length, rng)
+        result = {"chars": length}
+        if hasattr(model, "encode"):
+            for batch_size in (int(n) for n in args.batch_sizes.split(",")):
+                start = time.perf_counter()
+                for lo in range(0, len(docs), batch_size):
+                    model.encode(docs[lo:lo + batch_size])
+                result[f"encode_batch{batch_size}_docs_s"] = round(len(docs) / (time.perf_counter() - start))
+        start = time.perf_counter()
+        asyncio.run(model.embed_texts(docs))
+        result["embed_texts_docs_s"] = round(len(docs) / (time.perf_counter() - start))
+        print(json.dumps(result))
+
+
+def recall_at_5(model, docs, queries, sources) -> float:
+    doc_vectors = np.asarray(asyncio.run(model.embed_texts(docs)), dtype=np.float32)
+    query_vectors = np.asarray(asyncio.run(model.embed_texts(queries)), dtype=np.float32)
+    scores = query_vectors @ doc_vectors.T
+    top = np.argpartition(-scores, 5, axis=1)[:, :5]
+    return float(np.mean([source in row for source, row in zip(sources, top)]))
+
+
+def quality(model_class, corpus: str):
+    rng = random.Random(1)
+    docs = sample(corpus, 3000, 300, rng)
+    queries, sources = [], []
+    for _ in range(300):
+        source = rng.randrange(len(docs))
+        start = rng.randrange(len(docs[source]) - 30)
+        snippet = list(docs[source][start:start + 30])
+        for position in sorted(rng.sample(range(30), 6), reverse=True):
+            del snippet[position]
+        queries.append("".join(snippet))
+        sources.append(source)
+
+    result = {"recall@5": round(recall_at_5(model_class(), docs, queries, sources), 3)}
+    model = model_class()
+    if hasattr(model, "fit_idf"):
+        model.fit_idf(docs)
+        result["recall@5_idf"] = round(recall_at_5(model, docs, queries, sources), 3)
+    print(json.dumps(result))
+
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, args.root)
+    from src.rag.embeddings import LocalEmbedding
+
+    corpus = load_corpus()
+    model = LocalEmbedding()
+
+    async def single_queries(count: int) -> float:
+        start = time.perf_counter()
+        for _ in range(count):
+            await model.embed_text("问姻缘何时到来")
+        return (time.perf_counter() - start) * 1000 / count
+
+    print(json.dumps({"single_query_ms": round(asyncio.run(single_queries(1000)), 3)}))
+    throughput(model, corpus, args)
+    quality(LocalEmbedding, corpus)
+
+
+if __name__ == "__main__":
+    main()
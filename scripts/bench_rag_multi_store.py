@@ -0,0 +1,130 @@
+"""
+多知识库检索基准
+
+数据：10 个 flat 集合，各 rows 条 384 维向量。
+- clustered：每个集合围绕各自的中心（中心 + 0.5 倍高斯噪声），查询取某个集合附近，主题分明
+- random：各向同性随机向量，上界无法剪枝
+- remote：同 clustered，但每个集合包一层同步接口、每次检索额外 20ms 的模拟远程存储（无上界）
+对 3/5/10 个集合分别执行 60 次检索（前 5 次预热不计），top_k=5，统计 p50/p95，
+并对比默认配置与 early_termination（阈值算法）。
+
+--root 可指向旧版本检出目录（不支持 early_termination 时只测默认配置）。
+
+用法：
+    python scripts/bench_rag_multi_store.py --rows 50000 --modes clustered,random,remote
+"""
+import argparse
+import asyncio
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+DIM = 384
+COLLECTIONS = 10
+REMOTE_DELAY = 0.020
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="多知识库检索基准")
+    parser.add_argument("--rows", type=int, default=50000, help="每个集合的条目数")
+    parser.add_argument("--modes", default="clustered,random,remote", help="逗号分隔的数据模式")
+    parser.add_argument("--collections", default="3,5,10", help="逗号分隔的参与检索的集合数")
+    parser.add_argument("--queries", type=int, default=60, help="每种配置的检索次数")
+    parser.add_argument("--warmup", type=int, default=5, help="不计入统计的预热次数")
+    parser.add_argument("--root", default=str(ROOT), help="被测代码所在目录")
+    return parser.parse_args()
+
+
+class FixedEmbedding:
+    """直接返回预先设置的查询向量"""
+
+    vector = None
+
+    async def embed(self, text: str):
+        return self.vector
+
+
+class SleepyStore:
+    """模拟远程存储：同步接口，每次检索额外 20ms 网络延迟"""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def search(self, query_embedding, top_k=5, categories=None, score_threshold=0.0):
+        time.sleep(REMOTE_DELAY)
+        return self.inner.search(query_embedding, top_k, categories, score_threshold)
+
+
+def build_stores(path: Path, mode: str, rows: int, centers: np.ndarray, rng: np.random.Generator):
+    from src.rag.models import DocumentChunk
+    from src.rag.vector_store import VectorStore
+
+    stores = {}
+    for k in range(COLLECTIONS):
+        store = VectorStore(str(path / f"s{k}"))
+        if mode == "random":
+            vectors = rng.normal(size=(rows, DIM))
+        else:
+            vectors = centers[k] + rng.normal(size=(rows, DIM)) * 0.5
+        chunks = [DocumentChunk(id=f"{k}-{i}", document_id="d", content="x", metadata={}) for i in range(rows)]
+        store.add_batch(chunks, vectors.astype(np.float32))
+        stores[f"s{k}"] = SleepyStore(store) if mode == "remote" else store
+    return stores
+
+
+async def bench_mode(mode: str, args, path: Path):
+    from src.rag.retriever import MultiStoreRetriever, RetrievalConfig
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(COLLECTIONS, DIM))
+    all_stores = build_stores(path, mode, args.rows, centers, rng)
+    embedding = FixedEmbedding()
+
+    variants = [("default", {})]
+    if "early_termination" in RetrievalConfig.__dataclass_fields__:
+        variants.append(("early_termination", {"early_termination": True}))
+
+    for count in (int(n) for n in args.collections.split(",")):
+        stores = {f"s{k}": all_stores[f"s{k}"] for k in range(count)}
+        for label, extra in variants:
+            retriever = MultiStoreRetriever(stores, embedding)
+            config = RetrievalConfig(top_k=5, score_threshold=0.3, use_rerank=False, **extra)
+            latencies = []
+            for i in range(args.queries):
+                embedding.vector = (centers[i % count] + rng.normal(size=DIM) * 0.5).tolist()
+                start = time.perf_counter()
+                await retriever.retrieve("q", config=config)
+                latencies.append(time.perf_counter() - start)
+            latencies = latencies[args.warmup:]
+            result = {
+                "mode": mode,
+                "collections": count,
+                "variant": label,
+                "p50_ms": round(statistics.median(latencies) * 1000, 1),
+                "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 1),
+            }
+            if hasattr(retriever, "stats"):
+                result["stats"] = retriever.stats()
+            print(json.dumps(result, ensure_ascii=False))
+
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, args.root)
+    for mode in args.modes.split(","):
+        path = Path(tempfile.mkdtemp(prefix=f"bench_multi_{mode}_"))
+        try:
+            asyncio.run(bench_mode(mode, args, path))
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
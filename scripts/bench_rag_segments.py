@@ -0,0 +1,123 @@
+"""
+向量集合冷启动基准（分段存储 vs 旧版每条一个 JSON）
+
+数据：标准正态随机向量，每条内容为 120 字中文，按行号轮流分到 3 个分类，
+先按旧版格式写成每条一个 JSON 文件；分段存储版本由当前代码打开该目录迁移后 save_all() 得到。
+每种格式在独立子进程中打开并执行一次检索，统计打开耗时、首次检索耗时与进程峰值内存。
+
+旧版格式需用旧代码打开（当前代码打开会触发迁移），通过 --legacy-root 指定旧版本检出目录；
+未指定时只测分段存储。
+
+用法：
+    python scripts/bench_rag_segments.py --rows 100000 --dim 384 --legacy-root /path/to/old/checkout
+"""
+import argparse
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+CATEGORIES = ["liuyao", "tarot", "bazi"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="向量集合冷启动基准")
+    parser.add_argument("--rows", type=int, default=100000, help="集合条目数")
+    parser.add_argument("--dim", type=int, default=384, help="向量维度")
+    parser.add_argument("--legacy-root", help="旧版本（每条一个 JSON）检出目录")
+    parser.add_argument("--open", dest="open_path", help=argparse.SUPPRESS)
+    parser.add_argument("--root", default=str(ROOT), help=argparse.SUPPRESS)
+    parser.add_argument("--migrate", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def write_legacy(path: Path, rows: int, dim: int):
+    """按旧版格式写出每条一个 JSON 文件"""
+    path.mkdir(parents=True)
+    vectors = np.random.default_rng(1).standard_normal((rows, dim)).astype(np.float32)
+    for i in range(rows):
+        with open(path / f"e{i}.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "id": f"e{i}",
+                "document_id": f"d{i // 10}",
+                "content": "六爻卦象解读" * 20,
+                "embedding": vectors[i].tolist(),
+                "category": CATEGORIES[i % len(CATEGORIES)],
+                "metadata": {"i": i},
+            }, f, ensure_ascii=False)
+
+
+def open_store(path: str, migrate: bool):
+    """子进程：打开集合并检索一次，输出耗时与内存"""
+    from src.rag.vector_store import VectorStore
+
+    start = time.perf_counter()
+    store = VectorStore(path)
+    open_s = time.perf_counter() - start
+    if migrate:
+        store.save_all()
+        return
+
+    entry = next(iter(store._entries.values()))
+    dim = len(entry.embedding) if entry.embedding else store._index.dimension
+    query = np.random.default_rng(2).standard_normal(dim).tolist()
+    start = time.perf_counter()
+    store.search(query, 5)
+    search_ms = (time.perf_counter() - start) * 1000
+
+    status = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("RssAnon", "RssFile")):
+                status[line.split(":")[0]] = int(line.split()[1]) // 1024
+    print(json.dumps({
+        "entries": len(store._entries),
+        "open_s": round(open_s, 2),
+        "first_search_ms": round(search_ms, 1),
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024,
+        "rss_anon_mb": status.get("RssAnon"),
+        "rss_file_mb": status.get("RssFile"),
+    }))
+
+
+def run_child(root: str, path: Path, migrate: bool = False) -> str:
+    command = [sys.executable, __file__, "--root", root, "--open", str(path)]
+    if migrate:
+        command.append("--migrate")
+    return subprocess.run(command, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def main():
+    args = parse_args()
+    if args.open_path:
+        sys.path.insert(0, args.root)
+        open_store(args.open_path, args.migrate)
+        return
+
+    work = Path(tempfile.mkdtemp(prefix="bench_segments_"))
+    try:
+        legacy = work / "json"
+        start = time.perf_counter()
+        write_legacy(legacy, args.rows, args.dim)
+        print(f"生成 {args.rows} 条 JSON 数据: {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+        segments = work / "segments"
+        shutil.copytree(legacy, segments)
+        run_child(str(ROOT), segments, migrate=True)
+
+        if args.legacy_root:
+            print(f"json      {run_child(args.legacy_root, legacy)}")
+        print(f"segments  {run_child(str(ROOT), segments)}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
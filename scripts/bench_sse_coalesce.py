@@ -0,0 +1,237 @@
+"""
+SSE 增量合并基准
+
+在子进程中启动一个最小 ASGI 服务（uvicorn），模拟上游：每个流把 6000 字的回答拆成 1–3 字的增量，
+每 2ms 产出一个。服务端按不同方式编码成 SSE 帧：
+- upstream：只消费上游、结束时发送一帧（作为基线，扣除模拟上游自身的 CPU）
+- per_delta_json：每个增量一帧，json.dumps 编码（改动前的行为）
+- per_delta：每个增量一帧，SSEMessage.data 编码
+- coalesced：coalesce_text_stream 合并后再用 SSEMessage.data 编码
+客户端并发打开 20 个流，校验拼接内容与原文一致，统计每流帧数、字节数、首字节延迟、帧/秒，
+以及扣除基线后的服务端 CPU/流。
+
+--root 可指向旧版本检出目录（没有 coalesce_text_stream 时跳过 coalesced）。
+
+用法：
+    python scripts/bench_sse_coalesce.py --streams 20 --modes upstream,per_delta_json,per_delta,coalesced
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+ANSWER_CHARS = 6000
+DELTA_INTERVAL = 0.002
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="SSE 增量合并基准")
+    parser.add_argument("--streams", type=int, default=20, help="并发流数")
+    parser.add_argument("--modes", default="upstream,per_delta_json,per_delta,coalesced", help="逗号分隔的编码方式")
+    parser.add_argument("--window-ms", type=int, default=40, help="coalesced 的合并时间窗口（毫秒）")
+    parser.add_argument("--max-chars", type=int, default=256, help="coalesced 的单帧最大字数")
+    parser.add_argument("--root", default=str(ROOT), help="被测代码所在目录")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def build_answer() -> tuple:
+    """固定的回答文本及其 1–3 字增量切分（含引号、反斜杠与换行，覆盖转义路径）"""
+    rng = random.Random(0)
+    alphabet = "乾坤震巽坎离艮兑，。、\"\\\n甲乙丙丁戊己庚辛壬癸 abc"
+    answer = "".join(rng.choice(alphabet) for _ in range(ANSWER_CHARS))
+    deltas, i = [], 0
+    while i < len(answer):
+        size = rng.randint(1, 3)
+        deltas.append(answer[i:i + size])
+        i += size
+    return answer, deltas
+
+
+# ==================== 模拟服务 ====================
+
+def make_app(args):
+    from src.common.sse_response import SSEMessage
+
+    try:
+        from src.common.sse_response import coalesce_text_stream
+    except ImportError:
+        coalesce_text_stream = None
+
+    _, deltas = build_answer()
+
+    async def upstream():
+        for delta in deltas:
+            await asyncio.sleep(DELTA_INTERVAL)
+            yield delta
+
+    async def frames(mode: str):
+        if mode == "upstream":
+            yield SSEMessage.data("".join([delta async for delta in upstream()]))
+        elif mode == "per_delta_json":
+            async for delta in upstream():
+                yield f"data: {json.dumps(delta, ensure_ascii=False)}\n\n"
+        elif mode == "per_delta":
+            async for delta in upstream():
+                yield SSEMessage.data(delta)
+        else:
+            coalesced = coalesce_text_stream(upstream(), window=args.window_ms / 1000, max_chars=args.max_chars)
+            async for chunk in coalesced:
+                yield SSEMessage.data(chunk)
+        yield SSEMessage.done()
+
+    async def app(scope, receive, send):
+        """GET /stream?mode=... 返回 SSE 流，GET /stats 返回服务进程 CPU 时间与支持的模式"""
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                else:
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        if scope["path"] == "/stats":
+            body = json.dumps({"cpu": time.process_time(), "coalesce": coalesce_text_stream is not None}).encode()
+            headers = [(b"content-type", b"application/json")]
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        mode = parse_qs(scope["query_string"].decode()).get("mode", ["per_delta"])[0]
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+        async for frame in frames(mode):
+            await send({"type": "http.response.body", "body": frame.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    return app
+
+
+def serve(port: int, args):
+    import uvicorn
+
+    uvicorn.run(make_app(args), host="127.0.0.1", port=port, log_level="error")
+
+
+# ==================== 压测 ====================
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def server_stats(client: httpx.AsyncClient, base_url: str) -> dict:
+    return (await client.get(f"{base_url}/stats")).json()
+
+
+async def wait_ready(client: httpx.AsyncClient, base_url: str, deadline: float = 10.0) -> dict:
+    start = time.monotonic()
+    while True:
+        try:
+            return await server_stats(client, base_url)
+        except httpx.TransportError:
+            if time.monotonic() - start > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+def decode(body: bytes) -> str:
+    """拼接所有数据帧的文本（[DONE] 除外）"""
+    text = []
+    for frame in body.decode("utf-8").split("\n\n"):
+        if frame.startswith("data: ") and frame != "data: [DONE]":
+            text.append(json.loads(frame[len("data: "):]))
+    return "".join(text)
+
+
+async def read_stream(client: httpx.AsyncClient, url: str) -> dict:
+    start = time.perf_counter()
+    first_byte = None
+    body = bytearray()
+    async with client.stream("GET", url) as response:
+        async for data in response.aiter_raw():
+            if first_byte is None:
+                first_byte = time.perf_counter()
+            body += data
+    elapsed = time.perf_counter() - start
+    return {
+        "frames": body.count(b"\n\n") - 1,     # 不含 [DONE]
+        "bytes": len(body),
+        "ttfb": (first_byte or start) - start,
+        "elapsed": elapsed,
+        "text": decode(bytes(body)),
+    }
+
+
+async def run_mode(client: httpx.AsyncClient, base_url: str, mode: str, args) -> dict:
+    answer, _ = build_answer()
+    before = await server_stats(client, base_url)
+    results = await asyncio.gather(*[
+        read_stream(client, f"{base_url}/stream?mode={mode}") for _ in range(args.streams)
+    ])
+    after = await server_stats(client, base_url)
+    return {
+        "mode": mode,
+        "streams": args.streams,
+        "frames_per_stream": round(statistics.mean(r["frames"] for r in results)),
+        "kb_per_stream": round(statistics.mean(r["bytes"] for r in results) / 1024, 1),
+        "frames_s_per_stream": round(statistics.mean(r["frames"] / r["elapsed"] for r in results)),
+        "ttfb_p50_ms": round(statistics.median(r["ttfb"] for r in results) * 1000, 1),
+        "cpu_ms_per_stream": (after["cpu"] - before["cpu"]) * 1000 / args.streams,
+        "content_ok": all(r["text"] == answer for r in results),
+    }
+
+
+async def run_all(base_url: str, args):
+    async with httpx.AsyncClient(timeout=120.0, limits=httpx.Limits(max_connections=args.streams + 1)) as client:
+        stats = await wait_ready(client, base_url)
+        baseline = None
+        for mode in args.modes.split(","):
+            if mode == "coalesced" and not stats["coalesce"]:
+                print(json.dumps({"mode": mode, "skipped": "被测代码没有 coalesce_text_stream"}, ensure_ascii=False))
+                continue
+            result = await run_mode(client, base_url, mode, args)
+            if mode == "upstream":
+                baseline = result["cpu_ms_per_stream"]
+            elif baseline is not None:
+                # 扣除模拟上游自身的 CPU
+                result["net_cpu_ms_per_stream"] = round(result["cpu_ms_per_stream"] - baseline, 1)
+            result["cpu_ms_per_stream"] = round(result["cpu_ms_per_stream"], 1)
+            print(json.dumps(result, ensure_ascii=False))
+
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, args.root)
+    if args.serve:
+        serve(args.serve, args)
+        return
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    command = [
+        sys.executable, __file__, "--serve", str(port), "--root", args.root,
+        "--window-ms", str(args.window_ms), "--max-chars", str(args.max_chars),
+    ]
+    server = subprocess.Popen(command)
+    try:
+        asyncio.run(run_all(base_url, args))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+词表匹配调用点微基准
+
+对 10KB 的提示词/模型输出各计时一次调用（取多次运行的中位数）：
+- domain：术语表词条、伦理敏感词与常用字随机拼接，命中密集
+- sparse：与玄学无关的普通中英文句子，几乎没有命中
+调用点：
+- stop words ×200 / ×2000：旧写法 any(w in prompt.lower() for w in stop_words) 与 TermMatcher.contains_any
+  （词表为不会命中的随机词，必须扫描全部）
+- translate_text en / zh-TW
+- EthicsFilter 替换（_replace_sensitive_terms）与检查（validate_content，未成年人）
+- KeywordExtractor.extract
+
+--root 可指向旧版本检出目录（没有 src/utils/term_matcher.py 时 stop words 只测旧写法）。
+
+用法：
+    python scripts/bench_term_matcher.py
+    python scripts/bench_term_matcher.py --root /path/to/old/checkout
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+TEXT_CHARS = 10_000
+
+SPARSE_SENTENCES = [
+    "今天天气不错，我们下午去公园散步。",
+    "会议改到周三上午十点，请提前准备材料。",
+    "这家餐厅的面条很好吃，价格也合理。",
+    "The quarterly report is due next Friday. ",
+    "请把附件里的表格更新后发回给我。",
+    "Traffic on the bridge was heavy this morning. ",
+    "周末计划整理书架，顺便清理一下阳台。",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="词表匹配调用点微基准")
+    parser.add_argument("--repeat", type=int, default=50, help="每项计时次数（取中位数）")
+    parser.add_argument("--root", default=str(ROOT), help="被测代码所在目录")
+    return parser.parse_args()
+
+
+def build_texts(glossary_terms, sensitive_terms) -> dict:
+    rng = random.Random(0)
+    fillers = list("的了是在有和就不人都一上也很到说要去你会着没看好自己这那中")
+    words = sorted(glossary_terms) + list(sensitive_terms)
+    domain = []
+    while sum(map(len, domain)) < TEXT_CHARS:
+        domain.append(rng.choice(words) if rng.random() < 0.4 else "".join(rng.choices(fillers, k=3)))
+        if rng.random() < 0.1:
+            domain.append("，")
+    sparse = []
+    while sum(map(len, sparse)) < TEXT_CHARS:
+        sparse.append(rng.choice(SPARSE_SENTENCES))
+    return {"domain": "".join(domain)[:TEXT_CHARS], "sparse": "".join(sparse)[:TEXT_CHARS]}
+
+
+def random_stop_words(count: int) -> tuple:
+    """不会在测试文本中出现的随机词（CJK 扩展区 A 的字）"""
+    rng = random.Random(count)
+    return tuple("".join(chr(rng.randrange(0x3400, 0x4DB5)) for _ in range(rng.randint(2, 4))) for _ in range(count))
+
+
+def measure(fn, repeat: int) -> float:
+    """中位数耗时（毫秒）"""
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, args.root)
+    from src.divination.ethics_filter import EthicsFilter
+    from src.i18n.glossary import TERMINOLOGY_GLOSSARY, translate_text
+    from src.rag.retriever import KeywordExtractor
+
+    try:
+        from src.utils.term_matcher import TermMatcher
+    except ImportError:
+        TermMatcher = None
+
+    ethics = EthicsFilter()
+    extractor = KeywordExtractor()
+    texts = build_texts(TERMINOLOGY_GLOSSARY["zh-en"], ethics.sensitive_marriage_terms)
+
+    cases = []
+    for count in (200, 2000):
+        stop_words = random_stop_words(count)
+        cases.append((
+            f"stop words x{count} (loop)",
+            lambda text, words=stop_words: any(w in text.lower() for w in words),
+        ))
+        if TermMatcher is not None:
+            matcher = TermMatcher(stop_words)
+            cases.append((
+                f"stop words x{count} (matcher)",
+                lambda text, matcher=matcher: matcher.contains_any(text.lower()),
+            ))
+    cases += [
+        ("translate_text en", lambda text: translate_text(text, "en")),
+        ("translate_text zh-TW", lambda text: translate_text(text, "zh-TW")),
+        ("ethics replace", lambda text: ethics._replace_sensitive_terms({"analysis": text})),
+        ("ethics validate", lambda text: ethics.validate_content(text, 15)),
+        ("KeywordExtractor.extract", extractor.extract),
+    ]
+
+    for name, fn in cases:
+        result = {"call_site": name}
+        for kind, text in texts.items():
+            result[f"{kind}_ms"] = round(measure(lambda: fn(text), args.repeat), 3)
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+生成汉字笔画数据表 src/utils/data/cjk_strokes.bin
+
+数据来源：
+- Unihan 数据库 kRSUnicode（部首.余画）、kTotalStrokes（规范笔画，G/T 两种来源）
+- OpenCC STCharacters.txt（简体 -> 繁体，取首选繁体字）
+
+康熙笔画（姓名学用）计算规则：
+1. 简体字先转为繁体字
+2. 笔画 = 部首原形笔画（氵按水 4 画、艹按艸 6 画、辶按辵 7 画等）+ 余画
+3. 部首本字（余画为 0）直接使用繁体笔画数
+
+用法：
+    python scripts/build_stroke_table.py Unihan_IRGSources.txt STCharacters.txt
+"""
+import struct
+import sys
+from pathlib import Path
+
+OUTPUT = Path(__file__).resolve().parent.parent / "src" / "utils" / "data" / "cjk_strokes.bin"
+
+MAGIC = b"CJKS"
+VERSION = 1
+
+# 收录区段：扩展A、基本区、兼容表意文字
+RANGES = [
+    (0x3400, 0x4DBF),
+    (0x4E00, 0x9FFF),
+    (0xF900, 0xFAFF),
+]
+
+# 康熙 214 部首按笔画排列，记录每个笔画数的最后一个部首编号
+_RADICAL_STROKE_BOUNDS = [
+    (6, 1), (29, 2), (60, 3), (94, 4), (117, 5), (146, 6), (166, 7), (175, 8),
+    (186, 9), (194, 10), (200, 11), (204, 12), (208, 13), (210, 14), (211, 15),
+    (213, 16), (214, 17),
+]
+
+
+def radical_strokes(radical: int) -> int:
+    """康熙部首原形笔画数"""
+    for last, strokes in _RADICAL_STROKE_BOUNDS:
+        if radical <= last:
+            return strokes
+    raise ValueError(f"无效的康熙部首编号: {radical}")
+
+
+def load_unihan(path: Path):
+    """读取 kRSUnicode / kTotalStrokes"""
+    rs, total_g, total_t = {}, {}, {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            code, field, value = line.rstrip("\n").split("\t")
+            cp = int(code[2:], 16)
+            if field == "kRSUnicode":
+                radical, residual = value.split()[0].split(".")
+                rs[cp] = (int(radical.rstrip("'")), int(residual))
+            elif field == "kTotalStrokes":
+                values = [int(v) for v in value.split()]
+                total_g[cp] = values[0]
+                total_t[cp] = values[-1]
+    return rs, total_g, total_t
+
+
+def load_opencc(path: Path):
+    """读取简繁字表，取首选繁体"""
+    mapping = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            simplified, candidates = line.rstrip("\n").split("\t")
+            traditional = candidates.split()[0]
+            if len(simplified) == 1 and len(traditional) == 1 and simplified != traditional:
+                mapping[ord(simplified)] = ord(traditional)
+    return mapping
+
+
+def kangxi_strokes(cp: int, rs, total_t, s2t) -> int:
+    trad = s2t.get(cp, cp)
+    if trad not in rs:
+        trad = cp
+    if trad not in rs:
+        return total_t.get(cp, 0)
+    radical, residual = rs[trad]
+    if residual == 0:
+        return total_t.get(trad) or radical_strokes(radical)
+    return radical_strokes(radical) + residual
+
+
+def build(unihan_path: Path, opencc_path: Path, output: Path = OUTPUT) -> None:
+    rs, total_g, total_t = load_unihan(unihan_path)
+    s2t = load_opencc(opencc_path)
+
+    standard = bytearray()
+    kangxi = bytearray()
+    for start, end in RANGES:
+        for cp in range(start, end + 1):
+            standard.append(min(total_g.get(cp, 0), 255))
+            kangxi.append(min(kangxi_strokes(cp, rs, total_t, s2t), 255))
+
+    pairs = sorted(s2t.items())
+    out = bytearray(MAGIC)
+    out += struct.pack("<HH", VERSION, len(RANGES))
+    for start, end in RANGES:
+        out += struct.pack("<II", start, end)
+    out += standard
+    out += kangxi
+    out += struct.pack("<I", len(pairs))
+    out += struct.pack(f"<{len(pairs)}I", *(s for s, _ in pairs))
+    out += struct.pack(f"<{len(pairs)}I", *(t for _, t in pairs))
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_bytes(bytes(out))
+    print(f"写入 {output}: {len(standard)} 字, {len(pairs)} 组简繁对照, {len(out)} bytes")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    build(Path(sys.argv[1]), Path(sys.argv[2]))
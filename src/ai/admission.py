@@ -0,0 +1,365 @@
+"""
+AI 调用准入控制
+
+所有上游 AI 调用先经过全局准入：
+- 并发上限：同时进行的上游调用数不超过 AI_ADMISSION_MAX_CONCURRENT，超出的请求排队
+- 按用户等级分队列，每个队列有长度上限；出队使用加权公平调度（stride scheduling），
+  权重取 UserQuotaManager.get_user_priority，高等级用户优先但低等级不会饿死
+- 排队超过 AI_ADMISSION_MAX_WAIT 秒快速失败，并给出 retry-after 估计
+- 单个模型同时进行的上游请求数不超过 AI_PROVIDER_MAX_STREAMS（ConcurrencyLimiter），
+  启用 AI_CONCURRENCY_ADAPTIVE 时该值仅为初始上限，之后按限流信号自适应调整（见 concurrency.py）
+
+指标：各等级队列深度、排队耗时直方图、准入/拒绝/超时次数，见 /api/monitor/ai/admission
+"""
+
+import asyncio
+import bisect
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 排队耗时直方图分桶上界（毫秒），最后一个桶为 +Inf
+WAIT_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# 平均占用时长的 EWMA 系数与初始值（秒），用于估算 retry-after
+HOLD_TIME_ALPHA = 0.1
+INITIAL_HOLD_SECONDS = 20.0
+
+
+class AdmissionRejectedError(Exception):
+    """排队已满或等待超时"""
+
+    def __init__(self, reason: str, retry_after: int):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"{reason}，请 {retry_after} 秒后重试")
+
+
+class ProviderBusyError(Exception):
+    """模型并发名额已满"""
+
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__(f"模型 {key} 并发已满")
+
+
+@dataclass
+class AdmissionTicket:
+    """准入凭证"""
+    tier: str
+    priority: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+    admitted_at: Optional[float] = None
+    future: Optional[asyncio.Future] = None
+    released: bool = False
+
+    @property
+    def admitted(self) -> bool:
+        return self.admitted_at is not None
+
+
+@dataclass
+class TierStats:
+    """单个等级的准入统计"""
+    admitted: int = 0
+    rejected_full: int = 0
+    timed_out: int = 0
+    max_depth: int = 0
+    wait_buckets: List[int] = field(default_factory=lambda: [0] * (len(WAIT_BUCKETS_MS) + 1))
+    wait_sum_ms: float = 0.0
+
+    def observe_wait(self, wait_ms: float) -> None:
+        self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+        self.wait_sum_ms += wait_ms
+
+
+class AdmissionController:
+    """全局准入控制器（仅在事件循环线程中使用）"""
+
+    def __init__(self, capacity: int, queue_limit: int, max_wait: float):
+        self.capacity = capacity
+        self.queue_limit = queue_limit
+        self.max_wait = max_wait
+        self._active = 0
+        self._queues: Dict[str, Deque[AdmissionTicket]] = {}
+        # stride scheduling：每个等级的虚拟时间，出队后增加 1/权重
+        self._pass: Dict[str, float] = {}
+        self._weights: Dict[str, int] = {}
+        self._virtual_time = 0.0
+        self._hold_seconds = INITIAL_HOLD_SECONDS
+        self._stats: Dict[str, TierStats] = {}
+
+    def _tier_stats(self, tier: str) -> TierStats:
+        stats = self._stats.get(tier)
+        if stats is None:
+            stats = self._stats[tier] = TierStats()
+        return stats
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def retry_after(self) -> int:
+        """按平均占用时长与排队长度估算重试等待秒数"""
+        backlog = self.queued + 1
+        return max(1, math.ceil(self._hold_seconds * backlog / max(1, self.capacity)))
+
+    def _admit(self, ticket: AdmissionTicket) -> None:
+        ticket.admitted_at = time.monotonic()
+        self._active += 1
+        stats = self._tier_stats(ticket.tier)
+        stats.admitted += 1
+        stats.observe_wait((ticket.admitted_at - ticket.enqueued_at) * 1000)
+        if ticket.future is not None and not ticket.future.done():
+            ticket.future.set_result(True)
+
+    def _dispatch(self) -> None:
+        """有空闲容量时按加权公平顺序放行排队请求"""
+        while self._active < self.capacity:
+            candidates = [tier for tier, queue in self._queues.items() if queue]
+            if not candidates:
+                return
+            tier = min(candidates, key=lambda t: self._pass[t])
+            ticket = self._queues[tier].popleft()
+            self._virtual_time = self._pass[tier]
+            self._pass[tier] += 1.0 / self._weights[tier]
+            self._admit(ticket)
+
+    def check(self, tier: str) -> None:
+        """
+        预检：该等级队列已满时直接拒绝（不占用名额，供响应开始前快速失败）
+
+        Raises:
+            AdmissionRejectedError: 该等级队列已满
+        """
+        if self._active >= self.capacity and len(self._queues.get(tier, ())) >= self.queue_limit:
+            self._tier_stats(tier).rejected_full += 1
+            raise AdmissionRejectedError("AI 服务繁忙，排队人数已满", self.retry_after())
+
+    def enqueue(self, tier: str, priority: int = 1) -> AdmissionTicket:
+        """
+        申请准入：有空闲容量且无人排队时立即放行，否则进入该等级队列
+
+        Raises:
+            AdmissionRejectedError: 该等级队列已满
+        """
+        ticket = AdmissionTicket(tier=tier, priority=max(1, priority))
+        if self._active < self.capacity and not self.queued:
+            self._admit(ticket)
+            return ticket
+
+        queue = self._queues.setdefault(tier, deque())
+        if len(queue) >= self.queue_limit:
+            self._tier_stats(tier).rejected_full += 1
+            raise AdmissionRejectedError("AI 服务繁忙，排队人数已满", self.retry_after())
+
+        self._weights[tier] = ticket.priority
+        if not queue:
+            # 空闲等级重新排队时从当前虚拟时间开始，不累积空闲期间的份额
+            self._pass[tier] = max(self._pass.get(tier, 0.0), self._virtual_time)
+        ticket.future = asyncio.get_running_loop().create_future()
+        queue.append(ticket)
+        stats = self._tier_stats(tier)
+        stats.max_depth = max(stats.max_depth, len(queue))
+        return ticket
+
+    def position(self, ticket: AdmissionTicket) -> int:
+        """排队位置（同等级队列内，从 1 开始）；已放行返回 0"""
+        if ticket.admitted:
+            return 0
+        queue = self._queues.get(ticket.tier)
+        try:
+            return queue.index(ticket) + 1 if queue else 0
+        except ValueError:
+            return 0
+
+    async def wait(self, ticket: AdmissionTicket, timeout: float) -> bool:
+        """等待放行，超时返回 False（仍在排队）"""
+        if ticket.admitted:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return ticket.admitted
+
+    def cancel(self, ticket: AdmissionTicket, timed_out: bool = False) -> None:
+        """放弃排队（超时或客户端断开）"""
+        if ticket.admitted:
+            return
+        queue = self._queues.get(ticket.tier)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+        if timed_out:
+            self._tier_stats(ticket.tier).timed_out += 1
+        if ticket.future is not None and not ticket.future.done():
+            ticket.future.cancel()
+
+    async def acquire(self, tier: str, priority: int = 1, timeout: Optional[float] = None) -> AdmissionTicket:
+        """
+        申请并等待准入
+
+        Raises:
+            AdmissionRejectedError: 队列已满或等待超时
+        """
+        ticket = self.enqueue(tier, priority)
+        try:
+            admitted = await self.wait(ticket, self.max_wait if timeout is None else timeout)
+        except BaseException:
+            if ticket.admitted:
+                self.release(ticket)
+            else:
+                self.cancel(ticket)
+            raise
+        if not admitted:
+            self.cancel(ticket, timed_out=True)
+            raise AdmissionRejectedError("AI 服务繁忙，排队超时", self.retry_after())
+        return ticket
+
+    def release(self, ticket: AdmissionTicket) -> None:
+        """释放准入，放行下一个排队请求"""
+        if not ticket.admitted or ticket.released:
+            return
+        ticket.released = True
+        self._active = max(0, self._active - 1)
+        held = time.monotonic() - ticket.admitted_at
+        self._hold_seconds += HOLD_TIME_ALPHA * (held - self._hold_seconds)
+        self._dispatch()
+
+    def snapshot(self) -> Dict[str, Any]:
+        tiers = {}
+        for tier, stats in self._stats.items():
+            waits = sum(stats.wait_buckets)
+            tiers[tier] = {
+                "depth": len(self._queues.get(tier, ())),
+                "max_depth": stats.max_depth,
+                "admitted": stats.admitted,
+                "rejected_full": stats.rejected_full,
+                "timed_out": stats.timed_out,
+                "wait_avg_ms": round(stats.wait_sum_ms / waits, 1) if waits else 0.0,
+                "wait_histogram_ms": dict(zip(
+                    [f"le_{b}" for b in WAIT_BUCKETS_MS] + ["le_inf"], stats.wait_buckets
+                )),
+            }
+        return {
+            "capacity": self.capacity,
+            "active": self._active,
+            "queued": self.queued,
+            "avg_hold_seconds": round(self._hold_seconds, 2),
+            "tiers": tiers,
+        }
+
+
+class ConcurrencyLimiter:
+    """按 key（模型）限制同时进行的上游请求数"""
+
+    def __init__(self, default_limit: int):
+        self.default_limit = default_limit
+        self._limits: Dict[str, int] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {}
+
+    def limit(self, key: str) -> int:
+        return self._limits.get(key, self.default_limit)
+
+    def in_flight(self, key: str) -> int:
+        return self._in_flight.get(key, 0)
+
+    def available(self, key: str) -> bool:
+        return self.in_flight(key) < self.limit(key)
+
+    def _wake(self, key: str) -> None:
+        waiters = self._waiters.get(key)
+        while waiters and self.available(key):
+            waiter = waiters.popleft()
+            if not waiter.done():
+                self._in_flight[key] = self.in_flight(key) + 1
+                waiter.set_result(True)
+
+    async def acquire(self, key: str, timeout: float) -> bool:
+        """占用一个名额，timeout 秒内未获得返回 False"""
+        if self.available(key) and not self._waiters.get(key):
+            self._in_flight[key] = self.in_flight(key) + 1
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self.release(key)
+            waiter.cancel()
+            self._discard_waiter(key, waiter)
+            raise
+        if waiter.done() and not waiter.cancelled():
+            return True
+        waiter.cancel()
+        self._discard_waiter(key, waiter)
+        return False
+
+    def _discard_waiter(self, key: str, waiter: asyncio.Future) -> None:
+        waiters = self._waiters.get(key)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+
+    def release(self, key: str) -> None:
+        self._in_flight[key] = max(0, self.in_flight(key) - 1)
+        self._wake(key)
+
+    def on_success(self, key: str, latency: Optional[float] = None) -> None:
+        """成功信号（固定上限时忽略，见 AdaptiveConcurrencyLimiter）"""
+
+    def on_overload(self, key: str, started: Optional[float] = None) -> None:
+        """限流/超时信号（固定上限时忽略，见 AdaptiveConcurrencyLimiter）"""
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        keys = set(self._in_flight) | set(self._limits)
+        return {
+            key: {
+                "limit": self.limit(key),
+                "in_flight": self.in_flight(key),
+                "waiting": len(self._waiters.get(key, ())),
+            }
+            for key in sorted(keys)
+        }
+
+
+_admission_controller: Optional[AdmissionController] = None
+_provider_limiter: Optional[ConcurrencyLimiter] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """获取全局准入控制器"""
+    global _admission_controller
+    if _admission_controller is None:
+        from src.config import settings
+        _admission_controller = AdmissionController(
+            capacity=settings.ai_admission_max_concurrent,
+            queue_limit=settings.ai_admission_queue_limit,
+            max_wait=settings.ai_admission_max_wait,
+        )
+    return _admission_controller
+
+
+def get_provider_limiter() -> ConcurrencyLimiter:
+    """获取全局模型并发限制器"""
+    global _provider_limiter
+    if _provider_limiter is None:
+        from src.config import settings
+        if settings.ai_concurrency_adaptive:
+            from .concurrency import AdaptiveConcurrencyLimiter
+            _provider_limiter = AdaptiveConcurrencyLimiter(
+                default_limit=settings.ai_provider_max_streams,
+                max_limit=settings.ai_concurrency_max_limit,
+                gradient=settings.ai_concurrency_gradient,
+            )
+        else:
+            _provider_limiter = ConcurrencyLimiter(default_limit=settings.ai_provider_max_streams)
+    return _provider_limiter
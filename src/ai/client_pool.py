@@ -0,0 +1,137 @@
+"""
+自定义 API 的 AsyncOpenAI 客户端池
+
+用户自带的 API 地址/密钥此前每个请求新建一个 AsyncOpenAI（及其 httpx 连接池），
+每次都要重新进行 TCP + TLS 握手，并发高时连接池也来不及回收。
+
+- 按 (base_url, 密钥指纹, 超时) 缓存客户端，LRU 限制条目数，密钥本身不出现在缓存键中
+- 每个 (base_url, 密钥指纹) 在 HTTPClientManager 中有自己的连接池（缓存键带 POOL_KEY_PREFIX 前缀），
+  最大连接数按密钥限制；不与预设提供商、嵌入服务等按 base_url 缓存的连接池共用
+- 长时间未使用的条目定期移除，对应连接池由 HTTPClientManager.close_idle 关闭（只关闭本池创建的连接池）
+- 不调用 AsyncOpenAI.close()：底层连接池是共享的
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+
+from .http_client import HTTP_CLIENT_LIMITS, http_client_manager
+
+logger = logging.getLogger(__name__)
+
+# 空闲清理的最小间隔（秒）
+SWEEP_INTERVAL = 60.0
+# 本池在 HTTPClientManager 中创建的连接池的缓存键前缀
+POOL_KEY_PREFIX = "client-pool:"
+
+ClientKey = Tuple[str, str, float]
+
+
+def api_key_fingerprint(api_key: str) -> str:
+    """密钥指纹（用于缓存键与日志，不可逆）"""
+    return hashlib.blake2b(api_key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class OpenAIClientPool:
+    """AsyncOpenAI 客户端 LRU 池"""
+
+    def __init__(self, max_size: int, idle_seconds: float, max_connections: int):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.limits = httpx.Limits(
+            max_keepalive_connections=min(max_connections, HTTP_CLIENT_LIMITS.max_keepalive_connections),
+            max_connections=max_connections,
+            keepalive_expiry=HTTP_CLIENT_LIMITS.keepalive_expiry,
+        )
+        self._clients: "OrderedDict[ClientKey, Tuple[AsyncOpenAI, float]]" = OrderedDict()
+        self._last_sweep = time.monotonic()
+        self._sweep_task: Optional[asyncio.Task] = None
+        self._stats = {"hits": 0, "created": 0, "evicted": 0, "expired": 0, "transports_closed": 0}
+
+    def get(self, base_url: str, api_key: str, timeout: float = 60.0) -> AsyncOpenAI:
+        """获取（或创建）指定地址与密钥的客户端"""
+        fingerprint = api_key_fingerprint(api_key)
+        key = (base_url, fingerprint, timeout)
+        transport_key = f"{POOL_KEY_PREFIX}{base_url}#{fingerprint}"
+        now = time.monotonic()
+        cached = self._clients.get(key)
+        if cached is not None:
+            self._clients[key] = (cached[0], now)
+            self._clients.move_to_end(key)
+            self._stats["hits"] += 1
+            # 刷新连接池的使用时间，避免被当作空闲关闭
+            http_client_manager.get_client(base_url, timeout=timeout, limits=self.limits, key=transport_key)
+            client = cached[0]
+        else:
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=timeout,
+                max_retries=0,
+                http_client=http_client_manager.get_client(
+                    base_url, timeout=timeout, limits=self.limits, key=transport_key,
+                ),
+            )
+            self._clients[key] = (client, now)
+            self._stats["created"] += 1
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self._stats["evicted"] += 1
+        self._maybe_sweep(now)
+        return client
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        if self._sweep_task is not None and not self._sweep_task.done():
+            return
+        self._last_sweep = now
+        expired = [key for key, (_, used) in self._clients.items() if now - used > self.idle_seconds]
+        for key in expired:
+            del self._clients[key]
+        self._stats["expired"] += len(expired)
+        try:
+            self._sweep_task = asyncio.get_running_loop().create_task(self._close_idle_transports())
+        except RuntimeError:
+            # 无事件循环（同步上下文），下次在异步上下文中再关闭
+            pass
+
+    async def _close_idle_transports(self) -> None:
+        self._stats["transports_closed"] += await http_client_manager.close_idle(
+            self.idle_seconds, prefix=POOL_KEY_PREFIX,
+        )
+
+    def base_urls(self) -> Set[str]:
+        return {key[0] for key in self._clients}
+
+    def get_stats(self) -> Dict[str, object]:
+        lookups = self._stats["hits"] + self._stats["created"]
+        return {
+            **self._stats,
+            "size": len(self._clients),
+            "max_size": self.max_size,
+            "endpoints": len(self.base_urls()),
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+_client_pool: Optional[OpenAIClientPool] = None
+
+
+def get_openai_client_pool() -> OpenAIClientPool:
+    """获取全局 AsyncOpenAI 客户端池"""
+    global _client_pool
+    if _client_pool is None:
+        from src.config import settings
+        _client_pool = OpenAIClientPool(
+            max_size=settings.ai_client_pool_max_size,
+            idle_seconds=settings.ai_client_pool_idle_seconds,
+            max_connections=settings.ai_client_pool_max_connections,
+        )
+    return _client_pool
@@ -0,0 +1,128 @@
+"""
+按模型自适应的并发上限（AIMD）
+
+服务商的真实并发容量未知且会变化（如智谱 1302、各家 429）。固定上限要么浪费容量，
+要么在服务商限流时把失败请求全部甩给下一个服务商。这里按模型动态调整上限：
+
+- 加性增（Additive Increase）：成功且名额使用率较高时，上限每轮约 +1（每次 +1/limit）
+- 乘性减（Multiplicative Decrease）：收到 429 / 1302 / 超时信号时上限 ×0.5，
+  上次退避之前发出的请求再报限流不重复退避，避免同一批并发失败把上限压到底
+- 可选延迟梯度（AI_CONCURRENCY_GRADIENT）：按 最小首字延迟 / 当前首字延迟 的比值平滑收缩上限，
+  在服务商开始排队（延迟上升）时就提前降低并发，而不是等到限流报错
+
+超过上限的请求短暂等待名额，或由故障转移路由到仍有名额的模型。
+"""
+
+import asyncio
+import math
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from .admission import ConcurrencyLimiter
+
+# 乘性减系数
+BACKOFF_RATIO = 0.5
+# 使用率低于该比例时不增加上限（名额没用满时成功不能说明容量更大）
+INCREASE_UTILIZATION = 0.5
+
+# 延迟梯度：允许的延迟膨胀倍数、平滑系数、最小延迟的缓慢上漂（适应基线变化）
+GRADIENT_TOLERANCE = 1.5
+GRADIENT_SMOOTHING = 0.2
+MIN_RTT_DRIFT = 0.01
+
+# 视为限流信号的业务错误码（智谱并发超限）
+OVERLOAD_ERROR_CODES = ("1302",)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """是否为服务商限流：HTTP 429、智谱 1302"""
+    if isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429:
+        return True
+    message = str(error)
+    return any(code in message for code in OVERLOAD_ERROR_CODES)
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """是否为限流/过载信号：HTTP 429、智谱 1302、超时"""
+    if isinstance(error, (httpx.TimeoutException, asyncio.TimeoutError, TimeoutError)):
+        return True
+    return is_rate_limit_error(error)
+
+
+class AdaptiveConcurrencyLimiter(ConcurrencyLimiter):
+    """AIMD 自适应并发限制器"""
+
+    def __init__(
+        self,
+        default_limit: int,
+        max_limit: int,
+        min_limit: int = 1,
+        gradient: bool = False,
+    ):
+        super().__init__(default_limit)
+        self.max_limit = max(max_limit, default_limit)
+        self.min_limit = min_limit
+        self.gradient = gradient
+        self._estimates: Dict[str, float] = {}
+        self._min_latency: Dict[str, float] = {}
+        self._last_backoff: Dict[str, float] = {}
+        self._overloads: Dict[str, int] = {}
+
+    def limit(self, key: str) -> int:
+        return max(self.min_limit, int(self._estimates.get(key, self.default_limit)))
+
+    def _set_estimate(self, key: str, value: float) -> None:
+        self._estimates[key] = min(float(self.max_limit), max(float(self.min_limit), value))
+        # 上限提高后放行等待者
+        self._wake(key)
+
+    def on_success(self, key: str, latency: Optional[float] = None) -> None:
+        """
+        成功信号
+
+        Args:
+            key: 模型
+            latency: 首字延迟（秒），启用延迟梯度时使用
+        """
+        current = self._estimates.get(key, float(self.default_limit))
+
+        if self.gradient and latency is not None and latency > 0:
+            min_latency = self._min_latency.get(key)
+            min_latency = latency if min_latency is None else min(latency, min_latency * (1 + MIN_RTT_DRIFT))
+            self._min_latency[key] = min_latency
+            ratio = max(0.5, min(1.0, GRADIENT_TOLERANCE * min_latency / latency))
+            if ratio < 1.0:
+                # 延迟明显膨胀：按梯度收缩，保留 sqrt(limit) 的排队余量
+                target = current * ratio + math.sqrt(current)
+                self._set_estimate(key, current + GRADIENT_SMOOTHING * (target - current))
+                return
+
+        if self.in_flight(key) + 1 >= current * INCREASE_UTILIZATION:
+            self._set_estimate(key, current + 1.0 / max(current, 1.0))
+
+    def on_overload(self, key: str, started: Optional[float] = None) -> None:
+        """
+        限流/超时信号：乘性减
+
+        Args:
+            key: 模型
+            started: 该请求的发起时间（time.monotonic），早于上次退避的请求不再重复退避
+        """
+        self._overloads[key] = self._overloads.get(key, 0) + 1
+        if started is not None and started < self._last_backoff.get(key, float("-inf")):
+            return
+        self._last_backoff[key] = time.monotonic()
+        current = self._estimates.get(key, float(self.default_limit))
+        self._set_estimate(key, current * BACKOFF_RATIO)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        result = super().snapshot()
+        for key in self._estimates:
+            entry = result.setdefault(key, {"limit": self.limit(key), "in_flight": 0, "waiting": 0})
+            entry["limit_estimate"] = round(self._estimates[key], 2)
+            entry["overloads"] = self._overloads.get(key, 0)
+            if key in self._min_latency:
+                entry["min_ttfb_ms"] = round(self._min_latency[key] * 1000, 1)
+        return result
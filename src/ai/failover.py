@@ -5,26 +5,35 @@ AI 故障转移逻辑
 """
 
 import asyncio
+import time
 import httpx
 import logging
 import cachetools
-from typing import List, Optional, Dict, Any, AsyncGenerator
+from typing import List, Optional, Dict, Any, AsyncGenerator, Awaitable, Callable, Tuple
 from dataclasses import dataclass
 
+from src.config import settings
+
 from .provider import AIProvider, ChatMessage, ChatResponse, get_provider
 from .models import AIModel, AIModelConfig, ModelStatus
-from .token_counter import estimate_tokens, estimate_cost
+from .token_counter import TokenTally, estimate_tokens, estimate_cost
 from .http_client import http_client_manager
+from .hedging import hedge_controller
+from .routing import get_provider_router
+from .admission import AdmissionTicket, ProviderBusyError, get_admission_controller, get_provider_limiter
+from .concurrency import is_overload_error, is_rate_limit_error
+from .health import BreakerState, CircuitOpenError, get_circuit_breakers
 
 logger = logging.getLogger(__name__)
 
-# 健康检查配置
-HEALTH_CHECK_TIMEOUT = 5.0  # 健康检查超时时间（秒）
-HEALTH_CHECK_CACHE_TTL = 300.0  # 健康检查缓存有效期（秒）- 从60秒延长到5分钟，减少重复检查
+# 健康探测超时时间（秒）
+HEALTH_CHECK_TIMEOUT = 5.0
+
+# 单个模型并发已满时等待名额的最长时间（秒），超时后故障转移到下一个模型
+PROVIDER_SLOT_WAIT = 2.0
 
 # Provider 缓存配置
 PROVIDER_CACHE_MAX_SIZE = 50  # 最大缓存的 Provider 实例数
-HEALTH_CACHE_MAX_SIZE = 100   # 最大缓存的健康检查结果数
 
 
 class AllModelsFailedError(Exception):
@@ -47,11 +56,10 @@ class FailoverResult:
 class AIProviderManager:
     """
     多 Provider 管理器
-    支持主备模型故障转移，流式预检健康机制
+    支持主备模型故障转移与按模型熔断
     
-    缓存策略：
     - Provider 缓存：LRU 策略，限制最大数量防止内存泄漏
-    - 健康检查缓存：TTL 策略，自动过期避免使用过时结果
+    - 健康状态：由后台探测与实时调用结果驱动熔断器（见 health.py），请求路径只读取熔断状态
     """
     
     def __init__(self, config: Optional[AIModelConfig] = None):
@@ -60,59 +68,35 @@ class AIProviderManager:
         self._providers_cache: cachetools.LRUCache[str, AIProvider] = cachetools.LRUCache(
             maxsize=PROVIDER_CACHE_MAX_SIZE
         )
-        # 健康检查缓存：使用 TTLCache 自动过期
-        self._health_cache: cachetools.TTLCache[str, bool] = cachetools.TTLCache(
-            maxsize=HEALTH_CACHE_MAX_SIZE,
-            ttl=HEALTH_CHECK_CACHE_TTL
-        )
     
-    async def _health_check(self, model: AIModel, timeout: float = HEALTH_CHECK_TIMEOUT) -> bool:
+    async def probe(self, model: AIModel, timeout: float = HEALTH_CHECK_TIMEOUT) -> None:
         """
-        快速健康检查：发送一个简单请求验证模型可用性
+        健康探测：发送一个 1 Token 请求验证模型可用性（由后台探测任务调用）
         
         Args:
-            model: 要检查的模型
+            model: 要探测的模型
             timeout: 超时时间（秒）
         
-        Returns:
-            bool: 模型是否健康可用
+        Raises:
+            httpx.HTTPError: 请求失败或返回非 2xx 状态码
         """
-        cache_key = f"{model.provider}:{model.base_url}:{model.name}"
-        
-        # 检查缓存（TTLCache 会自动处理过期）
-        if cache_key in self._health_cache:
-            is_healthy = self._health_cache[cache_key]
-            logger.debug(f"[AI] 使用缓存的健康检查结果: {model.name} = {is_healthy}")
-            return is_healthy
+        provider = self._get_provider_for_model(model)
+        model_name = model.parameters.get("model", model.name)
         
-        try:
-            provider = self._get_provider_for_model(model)
-            model_name = model.parameters.get("model", model.name)
-            
-            # 性能优化：复用连接池，避免每次创建新客户端
-            client = http_client_manager.get_client(provider.base_url, timeout=timeout)
-            response = await client.post(
-                f"{provider.base_url}/chat/completions",
-                json={
-                    "model": model_name,
-                    "messages": [{"role": "user", "content": "hi"}],
-                    "max_tokens": 1,
-                    "stream": False,
-                },
-                headers=provider._build_headers()
-            )
-            is_healthy = response.status_code == 200
-                
-            # 更新缓存（TTLCache 会自动处理过期）
-            self._health_cache[cache_key] = is_healthy
-            logger.info(f"[AI] 健康检查完成: {model.name} = {'健康' if is_healthy else '不可用'}")
-            return is_healthy
-            
-        except Exception as e:
-            logger.warning(f"[AI] 模型 {model.name} 健康检查失败: {e}")
-            # 缓存失败结果
-            self._health_cache[cache_key] = False
-            return False
+        # 性能优化：复用连接池，避免每次创建新客户端
+        client = http_client_manager.get_client(provider.base_url, timeout=timeout)
+        response = await client.post(
+            f"{provider.base_url}/chat/completions",
+            json={
+                "model": model_name,
+                "messages": [{"role": "user", "content": "hi"}],
+                "max_tokens": 1,
+                "stream": False,
+            },
+            headers=provider._build_headers()
+        )
+        response.raise_for_status()
+        logger.debug(f"[AI] 健康探测成功: {model.name}")
     
     def _get_candidates(
         self,
@@ -133,7 +117,19 @@ class AIProviderManager:
             candidates.extend(self.config.backups)
         
         # 过滤出活跃的模型
-        return [m for m in candidates if m.status == ModelStatus.ACTIVE]
+        active = [m for m in candidates if m.status == ModelStatus.ACTIVE]
+        
+        # 未指定主模型时按实时 EWMA 评分排序，流量自动避开变慢或出错的服务商
+        if primary_model is None and settings.ai_routing_enabled:
+            active = get_provider_router().rank(active)
+        # 未指定主模型时，并发名额已满的模型排到最后，优先路由到仍有名额的模型
+        if primary_model is None:
+            limiter = get_provider_limiter()
+            active.sort(key=lambda m: not limiter.available(m.name))
+        # 熔断中的模型排到最后（仅读取熔断状态，不发起健康检查）
+        breakers = get_circuit_breakers()
+        active.sort(key=lambda m: breakers.state(m.name) == BreakerState.OPEN)
+        return active
     
     def _get_provider_for_model(self, model: AIModel) -> AIProvider:
         """获取模型对应的 Provider 实例"""
@@ -149,6 +145,238 @@ class AIProviderManager:
         
         return self._providers_cache[cache_key]
     
+    @staticmethod
+    def _error_info(model: AIModel, error: Exception) -> Dict[str, Any]:
+        return {
+            "model": model.name,
+            "provider": model.provider,
+            "error": str(error)
+        }
+    
+    @staticmethod
+    def _should_hedge(hedge: Optional[bool], candidates: List[AIModel]) -> bool:
+        """是否启用对冲：显式参数优先，否则取 AI_HEDGE_ENABLED；至少需要一个备用模型"""
+        enabled = settings.ai_hedge_enabled if hedge is None else hedge
+        return enabled and len(candidates) > 1
+    
+    async def _hedged_call(
+        self,
+        primary: AIModel,
+        backup: AIModel,
+        tier: str,
+        kind: str,
+        call: Callable[[AIModel], Awaitable[Any]],
+        errors: List[Dict[str, Any]],
+        discard: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> Tuple[Optional[AIModel], Any, int]:
+        """
+        对冲调用：主模型超过自适应延迟仍未返回时，向备用模型发出相同请求，采用先成功者
+        
+        Args:
+            primary: 主模型
+            backup: 对冲使用的备用模型
+            tier: 用户等级（决定对冲预算）
+            kind: stream（等待首个片段）或 chat（等待完整响应）
+            call: 对单个模型发起调用的协程函数
+            errors: 失败信息列表（原地追加）
+            discard: 释放落选结果的回调（如关闭已打开的流）
+        
+        Returns:
+            (胜出模型, 结果, 已发起调用的模型数)，全部失败时胜出模型为 None
+        """
+        hedge_controller.start(tier)
+        started = time.monotonic()
+        primary_task = asyncio.create_task(call(primary))
+        task_models = {primary_task: primary}
+        pending = {primary_task}
+        try:
+            delay = hedge_controller.delay_for(kind, primary.name)
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            
+            if done or not hedge_controller.acquire(tier):
+                try:
+                    return primary, await primary_task, 1
+                except Exception as e:
+                    errors.append(self._error_info(primary, e))
+                    logger.warning(f"[AI] 模型 {primary.name} 调用失败: {e}, 尝试下一个")
+                    return None, None, 1
+            
+            logger.info(f"[AI] 模型 {primary.name} 超过 {delay:.2f}s 未响应，对冲请求 {backup.name}")
+            backup_task = asyncio.create_task(call(backup))
+            task_models[backup_task] = backup
+            pending.add(backup_task)
+            winner: Optional[asyncio.Task] = None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is not None:
+                        errors.append(self._error_info(task_models[task], error))
+                        logger.warning(f"[AI] 模型 {task_models[task].name} 调用失败: {error}")
+                    elif winner is None:
+                        winner = task
+                    elif discard is not None:
+                        # 两路同时完成，释放落选结果
+                        await discard(task.result())
+            if winner is None:
+                return None, None, 2
+            hedge_controller.record_winner(tier, hedge_won=winner is backup_task)
+            if winner is backup_task:
+                # 被取消的主模型至少耗时这么久，计入样本避免 p90 只反映快速响应
+                hedge_controller.record_latency(kind, primary.name, time.monotonic() - started)
+            return task_models[winner], winner.result(), 2
+        finally:
+            # 取消落选请求（调用方被取消时两路一起取消）
+            pending = {task for task in task_models if not task.done()}
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def _call_chat(
+        self,
+        model: AIModel,
+        messages: List[ChatMessage],
+        temperature: float,
+        max_tokens: Optional[int],
+        **kwargs
+    ) -> ChatResponse:
+        """单个模型的非流式调用（耗时计入对冲统计）"""
+        provider = self._get_provider_for_model(model)
+        
+        # 获取实际模型名称
+        model_name = model.parameters.get("model", model.name)
+        
+        breakers = get_circuit_breakers()
+        permit = breakers.acquire(model.name)
+        if permit is None:
+            raise CircuitOpenError(model.name)
+        limiter = get_provider_limiter()
+        if not await limiter.acquire(model.name, PROVIDER_SLOT_WAIT):
+            breakers.release(permit)
+            raise ProviderBusyError(model.name)
+        router = get_provider_router()
+        router.begin(model.name)
+        started = time.monotonic()
+        try:
+            response = await provider.chat(
+                messages=messages,
+                model=model_name,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            )
+        except Exception as e:
+            router.record_error(model.name)
+            if is_overload_error(e):
+                limiter.on_overload(model.name, started)
+            if not is_rate_limit_error(e):
+                breakers.record_failure(model.name)
+            raise
+        finally:
+            router.end(model.name)
+            limiter.release(model.name)
+            breakers.release(permit)
+        elapsed = time.monotonic() - started
+        limiter.on_success(model.name, elapsed)
+        breakers.record_success(model.name)
+        hedge_controller.record_latency("chat", model.name, elapsed)
+        output_tokens = estimate_tokens(response.content, model_name)
+        router.record_success(model.name, output_tokens=output_tokens, generation_seconds=elapsed)
+        
+        # 如果没有 token 信息，进行估算
+        if response.tokens_used is None:
+            input_text = "\n".join(m.content for m in messages)
+            response.tokens_used = estimate_tokens(input_text, model_name) + output_tokens
+            response.tokens_estimated = True
+        
+        # 计算成本
+        if response.tokens_used and model.cost_per_1k_tokens > 0:
+            response.cost = estimate_cost(response.tokens_used, model.cost_per_1k_tokens)
+        
+        return response
+    
+    async def _open_stream(
+        self,
+        model: AIModel,
+        messages: List[ChatMessage],
+        temperature: float,
+        max_tokens: Optional[int],
+        **kwargs
+    ) -> Tuple[AsyncGenerator[str, None], Optional[str]]:
+        """打开单个模型的流式调用并等待首个片段（首字延迟计入对冲统计）"""
+        provider = self._get_provider_for_model(model)
+        model_name = model.parameters.get("model", model.name)
+        
+        stream = self._observe_stream(model, provider.chat_stream(
+            messages=messages,
+            model=model_name,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        ))
+        started = time.monotonic()
+        try:
+            first_chunk: Optional[str] = await stream.__anext__()
+        except StopAsyncIteration:
+            first_chunk = None
+        except BaseException:
+            await stream.aclose()
+            raise
+        hedge_controller.record_latency("stream", model.name, time.monotonic() - started)
+        return stream, first_chunk
+    
+    @staticmethod
+    async def _observe_stream(model: AIModel, stream: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+        """包装流式调用：占用熔断放行与模型并发名额，向路由器与熔断器记录结果（取消/客户端断开不计入）"""
+        breakers = get_circuit_breakers()
+        permit = breakers.acquire(model.name)
+        if permit is None:
+            raise CircuitOpenError(model.name)
+        limiter = get_provider_limiter()
+        if not await limiter.acquire(model.name, PROVIDER_SLOT_WAIT):
+            breakers.release(permit)
+            raise ProviderBusyError(model.name)
+        router = get_provider_router()
+        router.begin(model.name)
+        started = time.monotonic()
+        first_at: Optional[float] = None
+        tally = TokenTally()
+        try:
+            async for chunk in stream:
+                if first_at is None:
+                    first_at = time.monotonic()
+                tally.add(chunk)
+                yield chunk
+        except Exception as e:
+            router.record_error(model.name)
+            if is_overload_error(e):
+                limiter.on_overload(model.name, started)
+            if not is_rate_limit_error(e):
+                breakers.record_failure(model.name)
+            raise
+        else:
+            finished = time.monotonic()
+            ttfb = (first_at or finished) - started
+            router.record_success(
+                model.name,
+                ttfb=ttfb,
+                output_tokens=tally.tokens(model.parameters.get("model", model.name)),
+                generation_seconds=finished - (first_at or finished),
+            )
+        finally:
+            router.end(model.name)
+            limiter.release(model.name)
+            breakers.release(permit)
+            await stream.aclose()
+        # 与非流式调用一致：先释放名额再反馈成功（on_success 按 in_flight + 1 计入本请求）
+        limiter.on_success(model.name, ttfb)
+        breakers.record_success(model.name)
+    
+    @staticmethod
+    async def _close_stream(opened: Tuple[AsyncGenerator[str, None], Optional[str]]) -> None:
+        await opened[0].aclose()
+    
     async def chat_with_failover(
         self,
         messages: List[ChatMessage],
@@ -156,6 +384,10 @@ class AIProviderManager:
         backup_models: Optional[List[AIModel]] = None,
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
+        hedge: Optional[bool] = None,
+        user_tier: str = "free",
+        user_priority: int = 1,
+        admission_ticket: Optional[AdmissionTicket] = None,
         **kwargs
     ) -> FailoverResult:
         """
@@ -167,6 +399,10 @@ class AIProviderManager:
             backup_models: 备用模型列表（可选）
             temperature: 温度参数
             max_tokens: 最大 Token 数
+            hedge: 是否对冲请求（默认取 AI_HEDGE_ENABLED）
+            user_tier: 用户等级，决定对冲预算与准入队列
+            user_priority: 用户优先级（准入队列的调度权重）
+            admission_ticket: 调用方已获得的准入凭证（由调用方释放），为空时在此申请
             **kwargs: 其他参数
         
         Returns:
@@ -174,82 +410,60 @@ class AIProviderManager:
         
         Raises:
             AllModelsFailedError: 所有模型都失败时抛出
+            AdmissionRejectedError: 准入排队已满或超时
         """
         # 构建候选模型列表
-        candidates: List[AIModel] = []
-        
-        if primary_model:
-            candidates.append(primary_model)
-        elif self.config.primary:
-            candidates.append(self.config.primary)
-        
-        if backup_models:
-            candidates.extend(backup_models)
-        else:
-            candidates.extend(self.config.backups)
-        
-        # 过滤出活跃的模型
-        active_candidates = [
-            m for m in candidates 
-            if m.status == ModelStatus.ACTIVE
-        ]
+        active_candidates = self._get_candidates(primary_model, backup_models)
         
         if not active_candidates:
             raise AllModelsFailedError([{"error": "没有可用的AI模型配置"}])
         
-        errors: List[Dict[str, Any]] = []
-        attempts = 0
-        
-        for model in active_candidates:
-            attempts += 1
-            try:
+        admission = get_admission_controller()
+        ticket = admission_ticket or await admission.acquire(user_tier, user_priority)
+        try:
+            errors: List[Dict[str, Any]] = []
+            index = 0
+            
+            async def call(model: AIModel) -> ChatResponse:
+                return await self._call_chat(model, messages, temperature, max_tokens, **kwargs)
+            
+            while index < len(active_candidates):
+                model = active_candidates[index]
                 logger.info(f"[AI] 尝试调用模型: {model.name} (Provider: {model.provider})")
                 
-                provider = self._get_provider_for_model(model)
-                
-                # 获取实际模型名称
-                model_name = model.parameters.get("model", model.name)
-                
-                response = await provider.chat(
-                    messages=messages,
-                    model=model_name,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    **kwargs
-                )
-                
-                # 如果没有 token 信息，进行估算
-                if response.tokens_used is None:
-                    input_text = "\n".join(m.content for m in messages)
-                    response.tokens_used = estimate_tokens(input_text) + estimate_tokens(response.content)
-                    response.tokens_estimated = True
-                
-                # 计算成本
-                if response.tokens_used and model.cost_per_1k_tokens > 0:
-                    response.cost = estimate_cost(response.tokens_used, model.cost_per_1k_tokens)
+                # 仅首次调用参与对冲（主模型 vs 第一个备用模型），之后按顺序故障转移
+                if index == 0 and self._should_hedge(hedge, active_candidates):
+                    winner, response, launched = await self._hedged_call(
+                        model, active_candidates[1], user_tier, "chat", call, errors
+                    )
+                    index += launched
+                    if winner is None:
+                        continue
+                    model = winner
+                else:
+                    index += 1
+                    try:
+                        response = await call(model)
+                    except Exception as e:
+                        errors.append(self._error_info(model, e))
+                        logger.warning(f"[AI] 模型 {model.name} 调用失败: {e}, 尝试下一个")
+                        continue
                 
                 logger.info(f"[AI] 模型 {model.name} 调用成功, 耗时: {response.response_time_ms}ms")
                 
                 return FailoverResult(
                     response=response,
                     model_used=model,
-                    attempts=attempts,
+                    attempts=index,
                     errors=errors
                 )
-                
-            except Exception as e:
-                error_info = {
-                    "model": model.name,
-                    "provider": model.provider,
-                    "error": str(e)
-                }
-                errors.append(error_info)
-                logger.warning(f"[AI] 模型 {model.name} 调用失败: {e}, 尝试下一个")
-                continue
-        
-        # 所有模型都失败
-        logger.error(f"[AI] 所有模型均调用失败: {errors}")
-        raise AllModelsFailedError(errors)
+            
+            # 所有模型都失败
+            logger.error(f"[AI] 所有模型均调用失败: {errors}")
+            raise AllModelsFailedError(errors)
+        finally:
+            if admission_ticket is None:
+                admission.release(ticket)
     
     async def chat(
         self,
@@ -270,10 +484,15 @@ class AIProviderManager:
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
         pre_check: bool = True,
+        hedge: Optional[bool] = None,
+        user_tier: str = "free",
+        user_priority: int = 1,
+        admission_ticket: Optional[AdmissionTicket] = None,
+        on_model: Optional[Callable[[AIModel], None]] = None,
         **kwargs
     ) -> AsyncGenerator[str, None]:
         """
-        带故障转移的流式 AI 调用（支持预检健康机制）
+        带故障转移的流式 AI 调用（按熔断状态选择模型）
         
         Args:
             messages: 聊天消息列表
@@ -281,7 +500,12 @@ class AIProviderManager:
             backup_models: 备用模型列表（可选）
             temperature: 温度参数
             max_tokens: 最大 Token 数
-            pre_check: 是否在流式开始前进行健康检查（默认启用）
+            pre_check: 兼容参数：健康状态由后台探测与熔断器维护，请求路径不再发起健康检查
+            hedge: 是否对冲请求（默认取 AI_HEDGE_ENABLED）
+            user_tier: 用户等级，决定对冲预算与准入队列
+            user_priority: 用户优先级（准入队列的调度权重）
+            admission_ticket: 调用方已获得的准入凭证（由调用方释放），为空时在此申请
+            on_model: 某个模型开始输出时的回调（故障转移到下一个模型时再次调用），用于按实际模型计量
             **kwargs: 其他参数
         
         Yields:
@@ -289,10 +513,12 @@ class AIProviderManager:
         
         Raises:
             AllModelsFailedError: 所有模型都失败时抛出
+            AdmissionRejectedError: 准入排队已满或超时
         
         Note:
-            预检健康机制可以避免流式传输中途失败导致的数据不一致问题。
-            当启用预检时，会先检查模型是否健康，选择第一个健康的模型进行流式调用。
+            熔断中的模型排在候选列表最后，打开期间直接跳过，不会让用户请求等待健康检查。
+            启用对冲时，主模型超过近期首字延迟 p90 仍未输出，会同时请求下一个模型，
+            采用先输出首个片段的一路并取消另一路。
         """
         # 获取候选模型列表
         active_candidates = self._get_candidates(primary_model, backup_models)
@@ -300,73 +526,69 @@ class AIProviderManager:
         if not active_candidates:
             raise AllModelsFailedError([{"error": "没有可用的AI模型配置"}])
         
-        # 预检健康机制：在流式开始前检查模型可用性
-        if pre_check and len(active_candidates) > 1:
-            logger.info("[AI] 执行流式预检健康检查...")
-            
-            # 并发检查所有候选模型的健康状态
-            health_tasks = [
-                self._health_check(model) 
-                for model in active_candidates
-            ]
-            health_results = await asyncio.gather(*health_tasks, return_exceptions=True)
+        admission = get_admission_controller()
+        ticket = admission_ticket or await admission.acquire(user_tier, user_priority)
+        try:
+            errors: List[Dict[str, Any]] = []
+            index = 0
             
-            # 筛选出健康的模型
-            healthy_candidates = [
-                model for model, result in zip(active_candidates, health_results)
-                if result is True
-            ]
+            async def open_stream(model: AIModel) -> Tuple[AsyncGenerator[str, None], Optional[str]]:
+                return await self._open_stream(model, messages, temperature, max_tokens, **kwargs)
             
-            if healthy_candidates:
-                logger.info(f"[AI] 预检完成，{len(healthy_candidates)}/{len(active_candidates)} 个模型健康")
-                # 优先使用健康的模型
-                active_candidates = healthy_candidates + [
-                    m for m in active_candidates if m not in healthy_candidates
-                ]
-            else:
-                logger.warning("[AI] 所有模型预检失败，将按原顺序尝试")
-        
-        errors: List[Dict[str, Any]] = []
-        
-        for model in active_candidates:
-            try:
+            while index < len(active_candidates):
+                model = active_candidates[index]
                 logger.info(f"[AI] 尝试流式调用模型: {model.name} (Provider: {model.provider})")
                 
-                provider = self._get_provider_for_model(model)
-                model_name = model.parameters.get("model", model.name)
-                
-                # 尝试流式调用
-                async for chunk in provider.chat_stream(
-                    messages=messages,
-                    model=model_name,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    **kwargs
-                ):
-                    yield chunk
-                
-                # 成功完成，退出
-                logger.info(f"[AI] 模型 {model.name} 流式调用成功")
-                return
+                # 仅首次调用参与对冲（主模型 vs 第一个备用模型），按首个片段的先后决出胜者
+                if index == 0 and self._should_hedge(hedge, active_candidates):
+                    winner, opened, launched = await self._hedged_call(
+                        model, active_candidates[1], user_tier, "stream", open_stream, errors,
+                        discard=self._close_stream,
+                    )
+                    index += launched
+                    if winner is None:
+                        continue
+                    model = winner
+                else:
+                    index += 1
+                    try:
+                        opened = await open_stream(model)
+                    except Exception as e:
+                        errors.append(self._error_info(model, e))
+                        logger.warning(f"[AI] 模型 {model.name} 流式调用失败: {e}, 尝试下一个")
+                        continue
                 
-            except Exception as e:
-                error_info = {
-                    "model": model.name,
-                    "provider": model.provider,
-                    "error": str(e)
-                }
-                errors.append(error_info)
-                logger.warning(f"[AI] 模型 {model.name} 流式调用失败: {e}, 尝试下一个")
-                continue
-        
-        # 所有模型都失败
-        logger.error(f"[AI] 所有模型流式调用均失败: {errors}")
-        raise AllModelsFailedError(errors)
+                stream, first_chunk = opened
+                if on_model is not None:
+                    on_model(model)
+                try:
+                    if first_chunk is not None:
+                        yield first_chunk
+                    async for chunk in stream:
+                        yield chunk
+                    
+                    # 成功完成，退出
+                    logger.info(f"[AI] 模型 {model.name} 流式调用成功")
+                    return
+                    
+                except Exception as e:
+                    errors.append(self._error_info(model, e))
+                    logger.warning(f"[AI] 模型 {model.name} 流式调用失败: {e}, 尝试下一个")
+                    continue
+                finally:
+                    await stream.aclose()
+            
+            # 所有模型都失败
+            logger.error(f"[AI] 所有模型流式调用均失败: {errors}")
+            raise AllModelsFailedError(errors)
+        finally:
+            if admission_ticket is None:
+                admission.release(ticket)
     
     def clear_health_cache(self):
-        """清除健康检查缓存"""
-        self._health_cache.clear()
-        logger.info("[AI] 健康检查缓存已清除")
+        """重置所有模型的熔断状态"""
+        get_circuit_breakers().reset()
+        logger.info("[AI] 熔断状态已重置")
     
     def set_config(self, config: AIModelConfig):
         """设置配置"""
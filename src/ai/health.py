@@ -0,0 +1,352 @@
+"""
+模型健康探测与熔断器
+
+以前的健康检查在请求路径上进行：TTL 缓存过期时，用户请求要先等一次 1 Token 的探测调用，
+已经挂掉的服务商也会被反复重试。这里改为：
+
+- 熔断器（按模型）：closed → open → half-open
+    - closed：连续失败达到阈值后打开
+    - open：在打开期间直接拒绝（故障转移到下一个模型，不发网络请求）；
+      再次打开时打开时长翻倍（上限 MAX_OPEN_MULTIPLIER 倍）
+    - half-open：打开期满后放行有限数量的试探请求（试探预算），连续成功达到预算后关闭，
+      任一失败重新打开
+- 熔断器同时由实时调用结果与后台探测驱动；限流（429 / 1302）由自适应并发处理，不计为失败
+- 后台探测：每个模型一个任务，按带抖动的间隔发送 1 Token 请求；近期已有成功调用的模型跳过探测，
+  熔断打开时在打开期满时探测，服务商恢复后无需用户请求试探即可关闭
+- 请求路径只读取熔断状态（排序候选模型、占用试探名额），不再发起健康检查
+
+Serverless 环境没有后台任务，熔断器仅由实时调用结果驱动（打开期满后由用户请求试探）。
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, Optional
+
+from .concurrency import is_rate_limit_error
+
+logger = logging.getLogger(__name__)
+
+# 再次打开时打开时长翻倍的上限倍数
+MAX_OPEN_MULTIPLIER = 8
+# 探测间隔的抖动比例（±20%），避免多个模型/多个进程同时探测
+PROBE_JITTER = 0.2
+# 启动后首次探测在该时间（秒）内随机分散
+PROBE_STARTUP_SPREAD = 5.0
+# 单次探测超时（秒）
+PROBE_TIMEOUT = 5.0
+# 保留的最近状态变化条数
+TRANSITION_HISTORY_SIZE = 100
+
+
+class BreakerState(str, Enum):
+    """熔断器状态"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """模型熔断中"""
+
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__(f"模型 {key} 熔断中")
+
+
+@dataclass
+class BreakerPermit:
+    """熔断器放行凭证（半开状态下占用一个试探名额）"""
+    key: str
+    trial: bool = False
+
+
+@dataclass
+class CircuitBreaker:
+    """单个模型的熔断状态"""
+    state: BreakerState = BreakerState.CLOSED
+    consecutive_failures: int = 0
+    open_until: float = 0.0
+    reopen_count: int = 0
+    trials_in_flight: int = 0
+    trial_successes: int = 0
+    last_success_at: Optional[float] = None
+    last_failure_at: Optional[float] = None
+    last_probe_at: Optional[float] = None
+    last_probe_ok: Optional[bool] = None
+
+
+class CircuitBreakerRegistry:
+    """按模型维护熔断器，记录状态变化"""
+
+    def __init__(self, failure_threshold: int = 5, open_seconds: float = 30.0, trial_budget: int = 3):
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self.trial_budget = max(1, trial_budget)
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._transitions: Counter = Counter()
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=TRANSITION_HISTORY_SIZE)
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker()
+        return breaker
+
+    def _transition(self, key: str, breaker: CircuitBreaker, state: BreakerState, reason: str, now: float) -> None:
+        previous = breaker.state
+        breaker.state = state
+        breaker.trials_in_flight = 0
+        breaker.trial_successes = 0
+        if state == BreakerState.OPEN:
+            multiplier = min(2 ** breaker.reopen_count, MAX_OPEN_MULTIPLIER)
+            breaker.open_until = now + self.open_seconds * multiplier
+            breaker.reopen_count += 1
+        elif state == BreakerState.CLOSED:
+            breaker.consecutive_failures = 0
+            breaker.reopen_count = 0
+        self._transitions[f"{previous.value}->{state.value}"] += 1
+        self._events.append({
+            "model": key,
+            "from": previous.value,
+            "to": state.value,
+            "reason": reason,
+            "at": time.time(),
+        })
+        log = logger.warning if state == BreakerState.OPEN else logger.info
+        log(f"[AI] 熔断器 {key}: {previous.value} -> {state.value} ({reason})")
+
+    # ---------- 请求路径 ----------
+
+    def state(self, key: str) -> BreakerState:
+        """当前状态（只读；打开期满视为半开）"""
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                return BreakerState.CLOSED
+            if breaker.state == BreakerState.OPEN and time.monotonic() >= breaker.open_until:
+                return BreakerState.HALF_OPEN
+            return breaker.state
+
+    def acquire(self, key: str) -> Optional[BreakerPermit]:
+        """申请放行：熔断中或试探名额已满时返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            breaker = self._get(key)
+            if breaker.state == BreakerState.CLOSED:
+                return BreakerPermit(key)
+            if breaker.state == BreakerState.OPEN:
+                if now < breaker.open_until:
+                    return None
+                self._transition(key, breaker, BreakerState.HALF_OPEN, "打开期满", now)
+            if breaker.trials_in_flight >= self.trial_budget:
+                return None
+            breaker.trials_in_flight += 1
+            return BreakerPermit(key, trial=True)
+
+    def release(self, permit: BreakerPermit) -> None:
+        """释放放行凭证（试探请求结束）"""
+        if not permit.trial:
+            return
+        with self._lock:
+            breaker = self._get(permit.key)
+            if breaker.state == BreakerState.HALF_OPEN and breaker.trials_in_flight > 0:
+                breaker.trials_in_flight -= 1
+
+    # ---------- 结果记录（实时调用与后台探测） ----------
+
+    def record_success(self, key: str, source: str = "live") -> None:
+        now = time.monotonic()
+        with self._lock:
+            breaker = self._get(key)
+            breaker.last_success_at = now
+            breaker.consecutive_failures = 0
+            if breaker.state == BreakerState.OPEN:
+                # 打开前发出的请求或探测成功：服务商已恢复，进入半开试探
+                self._transition(key, breaker, BreakerState.HALF_OPEN, f"{source} 成功", now)
+            if breaker.state == BreakerState.HALF_OPEN:
+                breaker.trial_successes += 1
+                if breaker.trial_successes >= self.trial_budget:
+                    self._transition(key, breaker, BreakerState.CLOSED, f"试探成功 {self.trial_budget} 次", now)
+
+    def record_failure(self, key: str, source: str = "live") -> None:
+        now = time.monotonic()
+        with self._lock:
+            breaker = self._get(key)
+            breaker.last_failure_at = now
+            breaker.consecutive_failures += 1
+            if breaker.state == BreakerState.HALF_OPEN:
+                self._transition(key, breaker, BreakerState.OPEN, f"试探期间 {source} 失败", now)
+            elif (
+                breaker.state == BreakerState.CLOSED
+                and breaker.consecutive_failures >= self.failure_threshold
+            ):
+                self._transition(key, breaker, BreakerState.OPEN, f"连续失败 {breaker.consecutive_failures} 次", now)
+
+    def record_probe(self, key: str, ok: bool) -> None:
+        with self._lock:
+            breaker = self._get(key)
+            breaker.last_probe_at = time.monotonic()
+            breaker.last_probe_ok = ok
+        if ok:
+            self.record_success(key, source="probe")
+        else:
+            self.record_failure(key, source="probe")
+
+    # ---------- 探测调度 ----------
+
+    def probe_delay(self, key: str, interval: float, rng: random.Random) -> float:
+        """距下次探测的时间：打开时在期满时探测，否则按带抖动的间隔"""
+        now = time.monotonic()
+        jittered = interval * rng.uniform(1.0 - PROBE_JITTER, 1.0 + PROBE_JITTER)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is not None and breaker.state == BreakerState.OPEN:
+                return min(max(0.0, breaker.open_until - now) + rng.uniform(0.0, 1.0), jittered)
+        return jittered
+
+    def needs_probe(self, key: str, interval: float) -> bool:
+        """正常状态且近期有成功调用的模型无需探测"""
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None or breaker.state != BreakerState.CLOSED:
+                return True
+            if breaker.last_success_at is None:
+                return True
+            return time.monotonic() - breaker.last_success_at >= interval
+
+    def reset(self) -> None:
+        with self._lock:
+            self._breakers.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """各模型的熔断状态、状态变化计数与最近的状态变化"""
+        now = time.monotonic()
+        with self._lock:
+            models: Dict[str, Any] = {}
+            for key, breaker in self._breakers.items():
+                models[key] = {
+                    "state": breaker.state.value,
+                    "consecutive_failures": breaker.consecutive_failures,
+                    "open_remaining_s": (
+                        round(max(0.0, breaker.open_until - now), 1)
+                        if breaker.state == BreakerState.OPEN else None
+                    ),
+                    "trials_in_flight": breaker.trials_in_flight,
+                    "trial_successes": breaker.trial_successes,
+                    "last_probe_ok": breaker.last_probe_ok,
+                    "last_probe_age_s": (
+                        round(now - breaker.last_probe_at, 1) if breaker.last_probe_at is not None else None
+                    ),
+                }
+            return {
+                "models": models,
+                "transitions": dict(self._transitions),
+                "recent_transitions": list(self._events)[-20:],
+            }
+
+
+class HealthProber:
+    """后台健康探测：每个模型一个探测任务"""
+
+    def __init__(
+        self,
+        manager_getter: Callable[[], Any],
+        breakers: CircuitBreakerRegistry,
+        interval: float = 60.0,
+        rng: Optional[random.Random] = None,
+    ):
+        self._manager_getter = manager_getter
+        self.breakers = breakers
+        self.interval = interval
+        self._rng = rng or random.Random()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._models: Dict[str, Any] = {}
+
+    async def probe(self, model: Any) -> Optional[bool]:
+        """探测一次；限流时不计结果，返回 None"""
+        try:
+            await self._manager_getter().probe(model, timeout=PROBE_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if is_rate_limit_error(e):
+                logger.debug(f"[AI] 健康探测 {model.name} 被限流，跳过")
+                return None
+            logger.warning(f"[AI] 健康探测 {model.name} 失败: {e}")
+            self.breakers.record_probe(model.name, ok=False)
+            return False
+        self.breakers.record_probe(model.name, ok=True)
+        return True
+
+    async def _probe_loop(self, key: str) -> None:
+        await asyncio.sleep(self._rng.uniform(0.0, PROBE_STARTUP_SPREAD))
+        while True:
+            model = self._models.get(key)
+            if model is None:
+                return
+            if self.breakers.needs_probe(key, self.interval):
+                await self.probe(model)
+            await asyncio.sleep(self.breakers.probe_delay(key, self.interval, self._rng))
+
+    def _sync_models(self) -> None:
+        """按当前配置启动/停止各模型的探测任务"""
+        models = {m.name: m for m in self._manager_getter().config.get_active_models()}
+        self._models = models
+        for key in list(self._tasks):
+            if key not in models or self._tasks[key].done():
+                self._tasks.pop(key).cancel()
+        for key in models:
+            if key not in self._tasks:
+                self._tasks[key] = asyncio.create_task(self._probe_loop(key))
+
+    async def run(self) -> None:
+        """后台任务：定期同步模型配置，探测由各模型任务完成"""
+        try:
+            while True:
+                try:
+                    self._sync_models()
+                except Exception as e:
+                    logger.error(f"[AI] 健康探测任务同步失败: {e}")
+                await asyncio.sleep(self.interval)
+        finally:
+            for task in self._tasks.values():
+                task.cancel()
+            self._tasks.clear()
+
+
+_circuit_breakers: Optional[CircuitBreakerRegistry] = None
+_health_prober: Optional[HealthProber] = None
+
+
+def get_circuit_breakers() -> CircuitBreakerRegistry:
+    """获取全局熔断器"""
+    global _circuit_breakers
+    if _circuit_breakers is None:
+        from src.config import settings
+        _circuit_breakers = CircuitBreakerRegistry(
+            failure_threshold=settings.ai_breaker_failure_threshold,
+            open_seconds=settings.ai_breaker_open_seconds,
+            trial_budget=settings.ai_breaker_trial_budget,
+        )
+    return _circuit_breakers
+
+
+def get_health_prober() -> HealthProber:
+    """获取全局健康探测器"""
+    global _health_prober
+    if _health_prober is None:
+        from src.config import settings
+        from .manager import get_ai_manager
+        _health_prober = HealthProber(
+            get_ai_manager,
+            get_circuit_breakers(),
+            interval=settings.ai_health_probe_interval,
+        )
+    return _health_prober
@@ -0,0 +1,201 @@
+"""
+对冲请求（Hedged Requests）
+
+主模型在自适应延迟内没有返回首个 token 时，向下一个候选模型发出相同请求，
+采用先返回者的结果并取消另一方，用少量额外调用压低 p99 首字延迟。
+
+- 对冲延迟：按模型统计近期首字延迟（流式）/总耗时（非流式）的 p90，限定在上下限之间
+- 对冲预算：按用户等级的令牌桶，每个请求累积 ratio 个令牌，每次对冲消耗 1 个，
+  即对冲率长期不超过 ratio，控制额外开销
+- 指标：对冲率、备用胜出次数、预算拒绝次数，可通过 /api/monitor/ai/hedging 查看
+"""
+
+import logging
+import threading
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 对冲延迟（秒）：(样本不足时的默认值, 下限, 上限)
+# 流式按首字延迟计算；非流式按整次调用耗时计算，长文本解读通常需要数十秒
+HEDGE_DELAY_BOUNDS: Dict[str, Tuple[float, float, float]] = {
+    "stream": (2.0, 0.3, 8.0),
+    "chat": (30.0, 3.0, 60.0),
+}
+HEDGE_QUANTILE = 0.9
+HEDGE_MIN_SAMPLES = 10
+
+# 每个模型保留的延迟样本数
+LATENCY_WINDOW = 200
+
+# 各等级对冲预算：长期对冲率上限，以及允许的突发次数
+HEDGE_BUDGET_RATIO: Dict[str, float] = {
+    "free": 0.02,
+    "vip": 0.05,
+    "premium": 0.10,
+    "unlimited": 0.20,
+}
+HEDGE_BUDGET_BURST = 5.0
+
+
+def latency_key(kind: str, model_name: str) -> str:
+    """延迟统计 key，kind 为 stream（首字延迟）或 chat（整次耗时）"""
+    return f"{kind}:{model_name}"
+
+
+class LatencyTracker:
+    """按 key 记录最近的延迟样本，用于计算分位数"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self._window)
+            samples.append(seconds)
+
+    def quantile(self, key: str, q: float) -> Optional[float]:
+        """分位数，样本不足时返回 None"""
+        with self._lock:
+            samples = self._samples.get(key)
+            if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            items = {key: sorted(samples) for key, samples in self._samples.items()}
+        result = {}
+        for key, ordered in items.items():
+            if not ordered:
+                continue
+            result[key] = {
+                "samples": len(ordered),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+                "p90_ms": round(ordered[min(len(ordered) - 1, int(0.9 * len(ordered)))] * 1000, 1),
+            }
+        return result
+
+
+class HedgeBudget:
+    """按用户等级的对冲令牌桶"""
+
+    def __init__(self, ratios: Optional[Dict[str, float]] = None, burst: float = HEDGE_BUDGET_BURST):
+        self._ratios = dict(ratios or HEDGE_BUDGET_RATIO)
+        self._burst = burst
+        self._tokens: Dict[str, float] = defaultdict(lambda: burst)
+        self._lock = threading.Lock()
+
+    def ratio(self, tier: str) -> float:
+        return self._ratios.get(tier, self._ratios.get("free", 0.0))
+
+    def credit(self, tier: str) -> None:
+        """每个可对冲的请求累积令牌"""
+        with self._lock:
+            self._tokens[tier] = min(self._burst, self._tokens[tier] + self.ratio(tier))
+
+    def try_acquire(self, tier: str) -> bool:
+        """消耗一次对冲机会"""
+        with self._lock:
+            if self._tokens[tier] >= 1.0:
+                self._tokens[tier] -= 1.0
+                return True
+            return False
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                tier: {"ratio": self.ratio(tier), "tokens": round(tokens, 2)}
+                for tier, tokens in self._tokens.items()
+            }
+
+
+@dataclass
+class HedgeCounters:
+    """对冲计数"""
+    eligible: int = 0        # 可对冲的请求数（开启对冲且有备用模型）
+    hedged: int = 0          # 实际发出对冲的请求数
+    hedge_wins: int = 0      # 备用模型先返回
+    primary_wins: int = 0    # 对冲发出后主模型仍先返回
+    budget_denied: int = 0   # 超过延迟但预算不足未对冲
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "eligible": self.eligible,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "primary_wins": self.primary_wins,
+            "budget_denied": self.budget_denied,
+            "hedge_rate": round(self.hedged / self.eligible, 4) if self.eligible else 0.0,
+            "hedge_win_rate": round(self.hedge_wins / self.hedged, 4) if self.hedged else 0.0,
+        }
+
+
+class HedgeController:
+    """对冲策略：延迟计算、预算控制与指标"""
+
+    def __init__(self):
+        self.latency = LatencyTracker()
+        self.budget = HedgeBudget()
+        self._counters: Dict[str, HedgeCounters] = defaultdict(HedgeCounters)
+        self._lock = threading.Lock()
+
+    def delay_for(self, kind: str, model_name: str) -> float:
+        """对冲延迟：该模型近期 p90，限定在 HEDGE_DELAY_BOUNDS 的上下限之间"""
+        default, lower, upper = HEDGE_DELAY_BOUNDS[kind]
+        observed = self.latency.quantile(latency_key(kind, model_name), HEDGE_QUANTILE)
+        if observed is None:
+            return default
+        return max(lower, min(upper, observed))
+
+    def record_latency(self, kind: str, model_name: str, seconds: float) -> None:
+        self.latency.record(latency_key(kind, model_name), seconds)
+
+    def start(self, tier: str) -> None:
+        """可对冲请求开始：累积预算并计数"""
+        self.budget.credit(tier)
+        with self._lock:
+            self._counters[tier].eligible += 1
+
+    def acquire(self, tier: str) -> bool:
+        """判断是否允许发出对冲"""
+        allowed = self.budget.try_acquire(tier)
+        with self._lock:
+            if allowed:
+                self._counters[tier].hedged += 1
+            else:
+                self._counters[tier].budget_denied += 1
+        return allowed
+
+    def record_winner(self, tier: str, hedge_won: bool) -> None:
+        with self._lock:
+            if hedge_won:
+                self._counters[tier].hedge_wins += 1
+            else:
+                self._counters[tier].primary_wins += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            tiers = {tier: counters.to_dict() for tier, counters in self._counters.items()}
+        total = HedgeCounters()
+        for counters in tiers.values():
+            for field_name in ("eligible", "hedged", "hedge_wins", "primary_wins", "budget_denied"):
+                setattr(total, field_name, getattr(total, field_name) + counters[field_name])
+        return {
+            "total": total.to_dict(),
+            "tiers": tiers,
+            "budget": self.budget.snapshot(),
+            "latency": self.latency.snapshot(),
+        }
+
+
+# 全局单例
+hedge_controller = HedgeController()
@@ -6,8 +6,9 @@ HTTP 客户端连接池管理器
 - 连接无法复用，增加延迟
 
 优化策略：
-- 按 base_url 维护客户端实例
+- 按 base_url 维护客户端实例（需要独立连接池的调用方可传入自己的缓存键）
 - 共享连接池配置
+- 长时间未使用的客户端自动关闭（close_idle）
 - 支持优雅关闭
 """
 
@@ -15,6 +16,7 @@ import asyncio
 import atexit
 import httpx
 import logging
+import time
 from typing import Dict, Optional, ClassVar
 
 logger = logging.getLogger(__name__)
@@ -36,12 +38,14 @@ class HTTPClientManager:
     """
     _instance: ClassVar[Optional["HTTPClientManager"]] = None
     _clients: Dict[str, httpx.AsyncClient]
+    _last_used: Dict[str, float]
     _default_timeout: float
     
     def __new__(cls) -> "HTTPClientManager":
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._instance._clients = {}
+            cls._instance._last_used = {}
             cls._instance._default_timeout = 120.0
             # 注册程序退出时的清理函数
             atexit.register(cls._instance._sync_cleanup)
@@ -51,7 +55,9 @@ class HTTPClientManager:
         self,
         base_url: str,
         timeout: Optional[float] = None,
-        headers: Optional[Dict[str, str]] = None
+        headers: Optional[Dict[str, str]] = None,
+        limits: Optional[httpx.Limits] = None,
+        key: Optional[str] = None,
     ) -> httpx.AsyncClient:
         """
         获取或创建指定 base_url 的 HTTP 客户端
@@ -60,24 +66,56 @@ class HTTPClientManager:
             base_url: API 基础 URL
             timeout: 请求超时时间
             headers: 默认请求头
+            limits: 连接池限制（仅在创建客户端时生效，默认 HTTP_CLIENT_LIMITS）
+            key: 缓存键，默认为 base_url；传入独立的键即获得独立的连接池与连接数上限
             
         Returns:
             httpx.AsyncClient 实例
         """
-        # 使用 base_url 作为缓存键
-        cache_key = base_url
+        cache_key = key or base_url
         
         if cache_key not in self._clients:
             client = httpx.AsyncClient(
                 timeout=timeout or self._default_timeout,
-                limits=HTTP_CLIENT_LIMITS,
+                limits=limits or HTTP_CLIENT_LIMITS,
                 headers=headers,
             )
             self._clients[cache_key] = client
             logger.debug(f"[HTTPClientManager] 创建新客户端: {base_url}")
         
+        self._last_used[cache_key] = time.monotonic()
         return self._clients[cache_key]
     
+    async def close_idle(self, max_idle: float, prefix: Optional[str] = None) -> int:
+        """
+        关闭超过 max_idle 秒未被获取的客户端
+        
+        max_idle 应大于最长请求耗时，避免关闭仍有请求在进行的客户端
+        
+        Args:
+            max_idle: 空闲时间（秒）
+            prefix: 只关闭缓存键以此开头的客户端（调用方只清理自己创建的连接池）
+        
+        Returns:
+            关闭的客户端数
+        """
+        now = time.monotonic()
+        idle = [
+            url for url, used in self._last_used.items()
+            if now - used > max_idle and (prefix is None or url.startswith(prefix))
+        ]
+        for url in idle:
+            self._last_used.pop(url, None)
+            client = self._clients.pop(url, None)
+            if client is None:
+                continue
+            try:
+                await client.aclose()
+                logger.debug(f"[HTTPClientManager] 关闭空闲客户端: {url}")
+            except Exception as e:
+                logger.warning(f"[HTTPClientManager] 关闭客户端失败: {url}, {e}")
+        return len(idle)
+    
     async def close_all(self) -> None:
         """异步关闭所有客户端"""
         for url, client in self._clients.items():
@@ -87,6 +125,7 @@ class HTTPClientManager:
             except Exception as e:
                 logger.warning(f"[HTTPClientManager] 关闭客户端失败: {url}, {e}")
         self._clients.clear()
+        self._last_used.clear()
     
     def _sync_cleanup(self) -> None:
         """同步清理（用于 atexit）"""
@@ -0,0 +1,195 @@
+"""
+基于实时流量的模型路由
+
+按模型维护指数加权移动平均（EWMA）：首字延迟、输出速度（tokens/s）与错误率，
+据此为候选模型打分并排序，使流量在硬故障之前就从变慢/出错的服务商移走。
+
+评分（越小越好）：
+    预期耗时 = 首字延迟 + ROUTING_REFERENCE_TOKENS / 输出速度
+    评分 = (预期耗时 + 成本权重 × 每千 Token 成本) / (1 - 错误率) × (1 + 位置偏置 × 配置顺序)
+
+- 无样本的模型使用先验值，位置偏置保证冷启动时仍按 manager.py 中的配置顺序
+- 错误率随时间向 0 衰减，降级的服务商恢复后会重新获得流量
+- 评分接近最优的模型之间使用 power-of-two-choices：随机取两个，选进行中请求较少者，分散负载
+- 少量请求（EXPLORATION_RATE）随机优先其他模型，避免统计过期的模型永远得不到流量
+"""
+
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .models import AIModel
+
+# EWMA 平滑系数（新样本权重）
+EWMA_ALPHA = 0.2
+# 错误率衰减时间常数（秒）：无新样本时错误率按 exp(-t/τ) 回落
+ERROR_DECAY_SECONDS = 120.0
+
+# 先验值（无样本时使用）
+PRIOR_TTFB = 1.5            # 秒
+PRIOR_TOKENS_PER_SECOND = 30.0
+
+# 预期耗时按一次典型解读的输出长度估算
+ROUTING_REFERENCE_TOKENS = 1000
+# 错误率上限，避免评分除以 0
+MAX_ERROR_RATE = 0.95
+# 配置顺序偏置：每靠后一位评分增加 10%
+POSITION_BIAS = 0.1
+# 评分在最优值 5% 以内视为接近，参与 power-of-two-choices
+NEAR_EQUAL_RATIO = 0.05
+# 探索概率：少量请求优先尝试非最优模型，使其统计保持更新（恢复后能重新获得流量）
+EXPLORATION_RATE = 0.02
+
+
+@dataclass
+class ModelStats:
+    """单个模型的 EWMA 统计"""
+    ttfb: Optional[float] = None
+    tokens_per_second: Optional[float] = None
+    error_rate: float = 0.0
+    successes: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    updated_at: float = field(default_factory=time.monotonic)
+
+    @staticmethod
+    def _ewma(current: Optional[float], value: float) -> float:
+        if current is None:
+            return value
+        return current + EWMA_ALPHA * (value - current)
+
+    def decayed_error_rate(self, now: float) -> float:
+        return self.error_rate * math.exp(-(now - self.updated_at) / ERROR_DECAY_SECONDS)
+
+    def observe(self, now: float, error: bool) -> None:
+        self.error_rate = self._ewma(self.decayed_error_rate(now), 1.0 if error else 0.0)
+        self.updated_at = now
+        if error:
+            self.errors += 1
+        else:
+            self.successes += 1
+
+
+class ProviderRouter:
+    """按 EWMA 评分对候选模型排序"""
+
+    def __init__(self, cost_weight: float = 0.0, rng: Optional[random.Random] = None):
+        self.cost_weight = cost_weight
+        self._stats: Dict[str, ModelStats] = {}
+        self._lock = threading.Lock()
+        self._rng = rng or random.Random()
+
+    def _get(self, model_name: str) -> ModelStats:
+        stats = self._stats.get(model_name)
+        if stats is None:
+            stats = self._stats[model_name] = ModelStats()
+        return stats
+
+    # ---------- 记录 ----------
+
+    def begin(self, model_name: str) -> None:
+        with self._lock:
+            self._get(model_name).in_flight += 1
+
+    def end(self, model_name: str) -> None:
+        with self._lock:
+            stats = self._get(model_name)
+            stats.in_flight = max(0, stats.in_flight - 1)
+
+    def record_success(
+        self,
+        model_name: str,
+        ttfb: Optional[float] = None,
+        output_tokens: int = 0,
+        generation_seconds: float = 0.0,
+    ) -> None:
+        """
+        记录一次成功调用
+
+        Args:
+            model_name: 模型名称
+            ttfb: 首字延迟（秒），非流式调用为 None
+            output_tokens: 输出 Token 数
+            generation_seconds: 生成输出所用时间（秒）
+        """
+        now = time.monotonic()
+        with self._lock:
+            stats = self._get(model_name)
+            stats.observe(now, error=False)
+            if ttfb is not None:
+                stats.ttfb = stats._ewma(stats.ttfb, ttfb)
+            if output_tokens > 0 and generation_seconds > 0:
+                stats.tokens_per_second = stats._ewma(
+                    stats.tokens_per_second, output_tokens / generation_seconds
+                )
+
+    def record_error(self, model_name: str) -> None:
+        with self._lock:
+            self._get(model_name).observe(time.monotonic(), error=True)
+
+    # ---------- 评分与排序 ----------
+
+    def _score(self, model: AIModel, position: int, now: float) -> float:
+        stats = self._stats.get(model.name) or ModelStats(updated_at=now)
+        ttfb = stats.ttfb if stats.ttfb is not None else PRIOR_TTFB
+        tps = stats.tokens_per_second or PRIOR_TOKENS_PER_SECOND
+        expected = ttfb + ROUTING_REFERENCE_TOKENS / tps + self.cost_weight * model.cost_per_1k_tokens
+        error_rate = min(MAX_ERROR_RATE, stats.decayed_error_rate(now))
+        return expected / (1.0 - error_rate) * (1.0 + POSITION_BIAS * position)
+
+    def rank(self, candidates: List[AIModel]) -> List[AIModel]:
+        """按评分排序候选模型，最优的若干个之间用 power-of-two-choices 选出首选"""
+        if len(candidates) < 2:
+            return list(candidates)
+        now = time.monotonic()
+        with self._lock:
+            scored = sorted(
+                ((self._score(model, i, now), i, model) for i, model in enumerate(candidates)),
+                key=lambda item: (item[0], item[1]),
+            )
+            best_score = scored[0][0]
+            near = [item for item in scored if item[0] <= best_score * (1.0 + NEAR_EQUAL_RATIO)]
+            if len(near) >= 2:
+                a, b = self._rng.sample(near, 2)
+                load_a = self._get(a[2].name).in_flight
+                load_b = self._get(b[2].name).in_flight
+                chosen = a if (load_a, a[0]) <= (load_b, b[0]) else b
+                scored.remove(chosen)
+                scored.insert(0, chosen)
+            elif self._rng.random() < EXPLORATION_RATE:
+                scored.insert(0, scored.pop(self._rng.randrange(1, len(scored))))
+        return [model for _, _, model in scored]
+
+    def snapshot(self, candidates: Optional[List[AIModel]] = None) -> Dict[str, Any]:
+        """各模型的 EWMA 统计与当前评分"""
+        now = time.monotonic()
+        with self._lock:
+            result: Dict[str, Any] = {}
+            for name, stats in self._stats.items():
+                result[name] = {
+                    "ttfb_ms": round(stats.ttfb * 1000, 1) if stats.ttfb is not None else None,
+                    "tokens_per_second": round(stats.tokens_per_second, 1) if stats.tokens_per_second else None,
+                    "error_rate": round(stats.decayed_error_rate(now), 4),
+                    "successes": stats.successes,
+                    "errors": stats.errors,
+                    "in_flight": stats.in_flight,
+                }
+            for i, model in enumerate(candidates or []):
+                entry = result.setdefault(model.name, {"successes": 0, "errors": 0, "in_flight": 0})
+                entry["score"] = round(self._score(model, i, now), 3)
+        return result
+
+
+_provider_router: Optional[ProviderRouter] = None
+
+
+def get_provider_router() -> ProviderRouter:
+    """获取全局模型路由器"""
+    global _provider_router
+    if _provider_router is None:
+        from src.config import settings
+        _provider_router = ProviderRouter(cost_weight=settings.ai_routing_cost_weight)
+    return _provider_router
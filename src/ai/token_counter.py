@@ -1,22 +1,128 @@
 """
 Token 计数与成本估算
 参考 zhanwen 项目的 estimateTokensFromText 函数
+
+两种模式：
+- 精确模式：安装 tokenizers 且 TOKEN_VOCAB_DIR（默认 src/ai/vocab）下存在对应模型族的 tokenizer.json
+  （如 qwen.json / deepseek.json / glm.json，取自各模型仓库）时，按真实 BPE 词表计数
+- 快速模式（默认回退）：按字符类别计数，再乘以各模型族的每字符 Token 系数。
+  字符分类不逐字符循环，而是由 ASCII / UTF-8 编码长度推算（均为 C 实现）：
+  UTF-8 中 ASCII 占 1 字节、拉丁扩展等占 2 字节、CJK 及全角字符占 3 字节
+
+流式输出使用 TokenTally 逐片段累计字符类别，结束时一次换算，避免逐片段取整误差。
+TokenTally 不保留文本，即使已加载词表也只按系数换算：精确模式下同一段输出，
+流式（TokenTally）与非流式（estimate_tokens）的计数会略有差异
 """
 
-from typing import Optional
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TokenRatio:
+    """每字符 Token 系数"""
+    cjk: float       # CJK 字符（含中文标点、全角字符）
+    ascii: float     # ASCII 字符
+    other: float     # 其他字符
+
+
+# 各模型族的系数：按本仓库提示词模板与签文语料（165 段，约 2KB/段）对照真实 BPE 词表计数拟合，
+# 文言与排盘术语较多，CJK 系数高于各家文档中现代白话文的 0.6–0.7；GLM 词表未实测，沿用 Qwen 系数
+MODEL_FAMILY_RATIOS: Dict[str, TokenRatio] = {
+    "qwen": TokenRatio(cjk=0.9, ascii=0.35, other=0.5),
+    "deepseek": TokenRatio(cjk=0.85, ascii=0.35, other=0.5),
+    "glm": TokenRatio(cjk=0.9, ascii=0.35, other=0.5),
+    # 未知模型：沿用原有保守估算（CJK 1 字 1 Token，ASCII 4 字符 1 Token）
+    "default": TokenRatio(cjk=1.0, ascii=0.25, other=0.5),
+}
+
+# 模型名关键字 -> 模型族
+MODEL_FAMILY_KEYWORDS = (
+    ("qwen", "qwen"),
+    ("qwq", "qwen"),
+    ("deepseek", "deepseek"),
+    ("glm", "glm"),
+    ("chatglm", "glm"),
+)
+
+# 默认词表目录
+DEFAULT_VOCAB_DIR = os.path.join(os.path.dirname(__file__), "vocab")
+
+# 精确模式词表缓存（None 表示已尝试加载但不可用）
+_tokenizers: Dict[str, Any] = {}
+
+
+def get_model_family(model: Optional[str]) -> str:
+    """根据模型名判断模型族"""
+    if not model:
+        return "default"
+    model_lower = model.lower()
+    for keyword, family in MODEL_FAMILY_KEYWORDS:
+        if keyword in model_lower:
+            return family
+    return "default"
+
+
+def _get_tokenizer(family: str) -> Any:
+    """加载模型族的本地 BPE 词表（需 tokenizers 库），不可用时返回 None"""
+    if family in _tokenizers:
+        return _tokenizers[family]
+    tokenizer = None
+    from src.config import settings
+    if settings.token_estimator_mode != "fast" and family != "default":
+        path = os.path.join(settings.token_vocab_dir or DEFAULT_VOCAB_DIR, f"{family}.json")
+        if os.path.isfile(path):
+            try:
+                from tokenizers import Tokenizer
+                tokenizer = Tokenizer.from_file(path)
+                logger.info(f"[Token] 已加载 {family} 词表: {path}")
+            except ImportError:
+                logger.warning("[Token] 未安装 tokenizers，使用快速估算")
+            except Exception as e:
+                logger.warning(f"[Token] 加载词表失败 {path}: {e}")
+    _tokenizers[family] = tokenizer
+    return tokenizer
+
+
+def count_char_classes(text: str) -> tuple:
+    """
+    统计 (ASCII, CJK, 其他) 字符数
+
+    CJK 按 UTF-8 三字节字符近似（U+0800–U+FFFF，覆盖 CJK 基本区、扩展 A、
+    兼容区、中文标点与全角字符），四字节字符（扩展 B 及以后、emoji）计入 CJK
+    """
+    length = len(text)
+    ascii_count = len(text.encode("ascii", "ignore"))
+    if ascii_count == length:
+        return ascii_count, 0, 0
+    extra = len(text.encode("utf-8", "surrogatepass")) - length
+    non_ascii = length - ascii_count
+    # extra = two + 2*three + 3*four，non_ascii = two + three + four
+    cjk = min(non_ascii, max(0, extra - non_ascii))
+    return ascii_count, cjk, non_ascii - cjk
 
 
-def estimate_tokens(text: str) -> int:
+def _apply_ratio(ascii_count: int, cjk_count: int, other_count: int, family: str) -> int:
+    ratio = MODEL_FAMILY_RATIOS[family]
+    return int(cjk_count * ratio.cjk + ascii_count * ratio.ascii + other_count * ratio.other)
+
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
     """
     估算文本的 Token 数
     
-    算法说明：
+    算法说明（快速模式，系数见 MODEL_FAMILY_RATIOS）：
     - ASCII 字符：约 4 个字符 = 1 Token
-    - CJK 字符（中日韩）：约 1 个字符 = 1 Token
+    - CJK 字符（中日韩）：Qwen/DeepSeek/GLM 约 0.85–0.9 Token，未知模型按 1 Token
     - 其他字符：约 2 个字符 = 1 Token
     
     Args:
         text: 待估算的文本
+        model: 模型名称（用于选择词表/系数），为空时使用默认系数
     
     Returns:
         估算的 Token 数
@@ -28,40 +134,41 @@ def estimate_tokens(text: str) -> int:
     if not text:
         return 0
     
-    ascii_count = 0
-    cjk_count = 0
-    other_count = 0
-    
-    for char in text:
-        code = ord(char)
-        
-        # ASCII 字符
-        if code <= 0x7F:
-            ascii_count += 1
-            continue
-        
-        # CJK 字符范围检测
-        is_cjk = (
-            (0x4E00 <= code <= 0x9FFF) or      # CJK 基本区
-            (0x3400 <= code <= 0x4DBF) or      # CJK 扩展 A
-            (0x20000 <= code <= 0x2A6DF) or    # CJK 扩展 B
-            (0x2A700 <= code <= 0x2B73F) or    # CJK 扩展 C
-            (0x2B740 <= code <= 0x2B81F) or    # CJK 扩展 D
-            (0x2B820 <= code <= 0x2CEAF) or    # CJK 扩展 E
-            (0xF900 <= code <= 0xFAFF) or      # CJK 兼容
-            (0x2F800 <= code <= 0x2FA1F) or    # CJK 兼容扩展
-            (0x3000 <= code <= 0x303F) or      # CJK 标点
-            (0xFF00 <= code <= 0xFFEF)         # 全角字符
-        )
-        
-        if is_cjk:
-            cjk_count += 1
-        else:
-            other_count += 1
-    
-    # Token 估算
-    estimated = cjk_count + (ascii_count // 4) + (other_count // 2)
-    return max(1, estimated)
+    family = get_model_family(model)
+    tokenizer = _get_tokenizer(family)
+    if tokenizer is not None:
+        return max(1, len(tokenizer.encode(text, add_special_tokens=False).ids))
+    
+    return max(1, _apply_ratio(*count_char_classes(text), family))
+
+
+class TokenTally:
+    """
+    流式输出的 Token 累计（逐片段统计字符类别，结束时按模型族换算）
+
+    为避免在流式响应中保留全部输出，只累计字符类别，始终按系数换算（不走 BPE 词表）
+    """
+
+    __slots__ = ("ascii", "cjk", "other")
+
+    def __init__(self):
+        self.ascii = 0
+        self.cjk = 0
+        self.other = 0
+
+    def add(self, chunk: str) -> None:
+        if not chunk:
+            return
+        ascii_count, cjk_count, other_count = count_char_classes(chunk)
+        self.ascii += ascii_count
+        self.cjk += cjk_count
+        self.other += other_count
+
+    def tokens(self, model: Optional[str] = None) -> int:
+        """按模型族系数换算（model 为实际调用的模型名，为空时使用默认系数）"""
+        if not (self.ascii or self.cjk or self.other):
+            return 0
+        return max(1, _apply_ratio(self.ascii, self.cjk, self.other, get_model_family(model)))
 
 
 def estimate_cost(tokens: int, cost_per_1k: float) -> float:
@@ -82,19 +189,20 @@ def estimate_cost(tokens: int, cost_per_1k: float) -> float:
     return round(cost, 6)
 
 
-def estimate_total_tokens(input_text: str, output_text: str) -> Optional[int]:
+def estimate_total_tokens(input_text: str, output_text: str, model: Optional[str] = None) -> Optional[int]:
     """
     估算输入和输出的总 Token 数
     
     Args:
         input_text: 输入文本（包含 system prompt 和 user prompt）
         output_text: AI 输出文本
+        model: 模型名称
     
     Returns:
         总 Token 数，如果都为空则返回 None
     """
-    input_tokens = estimate_tokens(input_text)
-    output_tokens = estimate_tokens(output_text)
+    input_tokens = estimate_tokens(input_text, model)
+    output_tokens = estimate_tokens(output_text, model)
     
     total = input_tokens + output_tokens
     return total if total > 0 else None
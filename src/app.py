@@ -1,5 +1,6 @@
 import os
 import uuid
+import asyncio
 import logging
 from pathlib import Path
 
@@ -184,6 +185,25 @@ app.include_router(monitoring_router, include_in_schema=False)  # 自带 /api/mo
 
 _logger.info("API路由已注册：v1版本路径 + 旧版本兼容层")
 
+# ========== 进程内后台任务 ==========
+# Serverless 环境（Vercel）没有常驻进程，各模块在请求时按需刷新，不依赖这些任务
+@app.on_event("startup")
+async def start_background_tasks():
+    from src.config import settings
+    from src.divination.zodiac import zodiac_precompute
+    from src.ai.health import get_health_prober
+    app.state.background_tasks = [
+        asyncio.create_task(zodiac_precompute.run_scheduler()),
+    ]
+    if settings.ai_health_probe_enabled:
+        app.state.background_tasks.append(asyncio.create_task(get_health_prober().run()))
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in getattr(app.state, "background_tasks", []):
+        task.cancel()
+
 # ========== 静态前端文件服务修复3：绝对路径 + 容错 ==========
 frontend_dist_path = Path(__file__).parent / "dist"  # 基于当前文件的绝对路径
 if frontend_dist_path.is_dir():
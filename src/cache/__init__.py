@@ -8,4 +8,9 @@ from .divination_cache import (
     get_cached_result,
     set_cached_result,
     invalidate_cache,
-)
\ No newline at end of file
+)
+from .response_cache import (
+    ai_response_cache,
+    build_response_cache_key,
+    ResponseRecorder,
+)
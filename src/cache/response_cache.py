@@ -0,0 +1,257 @@
+"""
+AI 解读结果缓存
+
+相同的 (提示词, 模型等级, 模板版本, 语言) 组合直接回放已缓存的解读，不再请求模型。
+
+- 键：规范化提示词（system + user，空白折叠）的哈希 + 模型等级 + 模板版本 + 语言
+- 记录：流式输出逐片段记录，同时保存各片段相对首片段的时间偏移
+- 回放：paced 按原始节奏（加速并限制最大间隔）逐片段输出，burst 一次性输出全文
+- 存储：进程内按字节数限制大小的 TLRU 缓存（L1）+ 可选 Redis（L2，cache_client_type=redis 时启用）
+- TTL 按占卜类型配置；严重降级（cache_only）时命中缓存直接返回，紧急降级时仅返回缓存
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+import cachetools
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 缓存 TTL 配置（秒）
+RESPONSE_CACHE_TTL = {
+    # 命盘类：输入固定则解读稳定
+    "ziwei": 7 * 86400,
+    "birthday": 7 * 86400,
+    "fate": 7 * 86400,
+    "hehun": 7 * 86400,
+    "name": 7 * 86400,
+    "new_name": 7 * 86400,
+    "zhuge": 7 * 86400,
+    "dream": 3 * 86400,
+    # 起卦类：提示词本身含时间/随机结果，重复概率低，短期缓存即可
+    "tarot": 3600,
+    "plum_flower": 3600,
+    "qimen": 3600,
+    "daliuren": 3600,
+    "xiaoliu": 3600,
+    "default": 86400,
+}
+
+# Redis 键前缀
+RESPONSE_CACHE_PREFIX = "ai:response:"
+
+# 预设模型线路的模型等级（自定义 API 不使用缓存）
+PRESET_MODEL_TIER = "preset"
+
+# paced 回放：相对原始节奏的加速倍数与单次间隔上限（秒）
+REPLAY_SPEEDUP = 2.0
+REPLAY_MAX_GAP = 0.2
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(text: str) -> str:
+    """规范化提示词：折叠连续空白，忽略首尾空白差异"""
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def build_response_cache_key(
+    system_prompt: str,
+    prompt: str,
+    model_tier: str,
+    template_version: int,
+    locale: str,
+) -> str:
+    """生成缓存键"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(normalize_prompt(system_prompt).encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(normalize_prompt(prompt).encode("utf-8"))
+    return f"{model_tier}:v{template_version}:{locale}:{digest.hexdigest()}"
+
+
+def get_response_ttl(divination_type: str) -> int:
+    return RESPONSE_CACHE_TTL.get(divination_type, RESPONSE_CACHE_TTL["default"])
+
+
+def get_template_version(divination_type: str) -> int:
+    """占卜类型对应提示词模板的版本号，模板不存在时为 0"""
+    from src.prompts import get_prompt_manager
+    template = get_prompt_manager().get_template(f"{divination_type}_divination")
+    return template.version if template else 0
+
+
+@dataclass
+class CachedResponse:
+    """缓存的流式输出"""
+    chunks: List[str]
+    offsets_ms: List[int]       # 各片段相对首片段的时间偏移
+    ttl: int
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def content(self) -> str:
+        return "".join(self.chunks)
+
+    @property
+    def size(self) -> int:
+        return sum(len(chunk) for chunk in self.chunks) * 3 + len(self.offsets_ms) * 8
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"c": self.chunks, "t": self.offsets_ms, "ttl": self.ttl, "at": self.created_at},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_json(cls, raw: str) -> "CachedResponse":
+        data = json.loads(raw)
+        return cls(chunks=data["c"], offsets_ms=data["t"], ttl=data["ttl"], created_at=data["at"])
+
+
+class ResponseRecorder:
+    """记录流式输出的片段与时间"""
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._offsets_ms: List[int] = []
+        self._started: Optional[float] = None
+
+    def add(self, chunk: str) -> None:
+        if not chunk:
+            return
+        now = time.monotonic()
+        if self._started is None:
+            self._started = now
+        self._chunks.append(chunk)
+        self._offsets_ms.append(int((now - self._started) * 1000))
+
+    def finish(self, ttl: int) -> Optional[CachedResponse]:
+        if not self._chunks:
+            return None
+        return CachedResponse(chunks=self._chunks, offsets_ms=self._offsets_ms, ttl=ttl)
+
+
+class AIResponseCache:
+    """AI 解读两级缓存"""
+
+    def __init__(self, max_bytes: int):
+        # TLRU：按条目自身的 TTL 过期，按近似字节数限制总大小
+        self._local: cachetools.TLRUCache = cachetools.TLRUCache(
+            maxsize=max_bytes,
+            ttu=lambda _key, entry, now: now + entry.ttl,
+            getsizeof=lambda entry: entry.size,
+        )
+        self._lock = threading.Lock()
+        self._stats = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "cache_only_hits": 0,
+        }
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    @staticmethod
+    def _redis_client():
+        if settings.cache_client_type != "redis":
+            return None
+        from .redis_client import RedisCacheClient
+        return RedisCacheClient
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._local.get(key)
+        if entry is not None:
+            self._count("local_hits")
+            return entry
+
+        redis_client = self._redis_client()
+        if redis_client is not None:
+            raw = await asyncio.to_thread(redis_client.get_token, RESPONSE_CACHE_PREFIX + key)
+            if raw:
+                try:
+                    entry = CachedResponse.from_json(raw)
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"AI 解读缓存数据损坏: {e}")
+                else:
+                    with self._lock:
+                        self._local[key] = entry
+                    self._count("redis_hits")
+                    return entry
+
+        self._count("misses")
+        return None
+
+    async def put(self, key: str, entry: CachedResponse) -> None:
+        with self._lock:
+            try:
+                self._local[key] = entry
+            except ValueError:
+                # 单条超过缓存总大小，仅写 Redis
+                pass
+        self._count("stores")
+
+        redis_client = self._redis_client()
+        if redis_client is not None:
+            try:
+                await asyncio.to_thread(
+                    redis_client.store_token, RESPONSE_CACHE_PREFIX + key, entry.to_json(), entry.ttl
+                )
+            except Exception as e:
+                logger.warning(f"AI 解读缓存写入 Redis 失败: {e}")
+
+    def record_cache_only_hit(self) -> None:
+        self._count("cache_only_hits")
+
+    @staticmethod
+    async def replay(entry: CachedResponse, paced: bool = True) -> AsyncIterator[str]:
+        """
+        回放缓存的输出
+
+        Args:
+            entry: 缓存条目
+            paced: True 按原始节奏逐片段输出（加速 REPLAY_SPEEDUP 倍，间隔不超过 REPLAY_MAX_GAP），
+                   False 一次性输出全文
+        """
+        if not paced:
+            yield entry.content
+            return
+        previous = 0
+        for chunk, offset in zip(entry.chunks, entry.offsets_ms):
+            gap = min((offset - previous) / 1000 / REPLAY_SPEEDUP, REPLAY_MAX_GAP)
+            if gap > 0:
+                await asyncio.sleep(gap)
+            previous = offset
+            yield chunk
+
+    def clear(self) -> None:
+        with self._lock:
+            self._local.clear()
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["local_entries"] = len(self._local)
+            stats["local_bytes"] = self._local.currsize
+            stats["local_max_bytes"] = self._local.maxsize
+        lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["local_hits"] + stats["redis_hits"]) / lookups, 4) if lookups else 0.0
+        stats["redis_enabled"] = settings.cache_client_type == "redis"
+        return stats
+
+
+# 全局单例
+ai_response_cache = AIResponseCache(max_bytes=settings.ai_response_cache_max_mb * 1024 * 1024)
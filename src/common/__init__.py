@@ -16,12 +16,22 @@ from .sse_response import (
     sse_data,
     sse_error,
     sse_done,
+    coalesce_text_stream,
+    cancel_on_disconnect,
 )
 from .error_handler import (
     handle_route_error,
     safe_api_call,
     format_error_response,
 )
+from .etag_response import (
+    CACHE_CONTROL_STATIC,
+    CACHE_CONTROL_NO_STORE,
+    PreserializedJSON,
+    etag_matches,
+    json_bytes_response,
+    make_etag,
+)
 from .api_utils import (
     normalize_api_key,
     get_api_config_from_request,
@@ -43,10 +53,19 @@ __all__ = [
     'sse_data',
     'sse_error',
     'sse_done',
+    'coalesce_text_stream',
+    'cancel_on_disconnect',
     # 错误处理
     'handle_route_error',
     'safe_api_call',
     'format_error_response',
+    # 预序列化响应
+    'CACHE_CONTROL_STATIC',
+    'CACHE_CONTROL_NO_STORE',
+    'PreserializedJSON',
+    'etag_matches',
+    'json_bytes_response',
+    'make_etag',
     # API 工具
     'normalize_api_key',
     'get_api_config_from_request',
@@ -0,0 +1,90 @@
+"""
+预序列化 JSON 响应工具
+
+用于直接返回已编码好的 JSON 字节（静态数据、预计算结果），
+附带 ETag / Cache-Control，并处理 If-None-Match 条件请求。
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+# 常用缓存策略
+CACHE_CONTROL_STATIC = "public, max-age=86400"
+CACHE_CONTROL_NO_STORE = "no-store"
+
+
+def make_etag(body: bytes) -> str:
+    """根据内容生成带引号的强 ETag"""
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+@dataclass(frozen=True)
+class PreserializedJSON:
+    """预序列化的 JSON 响应体及其 ETag"""
+    body: bytes
+    etag: str
+
+    @classmethod
+    def encode(cls, data: Any) -> "PreserializedJSON":
+        """按 FastAPI JSONResponse 相同的参数编码"""
+        body = json.dumps(
+            data, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+        return cls(body=body, etag=make_etag(body))
+
+
+def etag_matches(request: Optional[Request], etag: str) -> bool:
+    """
+    判断请求的 If-None-Match 是否命中 ETag
+
+    Args:
+        request: FastAPI 请求对象，可为 None
+        etag: 带引号的强 ETag
+
+    Returns:
+        是否命中（命中时应返回 304）
+    """
+    if request is None:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def json_bytes_response(
+    body: bytes,
+    etag: str,
+    request: Optional[Request] = None,
+    cache_control: str = CACHE_CONTROL_STATIC,
+) -> Response:
+    """
+    返回预序列化 JSON 字节
+
+    Args:
+        body: 已编码的 JSON 字节
+        etag: 带引号的强 ETag
+        request: 请求对象，用于处理 If-None-Match
+        cache_control: Cache-Control 头
+
+    Returns:
+        200 响应，或 ETag 命中时的 304 响应
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
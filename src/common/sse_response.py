@@ -6,12 +6,50 @@ SSE (Server-Sent Events) 流式响应格式工具
 - 普通内容: data: "内容字符串"\n\n
 - 错误消息: data: {"type":"error","code":"ERROR_CODE","message":"错误信息"}\n\n
 - 结束标记: data: [DONE]\n\n
+
+性能：
+- 纯文本帧不走 json.dumps，按 JSON 字符串规则直接转义（输出与 json.dumps(ensure_ascii=False) 一致）
+- coalesce_text_stream 把上游 1–3 字的增量按时间窗口/字数合并成帧，首个片段立即发送以保持首字延迟
+- cancel_on_disconnect 轮询客户端连接，断开后立即取消并关闭上游流（释放 Token 与并发名额）
 """
 
+import asyncio
 import json
-from typing import Optional, Dict, Any
+import logging
+import re
+from typing import AsyncIterator, Callable, List, Optional, Dict, Any, Set
 from enum import Enum
 
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+# 客户端断开检测的轮询间隔（秒）
+DISCONNECT_POLL_INTERVAL = 0.25
+
+# 正在后台关闭的上游流（保持任务引用，避免被回收）
+_closing_streams: Set[asyncio.Task] = set()
+
+# JSON 字符串中需要转义的字符（与 json.dumps(ensure_ascii=False) 一致）
+_JSON_ESCAPE_RE = re.compile(r'[\x00-\x1f"\\]')
+_JSON_ESCAPES = {i: f"\\u{i:04x}" for i in range(0x20)}
+_JSON_ESCAPES.update({
+    ord('"'): '\\"',
+    ord("\\"): "\\\\",
+    ord("\n"): "\\n",
+    ord("\r"): "\\r",
+    ord("\t"): "\\t",
+    ord("\b"): "\\b",
+    ord("\f"): "\\f",
+})
+
+
+def encode_json_string(text: str) -> str:
+    """将字符串编码为 JSON 字符串字面量（无需转义时直接拼接）"""
+    if _JSON_ESCAPE_RE.search(text) is None:
+        return f'"{text}"'
+    return f'"{text.translate(_JSON_ESCAPES)}"'
+
 
 class SSEErrorCode(str, Enum):
     """SSE 错误码"""
@@ -45,7 +83,7 @@ class SSEMessage:
         Returns:
             格式化的 SSE 数据行
         """
-        return f"data: {json.dumps(content, ensure_ascii=False)}\n\n"
+        return f"data: {encode_json_string(content)}\n\n"
     
     @staticmethod
     def error(
@@ -143,6 +181,179 @@ def sse_done() -> str:
     return SSEMessage.done()
 
 
+async def coalesce_text_stream(
+    source: AsyncIterator[str],
+    window: float = 0.04,
+    max_chars: int = 256,
+) -> AsyncIterator[str]:
+    """
+    合并流式文本增量
+
+    首个片段立即输出；之后由后台任务读取上游并追加到缓冲区，缓冲区非空后满足以下任一条件时合并输出：
+    - 缓冲区中最早的片段已等待 window 秒（上游暂停时也会按时输出）
+    - 缓冲区字数达到 max_chars
+
+    每帧只唤醒一次，单个增量只有一次列表追加的开销。关闭/取消时取消后台任务并关闭上游。
+
+    Args:
+        source: 上游文本流
+        window: 合并时间窗口（秒），<= 0 时不合并
+        max_chars: 单帧最大字数
+    """
+    if window <= 0:
+        async for chunk in source:
+            yield chunk
+        return
+
+    iterator = source.__aiter__()
+    buffer: List[str] = []
+    buffered = 0
+    finished = False
+    error: Optional[BaseException] = None
+    ready = asyncio.Event()     # 缓冲区非空或上游结束
+    full = asyncio.Event()      # 缓冲区达到 max_chars 或上游结束
+
+    async def pump() -> None:
+        nonlocal buffered, finished, error
+        try:
+            async for chunk in iterator:
+                if not chunk:
+                    continue
+                buffer.append(chunk)
+                buffered += len(chunk)
+                ready.set()
+                if buffered >= max_chars:
+                    full.set()
+        except Exception as e:
+            error = e
+        finally:
+            finished = True
+            ready.set()
+            full.set()
+
+    def take() -> str:
+        nonlocal buffered
+        frame = "".join(buffer)
+        buffer.clear()
+        buffered = 0
+        ready.clear()
+        full.clear()
+        return frame
+
+    pump_task: Optional[asyncio.Task] = None
+    try:
+        # 首个片段直接透传，保持首字延迟
+        async for chunk in iterator:
+            if chunk:
+                yield chunk
+                break
+        else:
+            return
+
+        pump_task = asyncio.ensure_future(pump())
+        while True:
+            await ready.wait()
+            if not finished and not full.is_set():
+                try:
+                    await asyncio.wait_for(full.wait(), window)
+                except asyncio.TimeoutError:
+                    pass
+            done = finished
+            if buffer:
+                yield take()
+            if done:
+                break
+        if buffer:
+            yield take()
+        if error is not None:
+            raise error
+    finally:
+        if pump_task is not None and not pump_task.done():
+            pump_task.cancel()
+            try:
+                await pump_task
+            except asyncio.CancelledError:
+                pass
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def _close_upstream(iterator: AsyncIterator[str], pending: Optional[asyncio.Future]) -> None:
+    """取消进行中的读取并关闭上游生成器"""
+    if pending is not None and not pending.done():
+        pending.cancel()
+        try:
+            await pending
+        except BaseException:
+            pass
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception as e:
+            logger.warning(f"[SSE] 关闭上游流失败: {e}")
+
+
+async def cancel_on_disconnect(
+    request: Request,
+    source: AsyncIterator[str],
+    on_disconnect: Optional[Callable[[], None]] = None,
+    poll_interval: float = DISCONNECT_POLL_INTERVAL,
+) -> AsyncIterator[str]:
+    """
+    客户端断开时立即取消上游流
+
+    后台轮询 request.is_disconnected()，上游的每次读取在独立任务中进行；检测到断开
+    （或响应任务被服务器先行取消）后取消正在进行的读取（排队、等待首字、读取片段均可取消），
+    并在独立任务中关闭上游生成器，使其 finally 中关闭 httpx 流、释放并发名额与准入名额。
+    关闭放在独立任务中是因为 anyio 的取消会在响应任务的每个 await 处重复抛出，
+    直接在当前任务里清理会被打断。
+
+    Args:
+        request: 当前请求
+        source: SSE 帧生成器
+        on_disconnect: 检测到断开后的回调（如记录 client_abandoned）
+        poll_interval: 轮询间隔（秒）
+    """
+    iterator = source.__aiter__()
+    disconnected = False
+    completed = False
+    pending: Optional[asyncio.Future] = None
+
+    async def watch() -> None:
+        while not await request.is_disconnected():
+            await asyncio.sleep(poll_interval)
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        while True:
+            pending = asyncio.ensure_future(iterator.__anext__())
+            await asyncio.wait((pending, watcher), return_when=asyncio.FIRST_COMPLETED)
+            if not pending.done():
+                disconnected = True
+                break
+            future, pending = pending, None
+            try:
+                item = future.result()
+            except StopAsyncIteration:
+                completed = True
+                break
+            yield item
+    except (asyncio.CancelledError, GeneratorExit):
+        # 服务器先检测到断开并取消了响应任务
+        disconnected = True
+        raise
+    finally:
+        watcher.cancel()
+        if not completed:
+            task = asyncio.ensure_future(_close_upstream(iterator, pending))
+            _closing_streams.add(task)
+            task.add_done_callback(_closing_streams.discard)
+        if disconnected and on_disconnect is not None:
+            on_disconnect()
+
+
 # 常用响应头配置
 SSE_HEADERS = {
     'Content-Type': 'text/event-stream; charset=utf-8',
@@ -137,6 +137,100 @@ class Settings(BaseSettings):
     quota_vip_daily_tokens: int = 0        # VIP用户每日Token使用上限
     quota_premium_daily_calls: int = 0     # 高级用户每日调用次数上限
     quota_premium_daily_tokens: int = 0    # 高级用户每日Token使用上限
+    # 签文预生成解读库路径，留空使用 src/divination/chouqian/data/interpretations.db
+    interpretation_corpus_path: str = ""
+    # 全年运势日历持久化目录，留空仅使用内存缓存
+    fortune_calendar_dir: str = ""
+    # AI 对冲请求：主模型超过近期首字延迟 p90 未响应时并行请求备用模型（按用户等级限额）
+    ai_hedge_enabled: bool = False
+    # AI 模型路由：按实时首字延迟/输出速度/错误率的 EWMA 评分排序候选模型
+    ai_routing_enabled: bool = True
+    # 路由成本权重：每千 Token 成本每 1 元折合的等待秒数，0 表示只看延迟与错误率
+    ai_routing_cost_weight: float = 0.0
+    # AI 解读缓存：相同提示词/模板版本/语言直接回放已缓存的解读（自定义 API 不缓存）
+    ai_response_cache_enabled: bool = True
+    # AI 解读进程内缓存上限（MB），配置 Redis 时同时写入 Redis
+    ai_response_cache_max_mb: int = 64
+    # 缓存回放方式：paced 按原始节奏加速回放，burst 一次性返回
+    ai_response_cache_replay: str = "paced"
+    # AI 调用准入：同时进行的上游调用上限，超出按用户等级加权公平排队
+    ai_admission_max_concurrent: int = 64
+    # 每个用户等级的排队长度上限
+    ai_admission_queue_limit: int = 200
+    # 排队最长等待时间（秒），超时返回 retry-after
+    ai_admission_max_wait: float = 15.0
+    # 排队时是否通过 SSE 推送 queue 事件（排队位置）
+    ai_admission_queue_events: bool = False
+    # 单个模型同时进行的上游请求上限（启用自适应时为初始上限）
+    ai_provider_max_streams: int = 16
+    # 按限流信号自适应调整单模型并发上限（AIMD）
+    ai_concurrency_adaptive: bool = True
+    # 自适应并发上限的最大值
+    ai_concurrency_max_limit: int = 64
+    # 首字延迟上升时提前收缩并发上限（延迟梯度）
+    ai_concurrency_gradient: bool = False
+    # 后台健康探测：按模型定时发送 1 Token 请求（带抖动），与实时调用结果一起驱动熔断器
+    ai_health_probe_enabled: bool = True
+    # 健康探测间隔（秒），近期已有成功调用的模型跳过探测
+    ai_health_probe_interval: float = 60.0
+    # 熔断：连续失败达到该次数后打开（限流不计为失败）
+    ai_breaker_failure_threshold: int = 5
+    # 熔断打开时长（秒），再次打开时翻倍，最长 8 倍
+    ai_breaker_open_seconds: float = 30.0
+    # 半开状态的试探请求数，全部成功后关闭熔断
+    ai_breaker_trial_budget: int = 3
+    # 自定义 API 客户端池的最大条目数（按地址+密钥）
+    ai_client_pool_max_size: int = 128
+    # 客户端池条目及其连接池的空闲关闭时间（秒），需大于最长请求耗时
+    ai_client_pool_idle_seconds: float = 600.0
+    # 每个自定义 API 地址 + 密钥的最大连接数（各密钥独立的连接池）
+    ai_client_pool_max_connections: int = 20
+    # Token 估算模式：auto 有本地词表时精确计数，否则按字符类别快速估算；fast 始终快速估算
+    token_estimator_mode: str = "auto"
+    # 本地 BPE 词表目录（qwen.json / deepseek.json / glm.json），留空使用 src/ai/vocab
+    token_vocab_dir: str = ""
+    # 占卜流式输出的增量合并窗口（毫秒），0 表示每个上游增量单独成帧
+    sse_coalesce_window_ms: int = 40
+    # 合并后单帧的最大字数
+    sse_coalesce_max_chars: int = 256
+    # 新建 RAG 知识库的向量索引类型：flat 精确检索，ivf 近似检索（大规模语料）
+    rag_vector_index: str = "flat"
+    # IVF 查询扫描的倒排表数，越大召回越高、延迟越高
+    rag_ivf_nprobe: int = 16
+    # IVF 乘积量化子空间数（须整除向量维度），0 表示不量化
+    rag_ivf_pq_m: int = 0
+    # 知识库行数达到该值后训练 IVF 索引，之前使用精确检索
+    rag_ivf_min_train_rows: int = 20000
+    # RAG 混合检索：BM25 关键词索引与向量索引并行检索后融合，替代按候选逐条提取关键词的过滤与重排序
+    rag_hybrid_search: bool = False
+    # 混合检索融合方式：rrf 按名次倒数融合，weighted 按相似度与归一化 BM25 分数加权
+    rag_hybrid_fusion: str = "rrf"
+    # 混合检索中关键词结果的权重（0~1）
+    rag_keyword_weight: float = 0.5
+    # RAG 嵌入缓存内存层容量（MB），按向量字节数 LRU 淘汰
+    rag_embedding_cache_memory_mb: int = 64
+    # RAG 嵌入缓存 SQLite 文件容量上限（MB），超出后按最近访问时间裁剪，0 表示不限
+    rag_embedding_cache_disk_mb: int = 1024
+    # RAG 嵌入缓存条目超过该天数未被访问即裁剪，0 表示不按时间裁剪
+    rag_embedding_cache_ttl_days: int = 0
+    # 远程嵌入请求的微批等待窗口（毫秒）：窗口内并发到达的文本合并为一次请求，0 表示只合并同时到达的请求
+    rag_embedding_batch_wait_ms: float = 5.0
+    # 单次批量嵌入请求的最大文本数（不超过接口上限）
+    rag_embedding_batch_max_size: int = 256
+    # 同时进行的批量嵌入请求数
+    rag_embedding_batch_concurrency: int = 4
+    # RAG 入库流水线各阶段之间队列的容量（下游跟不上时上游等待）
+    rag_ingest_queue_size: int = 64
+    # 入库时同时加载的文件数
+    rag_ingest_load_concurrency: int = 4
+    # 入库时每次嵌入的分块数
+    rag_ingest_embed_batch_size: int = 256
+    # 入库时同时进行的嵌入请求数
+    rag_ingest_embed_concurrency: int = 4
+    # 后台入库任务写入检查点的间隔（秒）
+    rag_ingest_checkpoint_seconds: float = 5.0
+    # 多知识库检索时单个知识库的时限（毫秒），超时的知识库结果被舍弃，0 表示不限
+    rag_retrieval_store_timeout_ms: float = 0.0
 
     def get_human_rate_limit(self) -> str:
         max_reqs, time_window_seconds = self.rate_limit
@@ -0,0 +1,78 @@
+"""
+签文离线任务
+
+    python -m src.divination.chouqian                  # 构建签文打包文件 data/qian.pack
+    python -m src.divination.chouqian corpus [...]     # 预生成解读库（见 corpus.py）
+    python -m src.divination.chouqian corpus-stats     # 查看解读库统计
+"""
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+
+from .corpus import (
+    STUB_CORPUS_FILENAME,
+    InterpretationCorpus,
+    PresetInterpretationProvider,
+    StubInterpretationProvider,
+    generate_corpus,
+    get_interpretation_corpus,
+    iter_corpus_items,
+)
+from .service import QIAN_TYPES
+from .store import DEFAULT_DATA_DIR, build_pack
+
+
+def _corpus_path(args) -> Path:
+    if args.output:
+        return Path(args.output)
+    # 桩数据单独存放，避免误当作正式解读上线
+    if getattr(args, "provider", None) == "stub":
+        return DEFAULT_DATA_DIR / STUB_CORPUS_FILENAME
+    return get_interpretation_corpus().path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.divination.chouqian")
+    sub = parser.add_subparsers(dest="command")
+
+    corpus_parser = sub.add_parser("corpus", help="预生成解读库")
+    corpus_parser.add_argument("--provider", choices=["preset", "stub"], default="preset")
+    corpus_parser.add_argument("--types", default=",".join(QIAN_TYPES), help="签类型，逗号分隔")
+    corpus_parser.add_argument("--concurrency", type=int, default=4)
+    corpus_parser.add_argument("--force", action="store_true", help="忽略已有结果重新生成")
+    corpus_parser.add_argument("--output", help="解读库路径")
+
+    stats_parser = sub.add_parser("corpus-stats", help="查看解读库统计")
+    stats_parser.add_argument("--output", help="解读库路径")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command is None:
+        build_pack(DEFAULT_DATA_DIR, list(QIAN_TYPES))
+        return
+
+    if args.command == "corpus":
+        qian_types = [t for t in args.types.split(",") if t]
+        unknown = [t for t in qian_types if t not in QIAN_TYPES]
+        if unknown:
+            parser.error(f"不支持的签类型: {', '.join(unknown)}")
+        provider = StubInterpretationProvider() if args.provider == "stub" else PresetInterpretationProvider()
+        corpus = InterpretationCorpus(_corpus_path(args), readonly=False)
+        try:
+            stats = asyncio.run(generate_corpus(
+                corpus, provider, iter_corpus_items(qian_types),
+                concurrency=args.concurrency, force=args.force,
+            ))
+        finally:
+            corpus.close()
+        print(f"{corpus.path}: {stats}")
+        return
+
+    corpus = InterpretationCorpus(_corpus_path(args), readonly=True)
+    for row in corpus.stats():
+        print(f"{row['qian_type']:<12} {row['version']:<28} {row['provider']:<8} {row['count']}")
+
+
+main()
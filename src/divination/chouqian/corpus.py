@@ -0,0 +1,430 @@
+"""
+签文预生成解读库
+
+灵签（各庙数百支）与诸葛神算（384 签）都是有限集合，通用解读的提示词
+对同一支签几乎完全相同。离线批处理为每支签渲染与线上完全一致的提示词，
+调用可配置的模型生成解读，结果按提示词摘要存入本地 SQLite：
+
+- 提示词摘要 = blake2b(system_prompt + user_prompt)，模版或签文变更后摘要随之变化，
+  旧结果保留但不再命中，天然实现版本化
+- 线上请求先按同样方式渲染提示词并查库，命中则直接返回，无需调用模型
+- 带个人信息的请求可在通用解读基础上再追加一段个性化补充（见 build_personalize_prompt）
+
+用法：
+    python -m src.divination.chouqian corpus --provider preset   # 调用预设模型线路生成
+    python -m src.divination.chouqian corpus --provider stub     # 本地桩数据，写入 *.stub.db
+    python -m src.divination.chouqian corpus-stats
+"""
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Protocol, Tuple
+
+from .models import ChouqianResult
+
+_logger = logging.getLogger(__name__)
+
+CORPUS_FILENAME = "interpretations.db"
+STUB_CORPUS_FILENAME = "interpretations.stub.db"
+DEFAULT_CORPUS_PATH = Path(__file__).parent / "data" / CORPUS_FILENAME
+
+# 诸葛神算前端固定发送的提示词，视为“无个人问题”的通用解读请求
+ZHUGE_GENERIC_PROMPTS = frozenset({"", "请解读此签", "诸葛神算解签"})
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS interpretations (
+    prompt_hash TEXT PRIMARY KEY,
+    qian_type   TEXT NOT NULL,
+    number      INTEGER NOT NULL,
+    version     TEXT NOT NULL,
+    provider    TEXT NOT NULL,
+    model       TEXT NOT NULL DEFAULT '',
+    content     TEXT NOT NULL,
+    created_at  REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_interpretations_item ON interpretations (qian_type, number);
+"""
+
+
+# ==================== 提示词渲染 ====================
+
+def _template(template_id: str, fallback: str) -> Tuple[str, str]:
+    """获取模版系统提示词及版本标签"""
+    from src.prompts import get_prompt_manager
+    template = get_prompt_manager().get_template(template_id)
+    if template:
+        return template.system_prompt, f"{template_id}@v{template.version}"
+    return fallback, f"{template_id}@builtin"
+
+
+def prompt_hash(system_prompt: str, user_prompt: str) -> str:
+    """提示词摘要，作为解读库的主键"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(system_prompt.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(user_prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def render_qian_info(qian_detail: ChouqianResult) -> str:
+    """签文信息段落（AI解签提示词与个性化补充共用）"""
+    qian_info = f"【{qian_detail.type_name}第{qian_detail.number}签】\n"
+    qian_info += f"签名：{qian_detail.title}\n"
+
+    # 根据签类型添加特定字段
+    if qian_detail.type == "huangdaxian":
+        if qian_detail.qianshu:
+            qian_info += f"签属：{qian_detail.qianshu}\n"
+        if qian_detail.name:
+            qian_info += f"签等：{qian_detail.name}\n"
+        if qian_detail.shi:
+            qian_info += f"签诗：{qian_detail.shi}\n"
+
+    qian_info += f"签文：{qian_detail.content}\n"
+    return qian_info
+
+
+def render_jieqian_prompt(
+    qian_detail: ChouqianResult,
+    user_name: str = "",
+    question: str = "",
+) -> Tuple[str, str, str]:
+    """
+    渲染 AI 解签提示词（/chouqian/ai_jieqian）
+
+    Returns:
+        (system_prompt, user_prompt, 版本标签)
+    """
+    system_prompt, version = _template(
+        "chouqian_analysis", "你是一位精通中国传统文化的解签大师，擅长解读各类灵签。"
+    )
+    user_info = ""
+    if user_name:
+        user_info += f"求签人：{user_name}\n"
+    if question:
+        user_info += f"所问之事：{question}\n"
+    user_prompt = f"{render_qian_info(qian_detail)}\n{user_info}\n请为此签进行详细解读。"
+    return system_prompt, user_prompt, version
+
+
+def render_zhuge_prompt(qian_detail: ChouqianResult, prompt: str = "") -> Tuple[str, str, str]:
+    """
+    渲染诸葛神算解签提示词（/divination, prompt_type=zhuge）
+
+    前端固定提示词视为无个人问题，其余内容作为所问之事附加在签文之后。
+    输出长度控制由 /divination 统一追加，不在此处处理。
+
+    Returns:
+        (system_prompt, user_prompt, 版本标签)
+    """
+    system_prompt, version = _template("zhuge_divination", "你是一位精通诸葛神算的解签大师。")
+    question = "" if prompt.strip() in ZHUGE_GENERIC_PROMPTS else prompt.strip()
+    user_prompt = f"【诸葛神算第{qian_detail.number}签】\n签诗：{qian_detail.title}\n解曰：{qian_detail.content}\n"
+    if question:
+        user_prompt += f"所问之事：{question}\n"
+    user_prompt += "\n请为此签进行详细解读。"
+    return system_prompt, user_prompt, version
+
+
+def build_personalize_prompt(
+    qian_detail: ChouqianResult,
+    base_interpretation: str,
+    user_name: str = "",
+    question: str = "",
+) -> Tuple[str, str]:
+    """
+    在通用解读之上追加个性化补充的提示词
+
+    通用解读已经先行返回，这里只要求模型针对求签人补充，输出短得多。
+
+    Returns:
+        (system_prompt, user_prompt)
+    """
+    system_prompt, _ = _template(
+        "chouqian_analysis", "你是一位精通中国传统文化的解签大师，擅长解读各类灵签。"
+    )
+    user_info = ""
+    if user_name:
+        user_info += f"求签人：{user_name}\n"
+    if question:
+        user_info += f"所问之事：{question}\n"
+    user_prompt = (
+        f"{render_qian_info(qian_detail)}\n"
+        f"【通用解读（已提供给求签人）】\n{base_interpretation}\n\n"
+        f"{user_info}\n"
+        "请结合求签人的具体情况，针对所问之事给出个性化的分析与建议，"
+        "不要重复通用解读中已有的内容。"
+    )
+    return system_prompt, user_prompt
+
+
+# ==================== 解读库存储 ====================
+
+@dataclass(frozen=True)
+class CorpusItem:
+    """一条待生成的解读"""
+    qian_type: str
+    number: int
+    system_prompt: str
+    user_prompt: str
+    version: str
+    detail: ChouqianResult
+
+    @property
+    def prompt_hash(self) -> str:
+        return prompt_hash(self.system_prompt, self.user_prompt)
+
+
+@dataclass(frozen=True)
+class Interpretation:
+    """已生成的解读"""
+    qian_type: str
+    number: int
+    version: str
+    provider: str
+    model: str
+    content: str
+    created_at: float
+
+
+class InterpretationCorpus:
+    """
+    解读库（SQLite，主键为提示词摘要）
+
+    线上以只读方式打开；文件不存在时视为空库，所有查询直接未命中。
+    批处理任务运行期间生成的新文件需重启服务后生效。
+    """
+
+    def __init__(self, path: Path, readonly: bool = True):
+        self.path = Path(path)
+        self.readonly = readonly
+        self._conn: Optional[sqlite3.Connection] = None
+        self._opened = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._opened:
+            return self._conn
+        with self._lock:
+            if self._opened:
+                return self._conn
+            try:
+                if self.readonly:
+                    if self.path.exists():
+                        self._conn = sqlite3.connect(
+                            f"{self.path.resolve().as_uri()}?mode=ro",
+                            uri=True,
+                            check_same_thread=False,
+                        )
+                    else:
+                        _logger.info(f"解读库不存在，跳过预生成解读: {self.path}")
+                else:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+                    self._conn.executescript(_SCHEMA)
+            except sqlite3.Error as e:
+                _logger.warning(f"解读库打开失败: {e}")
+                self._conn = None
+            self._opened = True
+        return self._conn
+
+    def get(self, hash_: str) -> Optional[Interpretation]:
+        """按提示词摘要查询，未命中返回 None"""
+        conn = self._connect()
+        if conn is None:
+            return None
+        try:
+            with self._lock:
+                row = conn.execute(
+                    "SELECT qian_type, number, version, provider, model, content, created_at "
+                    "FROM interpretations WHERE prompt_hash = ?",
+                    (hash_,),
+                ).fetchone()
+        except sqlite3.Error as e:
+            _logger.warning(f"解读库查询失败: {e}")
+            return None
+        return Interpretation(*row) if row else None
+
+    def lookup(self, system_prompt: str, user_prompt: str) -> Optional[Interpretation]:
+        """按渲染后的提示词查询"""
+        return self.get(prompt_hash(system_prompt, user_prompt))
+
+    def contains(self, hash_: str) -> bool:
+        return self.get(hash_) is not None
+
+    def put(self, item: CorpusItem, content: str, provider: str, model: str = "") -> None:
+        """写入一条解读（同一摘要覆盖）"""
+        conn = self._connect()
+        if conn is None:
+            raise RuntimeError(f"解读库不可写: {self.path}")
+        with self._lock:
+            conn.execute(
+                "INSERT OR REPLACE INTO interpretations "
+                "(prompt_hash, qian_type, number, version, provider, model, content, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (item.prompt_hash, item.qian_type, item.number, item.version,
+                 provider, model, content, time.time()),
+            )
+            conn.commit()
+
+    def stats(self) -> List[Dict[str, object]]:
+        """按签类型与版本统计条数"""
+        conn = self._connect()
+        if conn is None:
+            return []
+        with self._lock:
+            rows = conn.execute(
+                "SELECT qian_type, version, provider, COUNT(*) FROM interpretations "
+                "GROUP BY qian_type, version, provider ORDER BY qian_type, version"
+            ).fetchall()
+        return [
+            {"qian_type": t, "version": v, "provider": p, "count": c}
+            for t, v, p, c in rows
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+            self._opened = False
+
+
+_corpus: Optional[InterpretationCorpus] = None
+
+
+def get_interpretation_corpus() -> InterpretationCorpus:
+    """获取线上只读解读库（路径可通过 INTERPRETATION_CORPUS_PATH 配置）"""
+    global _corpus
+    if _corpus is None:
+        from src.config import settings
+        path = Path(settings.interpretation_corpus_path) if settings.interpretation_corpus_path else DEFAULT_CORPUS_PATH
+        _corpus = InterpretationCorpus(path, readonly=True)
+    return _corpus
+
+
+def iter_text_chunks(content: str) -> Iterator[str]:
+    """按行切分已生成的解读，流式返回时保持与模型输出相近的节奏"""
+    yield from content.splitlines(keepends=True)
+
+
+# ==================== 离线批处理 ====================
+
+class InterpretationProvider(Protocol):
+    """解读生成器"""
+    name: str
+
+    async def generate(self, item: CorpusItem) -> Tuple[str, str]:
+        """返回 (解读内容, 实际使用的模型)"""
+        ...
+
+
+class StubInterpretationProvider:
+    """本地桩实现：不调用模型，按签文拼出固定格式的解读，用于联调与测试"""
+    name = "stub"
+
+    async def generate(self, item: CorpusItem) -> Tuple[str, str]:
+        detail = item.detail
+        lines = [
+            f"## {detail.type_name}第{detail.number}签",
+            "",
+            f"**签名**：{detail.title}",
+        ]
+        if detail.shi:
+            lines.append(f"**签诗**：{detail.shi}")
+        lines += ["", "### 签文解读", "", detail.content.strip(), "", "（本地示例解读，仅用于开发调试）"]
+        return "\n".join(lines), "stub"
+
+
+class PresetInterpretationProvider:
+    """调用预设模型线路（带故障转移）生成解读"""
+    name = "preset"
+
+    def __init__(self, temperature: float = 0.8, max_tokens: int = 8000):
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    async def generate(self, item: CorpusItem) -> Tuple[str, str]:
+        from src.ai import get_ai_manager
+        from src.ai.provider import ChatMessage
+
+        result = await get_ai_manager().chat_with_failover(
+            messages=[
+                ChatMessage(role="system", content=item.system_prompt),
+                ChatMessage(role="user", content=item.user_prompt),
+            ],
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+        )
+        return result.response.content, result.response.model
+
+
+def iter_corpus_items(qian_types: Iterable[str]) -> Iterator[CorpusItem]:
+    """
+    枚举需要预生成的条目
+
+    每支签生成 AI 解签的通用提示词；诸葛神算额外生成 /divination 使用的提示词。
+    """
+    from src.prompts.output_control import enhance_prompt_with_length_control
+    from .service import chouqian_service
+
+    for qian_type in qian_types:
+        for detail in chouqian_service.get_all(qian_type):
+            system_prompt, user_prompt, version = render_jieqian_prompt(detail)
+            yield CorpusItem(qian_type, detail.number, system_prompt, user_prompt, version, detail)
+            if qian_type == "zhuge":
+                system_prompt, user_prompt, version = render_zhuge_prompt(detail)
+                # 与 /divination 最终发送的提示词保持一致
+                user_prompt = enhance_prompt_with_length_control(user_prompt, "detailed", "zhuge")
+                yield CorpusItem(qian_type, detail.number, system_prompt, user_prompt, version, detail)
+
+
+async def generate_corpus(
+    corpus: InterpretationCorpus,
+    provider: InterpretationProvider,
+    items: Iterable[CorpusItem],
+    concurrency: int = 4,
+    force: bool = False,
+) -> Dict[str, int]:
+    """
+    批量生成解读并写入解读库
+
+    已存在的摘要默认跳过，任务中断后重跑即可续传。
+
+    Returns:
+        统计信息 {total, skipped, generated, failed}
+    """
+    stats = {"total": 0, "skipped": 0, "generated": 0, "failed": 0}
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _run(item: CorpusItem):
+        async with semaphore:
+            try:
+                content, model = await provider.generate(item)
+            except Exception as e:
+                stats["failed"] += 1
+                _logger.warning(f"解读生成失败 {item.qian_type}#{item.number} ({item.version}): {e}")
+                return
+            if not content or not content.strip():
+                stats["failed"] += 1
+                _logger.warning(f"解读内容为空 {item.qian_type}#{item.number} ({item.version})")
+                return
+            corpus.put(item, content, provider.name, model)
+            stats["generated"] += 1
+            if stats["generated"] % 20 == 0:
+                _logger.info(f"已生成 {stats['generated']} 条解读")
+
+    tasks = []
+    for item in items:
+        stats["total"] += 1
+        if not force and corpus.contains(item.prompt_hash):
+            stats["skipped"] += 1
+            continue
+        tasks.append(_run(item))
+    await asyncio.gather(*tasks)
+    return stats
@@ -1,9 +1,10 @@
 """抽签服务"""
-import json
 import random
+import threading
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 from .models import ChouqianResult
+from .store import QianEntry, QianPack, load_pack
 
 
 QIAN_TYPES = {
@@ -17,58 +18,63 @@ QIAN_TYPES = {
 
 
 class ChouqianService:
-    """抽签服务类"""
+    """抽签服务类
+    
+    签文数据来自 data/qian.pack（见 store.py），首次访问时才映射，
+    各接口可直接取用预序列化的 JSON 字节，无需解析。
+    """
     
     def __init__(self):
         self.data_dir = Path(__file__).parent / "data"
-        self._data: Dict[str, List[ChouqianResult]] = {}
-        self._load_data()
+        self._pack: Optional[QianPack] = None
+        self._lock = threading.Lock()
     
-    def _load_data(self):
-        """加载所有签文数据"""
-        for qian_type in QIAN_TYPES.keys():
-            file_path = self.data_dir / f"{qian_type}.json"
-            if file_path.exists():
-                with open(file_path, 'r', encoding='utf-8-sig') as f:
-                    data = json.load(f)
-                    results = []
-                    for item in data:
-                        # 兼容处理：观音签使用jieqian字段作为content
-                        if 'content' not in item and 'jieqian' in item:
-                            item['content'] = item['jieqian']
-                        # 确保content字段存在
-                        if 'content' not in item:
-                            item['content'] = item.get('shiyi', '') or item.get('title', '')
-                        results.append(ChouqianResult(**item))
-                    self._data[qian_type] = results
+    @property
+    def pack(self) -> QianPack:
+        """延迟加载签文打包文件"""
+        if self._pack is None:
+            with self._lock:
+                if self._pack is None:
+                    self._pack = load_pack(self.data_dir, list(QIAN_TYPES.keys()))
+        return self._pack
     
-    def draw(self, qian_type: str) -> ChouqianResult:
-        """抽签"""
-        if qian_type not in self._data:
+    def _check_type(self, qian_type: str) -> QianPack:
+        pack = self.pack
+        if not pack.has_type(qian_type):
             raise ValueError(f"不支持的签类型: {qian_type}")
-        
-        data = self._data[qian_type]
-        if not data:
+        return pack
+    
+    def draw_entry(self, qian_type: str) -> QianEntry:
+        """抽签，返回预序列化签文"""
+        pack = self._check_type(qian_type)
+        count = pack.count(qian_type)
+        if not count:
             raise ValueError(f"{QIAN_TYPES[qian_type]['name']}数据未加载")
-        
-        return random.choice(data)
+        return pack.entry_at(qian_type, random.randrange(count))
+    
+    def get_entry(self, qian_type: str, number: int) -> QianEntry:
+        """根据签号获取预序列化签文"""
+        entry = self._check_type(qian_type).entry(qian_type, number)
+        if entry is None:
+            raise ValueError(f"签号{number}不存在")
+        return entry
+    
+    def get_all_entry(self, qian_type: str) -> QianEntry:
+        """获取预序列化的签文列表"""
+        return self._check_type(qian_type).list_body(qian_type)
+    
+    def draw(self, qian_type: str) -> ChouqianResult:
+        """抽签"""
+        return self.draw_entry(qian_type).decode()
     
     def get_by_number(self, qian_type: str, number: int) -> ChouqianResult:
         """根据签号获取签文"""
-        if qian_type not in self._data:
-            raise ValueError(f"不支持的签类型: {qian_type}")
-        
-        for item in self._data[qian_type]:
-            if item.number == number:
-                return item
-        
-        raise ValueError(f"签号{number}不存在")
+        return self.get_entry(qian_type, number).decode()
     
     def get_all(self, qian_type: str) -> List[ChouqianResult]:
         """获取所有签文"""
-        if qian_type not in self._data:
-            raise ValueError(f"不支持的签类型: {qian_type}")
-        return self._data[qian_type]
+        pack = self._check_type(qian_type)
+        return [pack.entry_at(qian_type, i).decode() for i in range(pack.count(qian_type))]
     
     def get_types(self) -> Dict[str, dict]:
         """获取所有签类型"""
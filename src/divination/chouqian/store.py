@@ -0,0 +1,281 @@
+"""
+签文紧凑存储
+
+将 data/ 下各灵签 JSON 打包为单个二进制文件（偏移索引 + UTF-8 数据块），
+运行时通过 mmap 只读映射，按需解码单支签文。
+
+文件布局：
+    MAGIC(4) | header_len(u32) | header(JSON) | 索引区 | 数据区
+
+- header: 版本号、源文件指纹、各签类型的索引位置与列表数据位置
+- 索引区: 每支签一条记录 (签号 u32, 偏移 u32, 长度 u32, 摘要 8 字节)
+- 数据区: 每个签类型一段预序列化的列表 JSON `[签1,签2,...]`，
+  单支签的数据即列表中的一段切片，详情/抽签/列表接口均可直接返回字节
+
+用法：
+    python -m src.divination.chouqian          # 构建 data/qian.pack
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from .models import ChouqianResult
+
+_logger = logging.getLogger(__name__)
+
+PACK_MAGIC = b"QPK1"
+PACK_VERSION = 1
+PACK_FILENAME = "qian.pack"
+
+DEFAULT_DATA_DIR = Path(__file__).parent / "data"
+
+# 签号, 数据偏移, 数据长度, 摘要
+_INDEX_RECORD = struct.Struct("<III8s")
+_HEADER_PREFIX = struct.Struct("<4sI")
+
+
+@dataclass(frozen=True)
+class QianEntry:
+    """单支签文的预序列化数据"""
+    number: int
+    body: bytes
+    etag: str
+
+    def decode(self) -> ChouqianResult:
+        """解码为 ChouqianResult"""
+        return ChouqianResult.model_validate_json(self.body)
+
+
+def _make_etag(digest: bytes) -> str:
+    return f'"{digest.hex()}"'
+
+
+def _normalize_item(item: dict) -> ChouqianResult:
+    """兼容各签文件的字段差异"""
+    # 兼容处理：观音签使用jieqian字段作为content
+    if 'content' not in item and 'jieqian' in item:
+        item['content'] = item['jieqian']
+    # 确保content字段存在
+    if 'content' not in item:
+        item['content'] = item.get('shiyi', '') or item.get('title', '')
+    return ChouqianResult(**item)
+
+
+def source_fingerprint(data_dir: Path, qian_types: List[str]) -> Dict[str, List[int]]:
+    """源 JSON 文件指纹（大小 + 修改时间），仅 stat 不读取内容"""
+    fingerprint = {}
+    for qian_type in qian_types:
+        file_path = data_dir / f"{qian_type}.json"
+        if file_path.exists():
+            stat = file_path.stat()
+            fingerprint[qian_type] = [stat.st_size, stat.st_mtime_ns]
+    return fingerprint
+
+
+def build_pack_bytes(data_dir: Path, qian_types: List[str]) -> bytes:
+    """
+    读取源 JSON 并生成打包后的字节内容
+
+    Args:
+        data_dir: 签文 JSON 所在目录
+        qian_types: 需要打包的签类型
+
+    Returns:
+        完整的打包文件内容
+    """
+    # 每个签类型: [(签号, 预序列化字节), ...]
+    type_items: Dict[str, List[tuple]] = {}
+    for qian_type in qian_types:
+        file_path = data_dir / f"{qian_type}.json"
+        if not file_path.exists():
+            continue
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            data = json.load(f)
+        items = []
+        for item in data:
+            result = _normalize_item(item)
+            items.append((result.number, result.model_dump_json().encode('utf-8')))
+        # 按签号排序，保证索引可二分查找；同号保留首条（与原先线性查找一致）
+        items.sort(key=lambda x: x[0])
+        deduped = []
+        for number, body in items:
+            if not deduped or deduped[-1][0] != number:
+                deduped.append((number, body))
+        type_items[qian_type] = deduped
+
+    # 先计算各段相对位置，再写入 header 中的绝对偏移
+    list_blobs: Dict[str, bytes] = {}
+    relative: Dict[str, List[tuple]] = {}
+    for qian_type, items in type_items.items():
+        parts = [b"["]
+        pos = 1
+        records = []
+        for i, (number, body) in enumerate(items):
+            if i:
+                parts.append(b",")
+                pos += 1
+            digest = hashlib.blake2b(body, digest_size=8).digest()
+            records.append((number, pos, len(body), digest))
+            parts.append(body)
+            pos += len(body)
+        parts.append(b"]")
+        list_blobs[qian_type] = b"".join(parts)
+        relative[qian_type] = records
+
+    header: Dict[str, object] = {
+        "version": PACK_VERSION,
+        "sources": source_fingerprint(data_dir, qian_types),
+        "types": {},
+    }
+
+    # header 长度依赖偏移数值，迭代到稳定为止（通常两轮）
+    header_bytes = b""
+    for _ in range(4):
+        offset = _HEADER_PREFIX.size + len(header_bytes)
+        index_offset = offset
+        for qian_type, records in relative.items():
+            index_offset_for_type = index_offset
+            index_offset += len(records) * _INDEX_RECORD.size
+            header["types"][qian_type] = {"index_offset": index_offset_for_type, "count": len(records)}
+        data_offset = index_offset
+        for qian_type in relative:
+            blob = list_blobs[qian_type]
+            header["types"][qian_type].update({
+                "list_offset": data_offset,
+                "list_length": len(blob),
+                "list_etag": _make_etag(hashlib.blake2b(blob, digest_size=8).digest()),
+            })
+            data_offset += len(blob)
+        new_header = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+        if len(new_header) == len(header_bytes):
+            header_bytes = new_header
+            break
+        header_bytes = new_header
+    else:
+        raise RuntimeError("签文打包 header 偏移未收敛")
+
+    out = bytearray(_HEADER_PREFIX.pack(PACK_MAGIC, len(header_bytes)))
+    out += header_bytes
+    for qian_type, records in relative.items():
+        list_offset = header["types"][qian_type]["list_offset"]
+        for number, pos, length, digest in records:
+            out += _INDEX_RECORD.pack(number, list_offset + pos, length, digest)
+    for qian_type in relative:
+        out += list_blobs[qian_type]
+    return bytes(out)
+
+
+def build_pack(data_dir: Path, qian_types: List[str], output: Optional[Path] = None) -> Path:
+    """
+    构建打包文件并原子写入磁盘
+
+    Args:
+        data_dir: 签文 JSON 所在目录
+        qian_types: 需要打包的签类型
+        output: 输出路径，默认 data_dir/qian.pack
+
+    Returns:
+        打包文件路径
+    """
+    output = output or data_dir / PACK_FILENAME
+    content = build_pack_bytes(data_dir, qian_types)
+    # 先写临时文件再替换，多个 worker 同时构建也不会读到半截文件
+    fd, tmp_path = tempfile.mkstemp(prefix=".qian-", dir=str(output.parent))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    _logger.info(f"签文打包完成: {output} ({len(content)} bytes)")
+    return output
+
+
+class QianPack:
+    """签文打包文件的只读视图"""
+
+    def __init__(self, buffer: Union[mmap.mmap, bytes]):
+        self._buffer = buffer
+        magic, header_len = _HEADER_PREFIX.unpack_from(buffer, 0)
+        if magic != PACK_MAGIC:
+            raise ValueError("签文打包文件格式错误")
+        header = json.loads(bytes(buffer[_HEADER_PREFIX.size:_HEADER_PREFIX.size + header_len]))
+        if header.get("version") != PACK_VERSION:
+            raise ValueError(f"签文打包文件版本不匹配: {header.get('version')}")
+        self.sources: Dict[str, List[int]] = header.get("sources", {})
+        self._types: Dict[str, dict] = header["types"]
+        # 签号数组很小，常驻内存用于二分查找；签文内容留在映射区
+        self._numbers: Dict[str, List[int]] = {}
+        for qian_type, info in self._types.items():
+            base = info["index_offset"]
+            self._numbers[qian_type] = [
+                _INDEX_RECORD.unpack_from(buffer, base + i * _INDEX_RECORD.size)[0]
+                for i in range(info["count"])
+            ]
+
+    @classmethod
+    def open(cls, path: Path) -> "QianPack":
+        """以 mmap 方式打开打包文件，多 worker 共享同一份页缓存"""
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer)
+
+    def has_type(self, qian_type: str) -> bool:
+        return qian_type in self._types
+
+    def count(self, qian_type: str) -> int:
+        return self._types[qian_type]["count"]
+
+    def entry_at(self, qian_type: str, index: int) -> QianEntry:
+        """按索引位置读取签文"""
+        base = self._types[qian_type]["index_offset"] + index * _INDEX_RECORD.size
+        number, offset, length, digest = _INDEX_RECORD.unpack_from(self._buffer, base)
+        return QianEntry(number=number, body=self._buffer[offset:offset + length], etag=_make_etag(digest))
+
+    def entry(self, qian_type: str, number: int) -> Optional[QianEntry]:
+        """按签号读取签文，不存在返回 None"""
+        numbers = self._numbers[qian_type]
+        i = bisect_left(numbers, number)
+        if i < len(numbers) and numbers[i] == number:
+            return self.entry_at(qian_type, i)
+        return None
+
+    def list_body(self, qian_type: str) -> QianEntry:
+        """整个签类型的预序列化列表"""
+        info = self._types[qian_type]
+        offset, length = info["list_offset"], info["list_length"]
+        return QianEntry(number=0, body=self._buffer[offset:offset + length], etag=info["list_etag"])
+
+
+def load_pack(data_dir: Path, qian_types: List[str]) -> QianPack:
+    """
+    加载签文打包文件，缺失或与源文件不一致时重新构建
+
+    只读文件系统（如 Vercel）无法写入时，在内存中构建。
+    """
+    pack_path = data_dir / PACK_FILENAME
+    fingerprint = source_fingerprint(data_dir, qian_types)
+    if pack_path.exists():
+        try:
+            pack = QianPack.open(pack_path)
+            if pack.sources == fingerprint:
+                return pack
+            _logger.info("签文源文件已变更，重新打包")
+        except (OSError, ValueError) as e:
+            _logger.warning(f"签文打包文件不可用，重新打包: {e}")
+    try:
+        return QianPack.open(build_pack(data_dir, qian_types, pack_path))
+    except OSError as e:
+        _logger.warning(f"无法写入签文打包文件，改为内存构建: {e}")
+        return QianPack(build_pack_bytes(data_dir, qian_types))
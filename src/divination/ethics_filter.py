@@ -8,6 +8,8 @@
 from typing import Dict, Any, List
 import logging
 
+from src.utils.term_matcher import TermMatcher
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,6 +35,10 @@ class EthicsFilter:
             "另一半": "好朋友"
         }
         
+        # 预编译词表：检查与替换都只需扫描一遍文本
+        self._sensitive_matcher = TermMatcher(self.sensitive_marriage_terms)
+        self._replacement_matcher = TermMatcher(self.replacement_terms)
+        
         # 年龄段适用的分析模板
         self.age_templates = {
             "minor": {
@@ -158,9 +164,7 @@ class EthicsFilter:
         """替换敏感词汇"""
         def replace_in_value(value):
             if isinstance(value, str):
-                for sensitive, replacement in self.replacement_terms.items():
-                    value = value.replace(sensitive, replacement)
-                return value
+                return self._replacement_matcher.replace(value)
             elif isinstance(value, dict):
                 return {k: replace_in_value(v) for k, v in value.items()}
             elif isinstance(value, list):
@@ -236,8 +240,9 @@ class EthicsFilter:
         issues = []
         
         if age < 18:
+            found = self._sensitive_matcher.present(text)
             for term in self.sensitive_marriage_terms:
-                if term in text:
+                if term in found:
                     issues.append(f"包含不适合未成年人的词汇：{term}")
         
         return {
@@ -246,6 +246,8 @@ def calculate_daily_fortune(day_master: str, target_date: date) -> DailyFortune:
     """
     计算每日个性化运势
     
+    评分取自全年运势日历（见 fortune_calendar.py），与逐日计算结果一致。
+    
     Args:
         day_master: 用户八字日主天干
         target_date: 目标日期
@@ -253,30 +255,21 @@ def calculate_daily_fortune(day_master: str, target_date: date) -> DailyFortune:
     Returns:
         DailyFortune: 每日运势数据
     """
-    day_stem, day_branch = get_ganzhi_from_date(target_date)
-    
-    # 计算流日与日主的十神关系
-    ten_god = calculate_ten_god(day_master, day_stem)
+    from .fortune_calendar import get_fortune_calendar
+    
+    day = get_fortune_calendar().day(day_master, target_date)
+    day_stem = day['day_stem']
+    day_branch = day['day_branch']
+    ten_god = day['ten_god']
+    scores = day['scores']
+    overall = scores['overall']
+    career = scores['career']
+    love = scores['love']
+    wealth = scores['wealth']
+    health = scores['health']
+    social = scores['social']
     
-    # 计算五行生克关系基础分
-    day_element = STEM_ELEMENTS.get(day_stem, '木')
     user_element = STEM_ELEMENTS.get(day_master, '木')
-    relation = get_element_relation(user_element, day_element)
-    base_score = ELEMENT_RELATION_SCORES.get(relation, 75)
-    
-    # 获取十神加成
-    god_bonus = TEN_GOD_FORTUNE_BONUS.get(ten_god, {})
-    
-    # 日期种子
-    date_seed = target_date.year * 10000 + target_date.month * 100 + target_date.day
-    
-    # 计算各项运势
-    career = clamp_score(base_score + god_bonus.get('career', 0) + seeded_random(date_seed, 1) * 10 - 5)
-    love = clamp_score(base_score + god_bonus.get('love', 0) + seeded_random(date_seed, 2) * 10 - 5)
-    wealth = clamp_score(base_score + god_bonus.get('wealth', 0) + seeded_random(date_seed, 3) * 10 - 5)
-    health = clamp_score(base_score + god_bonus.get('health', 0) + seeded_random(date_seed, 4) * 10 - 5)
-    social = clamp_score(base_score + god_bonus.get('social', 0) + seeded_random(date_seed, 5) * 10 - 5)
-    overall = clamp_score((career + love + wealth + health + social) / 5)
     
     # 生成运势建议
     advice = generate_daily_advice(ten_god, overall, career, wealth, health)
@@ -404,26 +397,19 @@ def calculate_generic_daily_fortune(target_date: date) -> Dict[str, Any]:
 
 
 def calculate_weekly_trend(day_master: str, center_date: date) -> List[Dict[str, Any]]:
-    """计算周趋势数据"""
+    """计算周趋势数据（取全年运势日历中连续7天的切片）"""
     from datetime import timedelta
+    from .fortune_calendar import get_fortune_calendar
+    
+    days = get_fortune_calendar().range(day_master, center_date - timedelta(days=3), 7)
     
     result = []
-    for offset in range(-3, 4):
-        target_date = center_date + timedelta(days=offset)
-        fortune = calculate_daily_fortune(day_master, target_date)
-        
+    for target_date, scores in days:
         result.append({
             'date': f"{target_date.month}/{target_date.day}",
-            'full_date': fortune.date,
+            'full_date': target_date.strftime('%Y-%m-%d'),
             'day_of_month': target_date.day,
-            'scores': {
-                'overall': fortune.overall,
-                'career': fortune.career,
-                'love': fortune.love,
-                'wealth': fortune.wealth,
-                'health': fortune.health,
-                'social': fortune.social,
-            }
+            'scores': scores,
         })
     
     return result
@@ -431,25 +417,16 @@ def calculate_weekly_trend(day_master: str, center_date: date) -> List[Dict[str,
 
 def generate_key_dates(day_master: str, year: int, month: int) -> List[Dict[str, Any]]:
     """生成月度关键日期"""
-    import calendar
+    from .fortune_calendar import SCORE_FIELDS, get_fortune_calendar
     
     key_dates = []
-    days_in_month = calendar.monthrange(year, month)[1]
-    
-    # 计算所有天的运势
-    daily_scores = []
-    for day in range(1, days_in_month + 1):
-        target_date = date(year, month, day)
-        fortune = calculate_daily_fortune(day_master, target_date)
-        daily_scores.append({
-            'day': day,
-            'overall': fortune.overall,
-            'career': fortune.career,
-            'wealth': fortune.wealth,
-            'love': fortune.love,
-            'health': fortune.health,
-            'social': fortune.social,
-        })
+    
+    # 当月所有天的运势：全年运势日历的一段切片
+    month_scores = get_fortune_calendar().month(day_master, year, month)
+    daily_scores = [
+        {'day': day, **dict(zip(SCORE_FIELDS, row))}
+        for day, row in enumerate(month_scores.tolist(), start=1)
+    ]
     
     # 识别吉日
     for score in daily_scores:
@@ -0,0 +1,248 @@
+"""
+全年运势日历（向量化）
+
+每日运势只取决于 日主天干 × 流日干支 × 日期种子，与用户其他信息无关。
+这里一次性计算 全年天数 × 10 个日主 × 6 项评分 的数组并按年份缓存，
+日/周/月视图直接取数组切片，避免逐日重复计算干支与正弦种子。
+
+计算结果与 calculator.calculate_daily_fortune 的逐日算法逐项一致：
+- 随机扰动仍用 math.sin 逐日计算（与日主无关，每年仅 366×5 次），保证与标量版本完全相同
+- 取整使用 np.rint（银行家舍入），与 Python round 行为一致
+
+可选持久化：配置 FORTUNE_CALENDAR_DIR 后，年度数组以 .npz 形式落盘，重启后直接加载。
+"""
+
+import calendar
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cachetools
+import numpy as np
+
+from .calculator import (
+    ELEMENT_RELATION_SCORES,
+    STEM_ELEMENTS,
+    TEN_GOD_FORTUNE_BONUS,
+    calculate_ten_god,
+    get_element_relation,
+    seeded_random,
+)
+
+_logger = logging.getLogger(__name__)
+
+CALENDAR_VERSION = 1
+
+HEAVENLY_STEMS = ['甲', '乙', '丙', '丁', '戊', '己', '庚', '辛', '壬', '癸']
+EARTHLY_BRANCHES = ['子', '丑', '寅', '卯', '辰', '巳', '午', '未', '申', '酉', '戌', '亥']
+TEN_GODS = list(TEN_GOD_FORTUNE_BONUS)
+
+# 分项评分（顺序对应 seeded_random 的 offset 1-5），数组最后一维为 overall + 分项
+DIMENSIONS = ('career', 'love', 'wealth', 'health', 'social')
+SCORE_FIELDS = ('overall',) + DIMENSIONS
+
+# 干支基准日：1900年1月31日（甲辰日），与 get_ganzhi_from_date 一致
+_BASE_ORDINAL = date(1900, 1, 31).toordinal()
+
+# 年度缓存上限（近几年足够覆盖绝大多数请求）
+YEAR_CACHE_SIZE = 8
+
+
+def _build_master_tables() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    日主 × 流日天干 的静态查表
+
+    Returns:
+        (十神索引 [10,10], 五行基础分 [10,10], 十神加成 [10,5])
+    """
+    ten_god_idx = np.empty((10, 10), dtype=np.int8)
+    base_score = np.empty((10, 10), dtype=np.float64)
+    for m, master in enumerate(HEAVENLY_STEMS):
+        user_element = STEM_ELEMENTS[master]
+        for s, stem in enumerate(HEAVENLY_STEMS):
+            ten_god_idx[m, s] = TEN_GODS.index(calculate_ten_god(master, stem))
+            relation = get_element_relation(user_element, STEM_ELEMENTS[stem])
+            base_score[m, s] = ELEMENT_RELATION_SCORES[relation]
+    bonus = np.array(
+        [[TEN_GOD_FORTUNE_BONUS[god][dim] for dim in DIMENSIONS] for god in TEN_GODS],
+        dtype=np.float64,
+    )
+    return ten_god_idx, base_score, bonus
+
+
+_TEN_GOD_IDX, _BASE_SCORE, _GOD_BONUS = _build_master_tables()
+
+
+def master_index(day_master: str) -> int:
+    """日主天干索引；未知天干按 calculator 的默认值（木、阴）等同于乙"""
+    try:
+        return HEAVENLY_STEMS.index(day_master)
+    except ValueError:
+        return 1
+
+
+@dataclass(frozen=True)
+class FortuneYear:
+    """单个年份的运势数组"""
+    year: int
+    stem_idx: np.ndarray     # [days] 流日天干索引
+    branch_idx: np.ndarray   # [days] 流日地支索引
+    scores: np.ndarray       # [10, days, 6] 各日主评分，最后一维按 SCORE_FIELDS 排列
+
+    @property
+    def start(self) -> date:
+        return date(self.year, 1, 1)
+
+    def day_index(self, target_date: date) -> int:
+        return target_date.toordinal() - self.start.toordinal()
+
+    def ten_god_idx(self, master: int) -> np.ndarray:
+        """[days] 某日主全年每日的十神索引"""
+        return _TEN_GOD_IDX[master, self.stem_idx]
+
+
+def compute_year(year: int) -> FortuneYear:
+    """一次性计算整年 × 10 日主 × 全部评分"""
+    days = 366 if calendar.isleap(year) else 365
+    start_ordinal = date(year, 1, 1).toordinal()
+    delta = np.arange(start_ordinal, start_ordinal + days, dtype=np.int64) - _BASE_ORDINAL
+    stem_idx = (delta % 10).astype(np.int8)
+    branch_idx = (delta % 12).astype(np.int8)
+
+    # 日期种子与扰动与日主无关，逐日用 math.sin 计算以保持与标量算法逐位一致
+    noise = np.empty((days, len(DIMENSIONS)), dtype=np.float64)
+    for i in range(days):
+        d = date.fromordinal(start_ordinal + i)
+        seed = d.year * 10000 + d.month * 100 + d.day
+        for k in range(len(DIMENSIONS)):
+            noise[i, k] = seeded_random(seed, k + 1)
+
+    # [10, days, 5]：基础分 + 十神加成 + 扰动
+    raw = (
+        _BASE_SCORE[:, stem_idx, None]
+        + _GOD_BONUS[_TEN_GOD_IDX[:, stem_idx]]
+        + noise[None, :, :] * 10
+        - 5
+    )
+    dims = np.clip(np.rint(raw), 30, 98)
+    overall = np.clip(np.rint(dims.sum(axis=-1) / 5), 30, 98)
+    scores = np.concatenate([overall[..., None], dims], axis=-1).astype(np.uint8)
+    return FortuneYear(year=year, stem_idx=stem_idx, branch_idx=branch_idx, scores=scores)
+
+
+class FortuneCalendar:
+    """按年份缓存的运势日历，日/周/月视图均为数组切片"""
+
+    def __init__(self, persist_dir: Optional[str] = None):
+        self._persist_dir = Path(persist_dir) if persist_dir else None
+        self._years: cachetools.LRUCache = cachetools.LRUCache(maxsize=YEAR_CACHE_SIZE)
+        self._lock = threading.Lock()
+
+    def _persist_path(self, year: int) -> Optional[Path]:
+        if self._persist_dir is None:
+            return None
+        return self._persist_dir / f"fortune_{year}_v{CALENDAR_VERSION}.npz"
+
+    def _load(self, year: int) -> Optional[FortuneYear]:
+        path = self._persist_path(year)
+        if path is None or not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                return FortuneYear(
+                    year=year,
+                    stem_idx=data["stem_idx"],
+                    branch_idx=data["branch_idx"],
+                    scores=data["scores"],
+                )
+        except (OSError, KeyError, ValueError) as e:
+            _logger.warning(f"运势日历加载失败 {path}: {e}")
+            return None
+
+    def _save(self, fortune_year: FortuneYear) -> None:
+        path = self._persist_path(fortune_year.year)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez_compressed(
+                path,
+                stem_idx=fortune_year.stem_idx,
+                branch_idx=fortune_year.branch_idx,
+                scores=fortune_year.scores,
+            )
+        except OSError as e:
+            # 只读文件系统（如 Vercel）下仅使用内存缓存
+            _logger.warning(f"运势日历持久化失败 {path}: {e}")
+
+    def year(self, year: int) -> FortuneYear:
+        """获取年度数组（内存 -> 磁盘 -> 计算）"""
+        cached = self._years.get(year)
+        if cached is not None:
+            return cached
+        with self._lock:
+            cached = self._years.get(year)
+            if cached is not None:
+                return cached
+            fortune_year = self._load(year)
+            if fortune_year is None:
+                fortune_year = compute_year(year)
+                self._save(fortune_year)
+            self._years[year] = fortune_year
+            return fortune_year
+
+    def day(self, day_master: str, target_date: date) -> Dict[str, object]:
+        """
+        单日视图
+
+        Returns:
+            {day_stem, day_branch, ten_god, scores: {overall, career, ...}}
+        """
+        fortune_year = self.year(target_date.year)
+        i = fortune_year.day_index(target_date)
+        m = master_index(day_master)
+        stem = int(fortune_year.stem_idx[i])
+        return {
+            'day_stem': HEAVENLY_STEMS[stem],
+            'day_branch': EARTHLY_BRANCHES[int(fortune_year.branch_idx[i])],
+            'ten_god': TEN_GODS[int(_TEN_GOD_IDX[m, stem])],
+            'scores': dict(zip(SCORE_FIELDS, fortune_year.scores[m, i].tolist())),
+        }
+
+    def range(self, day_master: str, start: date, days: int) -> List[Tuple[date, Dict[str, int]]]:
+        """连续多日视图（可跨年），返回 [(日期, 评分字典)]"""
+        m = master_index(day_master)
+        result = []
+        current = start
+        remaining = days
+        while remaining > 0:
+            fortune_year = self.year(current.year)
+            i = fortune_year.day_index(current)
+            block = fortune_year.scores[m, i:i + remaining]
+            for offset, row in enumerate(block.tolist()):
+                result.append((current + timedelta(days=offset), dict(zip(SCORE_FIELDS, row))))
+            current += timedelta(days=len(block))
+            remaining -= len(block)
+        return result
+
+    def month(self, day_master: str, year: int, month: int) -> np.ndarray:
+        """整月视图：[当月天数, 6] 的评分切片"""
+        fortune_year = self.year(year)
+        start = fortune_year.day_index(date(year, month, 1))
+        days = calendar.monthrange(year, month)[1]
+        return fortune_year.scores[master_index(day_master), start:start + days]
+
+
+_fortune_calendar: Optional[FortuneCalendar] = None
+
+
+def get_fortune_calendar() -> FortuneCalendar:
+    """获取全局运势日历"""
+    global _fortune_calendar
+    if _fortune_calendar is None:
+        from src.config import settings
+        _fortune_calendar = FortuneCalendar(persist_dir=settings.fortune_calendar_dir or None)
+    return _fortune_calendar
@@ -2,7 +2,7 @@
 
 算法说明：
 1. 用户输入三个汉字
-2. 通过AI计算每个汉字的笔画数
+2. 查本地笔画表获取每个汉字的笔画数
 3. 取每个笔画数的个位数（0改为1）
 4. 三个个位数组成三位数
 5. 如果>=384则减384，循环直到<384
@@ -13,6 +13,8 @@ import json
 from pathlib import Path
 from typing import Optional, Tuple
 
+from src.utils.stroke_counter import get_stroke
+
 
 class ZhugeService:
     """诸葛神算服务"""
@@ -30,18 +32,16 @@ class ZhugeService:
             with open(zhuge_file, 'r', encoding='utf-8-sig') as f:
                 self._zhuge_data = json.load(f)
     
-    async def get_bihua_from_ai(self, char: str) -> int:
-        """通过AI获取单个汉字的笔画数
+    def get_bihua(self, char: str) -> int:
+        """获取单个汉字的笔画数（本地笔画表，按字形实际书写计）
         
         Args:
             char: 单个汉字
             
         Returns:
-            笔画数
+            笔画数，非汉字返回-1
         """
-        # 此方法将由路由层调用AI服务来实现
-        # 这里返回占位值，实际笔画由调用方通过AI获取
-        return 0
+        return get_stroke(char)
     
     def calculate_qian_number(self, char1: str, char2: str, char3: str) -> int:
         """根据三个汉字计算签号
@@ -59,11 +59,17 @@ class ZhugeService:
             
         Returns:
             签号(1-384)
+            
+        Raises:
+            ValueError: 有字不在笔画表中（-1 取个位会被当作 9，不能参与计算）
         """
-        # 获取笔画并取个位
-        b1 = self.get_bihua(char1) % 10
-        b2 = self.get_bihua(char2) % 10
-        b3 = self.get_bihua(char3) % 10
+        strokes = [self.get_bihua(char) for char in (char1, char2, char3)]
+        unknown = [char for char, stroke in zip((char1, char2, char3), strokes) if stroke < 1]
+        if unknown:
+            raise ValueError(f"无法识别汉字的笔画: {''.join(unknown)}")
+        
+        # 取个位
+        b1, b2, b3 = (stroke % 10 for stroke in strokes)
         
         # 0改为1
         if b1 == 0:
@@ -110,6 +116,11 @@ class ZhugeService:
         b1 = self.get_bihua(char1)
         b2 = self.get_bihua(char2)
         b3 = self.get_bihua(char3)
+        if min(b1, b2, b3) < 1:
+            return {
+                "success": False,
+                "error": "请输入三个汉字"
+            }
         
         # 计算签号
         qian_number = self.calculate_qian_number(char1, char2, char3)
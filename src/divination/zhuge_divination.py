@@ -4,19 +4,32 @@ from .base import DivinationFactory
 
 
 class ZhugeFactory(DivinationFactory):
-    
+
     divination_type = "zhuge"
-    
+
     def build_prompt(self, divination_body: DivinationBody) -> tuple[str, str]:
         prompt = divination_body.prompt
+
+        # 带签号时把签文一并交给模型，提示词与预生成解读库的渲染方式一致（延迟导入）
+        if divination_body.qian_number:
+            from .chouqian.corpus import render_zhuge_prompt
+            from .chouqian.service import chouqian_service
+            try:
+                detail = chouqian_service.get_by_number("zhuge", divination_body.qian_number)
+            except ValueError:
+                detail = None
+            if detail is not None:
+                system_prompt, user_prompt, _ = render_zhuge_prompt(detail, prompt)
+                return user_prompt, system_prompt
+
         if not prompt:
             prompt = "请解读此签"
-        
+
         # 从模版库获取提示词（延迟导入）
         from src.prompts import get_prompt_manager
         manager = get_prompt_manager()
         template = manager.get_template("zhuge_divination")
         if template:
             return prompt, template.system_prompt
-        
+
         return prompt, "你是一位精通诸葛神算的解签大师。"
@@ -18,6 +18,10 @@ from .fortune import (
 from .compatibility import (
     get_zodiac_compatibility,
 )
+from .precompute import (
+    ZodiacPrecompute,
+    zodiac_precompute,
+)
 
 __all__ = [
     'get_sun_sign',
@@ -29,4 +33,6 @@ __all__ = [
     'get_weekly_zodiac_fortune',
     'get_monthly_zodiac_fortune',
     'get_zodiac_compatibility',
+    'ZodiacPrecompute',
+    'zodiac_precompute',
 ]
@@ -5,6 +5,7 @@
 
 from typing import Dict, Any, List
 from datetime import date, datetime
+import hashlib
 import math
 
 
@@ -14,6 +15,11 @@ def _seeded_random(seed: int, offset: int = 0) -> float:
     return x - math.floor(x)
 
 
+def _zodiac_seed(zodiac: str) -> int:
+    """星座种子（稳定哈希，多进程/重启后一致；内置 hash() 每个进程随机）"""
+    return int(hashlib.md5(zodiac.encode()).hexdigest()[:8], 16) % 10000
+
+
 def _get_fortune_score(seed: int, offset: int) -> int:
     """获取运势分数 (50-98)"""
     return int(_seeded_random(seed, offset) * 48) + 50
@@ -34,7 +40,7 @@ def get_daily_zodiac_fortune(zodiac: str, target_date: date = None) -> Dict[str,
         target_date = date.today()
     
     # 生成种子
-    zodiac_seed = hash(zodiac) % 10000
+    zodiac_seed = _zodiac_seed(zodiac)
     date_seed = target_date.year * 10000 + target_date.month * 100 + target_date.day
     seed = zodiac_seed + date_seed
     
@@ -118,7 +124,7 @@ def get_weekly_zodiac_fortune(zodiac: str, year: int, week: int) -> Dict[str, An
     Returns:
         每周运势数据
     """
-    zodiac_seed = hash(zodiac) % 10000
+    zodiac_seed = _zodiac_seed(zodiac)
     week_seed = year * 100 + week
     seed = zodiac_seed + week_seed
     
@@ -196,7 +202,7 @@ def get_monthly_zodiac_fortune(zodiac: str, year: int, month: int) -> Dict[str,
     Returns:
         每月运势数据
     """
-    zodiac_seed = hash(zodiac) % 10000
+    zodiac_seed = _zodiac_seed(zodiac)
     month_seed = year * 100 + month
     seed = zodiac_seed + month_seed
     
@@ -0,0 +1,167 @@
+"""
+星座结果预计算
+
+星座运势只取决于 (星座, 日期/周/月)，配对只取决于 (星座, 星座)，
+因此在进程内预先算好并编码为 JSON 字节（附 ETag），接口直接返回字节：
+
+- 静态部分（启动时构建一次）：星座列表、各星座详情、12×12 配对矩阵
+- 滚动窗口（每日零点刷新）：窗口内每个星座的每日/每周/每月运势
+- 窗口外的查询按需计算后放入 LRU 缓存
+"""
+
+import asyncio
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+import cachetools
+
+from src.common.etag_response import PreserializedJSON
+
+from .calculator import get_all_zodiacs, get_zodiac_info
+from .compatibility import get_zodiac_compatibility
+from .fortune import (
+    get_daily_zodiac_fortune,
+    get_monthly_zodiac_fortune,
+    get_weekly_zodiac_fortune,
+)
+
+_logger = logging.getLogger(__name__)
+
+ZODIAC_NAMES = (
+    '白羊座', '金牛座', '双子座', '巨蟹座', '狮子座', '处女座',
+    '天秤座', '天蝎座', '射手座', '摩羯座', '水瓶座', '双鱼座',
+)
+
+# 滚动窗口：每日运势覆盖 [今天-1, 今天+7]，周/月覆盖 [今天-7, 今天+14] 涉及的自然周与月份
+DAILY_WINDOW = (-1, 7)
+PERIOD_WINDOW = (-7, 14)
+
+# 窗口外查询的缓存上限
+EXTRA_CACHE_SIZE = 1024
+
+PrecomputeKey = Tuple
+
+
+class ZodiacPrecompute:
+    """星座预计算结果（预序列化 JSON）"""
+
+    def __init__(self):
+        self._static: Dict[PrecomputeKey, PreserializedJSON] = {}
+        self._window: Dict[PrecomputeKey, PreserializedJSON] = {}
+        self._window_date: Optional[date] = None
+        self._extra: cachetools.LRUCache = cachetools.LRUCache(maxsize=EXTRA_CACHE_SIZE)
+        self._lock = threading.Lock()
+
+    # ---------- 构建 ----------
+
+    def _build_static(self) -> Dict[PrecomputeKey, PreserializedJSON]:
+        static: Dict[PrecomputeKey, PreserializedJSON] = {
+            ("list",): PreserializedJSON.encode({"zodiacs": get_all_zodiacs()}),
+        }
+        for zodiac in ZODIAC_NAMES:
+            info = get_zodiac_info(zodiac)
+            if info:
+                static[("info", zodiac)] = PreserializedJSON.encode(info)
+            for other in ZODIAC_NAMES:
+                static[("compatibility", zodiac, other)] = PreserializedJSON.encode(
+                    get_zodiac_compatibility(zodiac, other)
+                )
+        return static
+
+    def _build_window(self, today: date) -> Dict[PrecomputeKey, PreserializedJSON]:
+        window: Dict[PrecomputeKey, PreserializedJSON] = {}
+        daily_dates = [today + timedelta(days=i) for i in range(DAILY_WINDOW[0], DAILY_WINDOW[1] + 1)]
+        period_dates = [today + timedelta(days=i) for i in range(PERIOD_WINDOW[0], PERIOD_WINDOW[1] + 1)]
+        weeks = sorted({d.isocalendar()[:2] for d in period_dates})
+        months = sorted({(d.year, d.month) for d in period_dates})
+        for zodiac in ZODIAC_NAMES:
+            for d in daily_dates:
+                window[("daily", zodiac, d)] = PreserializedJSON.encode(get_daily_zodiac_fortune(zodiac, d))
+            for year, week in weeks:
+                window[("weekly", zodiac, year, week)] = PreserializedJSON.encode(
+                    get_weekly_zodiac_fortune(zodiac, year, week)
+                )
+            for year, month in months:
+                window[("monthly", zodiac, year, month)] = PreserializedJSON.encode(
+                    get_monthly_zodiac_fortune(zodiac, year, month)
+                )
+        return window
+
+    def refresh(self, today: Optional[date] = None) -> None:
+        """重建滚动窗口（静态部分只构建一次）"""
+        today = today or date.today()
+        with self._lock:
+            if not self._static:
+                self._static = self._build_static()
+            if self._window_date == today:
+                return
+            # 整体替换字典引用，读取方无需加锁
+            self._window = self._build_window(today)
+            self._window_date = today
+        _logger.info(f"星座预计算完成: {today}, 窗口 {len(self._window)} 条, 静态 {len(self._static)} 条")
+
+    def _ensure_current(self) -> None:
+        # 无后台任务的环境（如 Serverless）在跨日后首个请求时刷新
+        if self._window_date != date.today():
+            self.refresh()
+
+    # ---------- 查询 ----------
+
+    def _get(self, key: PrecomputeKey, compute: Callable[[], dict]) -> PreserializedJSON:
+        self._ensure_current()
+        entry = self._static.get(key) or self._window.get(key) or self._extra.get(key)
+        if entry is None:
+            entry = PreserializedJSON.encode(compute())
+            self._extra[key] = entry
+        return entry
+
+    def zodiac_list(self) -> PreserializedJSON:
+        return self._get(("list",), lambda: {"zodiacs": get_all_zodiacs()})
+
+    def info(self, zodiac: str) -> Optional[PreserializedJSON]:
+        self._ensure_current()
+        return self._static.get(("info", zodiac))
+
+    def daily(self, zodiac: str, target_date: Optional[date] = None) -> PreserializedJSON:
+        target_date = target_date or date.today()
+        return self._get(
+            ("daily", zodiac, target_date),
+            lambda: get_daily_zodiac_fortune(zodiac, target_date),
+        )
+
+    def weekly(self, zodiac: str, year: int, week: int) -> PreserializedJSON:
+        return self._get(
+            ("weekly", zodiac, year, week),
+            lambda: get_weekly_zodiac_fortune(zodiac, year, week),
+        )
+
+    def monthly(self, zodiac: str, year: int, month: int) -> PreserializedJSON:
+        return self._get(
+            ("monthly", zodiac, year, month),
+            lambda: get_monthly_zodiac_fortune(zodiac, year, month),
+        )
+
+    def compatibility(self, zodiac1: str, zodiac2: str) -> PreserializedJSON:
+        return self._get(
+            ("compatibility", zodiac1, zodiac2),
+            lambda: get_zodiac_compatibility(zodiac1, zodiac2),
+        )
+
+    # ---------- 定时刷新 ----------
+
+    async def run_scheduler(self) -> None:
+        """后台任务：启动时构建，之后每天零点后刷新滚动窗口"""
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                _logger.error(f"星座预计算失败: {e}")
+            now = datetime.now()
+            next_midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+            await asyncio.sleep((next_midnight - now).total_seconds() + 1)
+
+
+# 全局单例
+zodiac_precompute = ZodiacPrecompute()
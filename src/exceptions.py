@@ -77,6 +77,18 @@ class ZhipuConcurrencyError(DivinationException):
     status_code = status.HTTP_429_TOO_MANY_REQUESTS
 
 
+class AIServiceBusyError(DivinationException):
+    """AI 服务排队已满或排队超时"""
+    code = "AI_SERVICE_BUSY"
+    message = "AI 服务繁忙，请稍后重试"
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    
+    def __init__(self, message: str = None, retry_after: int = 5):
+        super().__init__(message=message)
+        self.retry_after = retry_after
+        self.headers = {"Retry-After": str(retry_after)}
+
+
 class BirthdayFormatError(DivinationException):
     """生日格式错误"""
     code = "BIRTHDAY_FORMAT_ERROR"
@@ -148,6 +160,7 @@ ERROR_CODES = {
     "SERVICE_UNAVAILABLE": "服务暂时不可用",
     "QUOTA_EXCEEDED": "今日使用次数已达上限",
     "ZHIPU_CONCURRENCY_ERROR": "智谱AI并发请求过多，请稍后再试",
+    "AI_SERVICE_BUSY": "AI 服务繁忙，请稍后重试",
     "BIRTHDAY_FORMAT_ERROR": "生日格式错误",
     "NAME_LENGTH_ERROR": "姓名长度错误",
     "EMPTY_PROMPT": "问题不能为空",
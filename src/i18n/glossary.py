@@ -3,8 +3,11 @@
 包含命理术语的多语言翻译
 """
 
+from functools import lru_cache
 from typing import Dict, Optional
 
+from src.utils.term_matcher import TermMatcher, TermMatch
+
 # 术语对照表
 TERMINOLOGY_GLOSSARY: Dict[str, Dict[str, str]] = {
     # 中英对照
@@ -249,6 +252,12 @@ TERMINOLOGY_GLOSSARY: Dict[str, Dict[str, str]] = {
 }
 
 
+@lru_cache(maxsize=None)
+def _glossary_matcher(lang_key: str) -> TermMatcher:
+    """按语言编译术语表（每种语言只编译一次）"""
+    return TermMatcher(TERMINOLOGY_GLOSSARY.get(lang_key, {}))
+
+
 def get_translation(term: str, target_lang: str = "en") -> Optional[str]:
     """
     获取术语翻译
@@ -276,33 +285,20 @@ def translate_text(text: str, target_lang: str = "en") -> str:
     Returns:
         替换术语后的文本
     """
-    lang_key = f"zh-{target_lang}"
-    glossary = TERMINOLOGY_GLOSSARY.get(lang_key, {})
+    matcher = _glossary_matcher(f"zh-{target_lang}")
+    if not matcher:
+        return text
+    
+    # 单次扫描、最长优先：首次出现保留中文括注，后续出现只用翻译；译文不会被再次替换
+    annotated = set()
     
-    result = text
-    for zh_term, translation in glossary.items():
-        if zh_term in result:
-            # 首次出现保留中文括注
-            if result.count(zh_term) == 1:
-                result = result.replace(zh_term, f"{translation}（{zh_term}）", 1)
-            else:
-                # 后续出现只用翻译
-                first_occurrence = True
-                new_result = ""
-                remaining = result
-                while zh_term in remaining:
-                    idx = remaining.index(zh_term)
-                    new_result += remaining[:idx]
-                    if first_occurrence:
-                        new_result += f"{translation}（{zh_term}）"
-                        first_occurrence = False
-                    else:
-                        new_result += translation
-                    remaining = remaining[idx + len(zh_term):]
-                new_result += remaining
-                result = new_result
+    def render(match: TermMatch) -> str:
+        if match.term in annotated:
+            return match.value
+        annotated.add(match.term)
+        return f"{match.value}（{match.term}）"
     
-    return result
+    return matcher.replace(text, render)
 
 
 def build_glossary_text(target_lang: str = "en") -> str:
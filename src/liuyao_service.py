@@ -6,7 +6,7 @@ import logging
 from typing import Dict, Optional, List
 from abc import ABC, abstractmethod
 
-from openai import AsyncOpenAI
+from src.ai.client_pool import get_openai_client_pool
 
 from src.config import settings
 from src.liuyao import LineType, get_line_name
@@ -647,12 +647,7 @@ class OpenAIAIService(BaseAIService):
                 self.api_key = self.api_key[7:].strip()
         
         if self.api_key and self.api_base:
-            self.client = AsyncOpenAI(
-                api_key=self.api_key, 
-                base_url=self.api_base,
-                timeout=60.0,
-                max_retries=0
-            )
+            self.client = get_openai_client_pool().get(self.api_base, self.api_key, timeout=60.0)
             _logger.info(f"OpenAI兼容服务初始化成功: {self.api_base}")
         else:
             self.client = None
@@ -63,6 +63,8 @@ class DivinationBody(BaseModel):
     master: Optional[Dict[str, Any]] = None  # 解读大师配置 {id, name, prompt, gamePrompt}
     # 多语言输出支持
     language: Optional[str] = None  # 目标语言: zh/zh-TW/en/ja/ko
+    # 诸葛神算签号（由 /zhuge/divine 计算得出）
+    qian_number: Optional[int] = None
 
 
 class BirthdayBody(BaseModel):
@@ -8,6 +8,7 @@ from .stream_metrics import (
     record_first_chunk,
     record_chunk,
     complete_stream_tracking,
+    abandon_stream_tracking,
     get_stream_statistics,
 )
 
@@ -23,5 +24,6 @@ __all__ = [
     "record_first_chunk",
     "record_chunk",
     "complete_stream_tracking",
+    "abandon_stream_tracking",
     "get_stream_statistics",
 ]
@@ -8,6 +8,7 @@
 - Chunk Rate: 每秒接收的数据块数量
 - Total Latency: 总延迟（从请求到完成）
 - Error Rate: 流式请求失败率
+- Abandon Rate: 客户端中途断开的比例（client_abandoned，不计入失败率）
 """
 
 import time
@@ -19,6 +20,11 @@ from threading import Lock
 
 logger = logging.getLogger(__name__)
 
+# 请求结果
+OUTCOME_SUCCESS = "success"
+OUTCOME_ERROR = "error"
+OUTCOME_CLIENT_ABANDONED = "client_abandoned"
+
 
 @dataclass
 class StreamMetricsSnapshot:
@@ -34,6 +40,7 @@ class StreamMetricsSnapshot:
     error_message: Optional[str] = None
     user_id: Optional[str] = None
     tool_name: Optional[str] = None
+    outcome: Optional[str] = None
     
     @property
     def ttfb_ms(self) -> Optional[float]:
@@ -69,6 +76,7 @@ class StreamMetricsSnapshot:
             "chunk_rate": self.chunk_rate,
             "total_bytes": self.total_bytes,
             "success": self.success,
+            "outcome": self.outcome,
             "error_message": self.error_message,
             "user_id": self.user_id,
             "tool_name": self.tool_name,
@@ -126,6 +134,7 @@ class StreamMetricsCollector:
             if snapshot:
                 snapshot.end_time = current_time
                 snapshot.success = False
+                snapshot.outcome = OUTCOME_ERROR
                 snapshot.error_message = "请求超时被清理"
                 self._history.append(snapshot)
                 cleaned_count += 1
@@ -192,7 +201,8 @@ class StreamMetricsCollector:
         self, 
         request_id: str, 
         success: bool = True,
-        error_message: Optional[str] = None
+        error_message: Optional[str] = None,
+        outcome: Optional[str] = None
     ) -> Optional[StreamMetricsSnapshot]:
         """
         完成请求追踪
@@ -201,6 +211,7 @@ class StreamMetricsCollector:
             request_id: 请求唯一标识
             success: 是否成功
             error_message: 错误消息（如果失败）
+            outcome: 请求结果（success / error / client_abandoned），默认按 success 推断
         
         Returns:
             完成的指标快照，如果请求不存在则返回 None
@@ -213,21 +224,27 @@ class StreamMetricsCollector:
             snapshot.end_time = time.time()
             snapshot.success = success
             snapshot.error_message = error_message
+            snapshot.outcome = outcome or (OUTCOME_SUCCESS if success else OUTCOME_ERROR)
             
             self._history.append(snapshot)
         
         log_level = logging.INFO if success else logging.WARNING
+        ttfb = f"{snapshot.ttfb_ms:.2f}ms" if snapshot.ttfb_ms is not None else "-"
         logger.log(
             log_level,
             f"[StreamMetrics] 请求完成: {request_id}, "
-            f"TTFB={snapshot.ttfb_ms:.2f}ms, "
+            f"TTFB={ttfb}, "
             f"总耗时={snapshot.total_latency_ms:.2f}ms, "
             f"chunks={snapshot.chunk_count}, "
-            f"成功={success}"
+            f"结果={snapshot.outcome}"
         )
         
         return snapshot
     
+    def abandon_request(self, request_id: str) -> Optional[StreamMetricsSnapshot]:
+        """客户端中途断开：记录为 client_abandoned"""
+        return self.complete_request(request_id, success=False, outcome=OUTCOME_CLIENT_ABANDONED)
+    
     def get_statistics(self, window_seconds: float = 300.0) -> Dict[str, Any]:
         """
         获取指定时间窗口内的聚合统计
@@ -250,13 +267,16 @@ class StreamMetricsCollector:
             return {
                 "window_seconds": window_seconds,
                 "total_requests": 0,
+                "abandoned_requests": 0,
                 "success_rate": None,
                 "avg_ttfb_ms": None,
                 "avg_latency_ms": None,
                 "avg_chunk_rate": None,
             }
         
-        successful = [s for s in recent if s.success]
+        abandoned = [s for s in recent if s.outcome == OUTCOME_CLIENT_ABANDONED]
+        finished = [s for s in recent if s.outcome != OUTCOME_CLIENT_ABANDONED]
+        successful = [s for s in finished if s.success]
         ttfb_values = [s.ttfb_ms for s in successful if s.ttfb_ms is not None]
         latency_values = [s.total_latency_ms for s in successful if s.total_latency_ms is not None]
         chunk_rates = [s.chunk_rate for s in successful if s.chunk_rate is not None]
@@ -265,8 +285,10 @@ class StreamMetricsCollector:
             "window_seconds": window_seconds,
             "total_requests": len(recent),
             "successful_requests": len(successful),
-            "failed_requests": len(recent) - len(successful),
-            "success_rate": len(successful) / len(recent) if recent else None,
+            "failed_requests": len(finished) - len(successful),
+            "abandoned_requests": len(abandoned),
+            "abandon_rate": len(abandoned) / len(recent),
+            "success_rate": len(successful) / len(finished) if finished else None,
             "avg_ttfb_ms": sum(ttfb_values) / len(ttfb_values) if ttfb_values else None,
             "min_ttfb_ms": min(ttfb_values) if ttfb_values else None,
             "max_ttfb_ms": max(ttfb_values) if ttfb_values else None,
@@ -317,6 +339,11 @@ def complete_stream_tracking(
     return stream_metrics.complete_request(request_id, success, error_message)
 
 
+def abandon_stream_tracking(request_id: str) -> Optional[StreamMetricsSnapshot]:
+    """客户端断开，记录 client_abandoned"""
+    return stream_metrics.abandon_request(request_id)
+
+
 def get_stream_statistics(window_seconds: float = 300.0) -> Dict[str, Any]:
     """获取流式请求统计"""
     return stream_metrics.get_statistics(window_seconds)
@@ -12,11 +12,19 @@ RAG (Retrieval-Augmented Generation) 知识库模块
 - models.py: 数据模型定义
 - document_loader.py: 文档加载器
 - embeddings.py: 向量嵌入服务
+- batching.py: 嵌入请求微批处理（合并并发请求、相同文本去重）
 - vector_store.py: 向量存储
-- retriever.py: 语义检索器
+- index.py: 向量索引（float32 矩阵精确检索）
+- ivf.py: 近似向量索引（IVF / IVF-PQ）
+- bm25.py: BM25 关键词索引（中文二元组 + 领域词）
+- terms.py: 玄学领域词表与停用词
+- ingestion.py: 批量入库流水线（加载 → 分块 → 去重 → 批量嵌入 → 整批写入）与后台入库任务
+- segments.py: 向量集合的分段持久化（mmap 段文件、删除日志、压缩、旧格式迁移）
+- retriever.py: 语义检索器（多知识库并发检索、k 路归并、阈值算法提前结束）
 - generator.py: RAG 生成器
 - conversation.py: 对话管理
 - service.py: 统一服务层
+- __main__.py: 离线任务（python -m src.rag fit-idf 拟合本地嵌入 IDF 表）
 """
 
 from .models import (
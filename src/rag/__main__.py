@@ -0,0 +1,62 @@
+"""
+RAG 离线任务
+
+    python -m src.rag fit-idf                              # 用全部知识库的分块拟合本地嵌入 IDF 表
+    python -m src.rag fit-idf --kb <id> --directory docs/  # 指定知识库，并加入目录中的文档分块
+
+IDF 表写入 <data>/local_embedding_idf.npz，RAGService 启动时加载。
+IDF 会改变本地模型的 model_id：已用本地模型入库的集合随后会被标记为模型不匹配，需清空后重新入库。
+"""
+import argparse
+import logging
+from pathlib import Path
+
+from .document_loader import KnowledgeDocumentLoader
+from .embeddings import LOCAL_IDF_FILENAME, LocalEmbedding
+from .vector_store import VectorStoreManager
+
+DEFAULT_DATA_PATH = Path("data/rag")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.rag")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    idf_parser = sub.add_parser("fit-idf", help="拟合并保存本地嵌入模型的 IDF 表")
+    idf_parser.add_argument("--data-path", default=str(DEFAULT_DATA_PATH), help="RAG 数据目录")
+    idf_parser.add_argument("--kb", action="append", help="知识库 id（可重复），默认全部知识库")
+    idf_parser.add_argument("--directory", action="append", help="额外语料目录（可重复），按入库规则分块")
+    idf_parser.add_argument("--output", help="IDF 表路径，默认 <data-path>/local_embedding_idf.npz")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    data_path = Path(args.data_path)
+    manager = VectorStoreManager(base_path=str(data_path / "knowledge_bases"))
+    texts = []
+    local_stores = []
+    for kb_id in args.kb or sorted(manager.list_stores()):
+        store = manager.get_store(kb_id)
+        texts.extend(store.list_contents())
+        if (store.embedding_model or "").startswith("local-"):
+            local_stores.append(kb_id)
+
+    loader = KnowledgeDocumentLoader()
+    for directory in args.directory or []:
+        for document in loader.load_from_directory(directory):
+            texts.extend(loader.chunk_document(document))
+
+    if not texts:
+        parser.error("没有可用的语料：知识库为空且未指定 --directory")
+
+    model = LocalEmbedding()
+    model.fit_idf(texts)
+    output = Path(args.output) if args.output else data_path / LOCAL_IDF_FILENAME
+    output.parent.mkdir(parents=True, exist_ok=True)
+    model.save_idf(str(output))
+    print(f"{output}: {len(texts)} 个分块, model_id={model.model_id}")
+    if local_stores:
+        print(f"以下知识库由本地模型入库，需清空后重新入库: {', '.join(local_stores)}")
+
+
+main()
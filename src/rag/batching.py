@@ -0,0 +1,148 @@
+"""
+嵌入请求微批处理
+
+并发的查询与分块嵌入原本各自发起一次 HTTP 请求。批处理器把短时间窗口内到达的文本合并为一次批量请求：
+- 首个文本到达后最多等待 max_wait_ms，凑满 max_batch_size 条则立即发送
+- 相同文本在等待发送或请求进行期间只发送一次，结果分发给所有调用方
+- 同时进行的批量请求数受 max_concurrency 限制，超出的批次排队
+- 某个调用方被取消不影响同一批中的其他调用方
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set
+
+logger = logging.getLogger(__name__)
+
+EmbedFunc = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    """取走失败结果，避免调用方已取消时出现 "exception was never retrieved" 日志"""
+    if not future.cancelled():
+        future.exception()
+
+
+class EmbeddingBatcher:
+    """
+    嵌入请求微批处理器
+
+    Args:
+        embed_func: 批量嵌入函数，输入文本列表，按相同顺序返回向量列表
+        max_batch_size: 单次请求的最大文本数
+        max_wait_ms: 首个文本到达后的最长等待时间，0 表示只合并同一轮事件循环中到达的请求
+        max_concurrency: 同时进行的批量请求数
+    """
+
+    def __init__(
+        self,
+        embed_func: EmbedFunc,
+        max_batch_size: int = 256,
+        max_wait_ms: float = 5.0,
+        max_concurrency: int = 4,
+    ):
+        self.embed_func = embed_func
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_concurrency = max(1, int(max_concurrency))
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[str, asyncio.Future] = {}    # 等待发送
+        self._inflight: Dict[str, asyncio.Future] = {}   # 已发送、尚未返回
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._stats = {"texts": 0, "deduplicated": 0, "batches": 0, "batched_texts": 0, "errors": 0}
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        # 换了事件循环（如多次 asyncio.run）时，旧循环上的 Future 与定时器都已失效
+        self._loop = loop
+        self._pending = {}
+        self._inflight = {}
+        self._timer = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._tasks = set()
+
+    def _future_for(self, text: str) -> asyncio.Future:
+        self._stats["texts"] += 1
+        future = self._pending.get(text) or self._inflight.get(text)
+        if future is not None:
+            self._stats["deduplicated"] += 1
+            return future
+
+        future = self._loop.create_future()
+        self._pending[text] = future
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = self._loop.call_later(self.max_wait, self._flush)
+        return future
+
+    async def embed(self, text: str) -> List[float]:
+        """嵌入单个文本（与其他并发请求合并发送）"""
+        self._bind_loop()
+        return await asyncio.shield(self._future_for(text))
+
+    async def embed_many(self, texts: Sequence[str]) -> List[List[float]]:
+        """嵌入多个文本，超过 max_batch_size 时拆成多个请求并发发送"""
+        if not texts:
+            return []
+        self._bind_loop()
+        futures = [self._future_for(text) for text in texts]
+        self._flush()
+        return list(await asyncio.shield(asyncio.gather(*futures)))
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self._inflight.update(batch)
+        task = self._loop.create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: Dict[str, asyncio.Future]) -> None:
+        texts = list(batch)
+        try:
+            async with self._semaphore:
+                embeddings = await self.embed_func(texts)
+            if len(embeddings) != len(texts):
+                raise ValueError(f"嵌入结果数量不符: 请求 {len(texts)} 条，返回 {len(embeddings)} 条")
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.error(f"批量嵌入请求失败（{len(texts)} 条）: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.add_done_callback(_consume_exception)
+                    future.set_exception(e)
+        else:
+            self._stats["batches"] += 1
+            self._stats["batched_texts"] += len(texts)
+            for future, embedding in zip(batch.values(), embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+        finally:
+            for text, future in batch.items():
+                if self._inflight.get(text) is future:
+                    del self._inflight[text]
+
+    def stats(self) -> Dict[str, Any]:
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "avg_batch_size": round(self._stats["batched_texts"] / batches, 2) if batches else 0.0,
+            "pending": len(self._pending),
+            "inflight": len(self._inflight),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
@@ -0,0 +1,410 @@
+"""
+BM25 关键词索引
+
+- 分词：中文连续片段切为字二元组（单字片段保留单字），另外补充领域词表中的单字词与三字以上的长词，
+  英文/数字按词切分，二字停用词丢弃。词用 64 位整数键表示：二元组/单字直接由码位拼成，
+  在 UTF-32 码位数组上向量化生成；长词与英文词取哈希。词表为 词键 -> 词编号
+- 倒排表：已合并部分为 CSR 数组（词编号 -> 行号/词频）；每次写入的一批文本用 np.unique 统计词频，
+  生成一个小的 CSR 增量批次，增量行数超过一定比例或批次过多时整体合并；删除只清除存活标记
+- 打分：BM25（k1/b），文档频率只统计存活行；分类过滤使用按行的分类编号
+- 持久化：集合目录的 bm25.npz，保存倒排表、文档长度、条目 ID 与内容校验和，
+  加载时与当前条目比对，已删除/内容变化的行作废，缺少的行重新分词写入
+"""
+
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..utils.term_matcher import TermMatcher
+from .terms import IMPORTANT_TERMS, STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "bm25.npz"
+# 增量行数超过已合并行数的该比例（且超过 MERGE_MIN_ROWS）或增量批次超过 MERGE_MAX_BATCHES 时合并（按倍数增长，合并开销均摊）
+MERGE_RATIO = 1.0
+MERGE_MIN_ROWS = 2048
+MERGE_MAX_BATCHES = 32
+
+_CJK_FIRST, _CJK_LAST = 0x4E00, 0x9FFF
+_WORD = re.compile(r"[a-z0-9]+")
+# 哈希词键的标记位（码位键小于 2^42）
+_HASHED_KEY = 1 << 60
+
+
+@lru_cache(maxsize=65536)
+def _hashed_key(token: str) -> int:
+    """长词/英文词的词键（56 位哈希）"""
+    return _HASHED_KEY | int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=7).digest(), "little")
+
+
+def _char_key(text: str) -> int:
+    """单字或二字词的词键"""
+    key = 0
+    for char in text:
+        key = (key << 21) | ord(char)
+    return key
+
+
+class Tokenizer:
+    """中文字二元组 + 领域词分词器（输出整数词键）"""
+
+    def __init__(self, terms: Iterable[str] = IMPORTANT_TERMS, stopwords: Iterable[str] = STOPWORDS):
+        terms = set(terms)
+        # 二字词与二元组重合，只需额外补充单字词与长词（长词允许重叠）
+        self._single_codes = np.array(sorted(ord(term) for term in terms if len(term) == 1), dtype=np.int64)
+        self._long = TermMatcher(sorted(term for term in terms if len(term) > 2))
+        self._stop_keys = np.array(sorted(_char_key(word) for word in stopwords if len(word) == 2), dtype=np.int64)
+
+    def encode_batch(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量分词
+
+        Returns:
+            (词键, 所属文本序号)
+        """
+        if not texts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        lowered = [text.lower() for text in texts]
+        # 换行分隔各文本，二元组不会跨文本
+        codes = np.frombuffer("\n".join(lowered).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+        owners = np.repeat(np.arange(len(texts)), [len(text) + 1 for text in lowered])[:len(codes)]
+        cjk = (codes >= _CJK_FIRST) & (codes <= _CJK_LAST)
+        left = np.concatenate(([False], cjk[:-1]))
+        right = np.concatenate((cjk[1:], [False]))
+
+        pairs = np.flatnonzero(cjk & right)
+        bigrams = (codes[pairs] << 21) | codes[pairs + 1]
+        keep = ~np.isin(bigrams, self._stop_keys)
+        singles = np.flatnonzero(cjk & ((~left & ~right) | np.isin(codes, self._single_codes)))
+        keys = [bigrams[keep], codes[singles]]
+        docs = [owners[pairs][keep], owners[singles]]
+
+        extra_keys: List[int] = []
+        extra_docs: List[int] = []
+        for i, text in enumerate(lowered):
+            words = _WORD.findall(text)
+            if self._long:
+                words.extend(match.term for match in self._long.iter_matches(text))
+            extra_keys.extend(map(_hashed_key, words))
+            extra_docs.extend([i] * len(words))
+        if extra_keys:
+            keys.append(np.array(extra_keys, dtype=np.int64))
+            docs.append(np.array(extra_docs, dtype=np.int64))
+        return np.concatenate(keys), np.concatenate(docs)
+
+    def encode(self, text: str) -> np.ndarray:
+        return self.encode_batch([text])[0]
+
+
+def _checksum(text: str) -> int:
+    return zlib.crc32(text.encode("utf-8"))
+
+
+class BM25Index:
+    """BM25 倒排索引"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, tokenizer: Optional[Tokenizer] = None):
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = tokenizer or Tokenizer()
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        # 行信息
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._category_codes = np.zeros(0, dtype=np.int32)
+        self._checksums = np.zeros(0, dtype=np.uint32)
+        self._categories: Dict[str, int] = {}
+        self._size = 0
+        self._total_length = 0.0
+        # 已合并的倒排表（CSR）
+        self._vocab: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._posting_rows = np.zeros(0, dtype=np.int32)
+        self._posting_tfs = np.zeros(0, dtype=np.float32)
+        self._merged_rows = 0
+        # 增量批次：(按升序排列的词编号, 各词起止位置, 行号, 词频)
+        self._batches: List[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = []
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # ---------- 写入 ----------
+
+    def _reserve(self, needed: int) -> None:
+        capacity = len(self._alive)
+        if needed <= capacity:
+            return
+        capacity = max(1024, capacity)
+        while capacity < needed:
+            capacity *= 2
+        for name in ("_lengths", "_alive", "_category_codes", "_checksums"):
+            old = getattr(self, name)
+            grown = np.zeros(capacity, dtype=old.dtype)
+            grown[:self._size] = old[:self._size]
+            setattr(self, name, grown)
+
+    def _remove_locked(self, ids: Iterable[str]) -> int:
+        removed = 0
+        for entry_id in ids:
+            row = self._rows.pop(entry_id, None)
+            if row is None:
+                continue
+            self._alive[row] = False
+            self._ids[row] = None
+            self._total_length -= float(self._lengths[row])
+            removed += 1
+        return removed
+
+    def add(self, ids: Sequence[str], texts: Sequence[str], categories: Sequence[str]) -> None:
+        """写入文本（已存在的 ID 会被替换；分词在锁外进行）"""
+        keys, owners = self.tokenizer.encode_batch(texts)
+        checksums = np.array([_checksum(text) for text in texts], dtype=np.uint32)
+        lengths = np.bincount(owners, minlength=len(texts))
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        with self._lock:
+            self._remove_locked(entry_id for entry_id in ids if entry_id in self._rows)
+            start = self._size
+            end = start + len(ids)
+            self._reserve(end)
+            # 同一批内重复的 ID 以最后一条为准
+            rows = {entry_id: start + offset for offset, entry_id in enumerate(ids)}
+            batch_ids = [entry_id if rows[entry_id] == start + offset else None for offset, entry_id in enumerate(ids)]
+            alive = np.array([entry_id is not None for entry_id in batch_ids], dtype=bool)
+            self._rows.update(rows)
+            self._ids.extend(batch_ids)
+            self._lengths[start:end] = lengths
+            self._alive[start:end] = alive
+            self._checksums[start:end] = checksums
+            self._category_codes[start:end] = [
+                self._categories.setdefault(category, len(self._categories)) for category in categories
+            ]
+            self._total_length += float(lengths[alive].sum())
+            self._size = end
+
+            if len(keys):
+                vocab = self._vocab
+                unique_tids = np.fromiter(
+                    (vocab.setdefault(key, len(vocab)) for key in unique_keys.tolist()),
+                    dtype=np.int64, count=len(unique_keys),
+                )
+                tids = unique_tids[inverse.ravel()]
+                keys, tfs = np.unique(tids * end + start + owners, return_counts=True)
+                batch_tids, batch_starts = np.unique(keys // end, return_index=True)
+                self._batches.append((
+                    batch_tids,
+                    np.append(batch_starts, len(keys)),
+                    (keys % end).astype(np.int32),
+                    tfs.astype(np.float32),
+                ))
+            pending = self._size - self._merged_rows
+            if pending > max(MERGE_MIN_ROWS, self._merged_rows * MERGE_RATIO) or len(self._batches) > MERGE_MAX_BATCHES:
+                self._merge_locked()
+
+    def remove(self, ids: Iterable[str]) -> int:
+        with self._lock:
+            return self._remove_locked(ids)
+
+    def _merge_locked(self) -> None:
+        """把增量批次并入 CSR 倒排表（生成新数组，查询中的旧快照不受影响）"""
+        self._merged_rows = self._size
+        if not self._batches:
+            return
+        vocab_size = len(self._vocab)
+        parts_tokens = [np.repeat(np.arange(len(self._offsets) - 1, dtype=np.int64), np.diff(self._offsets))]
+        parts_rows = [self._posting_rows]
+        parts_tfs = [self._posting_tfs]
+        for batch_tids, batch_offsets, rows, tfs in self._batches:
+            parts_tokens.append(np.repeat(batch_tids, np.diff(batch_offsets)))
+            parts_rows.append(rows)
+            parts_tfs.append(tfs)
+        tokens = np.concatenate(parts_tokens)
+        rows = np.concatenate(parts_rows)
+        tfs = np.concatenate(parts_tfs)
+        # 顺带去掉已删除行的倒排项
+        keep = self._alive[rows]
+        tokens, rows, tfs = tokens[keep], rows[keep], tfs[keep]
+        # 批次按行号先后写入，按词稳定排序后每个词内部行号仍为升序
+        order = np.argsort(tokens, kind="stable")
+        self._offsets = np.concatenate(([0], np.cumsum(np.bincount(tokens, minlength=vocab_size))))
+        self._posting_rows = rows[order]
+        self._posting_tfs = tfs[order]
+        self._batches = []
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+
+    # ---------- 查询 ----------
+
+    def _postings_locked(self, key: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        tid = self._vocab.get(key)
+        if tid is None:
+            return None
+        parts_rows, parts_tfs = [], []
+        if tid < len(self._offsets) - 1:
+            lo, hi = self._offsets[tid], self._offsets[tid + 1]
+            parts_rows.append(self._posting_rows[lo:hi])
+            parts_tfs.append(self._posting_tfs[lo:hi])
+        for batch_tids, batch_offsets, rows, tfs in self._batches:
+            i = np.searchsorted(batch_tids, tid)
+            if i < len(batch_tids) and batch_tids[i] == tid:
+                lo, hi = batch_offsets[i], batch_offsets[i + 1]
+                parts_rows.append(rows[lo:hi])
+                parts_tfs.append(tfs[lo:hi])
+        if not parts_rows:
+            return None
+        if len(parts_rows) == 1:
+            return parts_rows[0], parts_tfs[0]
+        return np.concatenate(parts_rows), np.concatenate(parts_tfs)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        categories: Optional[Sequence[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        BM25 top-k 检索
+
+        Returns:
+            [(条目 ID, BM25 分数)]，按分数降序，只包含至少命中一个词的条目
+        """
+        query_keys, query_tfs = np.unique(self.tokenizer.encode(query), return_counts=True)
+        if top_k <= 0 or len(query_keys) == 0:
+            return []
+        with self._lock:
+            size = self._size
+            live = len(self._rows)
+            if live == 0:
+                return []
+            alive = self._alive[:size].copy()
+            selected = alive
+            if categories:
+                codes = [self._categories[c] for c in categories if c in self._categories]
+                selected = alive & np.isin(self._category_codes[:size], codes)
+            lengths = self._lengths[:size]
+            average_length = max(self._total_length / live, 1.0)
+            postings = [
+                (self._postings_locked(key), count) for key, count in zip(query_keys.tolist(), query_tfs.tolist())
+            ]
+            ids = self._ids
+
+        scores = np.zeros(size, dtype=np.float32)
+        for posting, query_tf in postings:
+            if posting is None:
+                continue
+            rows, tfs = posting
+            df = int(np.count_nonzero(alive[rows]))
+            if df == 0:
+                continue
+            idf = math.log(1.0 + (live - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * lengths[rows] / average_length)
+            scores[rows] += (query_tf * idf) * tfs * (self.k1 + 1.0) / (tfs + norm)
+        scores[~selected] = 0.0
+        hits = np.flatnonzero(scores)
+        if len(hits) == 0:
+            return []
+        k = min(top_k, len(hits))
+        top = hits[np.argpartition(-scores[hits], k - 1)[:k]] if k < len(hits) else hits
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(ids[row], float(scores[row])) for row in top if ids[row] is not None]
+
+    # ---------- 持久化 ----------
+
+    def save(self, path: Path) -> None:
+        """合并增量表后保存到 bm25.npz"""
+        with self._lock:
+            self._merge_locked()
+            size = self._size
+            ids = "\n".join(entry_id or "" for entry_id in self._ids[:size])
+            vocab = np.fromiter(self._vocab, dtype=np.int64, count=len(self._vocab))
+            categories = "\n".join(sorted(self._categories, key=self._categories.get))
+            arrays = {
+                "vocab": vocab,
+                "offsets": self._offsets,
+                "posting_rows": self._posting_rows,
+                "posting_tfs": self._posting_tfs.astype(np.uint16),
+                "lengths": self._lengths[:size],
+                "alive": self._alive[:size],
+                "category_codes": self._category_codes[:size],
+                "checksums": self._checksums[:size],
+            }
+        blobs = {
+            name: np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+            for name, text in (("ids", ids), ("categories", categories))
+        }
+        tmp = Path(path) / f"{INDEX_FILE}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays, **blobs)
+        os.replace(tmp, Path(path) / INDEX_FILE)
+
+    def load(self, path: Path, entries: Dict[str, Tuple[str, str]]) -> None:
+        """
+        加载 bm25.npz 并与当前条目同步
+
+        Args:
+            entries: 当前条目 {id: (内容, 分类)}
+        """
+        index_file = Path(path) / INDEX_FILE
+        if index_file.exists():
+            try:
+                self._load_file(index_file)
+            except Exception as e:
+                logger.warning(f"读取关键词索引失败，将重建: {e}")
+                self.clear()
+
+        stale = [
+            entry_id for entry_id, row in self._rows.items()
+            if entry_id not in entries or self._checksums[row] != _checksum(entries[entry_id][0])
+        ]
+        self.remove(stale)
+        missing = [entry_id for entry_id in entries if entry_id not in self._rows]
+        for lo in range(0, len(missing), 4096):
+            batch = missing[lo:lo + 4096]
+            self.add(batch, [entries[i][0] for i in batch], [entries[i][1] for i in batch])
+        if stale or missing:
+            logger.info(f"关键词索引同步: 作废 {len(stale)} 行, 新增 {len(missing)} 行")
+
+    def _load_file(self, index_file: Path) -> None:
+        with np.load(index_file) as data:
+            def text(name: str) -> List[str]:
+                raw = bytes(data[name]).decode("utf-8")
+                return raw.split("\n") if raw else []
+
+            ids = text("ids")
+            vocab = data["vocab"].tolist()
+            categories = text("categories")
+            with self._lock:
+                self._offsets = data["offsets"]
+                self._posting_rows = data["posting_rows"]
+                self._posting_tfs = data["posting_tfs"].astype(np.float32)
+                self._lengths = data["lengths"].astype(np.float32)
+                self._alive = data["alive"].copy()
+                self._category_codes = data["category_codes"]
+                self._checksums = data["checksums"]
+        size = len(self._lengths)
+        with self._lock:
+            self._ids = [entry_id or None for entry_id in ids[:size]]
+            self._rows = {entry_id: row for row, entry_id in enumerate(self._ids) if entry_id and self._alive[row]}
+            self._alive[[row for row, entry_id in enumerate(self._ids) if entry_id is None]] = False
+            self._vocab = {key: tid for tid, key in enumerate(vocab)}
+            self._categories = {name: code for code, name in enumerate(categories)}
+            self._size = size
+            self._merged_rows = size
+            self._total_length = float(self._lengths[self._alive[:size]].sum())
+            self._batches = []
@@ -21,8 +21,13 @@ class BaseDocumentLoader(ABC):
     """文档加载器基类"""
     
     @abstractmethod
-    def load(self, source: str) -> List[Document]:
-        """加载文档"""
+    def load(self, source: str, raise_errors: bool = False) -> List[Document]:
+        """
+        加载文档
+
+        Args:
+            raise_errors: 读取或解析失败时抛出异常；默认记录日志并返回空列表
+        """
         pass
     
     @abstractmethod
@@ -37,7 +42,7 @@ class JSONDocumentLoader(BaseDocumentLoader):
     def supports(self, source: str) -> bool:
         return source.endswith('.json')
     
-    def load(self, source: str) -> List[Document]:
+    def load(self, source: str, raise_errors: bool = False) -> List[Document]:
         documents = []
         try:
             with open(source, 'r', encoding='utf-8') as f:
@@ -57,6 +62,8 @@ class JSONDocumentLoader(BaseDocumentLoader):
                     if doc:
                         documents.append(doc)
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"加载 JSON 文件失败: {source}, 错误: {e}")
         
         return documents
@@ -124,7 +131,7 @@ class MarkdownDocumentLoader(BaseDocumentLoader):
     def supports(self, source: str) -> bool:
         return source.endswith('.md') or source.endswith('.markdown')
     
-    def load(self, source: str) -> List[Document]:
+    def load(self, source: str, raise_errors: bool = False) -> List[Document]:
         documents = []
         try:
             with open(source, 'r', encoding='utf-8') as f:
@@ -147,6 +154,8 @@ class MarkdownDocumentLoader(BaseDocumentLoader):
                 )
                 documents.append(doc)
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"加载 Markdown 文件失败: {source}, 错误: {e}")
         
         return documents
@@ -196,7 +205,7 @@ class TextDocumentLoader(BaseDocumentLoader):
     def supports(self, source: str) -> bool:
         return source.endswith('.txt')
     
-    def load(self, source: str) -> List[Document]:
+    def load(self, source: str, raise_errors: bool = False) -> List[Document]:
         documents = []
         try:
             with open(source, 'r', encoding='utf-8') as f:
@@ -211,6 +220,8 @@ class TextDocumentLoader(BaseDocumentLoader):
             )
             documents.append(doc)
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"加载文本文件失败: {source}, 错误: {e}")
         
         return documents
@@ -245,11 +256,11 @@ class DirectoryLoader:
         logger.info(f"从目录 {directory} 加载了 {len(documents)} 个文档")
         return documents
     
-    def _load_file(self, file_path: str) -> List[Document]:
+    def _load_file(self, file_path: str, raise_errors: bool = False) -> List[Document]:
         """加载单个文件"""
         for loader in self.loaders:
             if loader.supports(file_path):
-                return loader.load(file_path)
+                return loader.load(file_path, raise_errors=raise_errors)
         return []
 
 
@@ -345,9 +356,9 @@ class KnowledgeDocumentLoader:
         """从目录加载文档"""
         return self.directory_loader.load(directory, recursive)
     
-    def load_from_file(self, file_path: str) -> List[Document]:
-        """从单个文件加载"""
-        return self.directory_loader._load_file(file_path)
+    def load_from_file(self, file_path: str, raise_errors: bool = False) -> List[Document]:
+        """从单个文件加载（raise_errors=True 时读取失败抛出异常，而不是返回空列表）"""
+        return self.directory_loader._load_file(file_path, raise_errors)
     
     def load_from_dict(
         self,
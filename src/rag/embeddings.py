@@ -5,14 +5,21 @@
 """
 
 import os
+import asyncio
 import logging
 import hashlib
 import json
+import sqlite3
+import threading
+import time
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
-import httpx
+import cachetools
+import numpy as np
+
+from .batching import EmbeddingBatcher
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +29,17 @@ class BaseEmbedding(ABC):
     
     name: str = "base"
     dimension: int = 0
+    # 是否值得缓存（计算比读写缓存更便宜的模型应关闭）
+    cacheable: bool = True
+    # 是否把并发的单条请求合并为批量请求（远程接口按请求计费与限流时开启）
+    batchable: bool = False
+    # 单次批量请求的最大文本数
+    max_batch_size: int = 2048
+    
+    @property
+    def model_id(self) -> str:
+        """模型标识（随集合保存，用于识别不同模型产生的向量）"""
+        return self.name
     
     @abstractmethod
     async def embed_text(self, text: str) -> List[float]:
@@ -38,6 +56,7 @@ class OpenAIEmbedding(BaseEmbedding):
     """OpenAI 嵌入模型"""
     
     name = "openai"
+    batchable = True
     
     MODEL_DIMENSIONS = {
         "text-embedding-3-small": 1536,
@@ -58,13 +77,17 @@ class OpenAIEmbedding(BaseEmbedding):
         self.dimension = self.MODEL_DIMENSIONS.get(model, 1536)
         self.timeout = timeout
     
+    @property
+    def model_id(self) -> str:
+        return f"openai:{self.model}"
+    
     async def embed_text(self, text: str) -> List[float]:
         """嵌入单个文本"""
         results = await self.embed_texts([text])
         return results[0] if results else []
     
     async def embed_texts(self, texts: List[str]) -> List[List[float]]:
-        """批量嵌入文本"""
+        """批量嵌入文本（超过接口单次上限时分多次请求）"""
         if not texts:
             return []
         
@@ -72,25 +95,35 @@ class OpenAIEmbedding(BaseEmbedding):
             logger.warning("OpenAI API Key 未配置，使用模拟嵌入")
             return [self._mock_embedding(text) for text in texts]
         
+        results: List[List[float]] = []
+        for i in range(0, len(texts), self.max_batch_size):
+            results.extend(await self._request(texts[i:i + self.max_batch_size]))
+        return results
+    
+    async def _request(self, texts: List[str]) -> List[List[float]]:
+        # 复用按 base_url 共享的连接池，避免每次请求重新建立 TCP/TLS 连接
+        from ..ai.http_client import http_client_manager
+        
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/embeddings",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": self.model,
-                        "input": texts,
-                    },
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                # 按索引排序返回
-                embeddings = sorted(data["data"], key=lambda x: x["index"])
-                return [e["embedding"] for e in embeddings]
+            client = http_client_manager.get_client(self.base_url, timeout=self.timeout)
+            response = await client.post(
+                f"{self.base_url}/embeddings",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+                json={
+                    "model": self.model,
+                    "input": texts,
+                },
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            data = response.json()
+            
+            # 按索引排序返回
+            embeddings = sorted(data["data"], key=lambda x: x["index"])
+            return [e["embedding"] for e in embeddings]
         except Exception as e:
             logger.error(f"OpenAI 嵌入请求失败: {e}")
             return [self._mock_embedding(text) for text in texts]
@@ -110,107 +143,521 @@ class OpenAIEmbedding(BaseEmbedding):
         return vector[:self.dimension]
 
 
+# 特征哈希保留的位数；与文本序号拼成一个 uint64 后一次排序即可统计词频
+_FEATURE_BITS = 44
+_FEATURE_MASK = np.uint64((1 << _FEATURE_BITS) - 1)
+# 整批编码时按字符数切片，使排序数组留在缓存内（切片文本数远小于序号可用的 20 位）
+_ENCODE_SLICE_CHARS = 1 << 15
+_ENCODE_SLICE_TEXTS = 4096
+# 本地模型 IDF 表在 RAG 数据目录下的文件名（由 python -m src.rag fit-idf 生成）
+LOCAL_IDF_FILENAME = "local_embedding_idf.npz"
+
+
+def _mix64(keys: np.ndarray) -> np.ndarray:
+    """splitmix64 终混函数：把整数键打散成均匀的 64 位哈希（与进程、平台无关）"""
+    h = keys.astype(np.uint64)
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
 class LocalEmbedding(BaseEmbedding):
-    """本地嵌入模型 (基于简单的 TF-IDF 或字符特征)"""
+    """
+    本地嵌入模型（字符 n-gram 特征哈希 + TF-IDF）
+
+    - n-gram 由码位拼成整数键，经 splitmix64 哈希为 44 位特征，再映射到桶并带符号，结果与进程、重启无关
+    - 词频取 1 + log(tf)；加载了 IDF 表（python -m src.rag fit-idf 生成）时再乘以 IDF
+    - 整批文本一次向量化编码
+    - model_id 带版本、维度、n-gram 与 IDF 摘要，特征或权重变化后与已存向量不再匹配
+    """
     
     name = "local"
     dimension = 384  # 模拟维度
+    # 批量编码每秒上万条，比写入 SQLite 缓存还快
+    cacheable = False
+    VERSION = 2
+    # 超过该条数的批量在线程中编码，入库时不阻塞事件循环
+    THREAD_MIN_TEXTS = 32
     
-    def __init__(self, dimension: int = 384):
+    def __init__(self, dimension: int = 384, ngram_sizes: tuple = (1, 2, 3), idf_path: str = None):
         self.dimension = dimension
-        self._vocab: Dict[str, int] = {}
-        self._idf: Dict[str, float] = {}
+        self.ngram_sizes = tuple(sorted(ngram_sizes))
+        # IDF 表：排序后的特征哈希与对应权重；未登录的特征使用 _idf_default
+        self._idf_keys = np.zeros(0, dtype=np.uint64)
+        self._idf_values = np.zeros(0, dtype=np.float32)
+        self._idf_default = 1.0
+        self._idf_digest = ""
+        if idf_path and Path(idf_path).exists():
+            self.load_idf(idf_path)
+    
+    @property
+    def model_id(self) -> str:
+        ngrams = "".join(map(str, self.ngram_sizes))
+        model_id = f"local-v{self.VERSION}-{self.dimension}-n{ngrams}"
+        return f"{model_id}-idf{self._idf_digest}" if self._idf_digest else model_id
     
     async def embed_text(self, text: str) -> List[float]:
         """基于字符特征的简单嵌入"""
-        return self._compute_embedding(text)
+        return self.encode([text])[0].tolist()
     
     async def embed_texts(self, texts: List[str]) -> List[List[float]]:
         """批量嵌入"""
-        return [self._compute_embedding(text) for text in texts]
+        if len(texts) >= self.THREAD_MIN_TEXTS:
+            return await asyncio.to_thread(lambda: self.encode(texts).tolist())
+        return self.encode(texts).tolist()
     
-    def _compute_embedding(self, text: str) -> List[float]:
-        """计算简单的文本嵌入"""
-        import math
-        
-        # 基于字符 n-gram 的特征
-        ngrams = self._get_ngrams(text, n=3)
-        
-        vector = [0.0] * self.dimension
-        for ngram in ngrams:
-            idx = hash(ngram) % self.dimension
-            vector[idx] += 1.0
-        
-        # 归一化
-        norm = math.sqrt(sum(v * v for v in vector))
-        if norm > 0:
-            vector = [v / norm for v in vector]
+    def _ngram_keys(self, texts: List[str]) -> tuple:
+        """整批文本的 n-gram 键及所属文本序号（n-gram 不跨文本）"""
+        lowered = [text.lower() for text in texts]
+        codes = np.frombuffer("\n".join(lowered).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        lengths = np.array([len(text) + 1 for text in lowered])
+        owners = np.repeat(np.arange(len(texts)), lengths)[:len(codes)]
+        # 分隔符不属于任何文本
+        owners[np.cumsum(lengths)[:-1] - 1] = -1
+        keys, docs = [], []
+        for n in self.ngram_sizes:
+            count = len(codes) - n + 1
+            if count <= 0:
+                continue
+            # 码位不超过 21 位，三元组以内可无损拼进 64 位
+            key = codes[:count]
+            for offset in range(1, n):
+                key = (key << np.uint64(21)) | codes[offset:offset + count]
+            valid = (owners[:count] >= 0) & (owners[:count] == owners[n - 1:n - 1 + count])
+            keys.append(key[valid])
+            docs.append(owners[:count][valid])
+        if not keys:
+            return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(keys), np.concatenate(docs)
+    
+    def _features(self, texts: List[str]) -> tuple:
+        """
+        每个文本去重后的特征及其词频
+
+        Returns:
+            (文本序号, 特征哈希, 词频)，按文本序号排列
+        """
+        keys, docs = self._ngram_keys(texts)
+        # 高位存文本序号、低位存特征哈希，排序后同一文本的相同特征相邻
+        features = _mix64(keys) >> np.uint64(64 - _FEATURE_BITS)
+        packed = np.sort((docs.astype(np.uint64) << np.uint64(_FEATURE_BITS)) | features)
+        if len(packed) == 0:
+            return np.zeros(0, dtype=np.int64), packed, np.zeros(0, dtype=np.int64)
+        starts = np.flatnonzero(np.concatenate(([True], packed[1:] != packed[:-1])))
+        tf = np.diff(np.append(starts, len(packed)))
+        packed = packed[starts]
+        return (packed >> np.uint64(_FEATURE_BITS)).astype(np.int64), packed & _FEATURE_MASK, tf
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """批量编码为 L2 归一化的 float32 矩阵"""
+        parts = []
+        lo = size = 0
+        for i, text in enumerate(texts):
+            if i > lo and (size + len(text) > _ENCODE_SLICE_CHARS or i - lo >= _ENCODE_SLICE_TEXTS):
+                parts.append(self._encode_slice(texts[lo:i]))
+                lo, size = i, 0
+            size += len(text)
+        parts.append(self._encode_slice(texts[lo:]))
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+    
+    def _encode_slice(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        if not texts:
+            return vectors
+        docs, features, tf = self._features(texts)
+        if len(features) == 0:
+            return vectors
         
-        return vector
+        weights = 1.0 + np.log(tf)
+        if len(self._idf_keys):
+            weights *= self._idf_lookup(features)
+        buckets = (features % np.uint64(self.dimension)).astype(np.int64)
+        signs = np.where(features >> np.uint64(_FEATURE_BITS - 1), -1.0, 1.0)
+        flat = np.bincount(
+            docs * self.dimension + buckets,
+            weights=weights * signs,
+            minlength=len(texts) * self.dimension,
+        )
+        vectors = flat.reshape(len(texts), self.dimension).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+    
+    def _idf_lookup(self, features: np.ndarray) -> np.ndarray:
+        pos = np.searchsorted(self._idf_keys, features)
+        pos = np.minimum(pos, len(self._idf_keys) - 1)
+        found = self._idf_keys[pos] == features
+        return np.where(found, self._idf_values[pos], self._idf_default)
+    
+    def fit_idf(self, texts: List[str], batch_size: int = 4096):
+        """
+        在语料上统计特征的文档频率并固定 IDF 表
+
+        IDF 会改变 model_id，已用旧配置入库的集合需要重新入库。
+        """
+        all_features = []
+        for lo in range(0, len(texts), batch_size):
+            _, features, _ = self._features(texts[lo:lo + batch_size])
+            all_features.append(features)
+        if not texts:
+            return
+        # 每个文本内的特征已去重，出现次数即文档频率
+        keys, df = np.unique(np.concatenate(all_features), return_counts=True)
+        total = len(texts)
+        self._idf_keys = keys
+        self._idf_values = (np.log((1 + total) / (1 + df)) + 1).astype(np.float32)
+        self._idf_default = float(np.log(1 + total) + 1)
+        self._update_idf_digest()
     
-    def _get_ngrams(self, text: str, n: int = 3) -> List[str]:
-        """获取 n-gram"""
-        text = text.lower()
-        ngrams = []
-        for i in range(len(text) - n + 1):
-            ngrams.append(text[i:i+n])
-        return ngrams
+    def _update_idf_digest(self):
+        digest = hashlib.blake2b(digest_size=4)
+        digest.update(self._idf_keys.tobytes())
+        digest.update(self._idf_values.tobytes())
+        digest.update(np.float64(self._idf_default).tobytes())
+        self._idf_digest = digest.hexdigest()
+    
+    def save_idf(self, path: str):
+        np.savez(path, keys=self._idf_keys, values=self._idf_values, default=np.float64(self._idf_default))
+    
+    def load_idf(self, path: str):
+        with np.load(path) as data:
+            self._idf_keys = data["keys"].astype(np.uint64)
+            self._idf_values = data["values"].astype(np.float32)
+            self._idf_default = float(data["default"])
+        self._update_idf_digest()
+
+
+_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model       TEXT NOT NULL,
+    text_hash   BLOB NOT NULL,
+    dimension   INTEGER NOT NULL,
+    vector      BLOB NOT NULL,
+    created_at  REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (model, text_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_embeddings_accessed ON embeddings (accessed_at);
+"""
+
+# 每行除向量外的大致开销（主键、时间戳、B 树页内开销），用于按容量裁剪
+_ROW_OVERHEAD_BYTES = 64
+# SQLite 单条语句的参数上限保守取值
+_SQL_BATCH = 500
 
 
 class EmbeddingCache:
-    """嵌入缓存"""
-    
-    def __init__(self, cache_dir: str = None):
+    """
+    嵌入缓存（内存 LRU + SQLite）
+
+    - 内存层按字节数限制的 LRU，存 float32 向量
+    - 持久层为单个 SQLite 文件（WAL），按 (模型, 文本摘要) 存 float32 BLOB，
+      按最近访问时间做容量/TTL 裁剪
+    - 旧版每条一个 JSON 文件的缓存目录首次打开时导入并删除
+    """
+
+    DB_FILENAME = "embeddings.db"
+    # 累计写入多少行后自动裁剪一次
+    PRUNE_EVERY_ROWS = 4096
+
+    def __init__(
+        self,
+        cache_dir: str = None,
+        memory_max_bytes: int = 64 * 1024 * 1024,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+        ttl_seconds: float = 0,
+    ):
+        """
+        Args:
+            cache_dir: 缓存目录
+            memory_max_bytes: 内存层容量（字节）
+            disk_max_bytes: 持久层容量上限（字节，0 表示不限）
+            ttl_seconds: 超过该时长未被访问的条目在裁剪时删除（0 表示不按时间裁剪）
+        """
         self.cache_dir = Path(cache_dir) if cache_dir else Path("data/embedding_cache")
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        self._memory_cache: Dict[str, List[float]] = {}
-    
-    def _get_key(self, text: str, model: str) -> str:
-        """生成缓存键"""
-        content = f"{model}:{text}"
-        return hashlib.md5(content.encode()).hexdigest()
-    
+        self.db_path = self.cache_dir / self.DB_FILENAME
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: cachetools.LRUCache = cachetools.LRUCache(
+            maxsize=memory_max_bytes,
+            getsizeof=lambda vector: vector.nbytes,
+        )
+        # 内存命中的键只记在这里，写入或裁剪时再批量回写访问时间
+        self._touched: set = set()
+        self._written_since_prune = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._opened = False
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "pruned": 0,
+        }
+
+    @staticmethod
+    def _get_key(text: str, model: str) -> bytes:
+        """生成缓存键（与旧版 JSON 文件名相同的 md5，便于导入）"""
+        return hashlib.md5(f"{model}:{text}".encode()).digest()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._opened:
+            return self._conn
+        with self._lock:
+            if self._opened:
+                return self._conn
+            try:
+                conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(_CACHE_SCHEMA)
+                self._conn = conn
+            except sqlite3.Error as e:
+                logger.warning(f"嵌入缓存数据库打开失败，仅使用内存缓存: {e}")
+                self._conn = None
+            if self._conn is not None:
+                try:
+                    self._import_legacy_files_locked()
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning(f"旧版嵌入缓存文件导入失败: {e}")
+            self._opened = True
+        return self._conn
+
+    def _import_legacy_files_locked(self):
+        """导入旧版每条一个 JSON 的缓存文件，导入后删除"""
+        rows = []
+        imported = 0
+        now = time.time()
+        with os.scandir(self.cache_dir) as it:
+            for item in it:
+                if not item.name.endswith(".json"):
+                    continue
+                try:
+                    with open(item.path, "r") as f:
+                        data = json.load(f)
+                    vector = np.asarray(data["embedding"], dtype=np.float32)
+                    rows.append((data["model"], bytes.fromhex(item.name[:-5]), len(vector), vector.tobytes(), now, now))
+                except (OSError, ValueError, KeyError, TypeError):
+                    pass
+                os.unlink(item.path)
+                if len(rows) >= 1000:
+                    imported += self._insert_rows_locked(rows)
+                    rows = []
+        imported += self._insert_rows_locked(rows)
+        if imported:
+            logger.info(f"已导入旧版嵌入缓存文件 {imported} 条")
+
+    def _insert_rows_locked(self, rows: List[tuple]) -> int:
+        if not rows:
+            return 0
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings "
+            "(model, text_hash, dimension, vector, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self._conn.commit()
+        return len(rows)
+
     def get(self, text: str, model: str) -> Optional[List[float]]:
         """获取缓存的嵌入"""
-        key = self._get_key(text, model)
-        
-        # 内存缓存
-        if key in self._memory_cache:
-            return self._memory_cache[key]
-        
-        # 文件缓存
-        cache_file = self.cache_dir / f"{key}.json"
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'r') as f:
-                    data = json.load(f)
-                    embedding = data.get("embedding")
-                    if embedding:
-                        self._memory_cache[key] = embedding
-                        return embedding
-            except Exception:
-                pass
-        
-        return None
-    
+        return self.get_many([text], model)[0]
+
+    def get_many(self, texts: List[str], model: str) -> List[Optional[List[float]]]:
+        """批量获取缓存的嵌入，未命中的位置为 None"""
+        keys = [self._get_key(text, model) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        missing: Dict[bytes, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    results[i] = vector.tolist()
+                    self._touched.add((model, key))
+            self._stats["memory_hits"] += len(keys) - sum(map(len, missing.values()))
+
+        found = self._load_many(model, list(missing)) if missing else {}
+        with self._lock:
+            for key, vector in found.items():
+                self._remember_locked(key, vector)
+                values = vector.tolist()
+                for i in missing[key]:
+                    results[i] = values
+            disk_hits = sum(len(missing[key]) for key in found)
+            self._stats["disk_hits"] += disk_hits
+            self._stats["misses"] += sum(map(len, missing.values())) - disk_hits
+        return results
+
+    def _load_many(self, model: str, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        conn = self._connect()
+        if conn is None:
+            return {}
+        found: Dict[bytes, np.ndarray] = {}
+        try:
+            with self._lock:
+                for lo in range(0, len(keys), _SQL_BATCH):
+                    chunk = keys[lo:lo + _SQL_BATCH]
+                    rows = conn.execute(
+                        f"SELECT text_hash, vector FROM embeddings WHERE model = ? "
+                        f"AND text_hash IN ({','.join('?' * len(chunk))})",
+                        (model, *chunk),
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float32)
+                # 持久层命中的条目已提升到内存层，访问时间随下次写入回写
+                self._touched.update((model, key) for key in found)
+        except sqlite3.Error as e:
+            logger.warning(f"嵌入缓存查询失败: {e}")
+        return found
+
     def set(self, text: str, model: str, embedding: List[float]):
         """缓存嵌入"""
-        key = self._get_key(text, model)
-        self._memory_cache[key] = embedding
-        
-        # 异步写入文件
-        cache_file = self.cache_dir / f"{key}.json"
+        self.set_many([text], model, [embedding])
+
+    def set_many(self, texts: List[str], model: str, embeddings: List[List[float]]):
+        """批量缓存嵌入（单个事务写入）"""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                if embedding is None or len(embedding) == 0:
+                    continue
+                key = self._get_key(text, model)
+                vector = np.asarray(embedding, dtype=np.float32)
+                self._remember_locked(key, vector)
+                self._touched.discard((model, key))
+                rows.append((model, key, len(vector), vector.tobytes(), now, now))
+            self._stats["stores"] += len(rows)
+
+        conn = self._connect()
+        if conn is None or not rows:
+            return
         try:
-            with open(cache_file, 'w') as f:
-                json.dump({"text": text[:100], "model": model, "embedding": embedding}, f)
-        except Exception as e:
-            logger.warning(f"缓存写入失败: {e}")
-    
+            with self._lock:
+                self._flush_touched_locked(now)
+                self._insert_rows_locked(rows)
+                self._written_since_prune += len(rows)
+                should_prune = self._written_since_prune >= self.PRUNE_EVERY_ROWS
+        except sqlite3.Error as e:
+            logger.warning(f"嵌入缓存写入失败: {e}")
+            return
+        if should_prune:
+            self.prune()
+
+    def _remember_locked(self, key: bytes, vector: np.ndarray):
+        try:
+            self._memory[key] = vector
+        except ValueError:
+            # 单条超过内存层容量，只落盘
+            pass
+
+    def _flush_touched_locked(self, now: float):
+        if not self._touched:
+            return
+        touched = list(self._touched)
+        self._touched.clear()
+        self._conn.executemany(
+            "UPDATE embeddings SET accessed_at = ? WHERE model = ? AND text_hash = ?",
+            [(now, model, key) for model, key in touched],
+        )
+
+    def prune(self) -> int:
+        """
+        裁剪持久层：删除超过 TTL 未访问的条目，再按最近访问时间删除超出容量的部分
+
+        Returns:
+            删除的条目数
+        """
+        conn = self._connect()
+        if conn is None:
+            return 0
+        removed = 0
+        now = time.time()
+        try:
+            with self._lock:
+                self._flush_touched_locked(now)
+                self._written_since_prune = 0
+                if self.ttl_seconds > 0:
+                    removed += conn.execute(
+                        "DELETE FROM embeddings WHERE accessed_at < ?", (now - self.ttl_seconds,)
+                    ).rowcount
+                if self.disk_max_bytes > 0:
+                    count, total = conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+                    ).fetchone()
+                    used = total + count * _ROW_OVERHEAD_BYTES
+                    if used > self.disk_max_bytes and count:
+                        # 裁到上限的 90%，避免每次写入都触发裁剪
+                        per_row = used / count
+                        excess = int((used - self.disk_max_bytes * 0.9) / per_row) + 1
+                        removed += conn.execute(
+                            "DELETE FROM embeddings WHERE (model, text_hash) IN ("
+                            "SELECT model, text_hash FROM embeddings ORDER BY accessed_at LIMIT ?)",
+                            (excess,),
+                        ).rowcount
+                conn.commit()
+                self._stats["pruned"] += removed
+        except sqlite3.Error as e:
+            logger.warning(f"嵌入缓存裁剪失败: {e}")
+        if removed:
+            logger.info(f"嵌入缓存裁剪 {removed} 条")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率与容量统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory.currsize
+            stats["memory_max_bytes"] = self._memory.maxsize
+        conn = self._connect()
+        if conn is not None:
+            try:
+                with self._lock:
+                    count, total = conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+                    ).fetchone()
+                stats["disk_entries"] = count
+                stats["disk_bytes"] = total + count * _ROW_OVERHEAD_BYTES
+            except sqlite3.Error as e:
+                logger.warning(f"嵌入缓存统计失败: {e}")
+        stats["disk_max_bytes"] = self.disk_max_bytes
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
     def clear(self):
         """清除缓存"""
-        self._memory_cache.clear()
-        for f in self.cache_dir.glob("*.json"):
-            f.unlink()
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+        conn = self._connect()
+        if conn is None:
+            return
+        try:
+            with self._lock:
+                conn.execute("DELETE FROM embeddings")
+                conn.commit()
+                conn.execute("VACUUM")
+        except sqlite3.Error as e:
+            logger.warning(f"嵌入缓存清除失败: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    if self._touched:
+                        self._flush_touched_locked(time.time())
+                        self._conn.commit()
+                except sqlite3.Error:
+                    pass
+                self._conn.close()
+            self._conn = None
+            self._opened = False
 
 
 class EmbeddingService:
@@ -224,6 +671,9 @@ class EmbeddingService:
         model_name: str = "text-embedding-3-small",
         use_cache: bool = True,
         cache_dir: str = None,
+        cache_options: Dict[str, Any] = None,
+        local_idf_path: str = None,
+        batch_options: Dict[str, Any] = None,
     ):
         self.model_type = model_type
         self.use_cache = use_cache
@@ -235,54 +685,68 @@ class EmbeddingService:
                 model=model_name,
             )
         else:
-            self.model = LocalEmbedding()
+            self.model = LocalEmbedding(idf_path=local_idf_path)
+        
+        self.cache = EmbeddingCache(cache_dir, **(cache_options or {})) if use_cache and self.model.cacheable else None
         
-        self.cache = EmbeddingCache(cache_dir) if use_cache else None
+        # 远程模型：并发请求合并为批量请求，相同文本只发送一次
+        self.batcher: Optional[EmbeddingBatcher] = None
+        if self.model.batchable:
+            options = dict(batch_options or {})
+            options["max_batch_size"] = min(
+                options.get("max_batch_size", self.model.max_batch_size), self.model.max_batch_size
+            )
+            self.batcher = EmbeddingBatcher(self.model.embed_texts, **options)
     
     @property
     def dimension(self) -> int:
         return self.model.dimension
     
+    @property
+    def model_id(self) -> str:
+        return self.model.model_id
+    
     async def embed(self, text: str) -> List[float]:
         """嵌入单个文本"""
         # 检查缓存
         if self.cache:
-            cached = self.cache.get(text, self.model.name)
+            cached = self.cache.get(text, self.model_id)
             if cached:
                 return cached
         
-        embedding = await self.model.embed_text(text)
+        if self.batcher:
+            embedding = await self.batcher.embed(text)
+        else:
+            embedding = await self.model.embed_text(text)
         
         # 缓存结果
         if self.cache and embedding:
-            self.cache.set(text, self.model.name, embedding)
+            self.cache.set(text, self.model_id, embedding)
         
         return embedding
     
     async def embed_batch(self, texts: List[str]) -> List[List[float]]:
         """批量嵌入文本"""
-        results = []
-        uncached_texts = []
-        uncached_indices = []
+        if not texts:
+            return []
+        results = self.cache.get_many(texts, self.model_id) if self.cache else [None] * len(texts)
         
-        # 检查缓存
-        for i, text in enumerate(texts):
-            if self.cache:
-                cached = self.cache.get(text, self.model.name)
-                if cached:
-                    results.append((i, cached))
-                    continue
-            uncached_texts.append(text)
-            uncached_indices.append(i)
+        # 未命中的文本去重后批量嵌入
+        pending: Dict[str, List[int]] = {}
+        for i, (text, cached) in enumerate(zip(texts, results)):
+            if not cached:
+                pending.setdefault(text, []).append(i)
         
-        # 批量嵌入未缓存的文本
-        if uncached_texts:
-            embeddings = await self.model.embed_texts(uncached_texts)
-            for idx, embedding in zip(uncached_indices, embeddings):
-                results.append((idx, embedding))
-                if self.cache:
-                    self.cache.set(texts[idx], self.model.name, embedding)
+        if pending:
+            uncached_texts = list(pending)
+            if self.batcher:
+                embeddings = await self.batcher.embed_many(uncached_texts)
+            else:
+                embeddings = await self.model.embed_texts(uncached_texts)
+            for text, embedding in zip(uncached_texts, embeddings):
+                for idx in pending[text]:
+                    results[idx] = embedding
+            if self.cache:
+                self.cache.set_many(uncached_texts, self.model_id, embeddings)
         
-        # 按原始顺序排序
-        results.sort(key=lambda x: x[0])
-        return [r[1] for r in results]
+        return results
@@ -0,0 +1,442 @@
+"""
+向量索引
+
+FlatIndex：精确检索（暴力扫描），向量按行存放在 float32 矩阵中：
+- 入库时归一化，查询时余弦相似度即矩阵-向量乘法，不再逐条计算范数
+- 矩阵由若干只读块（如 mmap 打开的持久化段，多进程共享页面）和一个可追加的尾块组成，
+  行号全局连续，与条目 ID 通过并行数组对应
+- 删除只清除存活标记，删除过多时整体压缩
+- 分类过滤使用按分类维护的布尔掩码，top-k 使用 argpartition，不做全量排序
+- 查询只在取快照时持锁，矩阵乘法在锁外进行（NumPy 运算期间释放 GIL）
+- 可给出查询与全部向量相似度的上界（质心方向 + 最大夹角构成的球冠），多集合检索据此提前结束
+
+近似检索（IVF/PQ）复用同样的行存储，见 ivf.py。
+"""
+
+import bisect
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 尾块初始容量（行），容量不足时翻倍
+INITIAL_CAPACITY = 1024
+# 已删除行超过该比例（且超过 COMPACT_MIN_ROWS 行）时压缩矩阵
+COMPACT_RATIO = 0.25
+COMPACT_MIN_ROWS = 1024
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """按行 L2 归一化（零向量保持为零）"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class FlatIndex:
+    """float32 矩阵上的精确余弦相似度检索"""
+
+    def __init__(self, dimension: Optional[int] = None):
+        self.dimension = dimension
+        # 只读块：(起始行, 矩阵)
+        self._blocks: List[Tuple[int, np.ndarray]] = []
+        self._tail = np.zeros((0, dimension or 0), dtype=np.float32)
+        self._tail_start = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._category_masks: Dict[str, np.ndarray] = {}
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._size = 0
+        # 压缩/清空时递增（行号重排），后台任务据此判断快照是否过期
+        self._generation = 0
+        # 相似度上界的包络（质心方向, 最小夹角余弦），写入新行后失效；删除只会让包络更宽松，无需失效
+        self._envelope: Optional[Tuple[np.ndarray, float]] = None
+        self._envelope_version = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, entry_id: str) -> bool:
+        return entry_id in self._rows
+
+    @property
+    def dead_rows(self) -> int:
+        return self._size - len(self._rows)
+
+    # ---------- 写入 ----------
+
+    def _ensure_dimension(self, dimension: int, count: int) -> bool:
+        if self.dimension is None:
+            self.dimension = dimension
+            self._tail = np.zeros((0, dimension), dtype=np.float32)
+        if dimension != self.dimension:
+            logger.warning(f"向量维度 {dimension} 与索引维度 {self.dimension} 不符，已跳过 {count} 条")
+            return False
+        return True
+
+    def _reserve_masks(self, needed: int) -> None:
+        capacity = len(self._alive)
+        if needed <= capacity:
+            return
+        capacity = max(INITIAL_CAPACITY, capacity)
+        while capacity < needed:
+            capacity *= 2
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._alive = alive
+        for category, mask in self._category_masks.items():
+            grown = np.zeros(capacity, dtype=bool)
+            grown[:self._size] = mask[:self._size]
+            self._category_masks[category] = grown
+
+    def _reserve_tail(self, rows: int) -> None:
+        """确保尾块容量足够（翻倍扩容，分配新数组，查询中的旧快照不受影响）"""
+        used = self._size - self._tail_start
+        needed = used + rows
+        capacity = self._tail.shape[0]
+        if needed <= capacity:
+            return
+        capacity = max(INITIAL_CAPACITY, capacity)
+        while capacity < needed:
+            capacity *= 2
+        tail = np.zeros((capacity, self.dimension), dtype=np.float32)
+        tail[:used] = self._tail[:used]
+        self._tail = tail
+
+    def _register_rows(self, start: int, ids: Sequence[str], categories: Sequence[str]) -> None:
+        """登记新行的 ID、分类掩码与存活标记（已存在的 ID 先删除旧行）"""
+        self._remove_locked(entry_id for entry_id in ids if entry_id in self._rows)
+        self._envelope = None
+        self._envelope_version += 1
+        end = start + len(ids)
+        self._reserve_masks(end)
+        self._alive[start:end] = True
+        self._ids.extend(ids)
+        for offset, (entry_id, category) in enumerate(zip(ids, categories)):
+            mask = self._category_masks.get(category)
+            if mask is None:
+                mask = self._category_masks[category] = np.zeros(len(self._alive), dtype=bool)
+            row = start + offset
+            mask[row] = True
+            previous = self._rows.get(entry_id)
+            if previous is not None:
+                # 同一批内重复的 ID 以最后一条为准
+                self._alive[previous] = False
+                for category_mask in self._category_masks.values():
+                    category_mask[previous] = False
+                self._ids[previous] = None
+            self._rows[entry_id] = row
+        self._size = end
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        categories: Sequence[str],
+        normalized: bool = False,
+    ) -> int:
+        """
+        批量添加向量（已存在的 ID 会被替换）
+
+        Args:
+            normalized: 向量是否已归一化
+
+        Returns:
+            实际加入的向量数（维度不符的会被跳过）
+        """
+        if len(ids) == 0:
+            return 0
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2:
+            # 各向量长度不一致，逐条处理
+            return sum(self.add([i], [v], [c]) for i, v, c in zip(ids, vectors, categories))
+        if not normalized:
+            matrix = normalize_rows(matrix)
+        with self._lock:
+            if not self._ensure_dimension(matrix.shape[1], len(ids)):
+                return 0
+            self._reserve_tail(len(ids))
+            used = self._size - self._tail_start
+            self._tail[used:used + len(ids)] = matrix
+            start = self._size
+            self._register_rows(start, ids, categories)
+            self._on_rows_added(start, matrix)
+            return len(ids)
+
+    def add_block(self, ids: Sequence[str], matrix: np.ndarray, categories: Sequence[str]) -> int:
+        """
+        添加只读块（不复制，如 mmap 打开的持久化段；向量须已归一化）
+
+        Returns:
+            加入的向量数
+        """
+        if len(ids) == 0:
+            return 0
+        with self._lock:
+            if not self._ensure_dimension(matrix.shape[1], len(ids)):
+                return 0
+            used = self._size - self._tail_start
+            if used:
+                # 冻结当前尾块
+                self._blocks.append((self._tail_start, self._tail[:used]))
+                self._tail = np.zeros((0, self.dimension), dtype=np.float32)
+            start = self._size
+            self._blocks.append((start, matrix))
+            self._register_rows(start, ids, categories)
+            self._tail_start = self._size
+            self._on_rows_added(start, matrix)
+            return len(ids)
+
+    def _on_rows_added(self, start: int, matrix: np.ndarray) -> None:
+        """新行写入后的扩展点（调用方持锁）"""
+
+    def _on_compact(self, keep: np.ndarray) -> None:
+        """压缩后的扩展点，keep 为保留的旧行号（调用方持锁）"""
+
+    def _remove_locked(self, ids: Iterable[str]) -> int:
+        removed = 0
+        for entry_id in ids:
+            row = self._rows.pop(entry_id, None)
+            if row is None:
+                continue
+            self._alive[row] = False
+            for mask in self._category_masks.values():
+                mask[row] = False
+            self._ids[row] = None
+            removed += 1
+        return removed
+
+    def remove(self, ids: Iterable[str]) -> int:
+        """删除向量，返回删除数量"""
+        with self._lock:
+            removed = self._remove_locked(ids)
+            dead = self.dead_rows
+            if dead > COMPACT_MIN_ROWS and dead > self._size * COMPACT_RATIO:
+                self._compact_locked()
+            return removed
+
+    def _compact_locked(self) -> None:
+        """去掉已删除的行，合并为一个尾块（生成新数组，查询中的旧快照不受影响）"""
+        keep = np.flatnonzero(self._alive[:self._size])
+        parts = [block for _, block in self._blocks_snapshot()]
+        matrix = np.concatenate(parts)[keep] if parts else self._tail[:0]
+        self._blocks = []
+        self._tail = matrix
+        self._tail_start = 0
+        self._alive = np.ones(len(keep), dtype=bool)
+        self._category_masks = {
+            category: mask[keep] for category, mask in self._category_masks.items() if mask[keep].any()
+        }
+        self._ids = [self._ids[row] for row in keep]
+        self._rows = {entry_id: row for row, entry_id in enumerate(self._ids)}
+        self._size = len(keep)
+        self._generation += 1
+        self._on_compact(keep)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._blocks = []
+            self._tail = np.zeros((0, self.dimension or 0), dtype=np.float32)
+            self._tail_start = 0
+            self._alive = np.zeros(0, dtype=bool)
+            self._category_masks = {}
+            self._ids = []
+            self._rows = {}
+            self._size = 0
+            self._generation += 1
+            self._envelope = None
+            self._envelope_version += 1
+
+    def save(self, path: Path) -> None:
+        """持久化索引附加文件（精确索引的数据即段文件本身，无附加文件）"""
+
+    def load(self, path: Path) -> None:
+        """段文件全部加入后，加载索引附加文件"""
+
+    # ---------- 查询 ----------
+
+    def _blocks_snapshot(self) -> List[Tuple[int, np.ndarray]]:
+        """所有块（含尾块已用部分）：[(起始行, 矩阵)]"""
+        blocks = list(self._blocks)
+        used = self._size - self._tail_start
+        if used:
+            blocks.append((self._tail_start, self._tail[:used]))
+        return blocks
+
+    def get_vector(self, entry_id: str) -> Optional[np.ndarray]:
+        """取出条目的向量（已归一化）"""
+        with self._lock:
+            row = self._rows.get(entry_id)
+            if row is None:
+                return None
+            blocks = self._blocks_snapshot()
+        starts = [start for start, _ in blocks]
+        start, block = blocks[bisect.bisect_right(starts, row) - 1]
+        return np.array(block[row - start])
+
+    def _snapshot_locked(
+        self, categories: Optional[Sequence[str]]
+    ) -> Tuple[List[Tuple[int, np.ndarray]], np.ndarray, List[Optional[str]]]:
+        """取得查询所需的矩阵块、可检索掩码与 ID 列表（调用方持锁）"""
+        size = self._size
+        if categories:
+            mask = np.zeros(size, dtype=bool)
+            for category in categories:
+                category_mask = self._category_masks.get(category)
+                if category_mask is not None:
+                    mask |= category_mask[:size]
+        else:
+            mask = self._alive[:size].copy()
+        return self._blocks_snapshot(), mask, self._ids
+
+    def _prepare_query(self, query: Sequence[float]) -> Optional[np.ndarray]:
+        """查询向量校验维度并归一化"""
+        q = np.asarray(query, dtype=np.float32)
+        if q.shape != (self.dimension,):
+            logger.warning(f"查询向量维度 {q.shape[0] if q.ndim == 1 else q.shape} 与索引维度 {self.dimension} 不符")
+            return None
+        norm = np.linalg.norm(q)
+        return q / norm if norm > 0 else q
+
+    @staticmethod
+    def _gather(blocks: List[Tuple[int, np.ndarray]], rows: np.ndarray) -> np.ndarray:
+        """按行号（升序）取出向量"""
+        parts = []
+        for start, block in blocks:
+            lo, hi = np.searchsorted(rows, [start, start + len(block)])
+            if hi > lo:
+                parts.append(block[rows[lo:hi] - start])
+        return np.concatenate(parts)
+
+    @staticmethod
+    def _score_rows(blocks: List[Tuple[int, np.ndarray]], rows: np.ndarray, q: np.ndarray) -> np.ndarray:
+        """只计算指定行（升序）的相似度"""
+        parts = []
+        for start, block in blocks:
+            lo, hi = np.searchsorted(rows, [start, start + len(block)])
+            if hi > lo:
+                parts.append(block[rows[lo:hi] - start] @ q)
+        return np.concatenate(parts)
+
+    @staticmethod
+    def _top_results(
+        scores: np.ndarray,
+        rows: Optional[np.ndarray],
+        ids: List[Optional[str]],
+        top_k: int,
+        score_threshold: float,
+    ) -> List[Tuple[str, float]]:
+        """从相似度数组取 top-k（rows 为 scores 对应的行号，None 表示与行号一致）"""
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        results: List[Tuple[str, float]] = []
+        for i in top:
+            score = float(scores[i])
+            if score < score_threshold:
+                break
+            entry_id = ids[rows[i] if rows is not None else i]
+            if entry_id is not None:
+                results.append((entry_id, score))
+        return results
+
+    def _compute_envelope(self) -> Optional[Tuple[np.ndarray, float]]:
+        """包住全部存活向量的球冠：(质心方向, 与质心的最小夹角余弦)；没有存活向量时返回 None"""
+        with self._lock:
+            envelope = self._envelope
+            if envelope is not None:
+                return envelope
+            blocks, mask, _ = self._snapshot_locked(None)
+            version = self._envelope_version
+        if not mask.any():
+            return None
+        total = np.zeros(self.dimension, dtype=np.float64)
+        for start, block in blocks:
+            total += mask[start:start + len(block)].astype(np.float32) @ block
+        norm = np.linalg.norm(total)
+        if norm == 0:
+            # 向量相互抵消，没有有意义的方向，上界退化为 1
+            centroid, min_cos = np.zeros(self.dimension, dtype=np.float32), -1.0
+        else:
+            centroid = (total / norm).astype(np.float32)
+            min_cos = 1.0
+            for start, block in blocks:
+                alive = mask[start:start + len(block)]
+                if alive.any():
+                    min_cos = min(min_cos, float((block @ centroid)[alive].min()))
+        envelope = (centroid, min_cos)
+        with self._lock:
+            if self._envelope_version == version:
+                self._envelope = envelope
+        return envelope
+
+    def score_bound(self, query: Sequence[float]) -> float:
+        """
+        查询与任一存活向量余弦相似度的上界
+
+        向量都落在以质心方向 c 为轴、半角 α 的球冠内，查询与 c 的夹角为 θ 时，
+        相似度不超过 cos(max(θ - α, 0))。包络在首次调用时计算一次（一次全量扫描），写入新行后重新计算。
+        近似索引的检索分数本身是估计值，上界只对精确相似度成立。
+
+        Returns:
+            上界；索引为空时为 -inf，无法判断时为 1.0
+        """
+        if self.dimension is None or len(self) == 0:
+            return float("-inf")
+        q = self._prepare_query(query)
+        if q is None:
+            return 1.0
+        envelope = self._compute_envelope()
+        if envelope is None:
+            return float("-inf")
+        centroid, min_cos = envelope
+        if min_cos <= -1.0:
+            return 1.0
+        theta = np.arccos(np.clip(float(q @ centroid), -1.0, 1.0))
+        alpha = np.arccos(np.clip(min_cos, -1.0, 1.0))
+        if theta <= alpha:
+            return 1.0
+        # 留出 float32 舍入误差的余量
+        return min(1.0, float(np.cos(theta - alpha)) + 1e-4)
+
+    def search(
+        self,
+        query: Sequence[float],
+        top_k: int = 5,
+        categories: Optional[Sequence[str]] = None,
+        score_threshold: float = 0.0,
+    ) -> List[Tuple[str, float]]:
+        """
+        余弦相似度 top-k 检索
+
+        Returns:
+            [(条目 ID, 相似度)]，按相似度降序
+        """
+        if top_k <= 0 or self.dimension is None:
+            return []
+        q = self._prepare_query(query)
+        if q is None:
+            return []
+
+        with self._lock:
+            blocks, mask, ids = self._snapshot_locked(categories)
+        valid = int(np.count_nonzero(mask))
+        if valid == 0:
+            return []
+        rows: Optional[np.ndarray] = None
+        if valid * 4 < len(mask):
+            # 过滤后剩余较少：只取这些行计算
+            rows = np.flatnonzero(mask)
+            scores = self._score_rows(blocks, rows, q)
+        else:
+            scores = np.empty(len(mask), dtype=np.float32)
+            for start, block in blocks:
+                np.matmul(block, q, out=scores[start:start + len(block)])
+            if valid < len(mask):
+                scores[~mask] = -np.inf
+        return self._top_results(scores, rows, ids, min(top_k, valid), score_threshold)
@@ -0,0 +1,592 @@
+"""
+RAG 批量入库流水线
+
+大批量导入原本在请求中逐个文档串行执行加载、分块、嵌入与写入，整个导入期间占住一个 worker。
+流水线把各步骤拆成阶段，阶段之间以有界 asyncio 队列连接（下游跟不上时上游自然等待）：
+
+    加载（线程中读取文件，load_concurrency 个并发）→ 分块（线程中执行）
+    → 去重并凑批（按内容，包括集合中已有的条目）→ 批量嵌入（embed_concurrency 个并发）
+    → 写入（单个写入者，整批追加到活动段）
+
+- 进度以来源（一个文件，或请求中的一个文档）为单位：来源的全部分块写入后才记为完成
+- IngestionManager 把流水线作为后台任务运行，定期把已完成的来源写入检查点，中断、失败或取消后可从检查点继续；
+  加载失败的来源不记为完成，任务以 failed 结束，继续时重新加载
+- 重新处理未完成的来源时，已写入的分块会被去重跳过
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from .document_loader import DocumentChunker, KnowledgeDocumentLoader
+from .embeddings import EmbeddingService
+from .models import Document, DocumentChunk
+from .vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+# 来源：(键, 加载函数)；加载函数在线程中执行
+Source = Tuple[str, Callable[[], List[Document]]]
+
+# 文件中文档的 id 由路径与序号确定，重新处理同一文件时分块仍归属同一文档
+_DOCUMENT_NAMESPACE = uuid.UUID("8a3e51c2-7d04-4b9e-a6f1-2c5d90e7b314")
+
+# 阶段结束标记
+_DONE = object()
+
+
+@dataclass
+class IngestionOptions:
+    """流水线参数"""
+    queue_size: int = 64            # 阶段之间队列的容量
+    load_concurrency: int = 4       # 同时加载的来源数
+    chunk_concurrency: int = 2      # 同时分块的来源数
+    embed_batch_size: int = 256     # 每次嵌入的分块数
+    embed_concurrency: int = 4      # 同时进行的嵌入请求数
+    batch_linger_ms: float = 20.0   # 凑批时等待后续分块的最长时间
+
+
+class IngestionPipeline:
+    """
+    一次入库的流水线
+
+    Args:
+        embedding_service: 嵌入服务
+        vector_store: 目标向量存储
+        chunker: 文档分块器
+        options: 流水线参数
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        vector_store: VectorStore,
+        chunker: DocumentChunker,
+        options: Optional[IngestionOptions] = None,
+    ):
+        self.embedding_service = embedding_service
+        self.vector_store = vector_store
+        self.chunker = chunker
+        self.options = options or IngestionOptions()
+
+        self.stats = {"sources": 0, "documents": 0, "skipped_documents": 0, "chunks": 0, "duplicate_chunks": 0}
+        # 本次运行中全部分块已写入的来源
+        self.completed: Set[str] = set()
+        # 本次运行中加载失败的来源：{来源: 错误信息}（不计入 completed，继续任务时重新处理）
+        self.failed: Dict[str, str] = {}
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+        # 进度跟踪：来源与文档尚未完成的工作量，分块所属的 (来源, 文档)
+        self._source_pending: Dict[str, int] = {}
+        self._doc_pending: Dict[Tuple[str, str], int] = {}
+        self._chunk_owner: Dict[str, Tuple[str, str]] = {}
+        # 本次已排队但尚未写入的内容
+        self._seen: Set[str] = set()
+
+    async def run(self, sources: Sequence[Source]) -> Dict[str, int]:
+        """处理全部来源，返回计数"""
+        if self.vector_store.model_mismatch:
+            raise ValueError(f"集合嵌入模型 {self.vector_store.embedding_model} 与当前模型不一致，请清空后重新入库")
+
+        options = self.options
+        self._started = time.monotonic()
+        loaded: asyncio.Queue = asyncio.Queue(maxsize=options.queue_size)
+        chunked: asyncio.Queue = asyncio.Queue(maxsize=options.queue_size)
+        batches: asyncio.Queue = asyncio.Queue(maxsize=options.embed_concurrency)
+        embedded: asyncio.Queue = asyncio.Queue(maxsize=options.embed_concurrency)
+        pending_sources = iter(sources)
+
+        stages = [
+            self._stage([self._load(pending_sources, loaded) for _ in range(options.load_concurrency)],
+                        loaded, options.chunk_concurrency),
+            self._stage([self._chunk(loaded, chunked) for _ in range(options.chunk_concurrency)],
+                        chunked, 1),
+            self._stage([self._dedupe(chunked, batches)], batches, options.embed_concurrency),
+            self._stage([self._embed(batches, embedded) for _ in range(options.embed_concurrency)],
+                        embedded, 1),
+            self._write(embedded),
+        ]
+        tasks = [asyncio.create_task(stage) for stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            self._finished = time.monotonic()
+            if self.stats["chunks"]:
+                # 保存关键词索引/近似索引，重启后无需重新分词或编码
+                await asyncio.to_thread(self.vector_store.save_indexes)
+        return dict(self.stats)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """计数与吞吐量"""
+        if self._started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._finished or time.monotonic()) - self._started
+        return {
+            **self.stats,
+            "elapsed_seconds": round(elapsed, 3),
+            "documents_per_sec": round(self.stats["documents"] / elapsed, 1) if elapsed > 0 else 0.0,
+            "chunks_per_sec": round(self.stats["chunks"] / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    @staticmethod
+    async def _stage(workers: List, outbox: asyncio.Queue, consumers: int) -> None:
+        """运行一个阶段的全部 worker，结束后通知下游的每个 worker"""
+        await asyncio.gather(*workers)
+        for _ in range(consumers):
+            await outbox.put(_DONE)
+
+    # ==================== 各阶段 ====================
+
+    async def _load(self, sources, outbox: asyncio.Queue) -> None:
+        for key, load in sources:
+            try:
+                documents = await asyncio.to_thread(load)
+            except Exception as e:
+                logger.error(f"加载来源失败: {key}, 错误: {e}")
+                self.failed[key] = str(e)
+                continue
+            self._source_pending[key] = 1
+            await outbox.put((key, documents))
+
+    async def _chunk(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            key, documents = item
+            pieces = await asyncio.to_thread(lambda: [self.chunker.split(doc.content) for doc in documents])
+            await outbox.put((key, documents, pieces))
+
+    async def _dedupe(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        """按内容去重，新分块凑成批次"""
+        batch: List[DocumentChunk] = []
+        batch_size = self.options.embed_batch_size
+        linger = self.options.batch_linger_ms / 1000.0
+        while True:
+            if batch:
+                try:
+                    item = await asyncio.wait_for(inbox.get(), linger)
+                except asyncio.TimeoutError:
+                    await outbox.put(batch)
+                    batch = []
+                    continue
+            else:
+                item = await inbox.get()
+            if item is _DONE:
+                break
+
+            key, documents, pieces = item
+            for doc, texts in zip(documents, pieces):
+                fresh = self._new_chunks(key, doc, texts)
+                if not fresh:
+                    self.stats["skipped_documents"] += 1
+                    continue
+                self._source_pending[key] += 1
+                self._doc_pending[(key, doc.id)] = len(fresh)
+                batch.extend(fresh)
+                while len(batch) >= batch_size:
+                    await outbox.put(batch[:batch_size])
+                    batch = batch[batch_size:]
+            self._release_source(key)
+
+        if batch:
+            await outbox.put(batch)
+
+    def _new_chunks(self, key: str, doc: Document, texts: List[str]) -> List[DocumentChunk]:
+        chunks = []
+        for idx, text in enumerate(texts):
+            if text in self._seen or self.vector_store.has_content(text):
+                self.stats["duplicate_chunks"] += 1
+                continue
+            self._seen.add(text)
+            chunk = DocumentChunk(
+                document_id=doc.id,
+                content=text,
+                chunk_index=idx,
+                metadata={
+                    "title": doc.title,
+                    "category": doc.category.value,
+                    "source": doc.source,
+                },
+            )
+            self._chunk_owner[chunk.id] = (key, doc.id)
+            chunks.append(chunk)
+        return chunks
+
+    async def _embed(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        while True:
+            batch = await inbox.get()
+            if batch is _DONE:
+                return
+            embeddings = await self.embedding_service.embed_batch([chunk.content for chunk in batch])
+            await outbox.put((batch, embeddings))
+
+    async def _write(self, inbox: asyncio.Queue) -> None:
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            chunks, embeddings = item
+            # 用执行器 Future 而非 Task：事件循环关闭时只取消 Task，不会把仍在写入的线程当作已结束
+            append = asyncio.get_running_loop().run_in_executor(None, self._append, chunks, embeddings)
+            try:
+                written = await asyncio.shield(append)
+            except asyncio.CancelledError:
+                # 线程中的写入无法中止：等它完成并记入进度后再退出（期间再次取消也不中断等待）
+                while not append.done():
+                    try:
+                        await asyncio.wait([append])
+                    except asyncio.CancelledError:
+                        pass
+                self._written(chunks, append.result())
+                raise
+            self._written(chunks, written)
+
+    def _written(self, chunks: List[DocumentChunk], count: int) -> None:
+        self.stats["chunks"] += count
+        for chunk in chunks:
+            self._seen.discard(chunk.content)
+            self._chunk_done(chunk)
+
+    def _append(self, chunks: List[DocumentChunk], embeddings: List[List[float]]) -> int:
+        """按分类整批追加，返回写入条数"""
+        groups: Dict[str, Tuple[List[DocumentChunk], List[List[float]]]] = {}
+        for chunk, embedding in zip(chunks, embeddings):
+            group = groups.setdefault(chunk.metadata["category"], ([], []))
+            group[0].append(chunk)
+            group[1].append(embedding)
+        return sum(
+            len(self.vector_store.add_batch(group_chunks, group_embeddings, category))
+            for category, (group_chunks, group_embeddings) in groups.items()
+        )
+
+    # ==================== 进度 ====================
+
+    def _chunk_done(self, chunk: DocumentChunk) -> None:
+        owner = self._chunk_owner.pop(chunk.id)
+        remaining = self._doc_pending[owner] - 1
+        if remaining:
+            self._doc_pending[owner] = remaining
+            return
+        del self._doc_pending[owner]
+        self.stats["documents"] += 1
+        self._release_source(owner[0])
+
+    def _release_source(self, key: str) -> None:
+        remaining = self._source_pending[key] - 1
+        if remaining:
+            self._source_pending[key] = remaining
+            return
+        del self._source_pending[key]
+        self.completed.add(key)
+        self.stats["sources"] += 1
+
+
+def directory_sources(
+    document_loader: KnowledgeDocumentLoader,
+    directory: str,
+    recursive: bool = True,
+) -> List[Source]:
+    """目录中可加载的文件，按路径排序"""
+    path = Path(directory)
+    if not path.is_dir():
+        logger.warning(f"目录不存在: {directory}")
+        return []
+    loaders = document_loader.directory_loader.loaders
+    files = sorted(
+        str(file_path) for file_path in path.glob("**/*" if recursive else "*")
+        if file_path.is_file() and any(loader.supports(str(file_path)) for loader in loaders)
+    )
+    return [(file_path, _file_loader(document_loader, file_path)) for file_path in files]
+
+
+def _file_loader(document_loader: KnowledgeDocumentLoader, file_path: str) -> Callable[[], List[Document]]:
+    def load() -> List[Document]:
+        # 读取失败必须抛出，流水线才会把该来源记为失败而不是已完成
+        documents = document_loader.load_from_file(file_path, raise_errors=True)
+        for idx, doc in enumerate(documents):
+            doc.id = str(uuid.uuid5(_DOCUMENT_NAMESPACE, f"{file_path}#{idx}"))
+        return documents
+    return load
+
+
+def document_sources(documents: Sequence[Document]) -> List[Source]:
+    """请求中的文档，每个文档一个来源"""
+    return [(f"#{idx}", (lambda doc=doc: [doc])) for idx, doc in enumerate(documents)]
+
+
+# ==================== 后台任务 ====================
+
+@dataclass
+class IngestionJob:
+    """后台入库任务（状态与检查点一起保存在任务目录的 <id>.json）"""
+    kb_id: str
+    kind: str                       # directory / documents
+    directory: str = ""
+    recursive: bool = True
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    status: str = "pending"         # pending / running / completed / failed / cancelled / interrupted
+    total_sources: int = 0
+    completed_sources: List[str] = field(default_factory=list)
+    failed_sources: List[str] = field(default_factory=list)   # 最近一次运行中加载失败的来源
+    stats: Dict[str, int] = field(default_factory=dict)      # 各次运行的累计计数
+    error: str = ""
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IngestionJob":
+        return cls(**{key: value for key, value in data.items() if key in cls.__dataclass_fields__})
+
+
+class IngestionManager:
+    """
+    后台入库任务管理
+
+    Args:
+        jobs_path: 任务状态与检查点目录
+        document_loader: 文档加载器
+        pipeline_factory: 按知识库 id 创建流水线
+        on_progress: 检查点回调 (kb_id, 新写入文档数, 新写入分块数)，用于更新知识库统计
+        checkpoint_seconds: 检查点间隔（秒）
+    """
+
+    RESUMABLE = ("failed", "cancelled", "interrupted")
+
+    def __init__(
+        self,
+        jobs_path: str,
+        document_loader: KnowledgeDocumentLoader,
+        pipeline_factory: Callable[[str], IngestionPipeline],
+        on_progress: Optional[Callable[[str, int, int], None]] = None,
+        checkpoint_seconds: float = 5.0,
+    ):
+        self.jobs_path = Path(jobs_path)
+        self.jobs_path.mkdir(parents=True, exist_ok=True)
+        self.document_loader = document_loader
+        self.pipeline_factory = pipeline_factory
+        self.on_progress = on_progress
+        self.checkpoint_seconds = checkpoint_seconds
+
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # 由调用方取消的任务（其他取消视为进程退出导致的中断）
+        self._cancel_requested: Set[str] = set()
+        # 每个任务最近一次运行：(流水线, 运行前的累计计数, 运行前已完成的来源)
+        self._runs: Dict[str, Tuple[IngestionPipeline, Dict[str, int], Set[str]]] = {}
+        self._load_jobs()
+
+    def _job_file(self, job_id: str) -> Path:
+        return self.jobs_path / f"{job_id}.json"
+
+    def _documents_file(self, job_id: str) -> Path:
+        return self.jobs_path / f"{job_id}.documents.jsonl"
+
+    def _load_jobs(self) -> None:
+        for job_file in self.jobs_path.glob("*.json"):
+            try:
+                with open(job_file, "r", encoding="utf-8") as f:
+                    job = IngestionJob.from_dict(json.load(f))
+            except Exception as e:
+                logger.warning(f"读取入库任务失败: {job_file}, 错误: {e}")
+                continue
+            if job.status in ("pending", "running"):
+                # 上次进程退出时仍在运行，可从检查点继续
+                job.status = "interrupted"
+            self._jobs[job.id] = job
+
+    def _save(self, job: IngestionJob) -> None:
+        """原子写入任务状态与检查点"""
+        job_file = self._job_file(job.id)
+        tmp = job_file.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp, job_file)
+
+    # ==================== 任务操作 ====================
+
+    async def start(
+        self,
+        kb_id: str,
+        directory: Optional[str] = None,
+        recursive: bool = True,
+        documents: Optional[List[Document]] = None,
+    ) -> IngestionJob:
+        """创建并启动任务（directory 与 documents 二选一）"""
+        if any(self._is_running(job) for job in self._jobs.values() if job.kb_id == kb_id):
+            raise ValueError(f"知识库已有进行中的入库任务: {kb_id}")
+        if directory:
+            if not Path(directory).is_dir():
+                raise FileNotFoundError(directory)
+            job = IngestionJob(
+                kb_id=kb_id,
+                kind="directory",
+                directory=str(Path(directory).resolve()),
+                recursive=recursive,
+            )
+        elif documents:
+            job = IngestionJob(kb_id=kb_id, kind="documents")
+            await asyncio.to_thread(self._write_documents, job.id, documents)
+        else:
+            raise ValueError("需要提供 directory 或 documents")
+
+        self._jobs[job.id] = job
+        self._save(job)
+        self._launch(job)
+        return job
+
+    async def resume(self, job_id: str) -> IngestionJob:
+        """从检查点继续失败、取消或中断的任务"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job.status not in self.RESUMABLE:
+            raise ValueError(f"任务状态为 {job.status}，无法继续")
+        if any(self._is_running(other) for other in self._jobs.values() if other.kb_id == job.kb_id):
+            raise ValueError(f"知识库已有进行中的入库任务: {job.kb_id}")
+        self._launch(job)
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            return False
+        self._cancel_requested.add(job_id)
+        task.cancel()
+        return True
+
+    def cancel_for(self, kb_id: str) -> int:
+        """取消知识库的全部进行中任务"""
+        return sum(self.cancel(job.id) for job in list(self._jobs.values()) if job.kb_id == kb_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return self._status(job) if job else None
+
+    def list(self, kb_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        jobs = [job for job in self._jobs.values() if kb_id is None or job.kb_id == kb_id]
+        jobs.sort(key=lambda job: job.created_at, reverse=True)
+        return [self._status(job) for job in jobs]
+
+    def _is_running(self, job: IngestionJob) -> bool:
+        task = self._tasks.get(job.id)
+        return task is not None and not task.done()
+
+    def _status(self, job: IngestionJob) -> Dict[str, Any]:
+        """任务状态：累计计数、本次运行的吞吐量（已完成来源列表只给出数量）"""
+        data = job.to_dict()
+        data["completed_sources"] = len(job.completed_sources)
+        data["current_run"] = None
+        run = self._runs.get(job.id)
+        if run:
+            pipeline, base, done = run
+            data["current_run"] = pipeline.snapshot()
+            if self._is_running(job):
+                data["stats"] = self._totals(pipeline, base)
+                data["completed_sources"] = len(done) + len(pipeline.completed)
+                data["failed_sources"] = sorted(pipeline.failed)
+        return data
+
+    # ==================== 运行 ====================
+
+    def _launch(self, job: IngestionJob) -> None:
+        job.status = "pending"
+        self._tasks[job.id] = asyncio.get_running_loop().create_task(self._run(job))
+
+    async def _run(self, job: IngestionJob) -> None:
+        self._runs.pop(job.id, None)
+        checkpoints = None
+        try:
+            pipeline = self.pipeline_factory(job.kb_id)
+            sources = await asyncio.to_thread(self._sources, job)
+            done = set(job.completed_sources)
+            self._runs[job.id] = (pipeline, dict(job.stats), done)
+            job.total_sources = len(sources)
+            job.status = "running"
+            job.started_at = datetime.now().isoformat()
+            job.finished_at = None
+            job.error = ""
+            job.failed_sources = []
+            self._save(job)
+            checkpoints = asyncio.create_task(self._checkpoint_loop(job))
+
+            await pipeline.run([source for source in sources if source[0] not in done])
+            if pipeline.failed:
+                # 其余来源已写入；失败的来源不记为完成，继续任务时重新加载
+                job.status = "failed"
+                job.error = f"{len(pipeline.failed)} 个来源加载失败"
+                logger.error(f"入库任务部分失败: {job.id}, 失败来源: {sorted(pipeline.failed)}")
+            else:
+                job.status = "completed"
+                logger.info(f"入库任务完成: {job.id}, {pipeline.snapshot()}")
+        except asyncio.CancelledError:
+            job.status = "cancelled" if job.id in self._cancel_requested else "interrupted"
+            logger.info(f"入库任务已{'取消' if job.status == 'cancelled' else '中断'}: {job.id}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"入库任务失败: {job.id}, 错误: {e}")
+        finally:
+            if checkpoints is not None:
+                checkpoints.cancel()
+            if job.id in self._runs:
+                self._checkpoint(job)
+            job.finished_at = datetime.now().isoformat()
+            self._save(job)
+            self._tasks.pop(job.id, None)
+            self._cancel_requested.discard(job.id)
+
+    async def _checkpoint_loop(self, job: IngestionJob) -> None:
+        while True:
+            await asyncio.sleep(self.checkpoint_seconds)
+            self._checkpoint(job)
+            await asyncio.to_thread(self._save, job)
+
+    @staticmethod
+    def _totals(pipeline: IngestionPipeline, base: Dict[str, int]) -> Dict[str, int]:
+        return {key: base.get(key, 0) + value for key, value in pipeline.stats.items()}
+
+    def _checkpoint(self, job: IngestionJob) -> None:
+        """合并本次运行的进度，并把新写入的数量报告给知识库统计"""
+        pipeline, base, done = self._runs[job.id]
+        previous = job.stats
+        job.stats = self._totals(pipeline, base)
+        if len(pipeline.completed) + len(done) != len(job.completed_sources):
+            job.completed_sources = sorted(done | pipeline.completed)
+        job.failed_sources = sorted(pipeline.failed)
+        documents = job.stats["documents"] - previous.get("documents", 0)
+        chunks = job.stats["chunks"] - previous.get("chunks", 0)
+        if self.on_progress and (documents or chunks):
+            self.on_progress(job.kb_id, documents, chunks)
+
+    def _sources(self, job: IngestionJob) -> List[Source]:
+        if job.kind == "directory":
+            return directory_sources(self.document_loader, job.directory, job.recursive)
+        return document_sources(self._read_documents(job.id))
+
+    def _write_documents(self, job_id: str, documents: List[Document]) -> None:
+        with open(self._documents_file(job_id), "w", encoding="utf-8") as f:
+            for doc in documents:
+                f.write(json.dumps(doc.to_dict(), ensure_ascii=False) + "\n")
+
+    def _read_documents(self, job_id: str) -> List[Document]:
+        with open(self._documents_file(job_id), "r", encoding="utf-8") as f:
+            return [Document.from_dict(json.loads(line)) for line in f if line.strip()]
@@ -0,0 +1,416 @@
+"""
+IVF / IVF-PQ 近似向量检索
+
+在 FlatIndex 的行存储（mmap 段 + 尾块）之上增加：
+- 粗量化：k-means 聚出 nlist 个中心，每行归入最近的中心（倒排表）；查询只扫描最接近的 nprobe 个倒排表
+- 乘积量化（可选，pq_m > 0）：向量相对中心的残差按 pq_m 个子空间各编码为 1 字节，
+  候选先用查表近似打分，只对前 top_k * rerank 个候选用原始向量精确重排
+- 训练前与行数不足 min_train_rows 时退化为精确检索；达到后在后台线程训练，训练完成后新写入的行增量编码
+- 中心、码本与各行编码保存在集合目录的 ivf.npz，按条目 ID 对应，段压缩或索引压缩后仍可复用，
+  未命中的行（保存之后写入的）在加载时补编码
+
+nprobe 越大召回越高、延迟越高；nprobe = nlist 时等价于精确检索（PQ 重排候选足够多时）。
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .index import FlatIndex
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "ivf.npz"
+# 每个中心的训练样本数上限（样本总数另受 MAX_TRAIN_ROWS 限制）
+TRAIN_ROWS_PER_LIST = 64
+MAX_TRAIN_ROWS = 131072
+KMEANS_ITERATIONS = 12
+# 编码时每批处理的行数
+ENCODE_BATCH_ROWS = 32768
+PQ_CENTROIDS = 256
+# 每个 PQ 码字的训练样本数
+PQ_TRAIN_ROWS_PER_CENTROID = 32
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """欧氏距离 k-means（空簇用随机样本重新初始化）"""
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(data, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        nonempty = np.flatnonzero(counts)
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+        sums = np.add.reduceat(data[order], offsets, axis=0)
+        centroids[nonempty] = sums / counts[nonempty, None]
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+def _nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """每行最近的中心（argmin ||x - c||² = argmax x·c - ||c||²/2）"""
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    assign = np.empty(len(data), dtype=np.int32)
+    for lo in range(0, len(data), ENCODE_BATCH_ROWS):
+        scores = data[lo:lo + ENCODE_BATCH_ROWS] @ centroids.T
+        scores -= half_norms
+        assign[lo:lo + ENCODE_BATCH_ROWS] = scores.argmax(axis=1)
+    return assign
+
+
+def _nearest_subspaces(data: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+    """各子空间分别取最近码字：data (m, n, d)，codebooks (m, k, d) -> (n, m)"""
+    half_norms = 0.5 * np.einsum("mkd,mkd->mk", codebooks, codebooks)[:, None, :]
+    batch = max(1, ENCODE_BATCH_ROWS // len(codebooks))
+    codes = np.empty((data.shape[1], len(codebooks)), dtype=np.int32)
+    for lo in range(0, data.shape[1], batch):
+        scores = np.matmul(data[:, lo:lo + batch], codebooks.transpose(0, 2, 1))
+        scores -= half_norms
+        codes[lo:lo + batch] = scores.argmax(axis=2).T
+    return codes
+
+
+def _kmeans_subspaces(data: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """所有子空间同时做 k-means：data (m, n, d) -> 码本 (m, k, d)"""
+    m, n, d = data.shape
+    codebooks = data[:, rng.choice(n, k, replace=False)].copy()
+    offsets = (np.arange(m) * k)[None, :]
+    for _ in range(iterations):
+        flat = (_nearest_subspaces(data, codebooks) + offsets).T.ravel()
+        counts = np.bincount(flat, minlength=m * k).reshape(m, k)
+        sums = np.stack([
+            np.bincount(flat, weights=data[:, :, j].ravel(), minlength=m * k) for j in range(d)
+        ], axis=1).reshape(m, k, d)
+        nonempty = counts > 0
+        codebooks[nonempty] = (sums[nonempty] / counts[nonempty][:, None]).astype(np.float32)
+        for j, c in zip(*np.nonzero(~nonempty)):
+            codebooks[j, c] = data[j, rng.integers(n)]
+    return codebooks
+
+
+class IVFIndex(FlatIndex):
+    """倒排文件 + 可选乘积量化的近似余弦相似度检索"""
+
+    def __init__(
+        self,
+        dimension: Optional[int] = None,
+        nlist: int = 0,
+        nprobe: int = 16,
+        pq_m: int = 0,
+        rerank: int = 10,
+        min_train_rows: int = 20000,
+    ):
+        """
+        Args:
+            nlist: 中心数，0 表示训练时按 sqrt(行数) 自动选择
+            nprobe: 查询时扫描的倒排表数
+            pq_m: 乘积量化子空间数（须整除维度），0 表示不量化、候选直接精确打分
+            rerank: PQ 近似打分后精确重排的候选数倍数（top_k * rerank）
+            min_train_rows: 达到该行数后训练，之前使用精确检索
+        """
+        super().__init__(dimension)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.rerank = rerank
+        self.min_train_rows = min_train_rows
+        self._centroids: Optional[np.ndarray] = None
+        self._codebooks: Optional[np.ndarray] = None  # (pq_m, 256, 子空间维度)
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._codes = np.zeros((0, 0), dtype=np.uint8)
+        # 倒排表：按中心排序的行号与各中心的起止位置，覆盖前 _listed 行，其后的行查询时线性筛选
+        self._list_rows = np.zeros(0, dtype=np.int64)
+        self._list_offsets = np.zeros(1, dtype=np.int64)
+        self._listed = 0
+        self._training = False
+        self._path: Optional[Path] = None
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    # ---------- 编码 ----------
+
+    def _encode(
+        self, vectors: np.ndarray, centroids: np.ndarray, codebooks: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """向量 -> (所属中心, PQ 编码)"""
+        assign = _nearest(vectors, centroids)
+        if codebooks is None:
+            return assign, np.zeros((len(vectors), 0), dtype=np.uint8)
+        residual = (vectors - centroids[assign]).reshape(len(vectors), len(codebooks), -1)
+        codes = _nearest_subspaces(np.ascontiguousarray(residual.transpose(1, 0, 2)), codebooks)
+        return assign, codes.astype(np.uint8)
+
+    def _reserve_codes(self, needed: int) -> None:
+        capacity = len(self._assign)
+        if needed <= capacity:
+            return
+        capacity = max(1024, capacity)
+        while capacity < needed:
+            capacity *= 2
+        assign = np.zeros(capacity, dtype=np.int32)
+        assign[:len(self._assign)] = self._assign
+        codes = np.zeros((capacity, self._codes.shape[1]), dtype=np.uint8)
+        codes[:len(self._codes)] = self._codes
+        self._assign, self._codes = assign, codes
+
+    def _store_codes(self, start: int, assign: np.ndarray, codes: np.ndarray) -> None:
+        self._reserve_codes(start + len(assign))
+        self._assign[start:start + len(assign)] = assign
+        self._codes[start:start + len(assign)] = codes
+
+    def _encode_rows_locked(self, start: int, end: int) -> None:
+        """编码 [start, end) 行（调用方持锁）"""
+        for lo in range(start, end, ENCODE_BATCH_ROWS):
+            hi = min(end, lo + ENCODE_BATCH_ROWS)
+            vectors = self._gather(self._blocks_snapshot(), np.arange(lo, hi))
+            self._store_codes(lo, *self._encode(vectors, self._centroids, self._codebooks))
+
+    def _on_rows_added(self, start: int, matrix: np.ndarray) -> None:
+        if self._centroids is not None:
+            self._store_codes(start, *self._encode(np.asarray(matrix), self._centroids, self._codebooks))
+
+    def _on_compact(self, keep: np.ndarray) -> None:
+        if self._centroids is not None:
+            self._assign = self._assign[keep]
+            self._codes = self._codes[keep]
+        self._reset_lists()
+
+    def _reset_lists(self) -> None:
+        self._list_rows = np.zeros(0, dtype=np.int64)
+        self._list_offsets = np.zeros(len(self._centroids) + 1 if self._centroids is not None else 1, dtype=np.int64)
+        self._listed = 0
+
+    def _lists_locked(self) -> Tuple[np.ndarray, np.ndarray, int]:
+        """倒排表；未覆盖的新行超过 1/8 时重建（调用方持锁）"""
+        pending = self._size - self._listed
+        if pending > max(1024, self._size // 8):
+            assign = self._assign[:self._size]
+            self._list_rows = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=len(self._centroids))
+            self._list_offsets = np.concatenate(([0], np.cumsum(counts)))
+            self._listed = self._size
+        return self._list_rows, self._list_offsets, self._listed
+
+    # ---------- 训练 ----------
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        categories: Sequence[str],
+        normalized: bool = False,
+    ) -> int:
+        added = super().add(ids, vectors, categories, normalized)
+        self.maybe_train_in_background()
+        return added
+
+    def maybe_train_in_background(self) -> bool:
+        """行数达到 min_train_rows 且尚未训练时启动后台训练线程"""
+        with self._lock:
+            if self._centroids is not None or self._training or len(self._rows) < self.min_train_rows:
+                return False
+            self._training = True
+        threading.Thread(target=self._train_worker, name="ivf-train", daemon=True).start()
+        return True
+
+    def _train_worker(self) -> None:
+        try:
+            self.train()
+        except Exception as e:
+            logger.error(f"IVF 索引训练失败: {e}")
+        finally:
+            self._training = False
+
+    def train(self, seed: int = 0) -> bool:
+        """
+        训练中心与码本并编码所有行（耗时部分在锁外进行，期间查询使用精确检索）
+
+        Returns:
+            是否训练成功（训练期间发生压缩/清空时放弃）
+        """
+        rng = np.random.default_rng(seed)
+        with self._lock:
+            generation = self._generation
+            size = self._size
+            blocks = self._blocks_snapshot()
+            alive = np.flatnonzero(self._alive[:size])
+        if len(alive) == 0:
+            return False
+        nlist = self.nlist or int(np.clip(np.sqrt(len(alive)), 16, 4096))
+        nlist = min(nlist, len(alive))
+        sample_size = min(len(alive), nlist * TRAIN_ROWS_PER_LIST, MAX_TRAIN_ROWS)
+        sample = np.sort(rng.choice(alive, sample_size, replace=False))
+        data = self._gather(blocks, sample)
+        centroids = _kmeans(data, nlist, KMEANS_ITERATIONS, rng)
+
+        codebooks = None
+        if self.pq_m:
+            if self.dimension % self.pq_m:
+                logger.warning(f"PQ 子空间数 {self.pq_m} 不能整除维度 {self.dimension}，不使用量化")
+            else:
+                pq_data = data[:PQ_CENTROIDS * PQ_TRAIN_ROWS_PER_CENTROID]
+                residual = (pq_data - centroids[_nearest(pq_data, centroids)]).reshape(len(pq_data), self.pq_m, -1)
+                codebooks = _kmeans_subspaces(
+                    np.ascontiguousarray(residual.transpose(1, 0, 2)),
+                    min(PQ_CENTROIDS, len(pq_data)), KMEANS_ITERATIONS, rng,
+                )
+
+        assign = np.empty(size, dtype=np.int32)
+        codes = np.empty((size, self.pq_m if codebooks is not None else 0), dtype=np.uint8)
+        for lo in range(0, size, ENCODE_BATCH_ROWS):
+            hi = min(size, lo + ENCODE_BATCH_ROWS)
+            assign[lo:hi], codes[lo:hi] = self._encode(self._gather(blocks, np.arange(lo, hi)), centroids, codebooks)
+
+        with self._lock:
+            if generation != self._generation:
+                logger.info("IVF 训练期间索引已重排，放弃本次训练")
+                return False
+            self._centroids, self._codebooks = centroids, codebooks
+            self._assign, self._codes = assign, codes
+            self._encode_rows_locked(size, self._size)
+            self._reset_lists()
+        logger.info(f"IVF 索引训练完成: {size} 行, nlist={nlist}, pq_m={self.pq_m if codebooks is not None else 0}")
+        if self._path is not None:
+            self.save(self._path)
+        return True
+
+    # ---------- 持久化 ----------
+
+    def save(self, path: Path) -> None:
+        """保存中心、码本与各行编码（按条目 ID 对应）"""
+        self._path = Path(path)
+        with self._lock:
+            if self._centroids is None:
+                return
+            size = self._size
+            ids = "\n".join(entry_id or "" for entry_id in self._ids[:size])
+            arrays = {
+                "centroids": self._centroids,
+                "codebooks": self._codebooks if self._codebooks is not None else np.zeros(0, dtype=np.float32),
+                "assign": self._assign[:size],
+                "codes": self._codes[:size],
+            }
+        tmp = self._path / f"{INDEX_FILE}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, ids=np.frombuffer(ids.encode("utf-8"), dtype=np.uint8), **arrays)
+        os.replace(tmp, self._path / INDEX_FILE)
+
+    def load(self, path: Path) -> None:
+        """加载 ivf.npz，按条目 ID 恢复各行编码，未命中的行重新编码；没有文件时按需训练"""
+        self._path = Path(path)
+        index_file = self._path / INDEX_FILE
+        if not index_file.exists():
+            self.maybe_train_in_background()
+            return
+        try:
+            with np.load(index_file) as data:
+                centroids = data["centroids"]
+                codebooks = data["codebooks"] if data["codebooks"].size else None
+                saved_assign, saved_codes = data["assign"], data["codes"]
+                saved_ids = bytes(data["ids"]).decode("utf-8").split("\n")
+        except Exception as e:
+            logger.warning(f"读取 IVF 索引文件失败，将重新训练: {e}")
+            self.maybe_train_in_background()
+            return
+        if self.dimension is not None and centroids.shape[1] != self.dimension:
+            logger.warning("IVF 索引文件维度与数据不符，将重新训练")
+            self.maybe_train_in_background()
+            return
+
+        positions = {entry_id: i for i, entry_id in enumerate(saved_ids) if entry_id}
+        with self._lock:
+            self._centroids, self._codebooks = centroids, codebooks
+            size = self._size
+            self._assign = np.zeros(size, dtype=np.int32)
+            self._codes = np.zeros((size, saved_codes.shape[1]), dtype=np.uint8)
+            found = np.fromiter(
+                (positions.get(entry_id, -1) if entry_id else -2 for entry_id in self._ids[:size]),
+                dtype=np.int64, count=size,
+            )
+            hit = found >= 0
+            self._assign[hit] = saved_assign[found[hit]]
+            self._codes[hit] = saved_codes[found[hit]]
+            # 已删除的行（ID 为空）无需编码
+            missing = np.flatnonzero(found == -1)
+            for lo in range(0, len(missing), ENCODE_BATCH_ROWS):
+                rows = missing[lo:lo + ENCODE_BATCH_ROWS]
+                assign, codes = self._encode(self._gather(self._blocks_snapshot(), rows), centroids, codebooks)
+                self._assign[rows], self._codes[rows] = assign, codes
+            self._reset_lists()
+        logger.info(f"加载 IVF 索引: 复用 {int(hit.sum())} 行编码, 重新编码 {len(missing)} 行")
+
+    def clear(self) -> None:
+        super().clear()
+        with self._lock:
+            self._centroids = None
+            self._codebooks = None
+            self._assign = np.zeros(0, dtype=np.int32)
+            self._codes = np.zeros((0, 0), dtype=np.uint8)
+            self._reset_lists()
+        if self._path is not None:
+            (self._path / INDEX_FILE).unlink(missing_ok=True)
+
+    # ---------- 查询 ----------
+
+    def search(
+        self,
+        query: Sequence[float],
+        top_k: int = 5,
+        categories: Optional[Sequence[str]] = None,
+        score_threshold: float = 0.0,
+        nprobe: Optional[int] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        近似余弦相似度 top-k 检索（未训练时为精确检索）
+
+        Args:
+            nprobe: 本次查询扫描的倒排表数，默认使用 self.nprobe
+        """
+        if self._centroids is None:
+            return super().search(query, top_k, categories, score_threshold)
+        if top_k <= 0:
+            return []
+        q = self._prepare_query(query)
+        if q is None:
+            return []
+
+        with self._lock:
+            blocks, mask, ids = self._snapshot_locked(categories)
+            list_rows, list_offsets, listed = self._lists_locked()
+            centroids, codebooks = self._centroids, self._codebooks
+            assign, codes = self._assign, self._codes
+            size = self._size
+
+        coarse = centroids @ q
+        probe_count = min(nprobe or self.nprobe, len(centroids))
+        probe = np.argpartition(-coarse, probe_count - 1)[:probe_count]
+        parts = [list_rows[list_offsets[c]:list_offsets[c + 1]] for c in probe]
+        if listed < size:
+            parts.append(listed + np.flatnonzero(np.isin(assign[listed:size], probe)))
+        rows = np.concatenate(parts)
+        rows = rows[mask[rows]]
+        if len(rows) == 0:
+            return []
+
+        if codebooks is not None and len(rows) > top_k * self.rerank:
+            # 查表近似打分：q·x ≈ q·c + Σ q_j·codebook_j[code_j]
+            m = len(codebooks)
+            table = np.einsum("jkd,jd->jk", codebooks, q.reshape(m, -1))
+            row_codes = codes[rows]
+            approx = coarse[assign[rows]]
+            for j in range(m):
+                approx += table[j].take(row_codes[:, j])
+            candidates = top_k * self.rerank
+            rows = rows[np.argpartition(-approx, candidates - 1)[:candidates]]
+
+        rows.sort()
+        scores = self._score_rows(blocks, rows, q)
+        return self._top_results(scores, rows, ids, top_k, score_threshold)
@@ -3,17 +3,26 @@
 
 提供高效的知识检索能力，支持：
 - 语义相似度检索
-- 关键词混合检索
+- 关键词混合检索（BM25 关键词索引与向量索引并行检索，RRF/加权融合）
 - 重排序优化
-- 多知识库联合检索
+- 多知识库联合检索（各集合并发检索、单集合时限、k 路归并、阈值算法提前结束）
 """
 
+import asyncio
+import heapq
+import itertools
 import logging
+import os
 import re
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
+from functools import lru_cache, partial
 
+from ..utils.term_matcher import TermMatcher
 from .models import DocumentChunk, RetrievalResult, KnowledgeCategory
+from .terms import STOPWORDS, IMPORTANT_TERMS
 from .vector_store import VectorStore, VectorEntry
 from .embeddings import EmbeddingService
 
@@ -29,48 +38,35 @@ class RetrievalConfig:
     use_rerank: bool = True             # 是否使用重排序
     rerank_top_k: int = 20              # 重排序候选数量
     categories: Optional[List[str]] = None  # 限定分类
+    hybrid: bool = False                # 是否使用混合检索（BM25 + 向量，替代关键词过滤与重排序）
+    fusion: str = "rrf"                 # 混合检索融合方式：rrf / weighted
+    keyword_weight: float = 0.5         # 混合检索中关键词结果的权重
+    rrf_k: int = 60                     # RRF 平滑常数
+    store_timeout: Optional[float] = None   # 多知识库检索时单个知识库的时限（秒），超时的知识库被舍弃
+    early_termination: bool = False     # 多知识库检索按相似度上界跳过/提前结束（阈值算法）
+
+
+@lru_cache(maxsize=8)
+def _matcher_for(terms: frozenset) -> TermMatcher:
+    return TermMatcher(sorted(terms))
 
 
 class KeywordExtractor:
     """关键词提取器"""
     
     # 玄学领域停用词
-    STOPWORDS = {
-        "的", "是", "在", "有", "和", "与", "或", "了", "也", "就",
-        "都", "而", "及", "这", "那", "个", "为", "以", "对", "等",
-        "请问", "什么", "怎么", "如何", "能否", "可以", "帮我", "告诉",
-    }
+    STOPWORDS = STOPWORDS
     
     # 玄学领域重要词汇
-    IMPORTANT_TERMS = {
-        # 八字相关
-        "八字", "四柱", "天干", "地支", "年柱", "月柱", "日柱", "时柱",
-        "甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸",
-        "子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥",
-        "大运", "流年", "命宫", "身宫", "喜神", "忌神", "用神", "仇神",
-        "比肩", "劫财", "食神", "伤官", "正财", "偏财", "正官", "七杀", "正印", "偏印",
-        # 五行相关
-        "五行", "金", "木", "水", "火", "土", "相生", "相克", "生克",
-        # 六爻相关
-        "六爻", "卦象", "乾", "坤", "震", "巽", "坎", "离", "艮", "兑",
-        "世爻", "应爻", "动爻", "变爻", "用神", "原神", "忌神", "仇神",
-        # 塔罗相关
-        "塔罗", "大阿尔卡那", "小阿尔卡那", "正位", "逆位", "牌阵",
-        "愚者", "魔术师", "女祭司", "女皇", "皇帝", "教皇",
-        "权杖", "圣杯", "宝剑", "星币",
-        # 其他术数
-        "紫微斗数", "奇门遁甲", "梅花易数", "大六壬", "小六壬",
-        "风水", "方位", "吉凶", "运势", "财运", "事业", "婚姻", "健康",
-    }
+    IMPORTANT_TERMS = IMPORTANT_TERMS
+    
+    def __init__(self):
+        self._term_matcher = _matcher_for(frozenset(self.IMPORTANT_TERMS))
     
     def extract(self, text: str) -> List[str]:
         """提取关键词"""
-        keywords = []
-        
         # 提取重要术语
-        for term in self.IMPORTANT_TERMS:
-            if term in text:
-                keywords.append(term)
+        keywords = list(self._term_matcher.present(text))
         
         # 简单分词
         words = re.findall(r'[\u4e00-\u9fff]+', text)
@@ -116,6 +112,54 @@ class Reranker:
         return scored_results[:top_k]
 
 
+def fuse_hybrid(
+    vector_hits: List[Tuple[VectorEntry, float]],
+    keyword_hits: List[Tuple[VectorEntry, float]],
+    config: RetrievalConfig,
+    similarities: Optional[Dict[str, float]] = None,
+) -> List[Tuple[VectorEntry, float, bool]]:
+    """
+    融合向量与关键词检索结果
+    
+    - rrf：Σ 权重 / (rrf_k + 名次)，除以最大可能值归一化到 (0, 1]
+    - weighted：(1 - w) * 余弦相似度 + w * BM25 分数 / 本次最高 BM25 分数；
+      仅由关键词命中的条目使用 similarities 中的相似度
+    
+    Returns:
+        [(条目, 融合分数, 是否命中关键词)]，按融合分数降序
+    """
+    weight = min(max(config.keyword_weight, 0.0), 1.0)
+    entries: Dict[str, VectorEntry] = {}
+    vector_scores: Dict[str, float] = {}
+    keyword_scores: Dict[str, float] = {}
+    fused: Dict[str, float] = {}
+    
+    for rank, (entry, score) in enumerate(vector_hits, 1):
+        entries[entry.id] = entry
+        vector_scores[entry.id] = score
+        if config.fusion == "rrf":
+            fused[entry.id] = fused.get(entry.id, 0.0) + (1 - weight) / (config.rrf_k + rank)
+    top_keyword = keyword_hits[0][1] if keyword_hits else 0.0
+    for rank, (entry, score) in enumerate(keyword_hits, 1):
+        entries.setdefault(entry.id, entry)
+        keyword_scores[entry.id] = score
+        if config.fusion == "rrf":
+            fused[entry.id] = fused.get(entry.id, 0.0) + weight / (config.rrf_k + rank)
+    
+    if config.fusion == "rrf":
+        best = 1.0 / (config.rrf_k + 1)
+        fused = {entry_id: score / best for entry_id, score in fused.items()}
+    else:
+        similarities = similarities or {}
+        for entry_id in entries:
+            similarity = vector_scores.get(entry_id, similarities.get(entry_id, 0.0))
+            keyword = keyword_scores.get(entry_id, 0.0) / top_keyword if top_keyword > 0 else 0.0
+            fused[entry_id] = (1 - weight) * similarity + weight * keyword
+    
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return [(entries[entry_id], score, entry_id in keyword_scores) for entry_id, score in ranked]
+
+
 class SemanticRetriever:
     """语义检索器"""
     
@@ -137,17 +181,19 @@ class SemanticRetriever:
     ) -> List[RetrievalResult]:
         """执行检索"""
         config = config or RetrievalConfig()
+        if config.hybrid:
+            return await self._hybrid_retrieve(query, config)
         
         # 1. 嵌入查询
         query_embedding = await self.embedding_service.embed(query)
         
         # 2. 向量搜索
         search_top_k = config.rerank_top_k if config.use_rerank else config.top_k
-        candidates = self.vector_store.search(
-            query_embedding=query_embedding,
-            top_k=search_top_k,
-            categories=config.categories,
-            score_threshold=config.score_threshold * 0.5,  # 初筛用较低阈值
+        # 矩阵扫描放到线程中，多个知识库并发检索时互不阻塞
+        candidates = await asyncio.to_thread(
+            self.vector_store.search,
+            query_embedding, search_top_k, config.categories,
+            config.score_threshold * 0.5,  # 初筛用较低阈值
         )
         
         if not candidates:
@@ -176,6 +222,48 @@ class SemanticRetriever:
         
         return final_results
     
+    async def _hybrid_retrieve(
+        self,
+        query: str,
+        config: RetrievalConfig,
+    ) -> List[RetrievalResult]:
+        """混合检索：关键词检索与查询嵌入/向量检索并行，结果融合"""
+        candidate_k = max(config.rerank_top_k, config.top_k)
+        keyword_task = asyncio.ensure_future(asyncio.to_thread(
+            self.vector_store.keyword_search, query, candidate_k, config.categories,
+        ))
+        query_embedding = await self.embedding_service.embed(query)
+        vector_hits = await asyncio.to_thread(
+            self.vector_store.search,
+            query_embedding, candidate_k, config.categories, config.score_threshold * 0.5,
+        )
+        keyword_hits = await keyword_task
+        
+        similarities = None
+        if config.fusion != "rrf":
+            vector_ids = {entry.id for entry, _ in vector_hits}
+            similarities = self.vector_store.similarity(
+                query_embedding, [entry.id for entry, _ in keyword_hits if entry.id not in vector_ids],
+            )
+        
+        # 命中关键词的条目不受相似度阈值限制，其余条目按向量相似度过滤
+        vector_scores = {entry.id: score for entry, score in vector_hits}
+        final_results = []
+        for entry, score, keyword_hit in fuse_hybrid(vector_hits, keyword_hits, config, similarities):
+            if not keyword_hit and vector_scores.get(entry.id, 0.0) < config.score_threshold:
+                continue
+            chunk = DocumentChunk(
+                id=entry.id,
+                document_id=entry.document_id,
+                content=entry.content,
+                metadata=entry.metadata,
+            )
+            final_results.append(RetrievalResult(chunk=chunk, score=score))
+            if len(final_results) >= config.top_k:
+                break
+        
+        return final_results
+    
     def _keyword_filter(
         self,
         query: str,
@@ -197,17 +285,56 @@ class SemanticRetriever:
         return filtered if filtered else candidates
 
 
+# 多知识库检索的线程池大小（NumPy 矩阵乘法期间释放 GIL，扫描可以真正并行）
+SEARCH_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+_search_executor: Optional[ThreadPoolExecutor] = None
+_search_executor_lock = threading.Lock()
+
+
+def get_search_executor() -> ThreadPoolExecutor:
+    """多知识库检索共用的线程池（与默认线程池分开，不会排在文档加载等任务之后）"""
+    global _search_executor
+    if _search_executor is None:
+        with _search_executor_lock:
+            if _search_executor is None:
+                _search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="rag-search")
+    return _search_executor
+
+
 class MultiStoreRetriever:
-    """多知识库联合检索器"""
+    """
+    多知识库联合检索器
+
+    - 各知识库并发检索：search 为协程函数（远程存储）时直接在事件循环上等待，否则（NumPy 扫描）提交到线程池
+    - 每个知识库有独立时限（config.store_timeout，可用 store_timeouts 按知识库覆盖），超时的结果被舍弃
+    - 各知识库结果已按分数降序，用堆做 k 路归并，只取全局前 N 条（N 为重排序候选数或 top_k）
+    - 开启 early_termination 时按阈值算法处理：知识库按相似度上界从高到低派发，
+      上界低于初筛阈值的不检索；已归并的第 N 名分数不低于某知识库的上界时，不再等待它，尚未派发的也不再扫描
+
+    Args:
+        stores: {名称: 向量存储}
+        embedding_service: 嵌入服务
+        store_timeouts: {名称: 时限（秒）}，覆盖 config.store_timeout
+        executor: 检索线程池，缺省使用模块共用的线程池
+        max_parallel: 阈值算法下同时进行的本地扫描数，缺省为 CPU 核数
+    """
     
     def __init__(
         self,
         stores: Dict[str, VectorStore],
         embedding_service: EmbeddingService,
+        store_timeouts: Optional[Dict[str, float]] = None,
+        executor: Optional[Executor] = None,
+        max_parallel: Optional[int] = None,
     ):
         self.stores = stores
         self.embedding_service = embedding_service
+        self.store_timeouts = dict(store_timeouts or {})
+        self.executor = executor
+        self.max_parallel = max(1, max_parallel or os.cpu_count() or 1)
         self.reranker = Reranker()
+        self._stats = {"queries": 0, "searched": 0, "pruned": 0, "terminated": 0, "timeouts": 0, "errors": 0}
     
     async def retrieve(
         self,
@@ -217,35 +344,27 @@ class MultiStoreRetriever:
     ) -> List[RetrievalResult]:
         """从多个知识库检索"""
         config = config or RetrievalConfig()
-        target_stores = store_names or list(self.stores.keys())
+        target_stores = [name for name in (store_names or list(self.stores.keys())) if name in self.stores]
+        pool_size = max(config.rerank_top_k, config.top_k) if config.use_rerank else config.top_k
+        self._stats["queries"] += 1
+        if not target_stores or pool_size <= 0:
+            return []
         
         # 嵌入查询
         query_embedding = await self.embedding_service.embed(query)
         
-        # 从各知识库检索
+        # 并发检索各知识库，归并出全局候选
+        ranked = await self._search_all(query_embedding, target_stores, pool_size, config)
         all_candidates = []
-        for store_name in target_stores:
-            if store_name not in self.stores:
-                continue
-            
-            store = self.stores[store_name]
-            candidates = store.search(
-                query_embedding=query_embedding,
-                top_k=config.rerank_top_k,
-                categories=config.categories,
-                score_threshold=config.score_threshold * 0.5,
-            )
-            
+        for store_name, entry, score in itertools.islice(ranked, pool_size):
             # 添加来源标记
-            for entry, score in candidates:
-                entry.metadata["source_store"] = store_name
-                all_candidates.append((entry, score))
+            entry.metadata["source_store"] = store_name
+            all_candidates.append((entry, score))
         
         # 重排序合并结果
         if config.use_rerank:
             all_candidates = self.reranker.rerank(query, all_candidates, config.top_k)
         else:
-            all_candidates.sort(key=lambda x: x[1], reverse=True)
             all_candidates = all_candidates[:config.top_k]
         
         # 转换结果
@@ -261,3 +380,151 @@ class MultiStoreRetriever:
                 results.append(RetrievalResult(chunk=chunk, score=score))
         
         return results
+    
+    def _score_bounds(self, store_names: List[str], query_embedding: List[float]) -> Dict[str, float]:
+        """各知识库的相似度上界（不支持上界的存储视为 1.0，即不剪枝）"""
+        bounds = {}
+        for name in store_names:
+            score_bound = getattr(self.stores[name], "score_bound", None)
+            bounds[name] = score_bound(query_embedding) if callable(score_bound) else 1.0
+        return bounds
+    
+    def _is_remote(self, name: str) -> bool:
+        return asyncio.iscoroutinefunction(self.stores[name].search)
+    
+    def _dispatch(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        name: str,
+        query_embedding: List[float],
+        top_k: int,
+        config: RetrievalConfig,
+    ) -> asyncio.Future:
+        store = self.stores[name]
+        args = (query_embedding, top_k, config.categories, config.score_threshold * 0.5)
+        if self._is_remote(name):
+            return loop.create_task(store.search(*args))
+        return loop.run_in_executor(self.executor or get_search_executor(), partial(store.search, *args))
+    
+    async def _search_all(
+        self,
+        query_embedding: List[float],
+        store_names: List[str],
+        pool_size: int,
+        config: RetrievalConfig,
+    ):
+        """
+        并发检索并归并
+
+        时限自本次检索开始计时。阈值算法下本地扫描最多同时进行 max_parallel 个（按上界从高到低），
+        后面的知识库在派发前先与当前第 N 名比较，上界不够高的不再扫描；
+        远程存储与无法给出上界的存储不受名额限制，立即派发。
+
+        Returns:
+            按分数降序的 (知识库名称, 条目, 分数) 迭代器
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        floor = config.score_threshold * 0.5
+        bounds: Dict[str, float] = {}
+        window = len(store_names)
+        if config.early_termination:
+            # 首次计算上界要扫描一遍集合，放到线程中
+            bounds = await loop.run_in_executor(
+                self.executor or get_search_executor(), self._score_bounds, store_names, query_embedding,
+            )
+            pruned = [name for name in store_names if bounds[name] < floor]
+            if pruned:
+                self._stats["pruned"] += len(pruned)
+                logger.debug(f"相似度上界低于阈值，跳过知识库: {pruned}")
+            store_names = sorted(
+                (name for name in store_names if bounds[name] >= floor), key=bounds.get, reverse=True,
+            )
+            window = self.max_parallel
+        
+        queue = list(store_names)
+        names: Dict[asyncio.Future, str] = {}
+        hits: List[List[Tuple[str, VectorEntry, float]]] = []
+        pending = set()
+        
+        def launch(kth: Optional[float]) -> None:
+            local = sum(1 for future in pending if not self._is_remote(names[future]))
+            elapsed = loop.time() - start
+            for name in list(queue):
+                if kth is not None and bounds[name] <= kth:
+                    # 阈值算法：第 N 名已不低于它的上界，它不可能再改变全局前 N
+                    queue.remove(name)
+                    self._stats["terminated"] += 1
+                    continue
+                timeout = self._timeout_for(name, config)
+                if timeout is not None and timeout <= elapsed:
+                    queue.remove(name)
+                    self._stats["timeouts"] += 1
+                    logger.warning(f"知识库 {name} 等待派发时已超时，未检索")
+                    continue
+                remote = self._is_remote(name)
+                # 上界为 1 的知识库不可能被剪枝，无需占名额等待
+                if not remote and local >= window and (not bounds or bounds[name] < 1.0):
+                    continue
+                queue.remove(name)
+                future = self._dispatch(loop, name, query_embedding, pool_size, config)
+                names[future] = name
+                pending.add(future)
+                self._stats["searched"] += 1
+                local += not remote
+        
+        launch(None)
+        try:
+            while pending:
+                timeout = None
+                deadlines = [
+                    start + self._timeout_for(names[future], config) for future in pending
+                    if self._timeout_for(names[future], config) is not None
+                ]
+                if deadlines:
+                    timeout = max(0.0, min(deadlines) - loop.time())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    name = names[future]
+                    try:
+                        hits.append([(name, entry, score) for entry, score in future.result()])
+                    except Exception as e:
+                        self._stats["errors"] += 1
+                        logger.warning(f"知识库 {name} 检索失败: {e}")
+                
+                elapsed = loop.time() - start
+                for future in list(pending):
+                    timeout = self._timeout_for(names[future], config)
+                    if timeout is not None and timeout <= elapsed:
+                        future.cancel()
+                        pending.discard(future)
+                        self._stats["timeouts"] += 1
+                        logger.warning(f"知识库 {names[future]} 检索超时，结果已舍弃")
+                
+                if config.early_termination:
+                    kth = self._kth_score(hits, pool_size)
+                    if kth is not None:
+                        for future in [f for f in pending if bounds[names[f]] <= kth]:
+                            future.cancel()
+                            pending.discard(future)
+                            self._stats["terminated"] += 1
+                    launch(kth)
+        finally:
+            for future in pending:
+                future.cancel()
+        
+        return heapq.merge(*hits, key=lambda hit: hit[2], reverse=True)
+    
+    def _timeout_for(self, name: str, config: RetrievalConfig) -> Optional[float]:
+        return self.store_timeouts.get(name, config.store_timeout)
+    
+    @staticmethod
+    def _kth_score(hits: List[List[Tuple[str, VectorEntry, float]]], k: int) -> Optional[float]:
+        """已归并结果中第 k 名的分数，不足 k 条时返回 None"""
+        if sum(len(store_hits) for store_hits in hits) < k:
+            return None
+        ranked = heapq.merge(*hits, key=lambda hit: hit[2], reverse=True)
+        return next(itertools.islice(ranked, k - 1, None))[2]
+    
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
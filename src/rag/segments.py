@@ -0,0 +1,408 @@
+"""
+向量集合的分段持久化格式
+
+目录结构（每个集合一个目录）：
+- manifest.json：维度、已封存段列表、当前活动段
+- seg-000001.npy：已封存段的向量矩阵（float32，已归一化），以 mmap 只读打开，多个 worker 共享页面
+- seg-000001.jsonl：与矩阵逐行对应的条目元数据（id / document_id / content / category / metadata）
+- 活动段：seg-00000N.f32（按行追加的原始 float32）+ seg-00000N.jsonl，行数达到上限后封存为 .npy
+- deletes.log：追加写入的删除记录（id 与删除时的总行数，之后重新写入的同 id 条目不受影响）
+
+同一 id 多次写入时以最后一次为准。删除与覆盖产生的死行超过一定比例时，
+后台线程把所有存活行重写为新段并清空删除记录（旧段文件在新清单生效后删除）。
+
+旧版每个条目一个 JSON 文件的目录在首次打开时一次性迁移，原文件移入 _legacy_json/。
+"""
+
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+DELETES_FILE = "deletes.log"
+LEGACY_DIR = "_legacy_json"
+FORMAT_VERSION = 1
+
+# 活动段行数达到该值后封存
+SEGMENT_MAX_ROWS = 65536
+# 死行超过总行数该比例（且超过 COMPACT_MIN_DEAD_ROWS）时后台压缩
+COMPACT_DEAD_RATIO = 0.25
+COMPACT_MIN_DEAD_ROWS = 1000
+
+
+@dataclass
+class LoadedSegment:
+    """打开的段：向量矩阵（已封存段为 mmap）与逐行对应的元数据"""
+    name: str
+    vectors: np.ndarray
+    records: List[Dict[str, Any]]
+
+
+def _fsync_write(path: Path, data: str) -> None:
+    """原子写入（临时文件 + rename）"""
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class SegmentStore:
+    """一个向量集合的段文件读写"""
+
+    def __init__(self, path: Path, segment_rows: int = SEGMENT_MAX_ROWS):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.segment_rows = segment_rows
+        self.dimension: Optional[int] = None
+        self._sealed: List[Dict[str, Any]] = []
+        self._active: Optional[str] = None
+        self._active_rows = 0
+        self._next_segment = 1
+        self.total_rows = 0
+        self.dead_rows = 0
+        self._lock = threading.RLock()
+        self._compacting = False
+        self._read_manifest()
+
+    # ---------- 清单 ----------
+
+    def _read_manifest(self) -> None:
+        manifest_file = self.path / MANIFEST_FILE
+        if not manifest_file.exists():
+            return
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.dimension = manifest.get("dimension")
+        self._sealed = manifest.get("segments", [])
+        self._active = manifest.get("active")
+        self._next_segment = manifest.get("next_segment", len(self._sealed) + 1)
+
+    def _write_manifest(self) -> None:
+        _fsync_write(self.path / MANIFEST_FILE, json.dumps({
+            "version": FORMAT_VERSION,
+            "dimension": self.dimension,
+            "segments": self._sealed,
+            "active": self._active,
+            "next_segment": self._next_segment,
+            "updated_at": datetime.now().isoformat(),
+        }, ensure_ascii=False))
+
+    def _new_segment_name(self) -> str:
+        name = f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+        return name
+
+    @property
+    def exists(self) -> bool:
+        return (self.path / MANIFEST_FILE).exists()
+
+    # ---------- 读取 ----------
+
+    @staticmethod
+    def _read_records(path: Path, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        records: List[Dict[str, Any]] = []
+        if not path.exists():
+            return records
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if limit is not None and len(records) >= limit:
+                    break
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 写入中断的最后一行
+                    break
+        return records
+
+    def _open_active(self) -> Optional[LoadedSegment]:
+        """打开活动段（行数取向量文件与元数据中较小者，截掉写入中断的尾部）"""
+        if not self._active or not self.dimension:
+            return None
+        vector_file = self.path / f"{self._active}.f32"
+        if not vector_file.exists():
+            return None
+        rows = vector_file.stat().st_size // (4 * self.dimension)
+        records = self._read_records(self.path / f"{self._active}.jsonl", limit=rows)
+        rows = len(records)
+        self._truncate_active(rows)
+        if rows == 0:
+            return None
+        vectors = np.memmap(vector_file, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+        return LoadedSegment(self._active, vectors, records)
+
+    def load(self) -> Tuple[List[LoadedSegment], Dict[str, int]]:
+        """
+        打开所有段
+
+        Returns:
+            (按写入顺序排列的段, 删除记录 {id: 删除时的总行数})
+        """
+        with self._lock:
+            segments: List[LoadedSegment] = []
+            for info in self._sealed:
+                vectors = np.load(self.path / f"{info['name']}.npy", mmap_mode="r")
+                records = self._read_records(self.path / f"{info['name']}.jsonl", limit=len(vectors))
+                segments.append(LoadedSegment(info["name"], vectors[:len(records)], records))
+            active = self._open_active()
+            self._active_rows = 0
+            if active is not None:
+                segments.append(active)
+                self._active_rows = len(active.records)
+            self.total_rows = sum(len(segment.records) for segment in segments)
+            return segments, self._read_deletes()
+
+    def _read_deletes(self) -> Dict[str, int]:
+        deletes: Dict[str, int] = {}
+        for record in self._read_records(self.path / DELETES_FILE):
+            deletes[record["id"]] = record["seq"]
+        return deletes
+
+    def _truncate_active(self, rows: int) -> None:
+        """截掉活动段写入中断的尾部，保证两个文件行数一致"""
+        vector_file = self.path / f"{self._active}.f32"
+        if vector_file.stat().st_size != rows * 4 * self.dimension:
+            with open(vector_file, "r+b") as f:
+                f.truncate(rows * 4 * self.dimension)
+        meta_file = self.path / f"{self._active}.jsonl"
+        if not meta_file.exists():
+            return
+        with open(meta_file, "r+b") as f:
+            for _ in range(rows):
+                f.readline()
+            f.truncate(f.tell())
+
+    # ---------- 写入 ----------
+
+    def append(self, records: List[Dict[str, Any]], vectors: np.ndarray, replaced: int = 0) -> None:
+        """
+        追加条目（向量须已归一化）
+
+        Args:
+            records: 条目元数据
+            vectors: 与 records 逐行对应的向量矩阵
+            replaced: 其中覆盖已有 id 的条数（计入死行）
+        """
+        if not records:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            offset = 0
+            while offset < len(records):
+                if self._active is None:
+                    self._active = self._new_segment_name()
+                    self._active_rows = 0
+                    self._write_manifest()
+                take = min(len(records) - offset, self.segment_rows - self._active_rows)
+                with open(self.path / f"{self._active}.f32", "ab") as f:
+                    f.write(vectors[offset:offset + take].tobytes())
+                with open(self.path / f"{self._active}.jsonl", "a", encoding="utf-8") as f:
+                    f.write("".join(
+                        json.dumps(record, ensure_ascii=False) + "\n"
+                        for record in records[offset:offset + take]
+                    ))
+                self._active_rows += take
+                self.total_rows += take
+                offset += take
+                if self._active_rows >= self.segment_rows:
+                    self._seal_active()
+            self.dead_rows += replaced
+
+    def _seal_active(self) -> None:
+        """把活动段封存为 .npy"""
+        name = self._active
+        vector_file = self.path / f"{name}.f32"
+        rows = vector_file.stat().st_size // (4 * self.dimension)
+        vectors = np.memmap(vector_file, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+        np.save(self.path / f"{name}.npy", vectors)
+        del vectors
+        self._sealed.append({"name": name, "rows": rows})
+        self._active = None
+        self._active_rows = 0
+        self._write_manifest()
+        vector_file.unlink()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """追加删除记录"""
+        with self._lock:
+            lines = [
+                json.dumps({"id": entry_id, "seq": self.total_rows}, ensure_ascii=False) + "\n"
+                for entry_id in ids
+            ]
+            if not lines:
+                return 0
+            with open(self.path / DELETES_FILE, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+            self.dead_rows += len(lines)
+            return len(lines)
+
+    def flush(self) -> None:
+        """封存活动段（save_all 时调用，之后打开即为 mmap）"""
+        with self._lock:
+            if self._active is not None and self._active_rows > 0:
+                self._seal_active()
+
+    def clear(self) -> None:
+        with self._lock:
+            for f in self.path.iterdir():
+                if f.is_file() and (f.name.startswith("seg-") or f.name in (MANIFEST_FILE, DELETES_FILE)):
+                    f.unlink()
+            self.dimension = None
+            self._sealed = []
+            self._active = None
+            self._active_rows = 0
+            self._next_segment = 1
+            self.total_rows = 0
+            self.dead_rows = 0
+
+    # ---------- 压缩 ----------
+
+    def needs_compaction(self) -> bool:
+        return (
+            self.dead_rows > COMPACT_MIN_DEAD_ROWS
+            and self.dead_rows > self.total_rows * COMPACT_DEAD_RATIO
+        )
+
+    def maybe_compact_in_background(self) -> bool:
+        """死行过多时启动后台压缩线程"""
+        with self._lock:
+            if self._compacting or not self.needs_compaction():
+                return False
+            self._compacting = True
+        threading.Thread(target=self._compact_worker, name=f"compact-{self.path.name}", daemon=True).start()
+        return True
+
+    def _compact_worker(self) -> None:
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error(f"向量段压缩失败 {self.path}: {e}")
+        finally:
+            self._compacting = False
+
+    @staticmethod
+    def live_rows(segments: List[LoadedSegment], deletes: Dict[str, int]) -> Iterator[Tuple[LoadedSegment, List[int]]]:
+        """每个段中存活的行（同 id 取最后一次写入，删除记录只作用于删除前写入的行）"""
+        latest: Dict[str, Tuple[int, int, int]] = {}
+        seq = 0
+        for index, segment in enumerate(segments):
+            for row, record in enumerate(segment.records):
+                latest[record["id"]] = (index, row, seq)
+                seq += 1
+        keep: Dict[int, List[int]] = {}
+        for entry_id, (index, row, position) in latest.items():
+            deleted_at = deletes.get(entry_id)
+            if deleted_at is not None and position < deleted_at:
+                continue
+            keep.setdefault(index, []).append(row)
+        for index, segment in enumerate(segments):
+            yield segment, sorted(keep.get(index, []))
+
+    def compact(self) -> int:
+        """
+        把所有存活行重写为新段，清空删除记录
+
+        Returns:
+            压缩后的行数
+        """
+        with self._lock:
+            segments, deletes = self.load()
+            old_files = [f for f in self.path.iterdir() if f.name.startswith("seg-")]
+            new_sealed: List[Dict[str, Any]] = []
+            buffer_records: List[Dict[str, Any]] = []
+            buffer_vectors: List[np.ndarray] = []
+            buffered = 0
+
+            def write_segment() -> None:
+                nonlocal buffer_records, buffer_vectors, buffered
+                name = self._new_segment_name()
+                np.save(self.path / f"{name}.npy", np.concatenate(buffer_vectors))
+                with open(self.path / f"{name}.jsonl", "w", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in buffer_records))
+                new_sealed.append({"name": name, "rows": len(buffer_records)})
+                buffer_records, buffer_vectors, buffered = [], [], 0
+
+            for segment, rows in self.live_rows(segments, deletes):
+                position = 0
+                while position < len(rows):
+                    chunk = rows[position:position + self.segment_rows - buffered]
+                    buffer_vectors.append(np.asarray(segment.vectors[chunk]))
+                    buffer_records.extend(segment.records[row] for row in chunk)
+                    buffered += len(chunk)
+                    position += len(chunk)
+                    if buffered >= self.segment_rows:
+                        write_segment()
+            if buffered:
+                write_segment()
+            del segments
+
+            self._sealed = new_sealed
+            self._active = None
+            self._active_rows = 0
+            self._write_manifest()
+            (self.path / DELETES_FILE).unlink(missing_ok=True)
+            for f in old_files:
+                # 已打开的 mmap 在文件删除后仍然有效
+                f.unlink(missing_ok=True)
+            self.total_rows = sum(info["rows"] for info in new_sealed)
+            self.dead_rows = 0
+            logger.info(f"向量段压缩完成 {self.path}: {self.total_rows} 行, {len(new_sealed)} 段")
+            return self.total_rows
+
+    # ---------- 旧格式迁移 ----------
+
+    def migrate_legacy_json(self, keep: Iterable[str] = ()) -> int:
+        """
+        把旧版「每个条目一个 JSON 文件」的目录一次性迁移为段格式
+
+        Args:
+            keep: 目录中不属于旧格式的其他 JSON 文件名
+
+        Returns:
+            迁移的条目数
+        """
+        skip = {MANIFEST_FILE, *keep}
+        legacy_files = [f for f in self.path.glob("*.json") if not f.name.startswith("_") and f.name not in skip]
+        if self.exists or not legacy_files:
+            return 0
+        records: List[Dict[str, Any]] = []
+        vectors: List[List[float]] = []
+        for entry_file in legacy_files:
+            try:
+                with open(entry_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                embedding = data.pop("embedding")
+            except Exception as e:
+                logger.warning(f"迁移时读取向量文件失败 {entry_file}: {e}")
+                continue
+            if vectors and len(embedding) != len(vectors[0]):
+                logger.warning(f"迁移时跳过维度不符的向量 {entry_file}")
+                continue
+            records.append(data)
+            vectors.append(embedding)
+        if records:
+            from .index import normalize_rows
+            self.append(records, normalize_rows(np.asarray(vectors, dtype=np.float32)))
+            self.flush()
+        self._write_manifest()
+        legacy_dir = self.path / LEGACY_DIR
+        legacy_dir.mkdir(exist_ok=True)
+        for entry_file in legacy_files:
+            os.replace(entry_file, legacy_dir / entry_file.name)
+        index_file = self.path / "_index.json"
+        if index_file.exists():
+            os.replace(index_file, legacy_dir / index_file.name)
+        logger.info(f"向量存储已迁移为段格式 {self.path}: {len(records)} 条，原文件移至 {LEGACY_DIR}/")
+        return len(records)
@@ -10,21 +10,28 @@ RAG 服务层
 """
 
 import os
+import asyncio
+import heapq
+import itertools
 import logging
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 from .models import (
-    Document, DocumentChunk, KnowledgeBase, KnowledgeCategory,
+    Document, KnowledgeBase, KnowledgeCategory,
     RetrievalResult, RAGQuery, RAGResponse, MessageRole,
 )
 from .document_loader import KnowledgeDocumentLoader
-from .embeddings import EmbeddingService
+from .embeddings import LOCAL_IDF_FILENAME, EmbeddingService
 from .vector_store import VectorStore, VectorStoreManager
 from .retriever import SemanticRetriever, RetrievalConfig
 from .generator import RAGGenerator, GeneratorConfig
 from .conversation import ConversationManager, ConversationSession
+from .ingestion import (
+    IngestionManager, IngestionOptions, IngestionPipeline, Source,
+    directory_sources, document_sources,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -65,10 +72,15 @@ class RAGService:
             model_name=embedding_model_name,
             use_cache=True,
             cache_dir=str(self.data_path / "embedding_cache"),
+            cache_options=self._embedding_cache_options(),
+            local_idf_path=str(self.data_path / LOCAL_IDF_FILENAME),
+            batch_options=self._embedding_batch_options(),
         )
         
         self.vector_store_manager = VectorStoreManager(
-            base_path=str(self.data_path / "knowledge_bases")
+            base_path=str(self.data_path / "knowledge_bases"),
+            embedding_model=self.embedding_service.model_id,
+            **self._index_defaults(),
         )
         
         self.conversation_manager = ConversationManager(
@@ -80,6 +92,104 @@ class RAGService:
         # 知识库元数据
         self._knowledge_bases: Dict[str, KnowledgeBase] = {}
         self._load_knowledge_bases_meta()
+        
+        # 后台入库任务
+        self.ingestion = IngestionManager(
+            jobs_path=str(self.data_path / "ingestion_jobs"),
+            document_loader=self.document_loader,
+            pipeline_factory=self._ingestion_pipeline,
+            on_progress=self._record_ingested,
+            checkpoint_seconds=self._ingestion_checkpoint_seconds(),
+        )
+    
+    @staticmethod
+    def _hybrid_options() -> Dict[str, Any]:
+        """检索配置中的混合检索选项（取自 settings）"""
+        try:
+            from ..config import settings
+        except ImportError:
+            return {}
+        return {
+            "hybrid": settings.rag_hybrid_search,
+            "fusion": settings.rag_hybrid_fusion,
+            "keyword_weight": settings.rag_keyword_weight,
+        }
+    
+    @staticmethod
+    def _embedding_cache_options() -> Dict[str, Any]:
+        """嵌入缓存容量与过期配置（取自 settings）"""
+        try:
+            from ..config import settings
+        except ImportError:
+            return {}
+        return {
+            "memory_max_bytes": settings.rag_embedding_cache_memory_mb * 1024 * 1024,
+            "disk_max_bytes": settings.rag_embedding_cache_disk_mb * 1024 * 1024,
+            "ttl_seconds": settings.rag_embedding_cache_ttl_days * 86400,
+        }
+    
+    @staticmethod
+    def _embedding_batch_options() -> Dict[str, Any]:
+        """远程嵌入微批配置（取自 settings）"""
+        try:
+            from ..config import settings
+        except ImportError:
+            return {}
+        return {
+            "max_wait_ms": settings.rag_embedding_batch_wait_ms,
+            "max_batch_size": settings.rag_embedding_batch_max_size,
+            "max_concurrency": settings.rag_embedding_batch_concurrency,
+        }
+    
+    @staticmethod
+    def _ingestion_options() -> IngestionOptions:
+        """入库流水线参数（取自 settings）"""
+        try:
+            from ..config import settings
+        except ImportError:
+            return IngestionOptions()
+        return IngestionOptions(
+            queue_size=settings.rag_ingest_queue_size,
+            load_concurrency=settings.rag_ingest_load_concurrency,
+            embed_batch_size=settings.rag_ingest_embed_batch_size,
+            embed_concurrency=settings.rag_ingest_embed_concurrency,
+        )
+    
+    @staticmethod
+    def _ingestion_checkpoint_seconds() -> float:
+        try:
+            from ..config import settings
+        except ImportError:
+            return 5.0
+        return settings.rag_ingest_checkpoint_seconds
+    
+    @staticmethod
+    def _store_timeout() -> Optional[float]:
+        """单个知识库的检索时限（秒），None 表示不限（取自 settings）"""
+        try:
+            from ..config import settings
+        except ImportError:
+            return None
+        timeout_ms = settings.rag_retrieval_store_timeout_ms
+        return timeout_ms / 1000.0 if timeout_ms > 0 else None
+    
+    @staticmethod
+    def _index_defaults() -> Dict[str, Any]:
+        """新建知识库的向量索引配置（取自 settings）"""
+        try:
+            from ..config import settings
+        except ImportError:
+            return {}
+        if settings.rag_vector_index != "ivf":
+            return {"default_index_type": settings.rag_vector_index}
+        return {
+            "default_index_type": "ivf",
+            "default_index_params": {
+                "nprobe": settings.rag_ivf_nprobe,
+                "pq_m": settings.rag_ivf_pq_m,
+                "min_train_rows": settings.rag_ivf_min_train_rows,
+            },
+        }
     
     # ==================== 知识库管理 ====================
     
@@ -94,7 +204,7 @@ class RAGService:
             name=name,
             description=description,
             category=category,
-            embedding_model=self.embedding_service.model.name,
+            embedding_model=self.embedding_service.model_id,
         )
         
         self._knowledge_bases[kb.id] = kb
@@ -119,6 +229,7 @@ class RAGService:
         if kb_id not in self._knowledge_bases:
             return False
         
+        self.ingestion.cancel_for(kb_id)
         del self._knowledge_bases[kb_id]
         self._save_knowledge_bases_meta()
         self.vector_store_manager.delete_store(kb_id)
@@ -139,14 +250,11 @@ class RAGService:
         if not kb:
             raise ValueError(f"知识库不存在: {kb_id}")
         
-        # 加载文档
-        documents = self.document_loader.load_from_directory(directory, recursive)
-        
-        if not documents:
+        sources = await asyncio.to_thread(directory_sources, self.document_loader, directory, recursive)
+        if not sources:
             return {"added": 0, "chunks": 0}
         
-        # 处理文档
-        result = await self._process_documents(kb_id, documents)
+        result = await self._ingest(kb_id, sources)
         
         # 更新知识库统计
         kb.document_count += result["added"]
@@ -176,7 +284,7 @@ class RAGService:
             metadata=metadata or {},
         )
         
-        result = await self._process_documents(kb_id, [doc])
+        result = await self._ingest(kb_id, document_sources([doc]))
         
         # 更新统计
         kb.document_count += result["added"]
@@ -204,7 +312,7 @@ class RAGService:
             )
             documents.append(doc)
         
-        result = await self._process_documents(kb_id, documents)
+        result = await self._ingest(kb_id, document_sources(documents))
         
         # 更新统计
         kb.document_count += result["added"]
@@ -214,53 +322,87 @@ class RAGService:
         
         return result
     
-    async def _process_documents(
+    def _ingestion_pipeline(self, kb_id: str) -> IngestionPipeline:
+        """创建写入指定知识库的入库流水线"""
+        if kb_id not in self._knowledge_bases:
+            raise ValueError(f"知识库不存在: {kb_id}")
+        return IngestionPipeline(
+            embedding_service=self.embedding_service,
+            vector_store=self.vector_store_manager.get_store(kb_id, self.embedding_service.dimension),
+            chunker=self.document_loader.chunker,
+            options=self._ingestion_options(),
+        )
+    
+    async def _ingest(self, kb_id: str, sources: List[Source]) -> Dict[str, Any]:
+        """在当前请求中运行入库流水线：加载 -> 分块 -> 去重 -> 批量嵌入 -> 整批写入"""
+        pipeline = self._ingestion_pipeline(kb_id)
+        await pipeline.run(sources)
+        stats = pipeline.snapshot()
+        logger.info(
+            f"处理了 {stats['documents']} 个文档，{stats['chunks']} 个分块"
+            f"（重复 {stats['duplicate_chunks']} 个，{stats['documents_per_sec']} 文档/秒）"
+        )
+        if pipeline.failed:
+            logger.warning(f"{len(pipeline.failed)} 个来源加载失败: {sorted(pipeline.failed)}")
+        return {
+            "added": stats["documents"],
+            "chunks": stats["chunks"],
+            "duplicates": stats["duplicate_chunks"],
+            "failed": sorted(pipeline.failed),
+        }
+    
+    def _record_ingested(self, kb_id: str, documents: int, chunks: int) -> None:
+        """后台任务写入后更新知识库统计"""
+        kb = self._knowledge_bases.get(kb_id)
+        if not kb:
+            return
+        kb.document_count += documents
+        kb.chunk_count += chunks
+        kb.updated_at = datetime.now()
+        self._save_knowledge_bases_meta()
+    
+    # ==================== 后台入库任务 ====================
+    
+    async def start_ingestion_job(
         self,
         kb_id: str,
-        documents: List[Document],
+        directory: str = None,
+        recursive: bool = True,
+        documents_data: List[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
-        """处理文档：分块 -> 嵌入 -> 存储"""
-        vector_store = self.vector_store_manager.get_store(
-            kb_id, self.embedding_service.dimension
-        )
-        
-        total_chunks = 0
-        added_docs = 0
+        """创建后台入库任务（目录与文档列表二选一），立即返回任务状态"""
+        kb = self.get_knowledge_base(kb_id)
+        if not kb:
+            raise ValueError(f"知识库不存在: {kb_id}")
         
-        for doc in documents:
-            # 分块
-            chunk_texts = self.document_loader.chunk_document(doc)
-            if not chunk_texts:
-                continue
-            
-            # 创建 chunks
-            chunks = []
-            for idx, text in enumerate(chunk_texts):
-                chunk = DocumentChunk(
-                    document_id=doc.id,
-                    content=text,
-                    chunk_index=idx,
-                    metadata={
-                        "title": doc.title,
-                        "category": doc.category.value,
-                        "source": doc.source,
-                    },
+        documents = None
+        if documents_data:
+            documents = [
+                self.document_loader.load_from_dict(
+                    data,
+                    category=KnowledgeCategory(data.get("category", kb.category.value)),
                 )
-                chunks.append(chunk)
-            
-            # 批量嵌入
-            embeddings = await self.embedding_service.embed_batch(
-                [c.content for c in chunks]
-            )
-            
-            # 存储向量
-            vector_store.add_batch(chunks, embeddings, doc.category.value)
-            
-            total_chunks += len(chunks)
-            added_docs += 1
-        
-        logger.info(f"处理了 {added_docs} 个文档，{total_chunks} 个分块")
-        return {"added": added_docs, "chunks": total_chunks}
+                for data in documents_data
+            ]
+        job = await self.ingestion.start(kb_id, directory=directory, recursive=recursive, documents=documents)
+        return self.ingestion.get(job.id)
+    
+    def get_ingestion_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取入库任务状态"""
+        return self.ingestion.get(job_id)
+    
+    def list_ingestion_jobs(self, kb_id: str = None) -> List[Dict[str, Any]]:
+        """列出入库任务"""
+        return self.ingestion.list(kb_id)
+    
+    def cancel_ingestion_job(self, job_id: str) -> bool:
+        """取消入库任务（已完成的来源保留在检查点中）"""
+        return self.ingestion.cancel(job_id)
+    
+    async def resume_ingestion_job(self, job_id: str) -> Dict[str, Any]:
+        """从检查点继续入库任务"""
+        job = await self.ingestion.resume(job_id)
+        return self.ingestion.get(job.id)
     
     # ==================== 检索与生成 ====================
     
@@ -315,8 +457,8 @@ class RAGService:
         return response
     
     async def _retrieve(self, query: RAGQuery) -> List[RetrievalResult]:
-        """执行检索"""
-        all_results = []
+        """执行检索（各知识库并发检索，结果按分数 k 路归并）"""
+        retrievals = []
         
         # 确定检索范围
         kb_ids = list(self._knowledge_bases.keys())
@@ -326,6 +468,8 @@ class RAGService:
             score_threshold=query.score_threshold,
             use_rerank=query.use_rerank,
             categories=query.categories,
+            store_timeout=self._store_timeout(),
+            **self._hybrid_options(),
         )
         
         # 从各知识库检索
@@ -345,12 +489,25 @@ class RAGService:
                 embedding_service=self.embedding_service,
             )
             
-            results = await retriever.retrieve(query.query, config)
-            all_results.extend(results)
+            retrievals.append(
+                self._retrieve_within(kb_id, retriever.retrieve(query.query, config), config.store_timeout)
+            )
         
-        # 按分数排序并截取
-        all_results.sort(key=lambda r: r.score, reverse=True)
-        return all_results[:query.top_k]
+        # 各知识库结果已按分数降序，归并后截取
+        results = await asyncio.gather(*retrievals)
+        ranked = heapq.merge(*results, key=lambda r: r.score, reverse=True)
+        return list(itertools.islice(ranked, query.top_k))
+    
+    @staticmethod
+    async def _retrieve_within(kb_id: str, retrieval, timeout: Optional[float]) -> List[RetrievalResult]:
+        """等待单个知识库的检索，超过时限时舍弃其结果"""
+        if timeout is None:
+            return await retrieval
+        try:
+            return await asyncio.wait_for(retrieval, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"知识库 {kb_id} 检索超时（{timeout * 1000:.0f}ms），结果已舍弃")
+            return []
     
     # ==================== 追问对话 ====================
     
@@ -419,8 +576,10 @@ class RAGService:
             "knowledge_bases": kb_stats,
             "total_knowledge_bases": len(self._knowledge_bases),
             "active_conversations": len(conversations),
-            "embedding_model": self.embedding_service.model.name,
+            "embedding_model": self.embedding_service.model_id,
             "embedding_dimension": self.embedding_service.dimension,
+            "embedding_cache": self.embedding_service.cache.stats() if self.embedding_service.cache else None,
+            "embedding_batcher": self.embedding_service.batcher.stats() if self.embedding_service.batcher else None,
         }
     
     def _load_knowledge_bases_meta(self):
@@ -447,6 +606,7 @@ class RAGService:
                         updated_at=datetime.fromisoformat(kb_data["updated_at"]) if "updated_at" in kb_data else datetime.now(),
                     )
                     self._knowledge_bases[kb.id] = kb
+                    self.vector_store_manager.legacy_models[kb.id] = kb.embedding_model
                 
                 logger.info(f"加载了 {len(self._knowledge_bases)} 个知识库")
             except Exception as e:
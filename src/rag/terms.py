@@ -0,0 +1,34 @@
+"""
+玄学领域词表
+
+关键词提取（retriever.py）与关键词索引分词（bm25.py）共用
+"""
+
+# 玄学领域停用词
+STOPWORDS = frozenset({
+    "的", "是", "在", "有", "和", "与", "或", "了", "也", "就",
+    "都", "而", "及", "这", "那", "个", "为", "以", "对", "等",
+    "请问", "什么", "怎么", "如何", "能否", "可以", "帮我", "告诉",
+})
+
+# 玄学领域重要词汇
+IMPORTANT_TERMS = frozenset({
+    # 八字相关
+    "八字", "四柱", "天干", "地支", "年柱", "月柱", "日柱", "时柱",
+    "甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸",
+    "子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥",
+    "大运", "流年", "命宫", "身宫", "喜神", "忌神", "用神", "仇神",
+    "比肩", "劫财", "食神", "伤官", "正财", "偏财", "正官", "七杀", "正印", "偏印",
+    # 五行相关
+    "五行", "金", "木", "水", "火", "土", "相生", "相克", "生克",
+    # 六爻相关
+    "六爻", "卦象", "乾", "坤", "震", "巽", "坎", "离", "艮", "兑",
+    "世爻", "应爻", "动爻", "变爻", "用神", "原神", "忌神", "仇神",
+    # 塔罗相关
+    "塔罗", "大阿尔卡那", "小阿尔卡那", "正位", "逆位", "牌阵",
+    "愚者", "魔术师", "女祭司", "女皇", "皇帝", "教皇",
+    "权杖", "圣杯", "宝剑", "星币",
+    # 其他术数
+    "紫微斗数", "奇门遁甲", "梅花易数", "大六壬", "小六壬",
+    "风水", "方位", "吉凶", "运势", "财运", "事业", "婚姻", "健康",
+})
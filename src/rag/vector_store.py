@@ -2,29 +2,65 @@
 向量存储
 
 轻量级向量存储实现，支持：
-- 基于文件的持久化存储
-- 高效的相似度搜索
+- 分段持久化（.npy 向量矩阵 mmap 打开 + 追加写入的元数据/删除日志，见 segments.py）
+- 高效的相似度搜索（向量保存在 float32 矩阵中，见 index.py）
+- 每个集合可选索引类型：flat 精确检索 / ivf 近似检索（IVF、IVF-PQ，见 ivf.py），配置保存在集合目录的 index.json
+- 集合记录写入向量的嵌入模型标识（index.json），与当前模型不一致时拒绝写入与向量检索
+- BM25 关键词索引（见 bm25.py），入库时建立，与向量索引一起保存，供混合检索使用
 - 动态索引管理
 """
 
 import json
-import math
 import logging
-import os
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass, asdict
-from datetime import datetime
+from dataclasses import dataclass, replace
 import threading
 
+import numpy as np
+
 from .models import DocumentChunk, KnowledgeCategory
+from .bm25 import BM25Index, INDEX_FILE as KEYWORD_INDEX_FILE
+from .index import FlatIndex, normalize_rows
+from .ivf import IVFIndex
+from .segments import SegmentStore
 
 logger = logging.getLogger(__name__)
 
+INDEX_CONFIG_FILE = "index.json"
+INDEX_TYPES = {
+    "flat": FlatIndex,
+    "ivf": IVFIndex,
+}
+
+# 升级前的本地嵌入模型（按进程加盐的 hash()，向量无法复现）
+LEGACY_LOCAL_MODEL_ID = "local-v1"
+
+
+def legacy_model_id(current: Optional[str], legacy_name: Optional[str] = None) -> Optional[str]:
+    """
+    升级前未记录模型标识、但已有向量的集合所对应的模型标识
+
+    Args:
+        current: 当前嵌入模型标识
+        legacy_name: 知识库元数据中记录的模型名（旧版为 local / openai），未知时按当前后端推断
+
+    Returns:
+        None 表示沿用当前模型（旧版 OpenAI 集合与当前 OpenAI 接口生成的向量一致）
+    """
+    if not current or legacy_name == current:
+        return None
+    backend = legacy_name or ("local" if current.startswith("local-") else "openai")
+    if backend == "local":
+        return LEGACY_LOCAL_MODEL_ID
+    if backend == "openai" and current.startswith("openai:"):
+        return None
+    return backend
+
 
 @dataclass
 class VectorEntry:
-    """向量条目"""
+    """向量条目（内存中的向量只保存在索引矩阵里，embedding 由 get() 等按需填充）"""
     id: str
     document_id: str
     content: str
@@ -41,7 +77,18 @@ class VectorStore:
         store_path: str = None,
         dimension: int = 1536,
         auto_save: bool = True,
+        index_type: Optional[str] = None,
+        index_params: Optional[Dict[str, Any]] = None,
+        embedding_model: Optional[str] = None,
+        legacy_embedding_model: Optional[str] = None,
     ):
+        """
+        Args:
+            index_type: 索引类型（flat / ivf），None 表示沿用集合已保存的配置（默认 flat）
+            index_params: 索引参数（如 ivf 的 nlist / nprobe / pq_m），None 表示沿用已保存的配置
+            embedding_model: 当前嵌入模型标识；集合尚未记录时写入，已记录且不同时标记为不匹配
+            legacy_embedding_model: 知识库元数据中记录的模型名，用于判断未记录模型标识的旧集合（见 legacy_model_id）
+        """
         self.store_path = Path(store_path) if store_path else Path("data/vector_store")
         self.store_path.mkdir(parents=True, exist_ok=True)
         self.dimension = dimension
@@ -50,10 +97,106 @@ class VectorStore:
         self._entries: Dict[str, VectorEntry] = {}
         self._category_index: Dict[str, List[str]] = {}  # category -> [entry_ids]
         self._document_index: Dict[str, List[str]] = {}  # doc_id -> [entry_ids]
+        self._content_index: Dict[str, int] = {}  # 内容 -> 条目数（入库去重）
+        self.index_type, self.index_params = self._index_config(index_type, index_params)
+        self._index = INDEX_TYPES[self.index_type](**self.index_params)
+        self._segments = SegmentStore(self.store_path)
+        self._keywords = BM25Index()
+        # auto_save=False 时尚未写入磁盘的操作，save_all() 时按顺序写入
+        self._pending: List[Tuple[str, Any]] = []
         self._lock = threading.Lock()
         
         # 加载已有数据
         self._load()
+        self._current_embedding_model = embedding_model
+        self.embedding_model, self.model_mismatch = self._bind_embedding_model(
+            embedding_model, legacy_embedding_model
+        )
+    
+    def _read_config(self) -> Dict[str, Any]:
+        config_file = self.store_path / INDEX_CONFIG_FILE
+        if not config_file.exists():
+            return {}
+        try:
+            with open(config_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取索引配置失败: {e}")
+            return {}
+    
+    def _write_config(self, config: Dict[str, Any]) -> None:
+        with open(self.store_path / INDEX_CONFIG_FILE, "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False)
+    
+    def _bind_embedding_model(
+        self, embedding_model: Optional[str], legacy_name: Optional[str] = None
+    ) -> Tuple[Optional[str], bool]:
+        """记录或校验集合的嵌入模型标识，返回 (集合的模型标识, 是否与当前模型不匹配)"""
+        config = self._read_config()
+        saved = config.get("embedding_model")
+        if embedding_model is None or saved == embedding_model:
+            return saved, False
+        if saved is None:
+            # 升级前已有向量的集合按旧模型记录（旧本地模型的向量不可复现，须重新入库）；新集合以当前模型为准
+            saved = legacy_model_id(embedding_model, legacy_name) if self._entries else None
+            config["embedding_model"] = saved or embedding_model
+            self._write_config(config)
+            if saved is None:
+                return embedding_model, False
+        logger.error(
+            f"集合 {self.store_path} 的向量由 {saved} 生成，与当前嵌入模型 {embedding_model} 不一致，"
+            f"已停用写入与向量检索，请清空后重新入库"
+        )
+        return saved, True
+    
+    def _index_config(
+        self, index_type: Optional[str], index_params: Optional[Dict[str, Any]]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """确定索引类型与参数；显式指定且与已保存的不同时写入 index.json"""
+        saved = self._read_config()
+        config = dict(saved)
+        config["type"] = index_type or saved.get("type", "flat")
+        config["params"] = index_params if index_params is not None else saved.get("params", {})
+        if config["type"] not in INDEX_TYPES:
+            logger.warning(f"未知的索引类型 {config['type']}，使用 flat")
+            config.update(type="flat", params={})
+        if config != saved and (index_type or index_params is not None):
+            self._write_config(config)
+        return config["type"], dict(config["params"])
+    
+    def _index_entry(self, entry: VectorEntry) -> None:
+        """登记条目及分类/文档索引（调用方持锁）"""
+        if entry.id in self._entries:
+            self._unindex_entry(self._entries[entry.id])
+        self._entries[entry.id] = entry
+        
+        if entry.category not in self._category_index:
+            self._category_index[entry.category] = []
+        self._category_index[entry.category].append(entry.id)
+        
+        if entry.document_id not in self._document_index:
+            self._document_index[entry.document_id] = []
+        self._document_index[entry.document_id].append(entry.id)
+        
+        self._content_index[entry.content] = self._content_index.get(entry.content, 0) + 1
+    
+    def _unindex_entry(self, entry: VectorEntry) -> None:
+        """移除条目的分类/文档索引（调用方持锁）"""
+        if entry.category in self._category_index:
+            self._category_index[entry.category] = [
+                id for id in self._category_index[entry.category] if id != entry.id
+            ]
+        
+        if entry.document_id in self._document_index:
+            self._document_index[entry.document_id] = [
+                id for id in self._document_index[entry.document_id] if id != entry.id
+            ]
+        
+        remaining = self._content_index.get(entry.content, 0) - 1
+        if remaining > 0:
+            self._content_index[entry.content] = remaining
+        else:
+            self._content_index.pop(entry.content, None)
     
     def add(
         self,
@@ -62,31 +205,7 @@ class VectorStore:
         category: str = "general",
     ) -> str:
         """添加向量"""
-        with self._lock:
-            entry = VectorEntry(
-                id=chunk.id,
-                document_id=chunk.document_id,
-                content=chunk.content,
-                embedding=embedding,
-                category=category,
-                metadata=chunk.metadata,
-            )
-            
-            self._entries[entry.id] = entry
-            
-            # 更新索引
-            if category not in self._category_index:
-                self._category_index[category] = []
-            self._category_index[category].append(entry.id)
-            
-            if chunk.document_id not in self._document_index:
-                self._document_index[chunk.document_id] = []
-            self._document_index[chunk.document_id].append(entry.id)
-            
-            if self.auto_save:
-                self._save_entry(entry)
-            
-            return entry.id
+        return self.add_batch([chunk], [embedding], category)[0]
     
     def add_batch(
         self,
@@ -94,12 +213,53 @@ class VectorStore:
         embeddings: List[List[float]],
         category: str = "general",
     ) -> List[str]:
-        """批量添加向量"""
-        ids = []
-        for chunk, embedding in zip(chunks, embeddings):
-            entry_id = self.add(chunk, embedding, category)
-            ids.append(entry_id)
-        return ids
+        """批量添加向量（向量一次性写入矩阵并追加到活动段）"""
+        if not chunks:
+            return []
+        if self.model_mismatch:
+            logger.warning(f"集合嵌入模型 {self.embedding_model} 与当前模型不一致，已跳过 {len(chunks)} 条")
+            return []
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            # 各向量长度不一致，逐条处理
+            return [
+                entry_id
+                for chunk, embedding in zip(chunks, embeddings)
+                for entry_id in self.add_batch([chunk], [embedding], category)
+            ]
+        if self._index.dimension is not None and matrix.shape[1] != self._index.dimension:
+            logger.warning(f"向量维度 {matrix.shape[1]} 与存储维度 {self._index.dimension} 不符，已跳过 {len(chunks)} 条")
+            return []
+        matrix = normalize_rows(matrix)
+        entries = [
+            VectorEntry(
+                id=chunk.id,
+                document_id=chunk.document_id,
+                content=chunk.content,
+                embedding=[],
+                category=category,
+                metadata=chunk.metadata,
+            )
+            for chunk in chunks
+        ]
+        with self._lock:
+            replaced = sum(1 for entry in entries if entry.id in self._entries)
+            for entry in entries:
+                self._index_entry(entry)
+            self._index.add(
+                [entry.id for entry in entries],
+                matrix,
+                [entry.category for entry in entries],
+                normalized=True,
+            )
+            self._persist(("add", ([self._record(entry) for entry in entries], matrix, replaced)))
+        self._keywords.add(
+            [entry.id for entry in entries],
+            [entry.content for entry in entries],
+            [entry.category for entry in entries],
+        )
+        
+        return [entry.id for entry in entries]
     
     def search(
         self,
@@ -108,86 +268,97 @@ class VectorStore:
         categories: List[str] = None,
         score_threshold: float = 0.0,
     ) -> List[Tuple[VectorEntry, float]]:
-        """相似度搜索"""
+        """相似度搜索（矩阵-向量乘法 + argpartition top-k，扫描期间不持有存储锁）"""
+        if self.model_mismatch:
+            # 查询向量与集合向量来自不同模型，相似度没有意义
+            return []
+        results = []
+        for entry_id, score in self._index.search(query_embedding, top_k, categories, score_threshold):
+            entry = self._entries.get(entry_id)
+            if entry:
+                results.append((entry, score))
+        return results
+    
+    def score_bound(self, query_embedding: List[float]) -> float:
+        """查询与本集合任一条目相似度的上界（多集合检索据此跳过或提前结束，见 FlatIndex.score_bound）"""
+        if self.model_mismatch:
+            return float("-inf")
+        return self._index.score_bound(query_embedding)
+    
+    def keyword_search(
+        self,
+        query: str,
+        top_k: int = 5,
+        categories: List[str] = None,
+    ) -> List[Tuple[VectorEntry, float]]:
+        """BM25 关键词检索，返回 (条目, BM25 分数)"""
+        results = []
+        for entry_id, score in self._keywords.search(query, top_k, categories):
+            entry = self._entries.get(entry_id)
+            if entry:
+                results.append((entry, score))
+        return results
+    
+    def similarity(self, query_embedding: List[float], entry_ids: List[str]) -> Dict[str, float]:
+        """查询向量与指定条目的余弦相似度"""
+        if self.model_mismatch:
+            return {}
+        q = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm > 0:
+            q = q / norm
+        scores = {}
+        for entry_id in entry_ids:
+            vector = self._index.get_vector(entry_id)
+            if vector is not None and vector.shape == q.shape:
+                scores[entry_id] = float(vector @ q)
+        return scores
+    
+    def _delete_many(self, entry_ids: List[str]) -> int:
+        """批量删除：一次写入删除日志，死行过多时后台压缩段文件"""
         with self._lock:
-            # 确定搜索范围
-            if categories:
-                candidate_ids = set()
-                for cat in categories:
-                    candidate_ids.update(self._category_index.get(cat, []))
-            else:
-                candidate_ids = set(self._entries.keys())
-            
-            if not candidate_ids:
-                return []
-            
-            # 计算相似度
-            results = []
-            for entry_id in candidate_ids:
-                entry = self._entries.get(entry_id)
-                if not entry:
+            deleted = []
+            for entry_id in entry_ids:
+                entry = self._entries.pop(entry_id, None)
+                if entry is None:
                     continue
-                
-                score = self._cosine_similarity(query_embedding, entry.embedding)
-                if score >= score_threshold:
-                    results.append((entry, score))
-            
-            # 排序并返回 top_k
-            results.sort(key=lambda x: x[1], reverse=True)
-            return results[:top_k]
+                self._unindex_entry(entry)
+                deleted.append(entry_id)
+            if not deleted:
+                return 0
+            self._index.remove(deleted)
+            self._keywords.remove(deleted)
+            self._persist(("delete", deleted))
+        if self.auto_save:
+            self._segments.maybe_compact_in_background()
+        return len(deleted)
     
     def delete(self, entry_id: str) -> bool:
         """删除向量"""
-        with self._lock:
-            if entry_id not in self._entries:
-                return False
-            
-            entry = self._entries.pop(entry_id)
-            
-            # 更新索引
-            if entry.category in self._category_index:
-                self._category_index[entry.category] = [
-                    id for id in self._category_index[entry.category] if id != entry_id
-                ]
-            
-            if entry.document_id in self._document_index:
-                self._document_index[entry.document_id] = [
-                    id for id in self._document_index[entry.document_id] if id != entry_id
-                ]
-            
-            # 删除文件
-            entry_file = self.store_path / f"{entry_id}.json"
-            if entry_file.exists():
-                entry_file.unlink()
-            
-            return True
+        return self._delete_many([entry_id]) > 0
     
     def delete_by_document(self, document_id: str) -> int:
         """删除文档的所有向量"""
-        entry_ids = self._document_index.get(document_id, []).copy()
-        count = 0
-        for entry_id in entry_ids:
-            if self.delete(entry_id):
-                count += 1
-        return count
+        return self._delete_many(self._document_index.get(document_id, []).copy())
     
     def delete_by_category(self, category: str) -> int:
         """删除分类的所有向量"""
-        entry_ids = self._category_index.get(category, []).copy()
-        count = 0
-        for entry_id in entry_ids:
-            if self.delete(entry_id):
-                count += 1
-        return count
+        return self._delete_many(self._category_index.get(category, []).copy())
+    
+    def _with_embedding(self, entry: VectorEntry) -> VectorEntry:
+        """附带向量（取自索引矩阵，已归一化）"""
+        vector = self._index.get_vector(entry.id)
+        return replace(entry, embedding=vector.tolist() if vector is not None else [])
     
     def get(self, entry_id: str) -> Optional[VectorEntry]:
         """获取向量"""
-        return self._entries.get(entry_id)
+        entry = self._entries.get(entry_id)
+        return self._with_embedding(entry) if entry else None
     
     def get_by_document(self, document_id: str) -> List[VectorEntry]:
         """获取文档的所有向量"""
         entry_ids = self._document_index.get(document_id, [])
-        return [self._entries[id] for id in entry_ids if id in self._entries]
+        return [self._with_embedding(self._entries[id]) for id in entry_ids if id in self._entries]
     
     def count(self, category: str = None) -> int:
         """统计向量数量"""
@@ -195,77 +366,99 @@ class VectorStore:
             return len(self._category_index.get(category, []))
         return len(self._entries)
     
+    def has_content(self, content: str) -> bool:
+        """是否已有内容完全相同的条目"""
+        return content in self._content_index
+    
+    def list_contents(self) -> List[str]:
+        """全部条目的文本（拟合本地嵌入 IDF 等离线任务使用）"""
+        with self._lock:
+            return [entry.content for entry in self._entries.values()]
+    
     def list_categories(self) -> Dict[str, int]:
         """列出所有分类及数量"""
         return {cat: len(ids) for cat, ids in self._category_index.items()}
     
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """计算余弦相似度"""
-        if len(vec1) != len(vec2):
-            return 0.0
-        
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        norm1 = math.sqrt(sum(a * a for a in vec1))
-        norm2 = math.sqrt(sum(b * b for b in vec2))
-        
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-        
-        return dot_product / (norm1 * norm2)
+    @staticmethod
+    def _record(entry: VectorEntry) -> Dict[str, Any]:
+        """段文件中的条目元数据"""
+        return {
+            "id": entry.id,
+            "document_id": entry.document_id,
+            "content": entry.content,
+            "category": entry.category,
+            "metadata": entry.metadata,
+        }
     
-    def _save_entry(self, entry: VectorEntry):
-        """保存单个条目到文件"""
+    def _persist(self, op: Tuple[str, Any]) -> None:
+        """写入段文件（auto_save=False 时暂存，调用方持锁）"""
+        if not self.auto_save:
+            self._pending.append(op)
+            return
         try:
-            entry_file = self.store_path / f"{entry.id}.json"
-            with open(entry_file, 'w', encoding='utf-8') as f:
-                json.dump(asdict(entry), f, ensure_ascii=False)
+            kind, payload = op
+            if kind == "add":
+                records, matrix, replaced = payload
+                self._segments.append(records, matrix, replaced)
+            else:
+                self._segments.delete(payload)
         except Exception as e:
             logger.error(f"保存向量条目失败: {e}")
     
     def _load(self):
-        """从文件加载所有条目"""
+        """打开段文件（旧版 JSON 目录先一次性迁移）"""
         try:
-            for entry_file in self.store_path.glob("*.json"):
-                if entry_file.name.startswith("_"):
-                    continue
-                
-                try:
-                    with open(entry_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    entry = VectorEntry(**data)
-                    self._entries[entry.id] = entry
-                    
-                    # 更新索引
-                    if entry.category not in self._category_index:
-                        self._category_index[entry.category] = []
-                    self._category_index[entry.category].append(entry.id)
-                    
-                    if entry.document_id not in self._document_index:
-                        self._document_index[entry.document_id] = []
-                    self._document_index[entry.document_id].append(entry.id)
-                except Exception as e:
-                    logger.warning(f"加载向量文件失败 {entry_file}: {e}")
+            self._segments.migrate_legacy_json(keep=[INDEX_CONFIG_FILE])
+            segments, deletes = self._segments.load()
+            positions: Dict[str, int] = {}
+            offset = 0
+            for segment in segments:
+                ids = []
+                categories = []
+                for row, record in enumerate(segment.records):
+                    entry = VectorEntry(embedding=[], **record)
+                    self._index_entry(entry)
+                    positions[entry.id] = offset + row
+                    ids.append(entry.id)
+                    categories.append(entry.category)
+                self._index.add_block(ids, segment.vectors, categories)
+                offset += len(segment.records)
             
-            logger.info(f"加载了 {len(self._entries)} 个向量条目")
+            # 删除记录只作用于删除之前写入的条目
+            deleted = [
+                entry_id for entry_id, seq in deletes.items()
+                if entry_id in positions and positions[entry_id] < seq
+            ]
+            for entry_id in deleted:
+                self._unindex_entry(self._entries.pop(entry_id))
+            self._index.remove(deleted)
+            self._segments.dead_rows = self._segments.total_rows - len(self._entries)
+            self._index.load(self.store_path)
+            self._keywords.load(
+                self.store_path,
+                {entry.id: (entry.content, entry.category) for entry in self._entries.values()},
+            )
+            logger.info(f"加载了 {len(self._entries)} 个向量条目（{len(segments)} 段）")
         except Exception as e:
             logger.error(f"加载向量存储失败: {e}")
     
     def save_all(self):
-        """保存所有条目"""
+        """写入暂存的操作并封存活动段"""
         with self._lock:
-            for entry in self._entries.values():
-                self._save_entry(entry)
-            
-            # 保存索引
-            index_file = self.store_path / "_index.json"
-            with open(index_file, 'w', encoding='utf-8') as f:
-                json.dump({
-                    "category_index": self._category_index,
-                    "document_index": self._document_index,
-                    "count": len(self._entries),
-                    "updated_at": datetime.now().isoformat(),
-                }, f, ensure_ascii=False)
+            pending, self._pending = self._pending, []
+            auto_save, self.auto_save = self.auto_save, True
+            try:
+                for op in pending:
+                    self._persist(op)
+            finally:
+                self.auto_save = auto_save
+            self._segments.flush()
+        self.save_indexes()
+    
+    def save_indexes(self):
+        """保存向量索引与关键词索引的附加文件（不封存活动段）"""
+        self._index.save(self.store_path)
+        self._keywords.save(self.store_path)
     
     def clear(self):
         """清空存储"""
@@ -273,26 +466,67 @@ class VectorStore:
             self._entries.clear()
             self._category_index.clear()
             self._document_index.clear()
-            
-            for f in self.store_path.glob("*.json"):
-                f.unlink()
+            self._content_index.clear()
+            self._index.clear()
+            self._pending.clear()
+            self._segments.clear()
+            self._keywords.clear()
+            (self.store_path / KEYWORD_INDEX_FILE).unlink(missing_ok=True)
+            # 清空后按当前模型重新入库
+            if self.model_mismatch:
+                config = self._read_config()
+                config["embedding_model"] = self._current_embedding_model
+                self._write_config(config)
+                self.embedding_model = self._current_embedding_model
+                self.model_mismatch = False
 
 
 class VectorStoreManager:
     """向量存储管理器 - 支持多知识库"""
     
-    def __init__(self, base_path: str = None):
+    def __init__(
+        self,
+        base_path: str = None,
+        default_index_type: str = "flat",
+        default_index_params: Optional[Dict[str, Any]] = None,
+        embedding_model: Optional[str] = None,
+    ):
         self.base_path = Path(base_path) if base_path else Path("data/knowledge_bases")
         self.base_path.mkdir(parents=True, exist_ok=True)
+        # 新建集合的默认索引类型与参数
+        self.default_index_type = default_index_type
+        self.default_index_params = default_index_params
+        # 当前嵌入模型标识，各集合据此校验已存向量
+        self.embedding_model = embedding_model
+        # 知识库元数据中记录的模型名（知识库 id -> 模型名），用于判断未记录模型标识的旧集合
+        self.legacy_models: Dict[str, str] = {}
         self._stores: Dict[str, VectorStore] = {}
     
-    def get_store(self, kb_name: str, dimension: int = 1536) -> VectorStore:
-        """获取或创建知识库的向量存储"""
+    def get_store(
+        self,
+        kb_name: str,
+        dimension: int = 1536,
+        index_type: Optional[str] = None,
+        index_params: Optional[Dict[str, Any]] = None,
+    ) -> VectorStore:
+        """
+        获取或创建知识库的向量存储
+        
+        Args:
+            index_type: 索引类型（flat / ivf），None 时沿用集合已保存的配置，新集合使用管理器默认值
+            index_params: 索引参数，None 时同上
+        """
         if kb_name not in self._stores:
             store_path = self.base_path / kb_name / "vectors"
+            if index_type is None and not (store_path / INDEX_CONFIG_FILE).exists():
+                index_type, index_params = self.default_index_type, self.default_index_params
             self._stores[kb_name] = VectorStore(
                 store_path=str(store_path),
                 dimension=dimension,
+                index_type=index_type,
+                index_params=index_params,
+                embedding_model=self.embedding_model,
+                legacy_embedding_model=self.legacy_models.get(kb_name),
             )
         return self._stores[kb_name]
     
@@ -325,5 +559,7 @@ class VectorStoreManager:
             stats[name] = {
                 "total_vectors": store.count(),
                 "categories": store.list_categories(),
+                "embedding_model": store.embedding_model,
+                "model_mismatch": store.model_mismatch,
             }
         return stats
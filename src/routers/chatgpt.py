@@ -3,7 +3,9 @@ import os
 import re
 import time
 import asyncio
-from typing import Optional
+import uuid
+from functools import lru_cache
+from typing import Dict, Optional
 from urllib.parse import urlparse
 from fastapi.responses import StreamingResponse, JSONResponse
 from openai import AsyncOpenAI
@@ -26,17 +28,43 @@ from src.exceptions import (
     APIConfigError,
     APICallError,
     ZhipuConcurrencyError,
+    AIServiceBusyError,
 )
 from src.ai import AIProviderManager, AIModelConfig, AIModel, get_ai_manager
 from src.ai.models import PRESET_ROUTES, ModelStatus
 from src.ai.provider import ChatMessage
 from src.ai.degradation import degradation_manager, check_should_proceed
-from src.ai.token_counter import estimate_tokens, estimate_cost
+from src.ai.admission import AdmissionRejectedError, get_admission_controller
+from src.ai.client_pool import get_openai_client_pool
+from src.ai.token_counter import TokenTally, estimate_tokens, estimate_cost
 from src.quota import quota_manager
-from src.monitoring import cost_monitor
+from src.monitoring import (
+    cost_monitor,
+    start_stream_tracking,
+    record_first_chunk,
+    record_chunk,
+    complete_stream_tracking,
+    abandon_stream_tracking,
+)
 from src.prompts.output_control import enhance_prompt_with_length_control, get_output_max_tokens
 from src.i18n import Translator
-from src.common.sse_response import SSEMessage, SSEErrorCode, SSE_HEADERS
+from src.utils.term_matcher import TermMatcher
+from src.common.sse_response import (
+    SSEMessage,
+    SSEErrorCode,
+    SSE_HEADERS,
+    cancel_on_disconnect,
+    coalesce_text_stream,
+)
+from src.divination.chouqian.corpus import get_interpretation_corpus, iter_text_chunks
+from src.cache.response_cache import (
+    PRESET_MODEL_TIER,
+    ResponseRecorder,
+    ai_response_cache,
+    build_response_cache_key,
+    get_response_ttl,
+    get_template_version,
+)
 
 
 # 预编译敏感字段集合（避免每次调用重新创建）
@@ -48,6 +76,12 @@ _SENSITIVE_KEYS_LOWER = {
 }
 
 
+@lru_cache(maxsize=4)
+def _stop_word_matcher(stop_words: tuple) -> TermMatcher:
+    """禁止词表只编译一次，配置变更后按新词表重新编译"""
+    return TermMatcher(stop_words)
+
+
 def _sanitize_log_data(data: dict, sensitive_keys: set[str] = None) -> dict:
     """
     脱敏日志数据，隐藏敏感字段
@@ -128,11 +162,6 @@ async def divination(
     real_ip = get_real_ipaddr(request)
     request_start_time = time.time()
     
-    # 检查降级状态
-    should_proceed, reject_reason = check_should_proceed()
-    if not should_proceed:
-        raise HTTPException(status_code=503, detail=reject_reason)
-    
     # 获取用户ID
     user_id = f"{user.login_type}:{user.user_name}" if user else f"ip:{real_ip}"
     
@@ -160,7 +189,7 @@ async def divination(
         sanitized_user = _sanitize_log_data(user.model_dump()) if user else None
         sanitized_body = _sanitize_log_data(divination_body.model_dump())
         _logger.debug(f"Request detail: user={sanitized_user}, body={sanitized_body}")
-    if any(w in divination_body.prompt.lower() for w in settings.stop_words):
+    if _stop_word_matcher(tuple(settings.stop_words)).contains_any(divination_body.prompt.lower()):
         raise StopWordDetectedError(message="输入包含禁止词汇，请重新输入")
     
     divination_obj = DivinationFactory.get(divination_body.prompt_type)
@@ -188,6 +217,58 @@ async def divination(
         prompt, output_mode, divination_body.prompt_type
     )
 
+    # 诸葛神算签文有限：提示词与预生成解读库一致时直接返回，无需调用模型
+    if divination_body.prompt_type == "zhuge" and divination_body.qian_number:
+        cached = get_interpretation_corpus().lookup(system_prompt, prompt)
+        if cached:
+            _logger.info(f"命中预生成解读: zhuge#{divination_body.qian_number} ({cached.version})")
+
+            def get_corpus_generator():
+                for chunk in iter_text_chunks(cached.content):
+                    yield SSEMessage.data(chunk)
+                yield SSEMessage.done()
+
+            return StreamingResponse(
+                get_corpus_generator(),
+                media_type='text/event-stream',
+                headers=SSE_HEADERS
+            )
+
+    # AI 解读缓存：相同 提示词 + 模板版本 + 语言 的解读直接回放（自定义 API 不使用缓存）
+    response_cache_key = None
+    if settings.ai_response_cache_enabled and not (request.headers.get("x-api-key") or "").strip():
+        response_cache_key = build_response_cache_key(
+            system_prompt,
+            prompt,
+            model_tier=PRESET_MODEL_TIER,
+            template_version=get_template_version(divination_body.prompt_type),
+            locale=target_lang,
+        )
+        cached_response = await ai_response_cache.get(response_cache_key)
+        if cached_response:
+            # 降级仅用缓存时一次性返回，减少连接占用时间
+            cache_only = degradation_manager.should_use_cache_only()
+            if cache_only:
+                ai_response_cache.record_cache_only_hit()
+            paced = settings.ai_response_cache_replay == "paced" and not cache_only
+            _logger.info(f"命中AI解读缓存: {divination_body.prompt_type} (paced={paced})")
+
+            async def get_cached_generator():
+                async for chunk in ai_response_cache.replay(cached_response, paced=paced):
+                    yield SSEMessage.data(chunk)
+                yield SSEMessage.done()
+
+            return StreamingResponse(
+                get_cached_generator(),
+                media_type='text/event-stream',
+                headers=SSE_HEADERS
+            )
+
+    # 检查降级状态（放在缓存之后：紧急降级时已缓存的解读仍可返回）
+    should_proceed, reject_reason = check_should_proceed()
+    if not should_proceed:
+        raise HTTPException(status_code=503, detail=reject_reason)
+
     # ========== 安全增强：自定义API密钥处理 ==========
     custom_base_url = request.headers.get("x-api-url")
     custom_api_key = request.headers.get("x-api-key")
@@ -248,12 +329,7 @@ async def divination(
         masked_key = f"{final_api_key[:8]}...{final_api_key[-4:]}" if len(final_api_key) > 12 else "***"
         _logger.info(f"使用自定义API配置: base={final_base_url}, model={api_model}, key={masked_key}")
         
-        api_client = AsyncOpenAI(
-            api_key=final_api_key, 
-            base_url=final_base_url,
-            timeout=60.0,
-            max_retries=0
-        )
+        api_client = get_openai_client_pool().get(final_base_url, final_api_key, timeout=60.0)
 
         try:
             openai_stream = await api_client.chat.completions.create(
@@ -291,44 +367,110 @@ async def divination(
         # 内存保护：最大输出长度限制（约 250KB）
         MAX_OUTPUT_LENGTH = 250000
         
+        # 准入控制：按用户等级排队，队列已满时在响应开始前直接返回 503 + Retry-After
+        admission = get_admission_controller()
+        user_tier = quota_manager.get_user_tier(user_id).value
+        user_priority = quota_manager.get_user_priority(user_id)
+        try:
+            admission.check(user_tier)
+        except AdmissionRejectedError as e:
+            raise AIServiceBusyError(message=e.reason, retry_after=e.retry_after)
+        
+        stream_request_id = getattr(request.state, "request_id", None) or str(uuid.uuid4())
+        
         async def get_preset_stream_generator():
             """预设模型的流式生成器 - 使用统一的SSE响应格式"""
+            start_stream_tracking(stream_request_id, "preset-stream", user_id, divination_body.prompt_type)
             # 优化：只统计输出长度，避免累积完整内容占用大量内存
             output_length = 0
+            output_tally = TokenTally()
+            # 实际输出的模型名（故障转移后为最后一个模型），配额与成本按其模型族估算
+            served: Dict[str, str] = {}
             chunk_count = 0
+            recorder = ResponseRecorder() if response_cache_key else None
+            truncated = False
+            
+            # 排队等待准入（可选推送排队位置事件），超时返回带 retry_after 的错误
+            try:
+                ticket = admission.enqueue(user_tier, user_priority)
+            except AdmissionRejectedError as e:
+                yield SSEMessage.error(e.reason, SSEErrorCode.RATE_LIMIT_ERROR, {"retry_after": e.retry_after})
+                yield SSEMessage.done()
+                return
+            deadline = time.monotonic() + admission.max_wait
+            try:
+                while not ticket.admitted:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        admission.cancel(ticket, timed_out=True)
+                        retry_after = admission.retry_after()
+                        yield SSEMessage.error(
+                            "AI 服务繁忙，排队超时", SSEErrorCode.RATE_LIMIT_ERROR, {"retry_after": retry_after}
+                        )
+                        yield SSEMessage.done()
+                        return
+                    if settings.ai_admission_queue_events:
+                        yield SSEMessage.event("queue", {
+                            "position": admission.position(ticket),
+                            "queued": admission.queued,
+                        })
+                    await admission.wait(ticket, min(1.0, remaining))
+            except BaseException:
+                admission.cancel(ticket)
+                admission.release(ticket)
+                raise
             
             try:
                 # 性能优化：禁用预检健康检查，减少 1-5 秒首字节延迟
                 # 直接尝试主模型，失败后再故障转移到备用模型
-                async for chunk in ai_manager.chat_stream_with_failover(
+                # 上游 1–3 字的增量按时间窗口合并成帧，首个片段立即发送
+                upstream = ai_manager.chat_stream_with_failover(
                     messages=messages,
                     temperature=0.9,
                     max_tokens=max_tokens,
                     pre_check=False,  # 禁用预检，避免额外的 API 调用
+                    user_tier=user_tier,  # 对冲预算按用户等级
+                    admission_ticket=ticket,
+                    on_model=lambda model: served.update(model=model.parameters.get("model", model.name)),
+                )
+                async for chunk in coalesce_text_stream(
+                    upstream,
+                    window=settings.sse_coalesce_window_ms / 1000,
+                    max_chars=settings.sse_coalesce_max_chars,
                 ):
                     # 累计长度统计
                     chunk_len = len(chunk) if chunk else 0
                     output_length += chunk_len
+                    output_tally.add(chunk)
                     chunk_count += 1
                     
                     # 内存保护：超出最大长度限制时停止
                     if output_length > MAX_OUTPUT_LENGTH:
                         _logger.warning(f"[流式响应] 输出超出限制 ({output_length}/{MAX_OUTPUT_LENGTH})，提前终止")
                         yield SSEMessage.data("\n\n[内容过长，已截断]")
+                        truncated = True
                         break
                     
-                    yield SSEMessage.data(chunk)
+                    if recorder:
+                        recorder.add(chunk)
+                    frame = SSEMessage.data(chunk)
+                    if chunk_count == 1:
+                        record_first_chunk(stream_request_id)
+                    record_chunk(stream_request_id, len(frame))
+                    yield frame
                 
                 # 发送结束标记
                 yield SSEMessage.done()
+                complete_stream_tracking(stream_request_id, success=True)
                 
                 # 性能优化：使用后台任务记录监控，完全不阻塞响应
                 async def _record_metrics():
                     try:
                         latency = time.time() - request_start_time
-                        # 简化 token 估算，避免同步计算开销
-                        input_tokens = len(system_prompt + prompt) // 4  # 粗略估算
-                        output_tokens = output_length // 4
+                        # 输出按片段累计的字符类别换算，输入按 estimate_tokens 估算（计入配额与成本），均按实际模型
+                        model_name = served.get("model")
+                        input_tokens = estimate_tokens(system_prompt + "\n" + prompt, model_name)
+                        output_tokens = output_tally.tokens(model_name)
                         total_tokens = input_tokens + output_tokens
                         cost = estimate_cost(total_tokens, 0.002) if total_tokens > 0 else 0.0
                         
@@ -345,6 +487,12 @@ async def divination(
                         quota_manager.consume_quota(user_id, total_tokens, cost)
                     except Exception as e:
                         _logger.warning(f"监控记录失败: {e}")
+                    
+                    # 完整输出写入解读缓存（截断的不缓存）
+                    if recorder and not truncated:
+                        entry = recorder.finish(get_response_ttl(divination_body.prompt_type))
+                        if entry:
+                            await ai_response_cache.put(response_cache_key, entry)
                 
                 # 创建后台任务，不等待完成
                 asyncio.create_task(_record_metrics())
@@ -354,34 +502,67 @@ async def divination(
                 return
             except TimeoutError as e:
                 _logger.error(f"Preset streaming timeout: {e}")
+                complete_stream_tracking(stream_request_id, success=False, error_message=str(e))
                 yield SSEMessage.error(str(e), SSEErrorCode.TIMEOUT_ERROR)
                 yield SSEMessage.done()
             except Exception as e:
                 _logger.error(f"Preset streaming error: {e}")
+                complete_stream_tracking(stream_request_id, success=False, error_message=str(e))
                 yield SSEMessage.error(str(e), SSEErrorCode.STREAM_ERROR)
                 yield SSEMessage.done()
+            finally:
+                admission.release(ticket)
         
-        # 返回流式响应（使用统一响应头）
+        # 返回流式响应（使用统一响应头）；客户端断开后立即取消上游并释放名额
         return StreamingResponse(
-            get_preset_stream_generator(),
+            cancel_on_disconnect(
+                request,
+                get_preset_stream_generator(),
+                on_disconnect=lambda: abandon_stream_tracking(stream_request_id),
+            ),
             media_type='text/event-stream',
             headers=SSE_HEADERS
         )
 
-    async def get_openai_generator():
-        """SSE 流式生成器 - 边收边发，实时输出（使用统一的SSE响应格式）"""
+    finished = False
+    stream_request_id = getattr(request.state, "request_id", None) or str(uuid.uuid4())
+    
+    async def get_openai_deltas():
+        """提取上游增量文本（结束或取消时关闭上游 HTTP 流）"""
+        nonlocal finished
         try:
             async for event in openai_stream:
                 # 检查是否结束（finish_reason 不为空表示生成完成）
                 if event.choices and event.choices[0].finish_reason:
                     _logger.debug(f"Stream finished: {event.choices[0].finish_reason}")
-                    yield SSEMessage.done()
+                    finished = True
                     break
                 
-                # 提取并发送内容
+                # 提取内容
                 if event.choices and event.choices[0].delta and event.choices[0].delta.content:
-                    current_response = event.choices[0].delta.content
-                    yield SSEMessage.data(current_response)
+                    yield event.choices[0].delta.content
+        finally:
+            await openai_stream.close()
+    
+    async def get_openai_generator():
+        """SSE 流式生成器 - 边收边发，增量按时间窗口合并成帧（使用统一的SSE响应格式）"""
+        start_stream_tracking(stream_request_id, api_model, user_id, divination_body.prompt_type)
+        try:
+            first = True
+            async for chunk in coalesce_text_stream(
+                get_openai_deltas(),
+                window=settings.sse_coalesce_window_ms / 1000,
+                max_chars=settings.sse_coalesce_max_chars,
+            ):
+                frame = SSEMessage.data(chunk)
+                if first:
+                    record_first_chunk(stream_request_id)
+                    first = False
+                record_chunk(stream_request_id, len(frame))
+                yield frame
+            if finished:
+                yield SSEMessage.done()
+            complete_stream_tracking(stream_request_id, success=True)
                     
         except asyncio.CancelledError:
             # 客户端主动断开连接（如用户取消请求）
@@ -390,13 +571,18 @@ async def divination(
             
         except Exception as e:
             _logger.error(f"Streaming error: {e}")
+            complete_stream_tracking(stream_request_id, success=False, error_message=str(e))
             # 发送结构化错误信息（统一格式）
             yield SSEMessage.error(str(e), SSEErrorCode.STREAM_ERROR)
             yield SSEMessage.done()
 
     # 创建带完整响应头的 SSE 响应（使用统一响应头）
     return StreamingResponse(
-        get_openai_generator(),
+        cancel_on_disconnect(
+            request,
+            get_openai_generator(),
+            on_disconnect=lambda: abandon_stream_tracking(stream_request_id),
+        ),
         media_type='text/event-stream',
         headers=SSE_HEADERS
     )
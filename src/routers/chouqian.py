@@ -6,16 +6,32 @@ from fastapi.responses import StreamingResponse
 from typing import List, Dict, Optional
 from pydantic import BaseModel, Field
 import random
-from openai import AsyncOpenAI
+from ..ai.client_pool import get_openai_client_pool
 from ..divination.chouqian.models import ChouqianResult, ChouqianRequest, ShengbeiResult
 from ..divination.chouqian.service import chouqian_service
+from ..divination.chouqian.corpus import (
+    build_personalize_prompt,
+    get_interpretation_corpus,
+    iter_text_chunks,
+    render_jieqian_prompt,
+)
 from ..config import settings
-from ..common import safe_api_call, get_api_config_from_request, validate_api_config
+from ..common import (
+    safe_api_call,
+    get_api_config_from_request,
+    validate_api_config,
+    json_bytes_response,
+    CACHE_CONTROL_NO_STORE,
+    cancel_on_disconnect,
+)
 
 _logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chouqian", tags=["抽签"])
 
+# 通用解读与个性化补充之间的分隔标题
+PERSONALIZE_HEADING = "\n\n---\n\n## 个性化解读\n\n"
+
 
 class ShengbeiRequest(BaseModel):
     """圣杯请求"""
@@ -59,30 +75,33 @@ async def draw_qian(request: ChouqianRequest):
     - **user_name**: 求签人姓名（可选）
     - **question**: 所问之事（可选）
     """
-    return chouqian_service.draw(request.type)
+    entry = chouqian_service.draw_entry(request.type)
+    return json_bytes_response(entry.body, entry.etag, cache_control=CACHE_CONTROL_NO_STORE)
 
 
 @router.get("/detail/{qian_type}/{number}", response_model=ChouqianResult, summary="获取签文详情")
 @safe_api_call("获取签文详情")
-async def get_qian_detail(qian_type: str, number: int):
+async def get_qian_detail(request: Request, qian_type: str, number: int):
     """
     根据签号获取签文详情
     
     - **qian_type**: 签类型（guanyin）
     - **number**: 签号（1-100）
     """
-    return chouqian_service.get_by_number(qian_type, number)
+    entry = chouqian_service.get_entry(qian_type, number)
+    return json_bytes_response(entry.body, entry.etag, request)
 
 
 @router.get("/list/{qian_type}", response_model=List[ChouqianResult], summary="获取签文列表")
 @safe_api_call("获取签文列表")
-async def get_qian_list(qian_type: str):
+async def get_qian_list(request: Request, qian_type: str):
     """
     获取所有签文列表
     
     - **qian_type**: 签类型（guanyin）
     """
-    return chouqian_service.get_all(qian_type)
+    entry = chouqian_service.get_all_entry(qian_type)
+    return json_bytes_response(entry.body, entry.etag, request)
 
 
 @router.post("/draw_start", response_model=DrawWithShengbeiResponse, summary="开始抽签(含圣杯流程)")
@@ -164,7 +183,7 @@ async def throw_shengbei(request: ShengbeiRequest):
 class AIJieqianRequest(BaseModel):
     """AI解签请求"""
     qian_type: str = Field(..., min_length=1, max_length=50, description="签类型")
-    qian_number: int = Field(..., ge=1, le=200, description="签号")
+    qian_number: int = Field(..., ge=1, le=384, description="签号")
     user_name: str = Field("", max_length=50, description="求签人姓名")
     question: str = Field("", max_length=500, description="所问之事")
 
@@ -174,7 +193,8 @@ async def ai_jieqian(request: Request, body: AIJieqianRequest):
     """
     AI智能解签 - 根据签文内容和用户问题提供个性化解读
     
-    流式返回AI解签结果
+    流式返回AI解签结果。通用解读优先取自预生成解读库（见 corpus.py），
+    有姓名或所问之事时再由模型在其后追加个性化补充。
     """
     try:
         # 获取签文详情
@@ -182,58 +202,46 @@ async def ai_jieqian(request: Request, body: AIJieqianRequest):
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     
-    # 构建解签内容
-    qian_info = f"【{qian_detail.type_name}第{qian_detail.number}签】\n"
-    qian_info += f"签名：{qian_detail.title}\n"
-    
-    # 根据签类型添加特定字段
-    if body.qian_type == "huangdaxian":
-        if qian_detail.qianshu:
-            qian_info += f"签属：{qian_detail.qianshu}\n"
-        if qian_detail.name:
-            qian_info += f"签等：{qian_detail.name}\n"
-        if qian_detail.shi:
-            qian_info += f"签诗：{qian_detail.shi}\n"
-    
-    qian_info += f"签文：{qian_detail.content}\n"
+    # 先查预生成的通用解读
+    base_system_prompt, base_user_prompt, _ = render_jieqian_prompt(qian_detail)
+    cached = get_interpretation_corpus().lookup(base_system_prompt, base_user_prompt)
+    personalized = bool(body.user_name or body.question)
     
-    # 用户信息
-    user_info = ""
-    if body.user_name:
-        user_info += f"求签人：{body.user_name}\n"
-    if body.question:
-        user_info += f"所问之事：{body.question}\n"
+    def cached_events():
+        for chunk in iter_text_chunks(cached.content):
+            yield f"data: {json.dumps(chunk)}\n\n"
     
-    # 从模版库获取提示词
-    from ..prompts import get_prompt_manager
-    manager = get_prompt_manager()
-    template = manager.get_template("chouqian_analysis")
-    
-    if template:
-        system_prompt = template.system_prompt
-    else:
-        system_prompt = "你是一位精通中国传统文化的解签大师，擅长解读各类灵签。"
-
-    user_prompt = f"{qian_info}\n{user_info}\n请为此签进行详细解读。"
+    if cached and not personalized:
+        _logger.info(f"AI解签命中解读库: {body.qian_type}#{body.qian_number} ({cached.version})")
+        return StreamingResponse(cached_events(), media_type='text/event-stream')
     
     # 获取API配置（使用统一工具函数）
     api_config = get_api_config_from_request(request)
     try:
         validate_api_config(api_config)
     except ValueError as e:
+        if cached:
+            # 无可用模型配置时仅返回通用解读
+            return StreamingResponse(cached_events(), media_type='text/event-stream')
         raise HTTPException(status_code=403, detail=str(e))
     
-    api_client = AsyncOpenAI(
-        api_key=api_config["api_key"],
-        base_url=api_config["base_url"],
-        timeout=60.0,
-        max_retries=0
-    )
+    if cached:
+        system_prompt, user_prompt = build_personalize_prompt(
+            qian_detail, cached.content, body.user_name, body.question
+        )
+        max_tokens = 4000
+    else:
+        system_prompt, user_prompt, _ = render_jieqian_prompt(
+            qian_detail, body.user_name, body.question
+        )
+        max_tokens = 32000  # 用户体验优先：无限制输出
     
-    try:
-        openai_stream = await api_client.chat.completions.create(
+    api_client = get_openai_client_pool().get(api_config["base_url"], api_config["api_key"], timeout=60.0)
+    
+    async def create_stream():
+        return await api_client.chat.completions.create(
             model=api_config["model"],
-            max_tokens=32000,  # 用户体验优先：无限制输出
+            max_tokens=max_tokens,
             temperature=0.8,
             stream=True,
             messages=[
@@ -241,18 +249,43 @@ async def ai_jieqian(request: Request, body: AIJieqianRequest):
                 {"role": "user", "content": user_prompt}
             ]
         )
-    except Exception as e:
-        _logger.error(f"AI解签API错误: {e}")
-        raise HTTPException(status_code=500, detail="AI服务暂时不可用，请稍后重试")
     
-    async def generate():
+    async def stream_events(openai_stream):
         try:
             async for event in openai_stream:
                 if event.choices and event.choices[0].delta and event.choices[0].delta.content:
                     content = event.choices[0].delta.content
                     yield f"data: {json.dumps(content)}\n\n"
+        finally:
+            # 关闭上游 HTTP 流（客户端断开时同样执行）
+            await openai_stream.close()
+    
+    if cached:
+        async def generate_layered():
+            # 通用解读立即返回，个性化补充随后追加；补充失败不影响已返回的内容
+            for event in cached_events():
+                yield event
+            yield f"data: {json.dumps(PERSONALIZE_HEADING)}\n\n"
+            try:
+                async for event in stream_events(await create_stream()):
+                    yield event
+            except Exception as e:
+                _logger.error(f"AI解签个性化补充失败: {e}")
+        
+        return StreamingResponse(cancel_on_disconnect(request, generate_layered()), media_type='text/event-stream')
+    
+    try:
+        openai_stream = await create_stream()
+    except Exception as e:
+        _logger.error(f"AI解签API错误: {e}")
+        raise HTTPException(status_code=500, detail="AI服务暂时不可用，请稍后重试")
+    
+    async def generate():
+        try:
+            async for event in stream_events(openai_stream):
+                yield event
         except Exception as e:
             _logger.error(f"AI解签流式错误: {e}")
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
     
-    return StreamingResponse(generate(), media_type='text/event-stream')
+    return StreamingResponse(cancel_on_disconnect(request, generate()), media_type='text/event-stream')
@@ -5,6 +5,7 @@
 import json
 import logging
 import asyncio
+import uuid
 from typing import Optional, List
 from datetime import datetime
 from pydantic import BaseModel, Field
@@ -25,7 +26,15 @@ from src.liuyao_service import LiuYaoAIService, build_interpretation_prompt
 from src.ai import get_ai_manager
 from src.ai.provider import ChatMessage
 from src.config import settings
-from openai import AsyncOpenAI
+from src.common.sse_response import cancel_on_disconnect
+from src.monitoring import (
+    start_stream_tracking,
+    record_first_chunk,
+    record_chunk,
+    complete_stream_tracking,
+    abandon_stream_tracking,
+)
+from src.ai.client_pool import get_openai_client_pool
 from src.divination.liuyao_advanced import (
     LiuyaoAdvancedAnalyzer, 
     calculate_time_recommendations,
@@ -407,14 +416,13 @@ async def interpret_hexagram_stream(request: Request, body: InterpretRequest):
     
     _logger.info(f"六爻流式解卦使用: {api_base}, 模型: {model}")
     
+    stream_request_id = getattr(request.state, "request_id", None) or str(uuid.uuid4())
+    
     async def generate_stream():
+        start_stream_tracking(stream_request_id, model, tool_name="liuyao_analysis")
+        stream = None
         try:
-            client = AsyncOpenAI(
-                api_key=api_key,
-                base_url=api_base,
-                timeout=120.0,
-                max_retries=0
-            )
+            client = get_openai_client_pool().get(api_base, api_key, timeout=120.0)
             
             stream = await client.chat.completions.create(
                 model=model,
@@ -427,16 +435,36 @@ async def interpret_hexagram_stream(request: Request, body: InterpretRequest):
                 ]
             )
             
+            first = True
             async for event in stream:
                 if event.choices and event.choices[0].delta and event.choices[0].delta.content:
                     chunk = event.choices[0].delta.content
-                    yield f"data: {json.dumps(chunk)}\n\n"
+                    frame = f"data: {json.dumps(chunk)}\n\n"
+                    if first:
+                        record_first_chunk(stream_request_id)
+                        first = False
+                    record_chunk(stream_request_id, len(frame))
+                    yield frame
+            complete_stream_tracking(stream_request_id, success=True)
                     
         except Exception as e:
             _logger.error(f"流式调用失败: {e}")
+            complete_stream_tracking(stream_request_id, success=False, error_message=str(e))
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
-    
-    return StreamingResponse(generate_stream(), media_type='text/event-stream')
+        finally:
+            # 关闭上游 HTTP 流（客户端断开时同样执行），连接归还连接池
+            if stream is not None:
+                await stream.close()
+    
+    # 客户端断开后立即取消上游
+    return StreamingResponse(
+        cancel_on_disconnect(
+            request,
+            generate_stream(),
+            on_disconnect=lambda: abandon_stream_tracking(stream_request_id),
+        ),
+        media_type='text/event-stream',
+    )
 
 
 def _perform_advanced_analysis(hexagram_data: dict, question: str) -> Optional[dict]:
@@ -6,10 +6,17 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Optional
 import logging
 
-from src.monitoring import cost_monitor
+from src.monitoring import cost_monitor, stream_metrics
 from src.quota import quota_manager, QuotaTier
 from src.ai.degradation import degradation_manager, DegradationLevel, SystemMetrics
+from src.ai.hedging import hedge_controller
+from src.ai.admission import get_admission_controller, get_provider_limiter
+from src.ai.health import get_circuit_breakers
+from src.ai.client_pool import get_openai_client_pool
+from src.ai.manager import get_ai_manager
+from src.ai.routing import get_provider_router
 from src.cache.prompt_cache import prompt_cache
+from src.cache.response_cache import ai_response_cache
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/monitor", tags=["监控管理"])
@@ -17,10 +24,12 @@ router = APIRouter(prefix="/api/monitor", tags=["监控管理"])
 
 @router.get("/health")
 async def health_check():
-    """健康检查"""
+    """健康检查（含各模型的路由评分，评分越小越优先）"""
+    candidates = get_ai_manager().config.get_active_models()
     return {
         "status": "healthy",
-        "degradation_level": degradation_manager.get_current_level().value
+        "degradation_level": degradation_manager.get_current_level().value,
+        "providers": get_provider_router().snapshot(candidates),
     }
 
 
@@ -102,16 +111,59 @@ async def update_degradation_metrics(
     }
 
 
+@router.get("/ai/hedging")
+async def get_hedging_stats():
+    """获取对冲请求统计（对冲率、备用胜出、预算、各模型延迟分位）"""
+    return hedge_controller.snapshot()
+
+
+@router.get("/ai/admission")
+async def get_admission_stats():
+    """获取 AI 准入统计（各等级队列深度、排队耗时直方图、各模型并发与自适应上限）"""
+    return {
+        **get_admission_controller().snapshot(),
+        "providers": get_provider_limiter().snapshot(),
+    }
+
+
+@router.get("/ai/breakers")
+async def get_ai_breaker_stats():
+    """获取各模型熔断状态与状态变化（closed / open / half_open）"""
+    return get_circuit_breakers().snapshot()
+
+
+@router.get("/ai/clients")
+async def get_ai_client_pool_stats():
+    """获取自定义 API 客户端池统计（命中率、条目数、淘汰与空闲关闭次数）"""
+    return get_openai_client_pool().get_stats()
+
+
+@router.get("/streams")
+async def get_stream_stats(window_seconds: float = Query(default=300.0, ge=1, le=86400)):
+    """获取流式请求统计（首字延迟、成功率、客户端中途断开比例）"""
+    return {
+        **stream_metrics.get_statistics(window_seconds),
+        "recent": stream_metrics.get_recent_requests(10),
+    }
+
+
 @router.get("/cache/stats")
 async def get_cache_stats():
     """获取缓存统计"""
     return prompt_cache.get_stats()
 
 
+@router.get("/cache/ai-responses")
+async def get_ai_response_cache_stats():
+    """获取 AI 解读缓存统计"""
+    return ai_response_cache.get_stats()
+
+
 @router.post("/cache/clear")
 async def clear_cache():
     """清空所有缓存"""
     prompt_cache.clear_all()
+    ai_response_cache.clear()
     return {"success": True, "message": "缓存已清空"}
 
 
@@ -45,6 +45,13 @@ class AddFromDirectoryRequest(BaseModel):
     recursive: bool = Field(True, description="是否递归")
 
 
+class IngestionJobRequest(BaseModel):
+    """后台入库任务请求（directory 与 documents 二选一）"""
+    directory: Optional[str] = Field(None, description="目录路径")
+    recursive: bool = Field(True, description="是否递归")
+    documents: Optional[List[Dict[str, Any]]] = Field(None, description="文档列表")
+
+
 class QueryRequest(BaseModel):
     """查询请求"""
     query: str = Field(..., description="查询问题")
@@ -196,6 +203,83 @@ async def add_documents_from_directory(kb_id: str, request: AddFromDirectoryRequ
         raise HTTPException(status_code=500, detail="添加文档失败")
 
 
+# ==================== 后台入库任务 ====================
+
+@router.post("/knowledge-bases/{kb_id}/ingestion-jobs", summary="创建后台入库任务", status_code=202)
+async def create_ingestion_job(kb_id: str, request: IngestionJobRequest):
+    """在后台导入目录或文档列表，立即返回任务状态，进度通过任务状态接口查询"""
+    try:
+        service = get_rag_service()
+        job = await service.start_ingestion_job(
+            kb_id=kb_id,
+            directory=request.directory,
+            recursive=request.recursive,
+            documents_data=request.documents,
+        )
+        return {
+            "success": True,
+            "data": job,
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="目录不存在")
+    except Exception as e:
+        logger.error(f"创建入库任务失败: {e}")
+        raise HTTPException(status_code=500, detail="创建入库任务失败")
+
+
+@router.get("/ingestion-jobs", summary="列出入库任务")
+async def list_ingestion_jobs(kb_id: Optional[str] = None):
+    """列出入库任务（可按知识库过滤），按创建时间倒序"""
+    service = get_rag_service()
+    return {
+        "success": True,
+        "data": service.list_ingestion_jobs(kb_id),
+    }
+
+
+@router.get("/ingestion-jobs/{job_id}", summary="获取入库任务状态")
+async def get_ingestion_job(job_id: str):
+    """任务状态、累计计数与本次运行的吞吐量（文档/秒）"""
+    service = get_rag_service()
+    job = service.get_ingestion_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="入库任务不存在")
+    return {
+        "success": True,
+        "data": job,
+    }
+
+
+@router.post("/ingestion-jobs/{job_id}/cancel", summary="取消入库任务")
+async def cancel_ingestion_job(job_id: str):
+    """取消进行中的入库任务，已完成的部分保留，可稍后继续"""
+    service = get_rag_service()
+    if not service.cancel_ingestion_job(job_id):
+        raise HTTPException(status_code=404, detail="任务不存在或未在运行")
+    return {
+        "success": True,
+        "message": "已请求取消",
+    }
+
+
+@router.post("/ingestion-jobs/{job_id}/resume", summary="继续入库任务")
+async def resume_ingestion_job(job_id: str):
+    """从检查点继续失败、取消或中断的入库任务"""
+    try:
+        service = get_rag_service()
+        job = await service.resume_ingestion_job(job_id)
+        return {
+            "success": True,
+            "data": job,
+        }
+    except KeyError:
+        raise HTTPException(status_code=404, detail="入库任务不存在")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # ==================== 检索与生成 ====================
 
 @router.post("/query", summary="RAG查询")
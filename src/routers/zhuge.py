@@ -1,9 +1,10 @@
-"""诸葛神算API路由 - 使用AI计算笔画和解签"""
+"""诸葛神算API路由 - 本地笔画表计算签号，AI解签"""
 from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Optional
 
 from src.common import safe_api_call
+from src.utils.stroke_counter import get_strokes
 
 router = APIRouter(prefix="/zhuge", tags=["诸葛神算"])
 
@@ -11,7 +12,7 @@ router = APIRouter(prefix="/zhuge", tags=["诸葛神算"])
 class ZhugeRequest(BaseModel):
     """诸葛神算请求"""
     text: str  # 三个汉字
-    bihua1: Optional[int] = None  # 第一个字笔画(可由AI提供)
+    bihua1: Optional[int] = None  # 第一个字笔画(可选，缺省时查本地笔画表)
     bihua2: Optional[int] = None  # 第二个字笔画
     bihua3: Optional[int] = None  # 第三个字笔画
 
@@ -67,17 +68,17 @@ async def divine(request: ZhugeRequest):
     诸葛神算占卜接口 - 完整移植自zgss.asp
     
     - **text**: 输入三个汉字进行占卜
-    - **bihua1/2/3**: 可选，由前端通过AI获取笔画数后传入
+    - **bihua1/2/3**: 可选，缺省时由本地笔画表计算
     
     算法说明(从zgss.asp移植)：
     1. 用户输入三个汉字
-    2. 通过AI获取每个汉字的笔画数
+    2. 查本地笔画表获取每个汉字的笔画数
     3. 取每个笔画数的个位（0改为1）
     4. 三个个位数组成三位数
     5. 若>=384则减384
     6. 根据签号结合AI生成解签
     
-    注意：笔画计算和解签内容由前端调用AI服务完成
+    注意：解签内容由前端调用AI服务完成
     """
     # 提取三个汉字
     chars = list(request.text.replace(" ", ""))[:3]
@@ -87,22 +88,25 @@ async def divine(request: ZhugeRequest):
             error="请输入三个汉字"
         )
     
-    # 检查是否提供了笔画数
-    if request.bihua1 is None or request.bihua2 is None or request.bihua3 is None:
+    # 未提供的笔画数查本地笔画表
+    provided = [request.bihua1, request.bihua2, request.bihua3]
+    local = get_strokes("".join(chars))
+    bihua_list = [b if b is not None else s for b, s in zip(provided, local)]
+    if any(b < 0 for b in bihua_list):
         return ZhugeResponse(
             success=False,
             input_chars=chars,
-            error="请先通过AI获取汉字笔画数，然后提供bihua1/bihua2/bihua3参数"
+            error="请输入三个汉字"
         )
     
     # 计算签号
-    qian_number = calculate_qian_number(request.bihua1, request.bihua2, request.bihua3)
+    qian_number = calculate_qian_number(*bihua_list)
     qian_id = str(qian_number).zfill(3)
     
     return ZhugeResponse(
         success=True,
         input_chars=chars,
-        bihua_list=[request.bihua1, request.bihua2, request.bihua3],
+        bihua_list=bihua_list,
         qian_number=qian_number,
         qian_id=qian_id,
         title=f"第{qian_number}签",
@@ -123,10 +127,10 @@ async def get_info():
 这三个字，即是天灵与人心灵交流，也就是说，你的心事已得上天了解，而上天会对你作出指示。
 所以万万不可存"玩一玩"的心态。""",
         "algorithm": """1. 输入三个汉字
-2. 通过AI获取每个汉字的笔画数
+2. 查本地笔画表获取每个汉字的笔画数
 3. 取每个笔画数的个位（0改为1）
 4. 三个个位数组成三位数
 5. 若>=384则减384
 6. 根据签号结合AI生成解签""",
-        "usage": "请先输入三个汉字，系统会通过AI计算笔画并生成解签"
+        "usage": "请先输入三个汉字，系统会计算笔画并通过AI生成解签"
     }
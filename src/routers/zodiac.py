@@ -3,11 +3,13 @@
 提供星座查询、运势、配对等接口
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import date
 
+from src.common import CACHE_CONTROL_STATIC, json_bytes_response
+
 router = APIRouter(prefix="/api/zodiac", tags=["星座"])
 
 # 导入星座模块
@@ -17,11 +19,7 @@ try:
         get_moon_sign,
         get_rising_sign,
         get_zodiac_info,
-        get_all_zodiacs,
-        get_daily_zodiac_fortune,
-        get_weekly_zodiac_fortune,
-        get_monthly_zodiac_fortune,
-        get_zodiac_compatibility,
+        zodiac_precompute,
     )
     ZODIAC_AVAILABLE = True
 except ImportError:
@@ -64,6 +62,9 @@ VALID_ZODIACS = [
     '天秤座', '天蝎座', '射手座', '摩羯座', '水瓶座', '双鱼座'
 ]
 
+# 未指定日期的“今日运势”跨日即变，只允许短时缓存
+CACHE_CONTROL_TODAY = "public, max-age=300"
+
 
 def validate_zodiac(zodiac: str) -> str:
     """验证星座名称"""
@@ -76,24 +77,25 @@ def validate_zodiac(zodiac: str) -> str:
 
 
 @router.get("/list")
-async def list_zodiacs():
+async def list_zodiacs(request: Request):
     """获取所有星座列表"""
     if not ZODIAC_AVAILABLE:
         raise HTTPException(status_code=503, detail="星座模块不可用")
-    return {"zodiacs": get_all_zodiacs()}
+    entry = zodiac_precompute.zodiac_list()
+    return json_bytes_response(entry.body, entry.etag, request)
 
 
 @router.get("/info/{zodiac}")
-async def get_zodiac(zodiac: str):
+async def get_zodiac(zodiac: str, request: Request):
     """获取星座详细信息"""
     if not ZODIAC_AVAILABLE:
         raise HTTPException(status_code=503, detail="星座模块不可用")
     
     zodiac = validate_zodiac(zodiac)
-    info = get_zodiac_info(zodiac)
-    if not info:
+    entry = zodiac_precompute.info(zodiac)
+    if entry is None:
         raise HTTPException(status_code=404, detail="星座信息未找到")
-    return info
+    return json_bytes_response(entry.body, entry.etag, request)
 
 
 @router.post("/sun-sign")
@@ -154,6 +156,7 @@ async def calculate_rising_sign(request: RisingSignRequest):
 @router.get("/fortune/daily/{zodiac}")
 async def get_daily_fortune(
     zodiac: str,
+    request: Request,
     date_str: Optional[str] = Query(None, description="日期YYYY-MM-DD，默认今天")
 ):
     """获取每日星座运势"""
@@ -170,12 +173,15 @@ async def get_daily_fortune(
         except ValueError:
             raise HTTPException(status_code=400, detail="日期格式错误，应为YYYY-MM-DD")
     
-    return get_daily_zodiac_fortune(zodiac, target_date)
+    entry = zodiac_precompute.daily(zodiac, target_date)
+    cache_control = CACHE_CONTROL_STATIC if target_date else CACHE_CONTROL_TODAY
+    return json_bytes_response(entry.body, entry.etag, request, cache_control)
 
 
 @router.get("/fortune/weekly/{zodiac}")
 async def get_weekly_fortune(
     zodiac: str,
+    request: Request,
     year: int = Query(..., description="年份"),
     week: int = Query(..., ge=1, le=53, description="周数")
 ):
@@ -184,12 +190,14 @@ async def get_weekly_fortune(
         raise HTTPException(status_code=503, detail="星座模块不可用")
     
     zodiac = validate_zodiac(zodiac)
-    return get_weekly_zodiac_fortune(zodiac, year, week)
+    entry = zodiac_precompute.weekly(zodiac, year, week)
+    return json_bytes_response(entry.body, entry.etag, request)
 
 
 @router.get("/fortune/monthly/{zodiac}")
 async def get_monthly_fortune(
     zodiac: str,
+    request: Request,
     year: int = Query(..., description="年份"),
     month: int = Query(..., ge=1, le=12, description="月份")
 ):
@@ -198,11 +206,12 @@ async def get_monthly_fortune(
         raise HTTPException(status_code=503, detail="星座模块不可用")
     
     zodiac = validate_zodiac(zodiac)
-    return get_monthly_zodiac_fortune(zodiac, year, month)
+    entry = zodiac_precompute.monthly(zodiac, year, month)
+    return json_bytes_response(entry.body, entry.etag, request)
 
 
 @router.post("/compatibility")
-async def get_compatibility(request: CompatibilityRequest):
+async def get_compatibility(request: CompatibilityRequest, http_request: Request):
     """获取星座配对分析"""
     if not ZODIAC_AVAILABLE:
         raise HTTPException(status_code=503, detail="星座模块不可用")
@@ -210,11 +219,13 @@ async def get_compatibility(request: CompatibilityRequest):
     zodiac1 = validate_zodiac(request.zodiac1)
     zodiac2 = validate_zodiac(request.zodiac2)
     
-    return get_zodiac_compatibility(zodiac1, zodiac2)
+    entry = zodiac_precompute.compatibility(zodiac1, zodiac2)
+    return json_bytes_response(entry.body, entry.etag, http_request)
 
 
 @router.get("/compatibility")
 async def get_compatibility_get(
+    request: Request,
     zodiac1: str = Query(..., description="第一个星座"),
     zodiac2: str = Query(..., description="第二个星座")
 ):
@@ -225,4 +236,5 @@ async def get_compatibility_get(
     zodiac1 = validate_zodiac(zodiac1)
     zodiac2 = validate_zodiac(zodiac2)
     
-    return get_zodiac_compatibility(zodiac1, zodiac2)
+    entry = zodiac_precompute.compatibility(zodiac1, zodiac2)
+    return json_bytes_response(entry.body, entry.etag, request)
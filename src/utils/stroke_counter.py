@@ -3,12 +3,25 @@
 
 用于姓名五格剖象法的笔画数计算
 参考：康熙字典笔画规范
+
+笔画数据：
+- STROKE_MAP: 人工校对的常用姓名用字（优先使用）
+- data/cjk_strokes.bin: CJK 统一表意文字（含扩展A、兼容区）的规范笔画与康熙笔画，
+  按码位偏移存放的定长数组，O(1) 查询；由 scripts/build_stroke_table.py 生成
 """
 
 import logging
+import struct
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Tuple
 
 _logger = logging.getLogger(__name__)
 
+STROKE_TABLE_PATH = Path(__file__).parent / "data" / "cjk_strokes.bin"
+
 # 康熙字典笔画数映射表（简体字 -> 康熙笔画数）
 # 包含常用姓氏和名字用字
 STROKE_MAP = {
@@ -143,6 +156,119 @@ RADICAL_CORRECTIONS = {
 }
 
 
+# 数字按数理取笔画（姓名学惯例），优先于字形笔画
+NUMERAL_STROKES = {
+    "一": 1, "二": 2, "三": 3, "四": 4, "五": 5,
+    "六": 6, "七": 7, "八": 8, "九": 9, "十": 10,
+}
+
+
+class StrokeTable:
+    """
+    汉字笔画表
+    
+    文件布局：MAGIC | 版本 | 区段数 | 区段(起,止)... | 规范笔画[] | 康熙笔画[] | 简繁对照
+    每个区段内按 码位 - 起始码位 直接索引，0 表示无数据
+    """
+    
+    MAGIC = b"CJKS"
+    VERSION = 1
+    
+    def __init__(self, data: bytes):
+        magic, = struct.unpack_from("<4s", data, 0)
+        version, range_count = struct.unpack_from("<HH", data, 4)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError("笔画数据文件格式错误")
+        
+        pos = 8
+        # (起始码位, 结束码位, 在数组中的起始下标)
+        self._ranges: List[Tuple[int, int, int]] = []
+        size = 0
+        for _ in range(range_count):
+            start, end = struct.unpack_from("<II", data, pos)
+            pos += 8
+            self._ranges.append((start, end, size))
+            size += end - start + 1
+        
+        self._standard = data[pos:pos + size]
+        pos += size
+        self._kangxi = data[pos:pos + size]
+        pos += size
+        
+        pair_count, = struct.unpack_from("<I", data, pos)
+        pos += 4
+        self._s2t_keys = array("I", data[pos:pos + pair_count * 4])
+        pos += pair_count * 4
+        self._s2t_values = array("I", data[pos:pos + pair_count * 4])
+    
+    @classmethod
+    def load(cls, path: Path = STROKE_TABLE_PATH) -> "StrokeTable":
+        return cls(path.read_bytes())
+    
+    def _index(self, char: str) -> int:
+        """码位在数组中的下标，非单个字符或未收录时返回 -1"""
+        if len(char) != 1:
+            return -1
+        cp = ord(char)
+        for start, end, base in self._ranges:
+            if start <= cp <= end:
+                return base + cp - start
+        return -1
+    
+    def standard(self, char: str) -> int:
+        """规范笔画数（按字形书写），未收录返回 0"""
+        i = self._index(char)
+        return self._standard[i] if i >= 0 else 0
+    
+    def kangxi(self, char: str) -> int:
+        """康熙笔画数（繁体、部首取原形），未收录返回 0"""
+        i = self._index(char)
+        return self._kangxi[i] if i >= 0 else 0
+    
+    def traditional(self, char: str) -> str:
+        """简体转繁体（首选字形），无对应繁体时返回原字"""
+        if len(char) != 1:
+            return char
+        cp = ord(char)
+        i = bisect_left(self._s2t_keys, cp)
+        if i < len(self._s2t_keys) and self._s2t_keys[i] == cp:
+            return chr(self._s2t_values[i])
+        return char
+
+
+@lru_cache(maxsize=1)
+def get_stroke_table() -> StrokeTable:
+    """延迟加载笔画表（进程内单例）"""
+    return StrokeTable.load()
+
+
+def to_traditional(char: str) -> str:
+    """
+    获取汉字的繁体字形（康熙笔画按繁体计算）
+    
+    Args:
+        char: 单个汉字
+        
+    Returns:
+        繁体字，无对应繁体时返回原字
+    """
+    return get_stroke_table().traditional(char)
+
+
+def get_stroke(char: str) -> int:
+    """
+    获取汉字的规范笔画数（按字形实际书写，诸葛神算等使用）
+    
+    Args:
+        char: 单个汉字
+        
+    Returns:
+        笔画数，如果未找到则返回-1
+    """
+    strokes = get_stroke_table().standard(char)
+    return strokes if strokes > 0 else -1
+
+
 def get_kangxi_stroke(char: str) -> int:
     """
     获取汉字的康熙字典笔画数
@@ -153,14 +279,29 @@ def get_kangxi_stroke(char: str) -> int:
     Returns:
         笔画数，如果未找到则返回-1
     """
+    if char in NUMERAL_STROKES:
+        return NUMERAL_STROKES[char]
     if char in STROKE_MAP:
         return STROKE_MAP[char]
     
-    # 未收录的字，返回-1表示需要AI辅助
-    _logger.warning(f"未找到汉字 '{char}' 的康熙笔画数，将由AI辅助计算")
+    strokes = get_stroke_table().kangxi(char)
+    if strokes > 0:
+        return strokes
+    
+    _logger.warning(f"未找到汉字 '{char}' 的康熙笔画数")
     return -1
 
 
+def get_strokes(text: str) -> List[int]:
+    """批量获取规范笔画数，未找到的字为-1"""
+    return [get_stroke(c) for c in text]
+
+
+def get_kangxi_strokes(text: str) -> List[int]:
+    """批量获取康熙笔画数（如完整姓名），未找到的字为-1"""
+    return [get_kangxi_stroke(c) for c in text]
+
+
 def calculate_five_grids(name: str) -> dict:
     """
     计算姓名五格
@@ -200,8 +341,8 @@ def calculate_five_grids(name: str) -> dict:
         return {"error": "名字不能为空"}
     
     # 计算各字笔画
-    surname_strokes = [get_kangxi_stroke(c) for c in surname]
-    given_name_strokes = [get_kangxi_stroke(c) for c in given_name]
+    surname_strokes = get_kangxi_strokes(surname)
+    given_name_strokes = get_kangxi_strokes(given_name)
     
     # 检查是否有未找到的字
     all_found = all(s > 0 for s in surname_strokes + given_name_strokes)
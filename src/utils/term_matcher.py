@@ -0,0 +1,167 @@
+"""
+多模式词表匹配
+
+词表编译一次（字典树展开为正则，交给 re 引擎在 C 层扫描），之后对任意文本一次扫描即可完成：
+- 最左最长、互不重叠的命中与替换
+- 全部（可重叠）命中
+- 按词条附带的值（分类、译文、替换词）归类
+
+替换结果不会被再次匹配，因此词条之间、译文与词条之间不会互相串改。
+"""
+
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Set, Tuple, Union
+
+# 词表不超过该规模时，present() 直接逐词做子串查找（领域文本中命中密集，小词表上这样比正则扫描更快）
+SMALL_DICTIONARY = 128
+
+
+class TermMatch(NamedTuple):
+    """一次命中：文本区间 [start, end)、词条及其附带的值"""
+    start: int
+    end: int
+    term: str
+    value: Any
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """把词表展开成字典树形状的正则：同一起点总是优先尝试更长的词条"""
+    root: Dict[str, dict] = {}
+    for term in terms:
+        node = root
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict], depth: int = 0) -> str:
+        leaves = sorted(ch for ch, child in node.items() if ch and list(child) == [""])
+        branches = [
+            re.escape(ch) + build(child, depth + 1)
+            for ch, child in sorted(node.items()) if ch and list(child) != [""]
+        ]
+        # 首层全部保持为字面量分支，re 才能据此生成首字符集合并快速跳过无关文本
+        if len(leaves) == 1 or (leaves and depth == 0):
+            branches.extend(map(re.escape, leaves))
+        elif leaves:
+            branches.append("[" + "".join(map(re.escape, leaves)) + "]")
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(root)
+
+
+class TermMatcher:
+    """
+    编译后的多模式匹配器
+
+    Args:
+        terms: 词条序列，或 {词条: 值} 映射（值可为分类、译文等）；空串会被忽略
+    """
+
+    def __init__(self, terms: Union[Iterable[str], Mapping[str, Any]]):
+        if isinstance(terms, Mapping):
+            items = {term: value for term, value in terms.items() if term}
+        else:
+            items = {term: None for term in terms if term}
+
+        self._values: Dict[str, Any] = items
+        self._terms: List[str] = list(items)
+
+        # 每个词条在词表中的真前缀（按长度递增），用于从最长命中展开同一起点的全部命中
+        self._prefixes: Dict[str, Tuple[str, ...]] = {
+            term: tuple(term[:i] for i in range(1, len(term)) if term[:i] in items)
+            for term in self._terms
+        }
+
+        if self._terms:
+            pattern = _trie_pattern(self._terms)
+            self._longest: Optional[re.Pattern] = re.compile(pattern)
+            # 前瞻匹配本身无法生成首字符集合，额外加一层首字符前瞻
+            first = "".join(sorted({re.escape(term[0]) for term in self._terms}))
+            self._overlapping: Optional[re.Pattern] = re.compile(f"(?=[{first}])(?=({pattern}))")
+        else:
+            self._longest = self._overlapping = None
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __bool__(self) -> bool:
+        return bool(self._terms)
+
+    @property
+    def terms(self) -> List[str]:
+        return list(self._terms)
+
+    def iter_matches(self, text: str) -> Iterator[TermMatch]:
+        """全部命中（含重叠与嵌套），按起点递增，同一起点由短到长"""
+        if self._overlapping is None:
+            return
+        values, prefixes = self._values, self._prefixes
+        for found in self._overlapping.finditer(text):
+            start = found.start()
+            longest = found.group(1)
+            for term in prefixes[longest]:
+                yield TermMatch(start, start + len(term), term, values[term])
+            yield TermMatch(start, start + len(longest), longest, values[longest])
+
+    def find_all(self, text: str) -> List[TermMatch]:
+        return list(self.iter_matches(text))
+
+    def find_longest(self, text: str) -> List[TermMatch]:
+        """最左最长、互不重叠的命中，按起点排列"""
+        if self._longest is None:
+            return []
+        values = self._values
+        return [
+            TermMatch(found.start(), found.end(), found.group(), values[found.group()])
+            for found in self._longest.finditer(text)
+        ]
+
+    def search(self, text: str) -> Optional[TermMatch]:
+        """最左（同起点取最长）的一个命中，没有则返回 None"""
+        if self._longest is None:
+            return None
+        found = self._longest.search(text)
+        if found is None:
+            return None
+        return TermMatch(found.start(), found.end(), found.group(), self._values[found.group()])
+
+    def contains_any(self, text: str) -> bool:
+        return self._longest is not None and self._longest.search(text) is not None
+
+    def present(self, text: str) -> Set[str]:
+        """文本中出现过的不同词条"""
+        if len(self._terms) <= SMALL_DICTIONARY:
+            return {term for term in self._terms if term in text}
+        longest = set(self._overlapping.findall(text))
+        found = set(longest)
+        for term in longest:
+            found.update(self._prefixes[term])
+        return found
+
+    def tag(self, text: str) -> Dict[Any, List[str]]:
+        """按词条的值归类出现过的词条：{值: [词条, ...]}，词条保持词表顺序"""
+        found = self.present(text)
+        tagged: Dict[Any, List[str]] = {}
+        for term in self._terms:
+            if term in found:
+                tagged.setdefault(self._values[term], []).append(term)
+        return tagged
+
+    def replace(self, text: str, repl: Optional[Callable[[TermMatch], str]] = None) -> str:
+        """
+        最长优先替换，单次扫描完成
+
+        Args:
+            text: 原文
+            repl: 由命中生成替换文本的函数，缺省时使用词条附带的值
+        """
+        if self._longest is None:
+            return text
+        values = self._values
+        if repl is None:
+            return self._longest.sub(lambda found: str(values[found.group()]), text)
+        return self._longest.sub(
+            lambda found: repl(TermMatch(found.start(), found.end(), found.group(), values[found.group()])),
+            text,
+        )
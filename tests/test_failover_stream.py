@@ -0,0 +1,45 @@
+"""
+流式调用的并发反馈测试
+
+流式调用结束时应先释放模型并发名额、再向自适应限制器反馈成功，与非流式调用一致；
+否则 on_success 会把本请求计算两次，单路顺序请求也会推高并发上限。
+"""
+import pytest
+
+from src.ai import failover
+from src.ai.concurrency import AdaptiveConcurrencyLimiter
+from src.ai.failover import AIProviderManager
+from src.ai.models import AIModel
+
+
+class RecordingLimiter(AdaptiveConcurrencyLimiter):
+    """记录 on_success 被调用时的在途请求数"""
+
+    def __init__(self):
+        super().__init__(default_limit=4, max_limit=16)
+        self.in_flight_at_success = []
+
+    def on_success(self, key, latency=None):
+        self.in_flight_at_success.append(self.in_flight(key))
+        super().on_success(key, latency)
+
+
+async def upstream():
+    for chunk in ("甲", "乙", "丙"):
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_stream_releases_slot_before_success_feedback(monkeypatch):
+    limiter = RecordingLimiter()
+    monkeypatch.setattr(failover, "get_provider_limiter", lambda: limiter)
+    model = AIModel(name="stream-feedback-test", provider="openai")
+
+    for _ in range(3):
+        chunks = [chunk async for chunk in AIProviderManager._observe_stream(model, upstream())]
+        assert chunks == ["甲", "乙", "丙"]
+
+    assert limiter.in_flight_at_success == [0, 0, 0]
+    assert limiter.in_flight(model.name) == 0
+    # 顺序的单路请求利用率不足一半，上限保持不变
+    assert limiter.limit(model.name) == 4
@@ -0,0 +1,68 @@
+"""
+入库任务测试
+
+目录中某个文件读取失败时，该来源不能记为已完成：任务以 failed 结束并列出失败来源，
+继续任务时只重新加载失败的来源。
+"""
+import asyncio
+
+import pytest
+
+from src.rag.document_loader import KnowledgeDocumentLoader
+from src.rag.models import KnowledgeCategory
+from src.rag.service import RAGService
+
+GOOD = "# 五行\n\n木生火，火生土，土生金，金生水，水生木。"
+FIXED = "# 十天干\n\n甲乙丙丁戊己庚辛壬癸，阳干与阴干相间。"
+UNDECODABLE = b"# \xff\xfe\xfa broken \xc3\x28"
+
+
+async def wait_finished(service: RAGService, job_id: str, timeout: float = 10.0) -> dict:
+    async def poll():
+        while True:
+            job = service.get_ingestion_job(job_id)
+            if job["status"] in ("completed", "failed", "cancelled"):
+                return job
+            await asyncio.sleep(0.02)
+    return await asyncio.wait_for(poll(), timeout)
+
+
+def test_loader_raises_only_when_asked(tmp_path):
+    bad = tmp_path / "bad.md"
+    bad.write_bytes(UNDECODABLE)
+    loader = KnowledgeDocumentLoader()
+    assert loader.load_from_file(str(bad)) == []
+    with pytest.raises(UnicodeDecodeError):
+        loader.load_from_file(str(bad), raise_errors=True)
+
+
+@pytest.mark.asyncio
+async def test_failed_source_fails_job_and_is_reloaded_on_resume(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "good.md").write_text(GOOD, encoding="utf-8")
+    bad = corpus / "bad.md"
+    bad.write_bytes(UNDECODABLE)
+
+    service = RAGService(data_path=str(tmp_path / "data"), embedding_model="local")
+    kb = service.create_knowledge_base("test", category=KnowledgeCategory.WUXING)
+    job = await service.start_ingestion_job(kb.id, directory=str(corpus))
+    job = await wait_finished(service, job["id"])
+
+    assert job["status"] == "failed"
+    assert job["failed_sources"] == [str(bad.resolve())]
+    assert job["completed_sources"] == 1
+    assert job["stats"]["documents"] == 1
+
+    bad.write_text(FIXED, encoding="utf-8")
+    await service.resume_ingestion_job(job["id"])
+    job = await wait_finished(service, job["id"])
+
+    assert job["status"] == "completed"
+    assert job["failed_sources"] == []
+    assert job["completed_sources"] == job["total_sources"] == 2
+    # 只重新加载了失败的来源
+    assert job["current_run"]["sources"] == 1
+    assert job["stats"]["documents"] == 2
+    contents = [entry.content for entry in service.vector_store_manager.get_store(kb.id)._entries.values()]
+    assert any("甲乙丙丁" in content for content in contents)
@@ -0,0 +1,189 @@
+"""
+向量集合分段存储测试
+
+覆盖写入中断后的重新打开、删除后重新写入同 id、压缩只保留存活行、旧版 JSON 目录迁移。
+"""
+import json
+
+import numpy as np
+
+from src.rag.models import DocumentChunk
+from src.rag.segments import DELETES_FILE, LEGACY_DIR, MANIFEST_FILE, SegmentStore
+from src.rag.vector_store import VectorStore
+
+DIM = 4
+
+
+def record(entry_id: str, content: str = "") -> dict:
+    return {
+        "id": entry_id,
+        "document_id": "d",
+        "content": content or f"内容 {entry_id}",
+        "category": "general",
+        "metadata": {},
+    }
+
+
+def unit_rows(count: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def loaded_rows(store: SegmentStore) -> dict:
+    """重新打开后的存活行 {id: (content, 向量)}"""
+    segments, deletes = store.load()
+    return {
+        segment.records[row]["id"]: (segment.records[row]["content"], np.asarray(segment.vectors[row]))
+        for segment, rows in SegmentStore.live_rows(segments, deletes)
+        for row in rows
+    }
+
+
+# ==================== 写入中断 ====================
+
+def test_reopen_truncates_torn_active_segment_tail(tmp_path):
+    store = SegmentStore(tmp_path)
+    vectors = unit_rows(4)
+    store.append([record(i) for i in "abc"], vectors[:3])
+    active = store._active
+
+    # 模拟写入中断：向量只写了半行，元数据最后一行不完整
+    with open(tmp_path / f"{active}.f32", "ab") as f:
+        f.write(vectors[3].tobytes()[:DIM * 2])
+    with open(tmp_path / f"{active}.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"id": "d", "docu')
+
+    reopened = SegmentStore(tmp_path)
+    rows = loaded_rows(reopened)
+    assert sorted(rows) == ["a", "b", "c"]
+    np.testing.assert_array_equal(rows["c"][1], vectors[2])
+    assert (tmp_path / f"{active}.f32").stat().st_size == 3 * DIM * 4
+    assert len((tmp_path / f"{active}.jsonl").read_text(encoding="utf-8").splitlines()) == 3
+
+    # 截断后继续追加，行仍然对齐
+    reopened.append([record("d")], vectors[3:])
+    rows = loaded_rows(SegmentStore(tmp_path))
+    assert sorted(rows) == ["a", "b", "c", "d"]
+    np.testing.assert_array_equal(rows["d"][1], vectors[3])
+
+
+def test_reopen_drops_vector_row_without_metadata(tmp_path):
+    store = SegmentStore(tmp_path)
+    vectors = unit_rows(3)
+    store.append([record("a"), record("b")], vectors[:2])
+    # 向量已写入、元数据未写入时进程退出
+    with open(tmp_path / f"{store._active}.f32", "ab") as f:
+        f.write(vectors[2].tobytes())
+
+    assert sorted(loaded_rows(SegmentStore(tmp_path))) == ["a", "b"]
+
+
+def test_vector_store_reopens_after_torn_write(tmp_path):
+    store = VectorStore(str(tmp_path), dimension=DIM)
+    chunks = [DocumentChunk(id=i, document_id="d", content=f"内容 {i}") for i in "ab"]
+    store.add_batch(chunks, unit_rows(2).tolist())
+    active = store._segments._active
+    with open(tmp_path / f"{active}.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"id": "c"')
+
+    reopened = VectorStore(str(tmp_path), dimension=DIM)
+    assert reopened.count() == 2
+    assert reopened.search(unit_rows(2)[0].tolist(), top_k=1)[0][0].id == "a"
+
+
+# ==================== 删除与重新写入 ====================
+
+def test_delete_then_readd_same_id_survives_reopen(tmp_path):
+    store = SegmentStore(tmp_path)
+    vectors = unit_rows(3)
+    store.append([record("a", "旧"), record("b")], vectors[:2])
+    store.delete(["a"])
+    store.append([record("a", "新")], vectors[2:])
+
+    rows = loaded_rows(SegmentStore(tmp_path))
+    assert sorted(rows) == ["a", "b"]
+    assert rows["a"][0] == "新"
+    np.testing.assert_array_equal(rows["a"][1], vectors[2])
+
+
+def test_vector_store_delete_and_readd_across_reopen(tmp_path):
+    store = VectorStore(str(tmp_path), dimension=DIM)
+    vectors = unit_rows(3)
+    store.add_batch([DocumentChunk(id=i, document_id="d", content=f"旧 {i}") for i in "ab"], vectors[:2].tolist())
+    assert store.delete("a")
+    store.add_batch([DocumentChunk(id="a", document_id="d", content="新 a")], vectors[2:].tolist())
+    assert store.delete("b")
+
+    reopened = VectorStore(str(tmp_path), dimension=DIM)
+    assert reopened.count() == 1
+    assert reopened.get("a").content == "新 a"
+    assert reopened.get("b") is None
+    assert reopened.search(vectors[2].tolist(), top_k=1)[0][0].id == "a"
+
+
+# ==================== 压缩 ====================
+
+def test_compact_keeps_exactly_live_rows(tmp_path):
+    store = SegmentStore(tmp_path, segment_rows=2)
+    vectors = unit_rows(8)
+    store.append([record(i) for i in "abcde"], vectors[:5])
+    store.append([record("c", "覆盖")], vectors[5:6], replaced=1)
+    store.delete(["b", "e"])
+    store.append([record("e", "重新写入")], vectors[6:7])
+    store.delete(["x"])   # 不存在的 id
+    before = loaded_rows(store)
+    old_files = {f.name for f in tmp_path.iterdir() if f.name.startswith("seg-")}
+
+    assert store.compact() == 4
+    assert store.dead_rows == 0
+    assert not (tmp_path / DELETES_FILE).exists()
+    assert not old_files & {f.name for f in tmp_path.iterdir()}
+
+    after = loaded_rows(SegmentStore(tmp_path, segment_rows=2))
+    assert sorted(after) == sorted(before) == ["a", "c", "d", "e"]
+    assert after["c"][0] == "覆盖" and after["e"][0] == "重新写入"
+    for entry_id, (content, vector) in before.items():
+        np.testing.assert_array_equal(after[entry_id][1], vector)
+    # 压缩后各行只出现一次
+    segments, _ = SegmentStore(tmp_path).load()
+    assert sum(len(segment.records) for segment in segments) == 4
+
+
+# ==================== 旧格式迁移 ====================
+
+def test_migrate_legacy_json_moves_files(tmp_path):
+    raw = np.random.default_rng(1).standard_normal((3, DIM)).astype(np.float32)
+    for i, vector in enumerate(raw):
+        entry = dict(record(f"e{i}"), embedding=vector.tolist())
+        (tmp_path / f"e{i}.json").write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+    (tmp_path / "_index.json").write_text("{}", encoding="utf-8")
+    (tmp_path / "index.json").write_text('{"type": "flat"}', encoding="utf-8")
+
+    store = SegmentStore(tmp_path)
+    assert store.migrate_legacy_json(keep=["index.json"]) == 3
+
+    legacy = tmp_path / LEGACY_DIR
+    assert sorted(f.name for f in legacy.iterdir()) == ["_index.json", "e0.json", "e1.json", "e2.json"]
+    assert not list(tmp_path.glob("e*.json"))
+    assert (tmp_path / "index.json").exists()
+    assert (tmp_path / MANIFEST_FILE).exists()
+
+    rows = loaded_rows(SegmentStore(tmp_path))
+    assert sorted(rows) == ["e0", "e1", "e2"]
+    expected = raw / np.linalg.norm(raw, axis=1, keepdims=True)
+    for i in range(3):
+        np.testing.assert_allclose(rows[f"e{i}"][1], expected[i], rtol=1e-6)
+    # 已迁移的目录不再重复迁移
+    assert SegmentStore(tmp_path).migrate_legacy_json(keep=["index.json"]) == 0
+
+
+def test_vector_store_opens_legacy_directory(tmp_path):
+    vector = [3.0, 4.0, 0.0, 0.0]
+    entry = dict(record("old"), embedding=vector)
+    (tmp_path / "old.json").write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+
+    store = VectorStore(str(tmp_path), dimension=DIM)
+    assert store.get("old").content == "内容 old"
+    assert (tmp_path / LEGACY_DIR / "old.json").exists()
+    hit, score = store.search([0.6, 0.8, 0.0, 0.0], top_k=1)[0]
+    assert hit.id == "old" and abs(score - 1.0) < 1e-6
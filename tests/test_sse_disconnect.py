@@ -0,0 +1,221 @@
+"""
+SSE 客户端断开测试
+
+本地桩服务器以 chunked 方式缓慢推送 SSE 事件，上游生成器通过 httpx 流式读取；
+模拟客户端断开后，cancel_on_disconnect 应及时关闭上游生成器（桩服务器看到连接关闭），
+并通过回调把请求记录为 client_abandoned。
+"""
+import asyncio
+import time
+import uuid
+
+import httpx
+import pytest
+
+from src.common.sse_response import cancel_on_disconnect
+from src.monitoring.stream_metrics import (
+    OUTCOME_CLIENT_ABANDONED,
+    abandon_stream_tracking,
+    complete_stream_tracking,
+    start_stream_tracking,
+    stream_metrics,
+)
+
+# 断开后上游必须在该时间内关闭（秒）
+CLOSE_DEADLINE = 1.0
+
+
+class StubUpstream:
+    """本地 SSE 桩服务器：每 interval 秒推送一个事件，记录连接被对端关闭的时间"""
+
+    def __init__(self, events: int = 1000, interval: float = 0.02, first_delay: float = 0.0):
+        self.events = events
+        self.interval = interval
+        self.first_delay = first_delay
+        self.connection_closed = asyncio.Event()
+        self.sent = 0
+        self._server = None
+
+    async def __aenter__(self) -> "StubUpstream":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}/stream"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await reader.readuntil(b"\r\n\r\n")
+        watcher = asyncio.ensure_future(reader.read())   # 对端关闭时返回 b""
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/event-stream\r\n"
+                b"Transfer-Encoding: chunked\r\n\r\n"
+            )
+            await writer.drain()
+            # 等待期间对端关闭则立即结束
+            await asyncio.wait([watcher], timeout=self.first_delay)
+            for i in range(self.events):
+                if watcher.done():
+                    break
+                payload = f"data: {i}\n\n".encode()
+                writer.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+                await writer.drain()
+                self.sent += 1
+                await asyncio.wait([watcher], timeout=self.interval)
+            else:
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+            await watcher
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connection_closed.set()
+            watcher.cancel()
+            writer.close()
+
+
+class FakeRequest:
+    """只实现 is_disconnected 的请求对象"""
+
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+
+async def upstream_frames(url: str, state: dict):
+    """上游生成器：逐行转发 SSE 事件，关闭时记录时间"""
+    try:
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            async with client.stream("GET", url) as response:
+                async for line in response.aiter_lines():
+                    if line:
+                        yield f"{line}\n\n"
+    finally:
+        state["closed_at"] = time.monotonic()
+
+
+def outcome_of(request_id: str):
+    for record in stream_metrics.get_recent_requests(limit=50):
+        if record["request_id"] == request_id:
+            return record["outcome"]
+    return None
+
+
+@pytest.mark.asyncio
+async def test_disconnect_mid_stream_closes_upstream():
+    request_id = f"test-{uuid.uuid4().hex}"
+    start_stream_tracking(request_id, model="stub")
+    request = FakeRequest()
+    state: dict = {}
+
+    async with StubUpstream() as stub:
+        frames = []
+        stream = cancel_on_disconnect(
+            request,
+            upstream_frames(stub.url, state),
+            on_disconnect=lambda: abandon_stream_tracking(request_id),
+            poll_interval=0.01,
+        )
+        async for frame in stream:
+            frames.append(frame)
+            if len(frames) == 3:
+                request.disconnected = True
+                disconnected_at = time.monotonic()
+
+        await asyncio.wait_for(stub.connection_closed.wait(), CLOSE_DEADLINE)
+        assert frames == ["data: 0\n\n", "data: 1\n\n", "data: 2\n\n"]
+        assert state["closed_at"] - disconnected_at < CLOSE_DEADLINE
+        assert stub.sent < stub.events
+
+    assert outcome_of(request_id) == OUTCOME_CLIENT_ABANDONED
+
+
+@pytest.mark.asyncio
+async def test_disconnect_before_first_event_cancels_pending_read():
+    request_id = f"test-{uuid.uuid4().hex}"
+    start_stream_tracking(request_id, model="stub")
+    request = FakeRequest()
+    state: dict = {}
+
+    async with StubUpstream(first_delay=30.0) as stub:
+        stream = cancel_on_disconnect(
+            request,
+            upstream_frames(stub.url, state),
+            on_disconnect=lambda: abandon_stream_tracking(request_id),
+            poll_interval=0.01,
+        )
+        consumer = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.1)
+        request.disconnected = True
+        with pytest.raises(StopAsyncIteration):
+            await asyncio.wait_for(consumer, CLOSE_DEADLINE)
+
+        await asyncio.wait_for(stub.connection_closed.wait(), CLOSE_DEADLINE)
+        assert stub.sent == 0
+        assert "closed_at" in state
+
+    assert outcome_of(request_id) == OUTCOME_CLIENT_ABANDONED
+
+
+@pytest.mark.asyncio
+async def test_server_cancelling_response_task_closes_upstream():
+    """服务器先检测到断开、直接取消响应任务时同样关闭上游"""
+    request_id = f"test-{uuid.uuid4().hex}"
+    start_stream_tracking(request_id, model="stub")
+    state: dict = {}
+
+    async with StubUpstream() as stub:
+        received = asyncio.Event()
+
+        async def respond():
+            stream = cancel_on_disconnect(
+                FakeRequest(),
+                upstream_frames(stub.url, state),
+                on_disconnect=lambda: abandon_stream_tracking(request_id),
+                poll_interval=0.01,
+            )
+            async for _ in stream:
+                received.set()
+
+        task = asyncio.ensure_future(respond())
+        await asyncio.wait_for(received.wait(), CLOSE_DEADLINE)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        await asyncio.wait_for(stub.connection_closed.wait(), CLOSE_DEADLINE)
+        assert "closed_at" in state
+
+    assert outcome_of(request_id) == OUTCOME_CLIENT_ABANDONED
+
+
+@pytest.mark.asyncio
+async def test_completed_stream_is_not_abandoned():
+    request_id = f"test-{uuid.uuid4().hex}"
+    start_stream_tracking(request_id, model="stub")
+    abandoned = []
+    state: dict = {}
+
+    async with StubUpstream(events=3, interval=0.0) as stub:
+        stream = cancel_on_disconnect(
+            FakeRequest(),
+            upstream_frames(stub.url, state),
+            on_disconnect=lambda: abandoned.append(request_id),
+            poll_interval=0.01,
+        )
+        frames = [frame async for frame in stream]
+
+    complete_stream_tracking(request_id)
+    assert len(frames) == 3
+    assert abandoned == []
+    assert "closed_at" in state
+    assert outcome_of(request_id) != OUTCOME_CLIENT_ABANDONED
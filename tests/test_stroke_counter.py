@@ -0,0 +1,53 @@
+"""
+笔画表测试
+
+诸葛神算接受任意三个汉字，CJK 基本区（U+4E00–U+9FA5）的每个字都必须能查到笔画。
+"""
+import pytest
+
+from src.divination.zhuge.zhuge import ZhugeService
+from src.utils.stroke_counter import get_kangxi_stroke, get_stroke, get_stroke_table, to_traditional
+
+CJK_BASIC = range(0x4E00, 0x9FA5 + 1)
+
+
+def test_every_basic_cjk_char_has_standard_strokes():
+    missing = [f"U+{cp:04X}" for cp in CJK_BASIC if get_stroke(chr(cp)) < 1]
+    assert missing == []
+
+
+def test_every_basic_cjk_char_has_kangxi_strokes():
+    missing = [f"U+{cp:04X}" for cp in CJK_BASIC if get_kangxi_stroke(chr(cp)) < 1]
+    assert missing == []
+
+
+@pytest.mark.parametrize("char, standard, kangxi", [
+    ("张", 7, 11),
+    ("刘", 6, 15),
+    ("一", 1, 1),
+    ("龍", 16, 16),
+])
+def test_known_strokes(char, standard, kangxi):
+    assert get_stroke(char) == standard
+    assert get_kangxi_stroke(char) == kangxi
+
+
+@pytest.mark.parametrize("text", ["", "张三", "a", "😀"])
+def test_non_single_cjk_input_is_not_found(text):
+    assert get_stroke(text) == -1
+    assert get_kangxi_stroke(text) == -1
+
+
+def test_traditional_ignores_non_single_char_input():
+    assert to_traditional("刘") == "劉"
+    assert to_traditional("") == ""
+    assert get_stroke_table().traditional("张三") == "张三"
+
+
+def test_zhuge_rejects_unknown_strokes():
+    service = ZhugeService()
+    assert service.calculate_qian_number("张", "刘", "一") == 761 - 384
+    with pytest.raises(ValueError):
+        service.calculate_qian_number("张", "a", "一")
+    result = service.divine("张a一")
+    assert result["success"] is False
@@ -0,0 +1,99 @@
+"""
+多模式词表匹配测试
+
+find_all / find_longest / present 与逐位置暴力查找对照（小词表走子串查找、大词表走正则），
+并固定 translate_text 单次扫描后的术语重叠行为。
+"""
+import random
+
+import pytest
+
+from src.i18n.glossary import translate_text
+from src.utils.term_matcher import SMALL_DICTIONARY, TermMatch, TermMatcher
+
+# 小字母表保证大量重叠与嵌套；含正则元字符与中文
+ALPHABET = "ab.*木火土"
+
+
+def random_terms(rng: random.Random, count: int, max_len: int = 4) -> list:
+    terms = set()
+    while len(terms) < count:
+        terms.add("".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, max_len))))
+    return sorted(terms)
+
+
+def brute_all(terms, text: str) -> list:
+    return [
+        (i, i + len(term), term)
+        for i in range(len(text))
+        for term in sorted(terms, key=len)
+        if text.startswith(term, i)
+    ]
+
+
+def brute_longest(terms, text: str) -> list:
+    result, i = [], 0
+    while i < len(text):
+        hits = [term for term in terms if text.startswith(term, i)]
+        if hits:
+            term = max(hits, key=len)
+            result.append((i, i + len(term), term))
+            i += len(term)
+        else:
+            i += 1
+    return result
+
+
+def spans(matches) -> list:
+    return [(match.start, match.end, match.term) for match in matches]
+
+
+@pytest.mark.parametrize("size", [3, 20, SMALL_DICTIONARY, SMALL_DICTIONARY + 1, 300])
+def test_matches_agree_with_brute_force(size):
+    rng = random.Random(size)
+    for _ in range(30):
+        terms = random_terms(rng, size, max_len=5 if size > 200 else 4)
+        matcher = TermMatcher({term: i for i, term in enumerate(terms)})
+        for _ in range(10):
+            text = "".join(rng.choice(ALPHABET + "xyz") for _ in range(rng.randint(0, 60)))
+
+            assert spans(matcher.find_all(text)) == brute_all(terms, text)
+            assert spans(matcher.find_longest(text)) == brute_longest(terms, text)
+            assert matcher.present(text) == {term for term in terms if term in text}
+            for match in matcher.find_all(text):
+                assert match.value == terms.index(match.term)
+
+
+def test_empty_terms_are_ignored():
+    matcher = TermMatcher(["", "木"])
+    assert len(matcher) == 1
+    assert matcher.present("火土") == set()
+    assert not TermMatcher([""])
+    assert TermMatcher([]).find_all("木") == []
+
+
+def test_replace_is_single_pass():
+    matcher = TermMatcher({"木": "火", "火": "土", "木火": "金"})
+    assert matcher.replace("木火木") == "金火"
+    assert matcher.replace("木", lambda match: f"<{match.term}>") == "<木>"
+    assert matcher.search("土木火") == TermMatch(1, 3, "木火", "金")
+
+
+# ==================== translate_text ====================
+
+@pytest.mark.parametrize("text, lang, expected", [
+    # 译文不会被再次匹配（旧实现逐词 replace，会把 流年 译文中的 年柱 再译一遍：流年（流年）柱（年柱））
+    ("流年柱", "zh-TW", "流年（流年）柱"),
+    ("流年柱", "en", "Annual Luck（流年）柱"),
+    # 最长优先：塔罗牌 命中后剩余的 阵 不再组成 牌阵
+    ("塔罗牌阵", "zh-TW", "塔羅牌（塔罗牌）阵"),
+    ("塔罗牌与牌阵", "zh-TW", "塔羅牌（塔罗牌）与牌陣（牌阵）"),
+    # 首次出现保留中文括注，后续出现只用译文
+    ("用神与用神", "en", "Useful God（用神）与Useful God"),
+])
+def test_translate_text_single_pass(text, lang, expected):
+    assert translate_text(text, lang) == expected
+
+
+def test_translate_text_unknown_language_is_noop():
+    assert translate_text("塔罗牌阵", "xx") == "塔罗牌阵"
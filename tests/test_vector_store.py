@@ -0,0 +1,56 @@
+"""
+向量集合测试：嵌入模型标识的记录与校验
+"""
+import json
+
+import pytest
+
+from src.rag.models import DocumentChunk
+from src.rag.vector_store import LEGACY_LOCAL_MODEL_ID, VectorStore, VectorStoreManager
+
+LOCAL = "local-v2-4-n123"
+OPENAI = "openai:text-embedding-3-small"
+
+
+def legacy_collection(path) -> None:
+    """升级前的集合：有向量、index.json 未记录模型标识"""
+    store = VectorStore(str(path), dimension=4)
+    store.add_batch([DocumentChunk(id="a", document_id="d", content="五行相生")], [[1.0, 0.0, 0.0, 0.0]])
+    store.save_all()
+    assert not (path / "index.json").exists()
+
+
+def test_new_collection_records_current_model(tmp_path):
+    store = VectorStore(str(tmp_path), dimension=4, embedding_model=LOCAL)
+    assert store.embedding_model == LOCAL and not store.model_mismatch
+    assert json.loads((tmp_path / "index.json").read_text(encoding="utf-8"))["embedding_model"] == LOCAL
+
+
+@pytest.mark.parametrize("legacy_name", [None, "local"])
+def test_unrecorded_local_collection_is_flagged(tmp_path, legacy_name):
+    legacy_collection(tmp_path)
+    store = VectorStore(str(tmp_path), dimension=4, embedding_model=LOCAL, legacy_embedding_model=legacy_name)
+    assert store.model_mismatch
+    assert store.embedding_model == LEGACY_LOCAL_MODEL_ID
+    assert store.search([1.0, 0.0, 0.0, 0.0]) == []
+    assert store.keyword_search("五行")
+    # 重新打开仍然不匹配；清空后绑定当前模型
+    assert VectorStore(str(tmp_path), dimension=4, embedding_model=LOCAL).model_mismatch
+    store.clear()
+    assert not VectorStore(str(tmp_path), dimension=4, embedding_model=LOCAL).model_mismatch
+
+
+def test_unrecorded_openai_collection_is_adopted(tmp_path):
+    legacy_collection(tmp_path)
+    store = VectorStore(str(tmp_path), dimension=4, embedding_model=OPENAI, legacy_embedding_model="openai")
+    assert not store.model_mismatch
+    assert store.embedding_model == OPENAI
+    assert store.search([1.0, 0.0, 0.0, 0.0])
+
+
+def test_unrecorded_openai_collection_under_local_model_is_flagged(tmp_path):
+    legacy_collection(tmp_path / "kb" / "vectors")
+    manager = VectorStoreManager(str(tmp_path), embedding_model=LOCAL)
+    manager.legacy_models["kb"] = "openai"
+    store = manager.get_store("kb", 4)
+    assert store.model_mismatch and store.embedding_model == "openai"